@@ -34,6 +34,57 @@ class Settings(BaseSettings):
     azure_openai_api_version: str = "2024-12-01-preview"
     azure_openai_deployment_m: str
     azure_openai_deployment_n: str
+    # Pools de déploiements par rôle : "client=dep1,dep2;synthese=dep3,dep4"
+    azure_openai_deployment_pools: str = ""
+
+    # Azure OpenAI - pool de connexions HTTP du client partagé
+    azure_openai_max_connections: int = 100
+    azure_openai_max_keepalive_connections: int = 20
+    azure_openai_keepalive_expiry: float = 30.0
+    azure_openai_connect_timeout: float = 10.0
+    azure_openai_timeout: float = 120.0
+
+    # Synthèses exécutées en tâche de fond
+    synthese_max_workers: int = 2
+    synthese_job_ttl_seconds: int = 3600
+    synthese_job_budget_seconds: float = 600.0
+    # "unique" (un appel pour toute l'évaluation) ou "parallele" (un appel par dimension)
+    synthese_mode: str = "unique"
+    # Sortie structurée stricte (schéma JSON imposé) ; false si le déploiement ne la supporte pas
+    synthese_structured_output: bool = True
+
+    # Résilience des appels Azure OpenAI (tentatives, backoff, disjoncteur par déploiement)
+    llm_max_attempts: int = 4
+    llm_backoff_base_seconds: float = 0.5
+    llm_backoff_max_seconds: float = 20.0
+    llm_circuit_failure_threshold: int = 5
+    llm_circuit_reset_seconds: float = 30.0
+
+    # Budget de temps des appels LLM d'une requête
+    llm_chat_budget_seconds: float = 45.0
+    llm_faq_budget_seconds: float = 60.0
+
+    # Documents de référence partagés (intervalle de vérification des fichiers, 0 = pas de rechargement)
+    documents_reload_interval_seconds: float = 30.0
+
+    # Versions du corpus (manifest.json par répertoire) et déploiement progressif
+    corpus_directory: str = "data/txt"
+    corpus_default_version: str = "racine"
+    corpus_rollout: str = ""
+
+    # Cache des réponses FAQ (mémoire LRU + FileShare)
+    faq_cache_max_entries: int = 500
+    faq_cache_ttl_seconds: int = 604800
+    faq_cache_similarity_threshold: float = 0.85
+
+    # Fenêtre de conversation du client simulé (budget de tokens du prompt)
+    conversation_token_budget: int = 8000
+    conversation_token_budgets: str = ""  # par déploiement : "deploiement=budget,..."
+    conversation_verbatim_turns: int = 6
+
+    # Pré-évaluation de la conversation en tâche de fond, par segments de N tours
+    pre_evaluation_enabled: bool = False
+    pre_evaluation_turns_per_segment: int = 4
 
     # OAuth2 Gauthiq
     gauthiq_client_id: str
@@ -75,12 +126,36 @@ class Settings(BaseSettings):
 
     # OAuth2 Gauthiq - Additional
     gauthiq_habilitation_endpoint: str = "/api/habilitations"
+    # Cache des habilitations par jeton d'accès (validate_session)
+    habilitations_cache_ttl_seconds: int = 300
+    habilitations_cache_max_entries: int = 10000
+    # Entrée périmée servie pendant cette durée si l'API est lente ou en erreur (0 : désactivé)
+    habilitations_stale_seconds: int = 600
+    # Attente maximale du rafraîchissement avant de servir l'entrée périmée
+    habilitations_stale_wait_seconds: float = 1.0
+    habilitations_timeout_seconds: float = 10.0
+    habilitations_max_connections: int = 20
 
     # Session Configuration - Additional
     session_max_age_hours: int = 1
     session_cookie_path: str = "/"
+    # Stockage des sessions : "memory", "filesystem", "sqlite" (identifiant signé dans le cookie)
+    # ou "cookie" (session entière dans le cookie signé)
     session_type: str = "filesystem"
     session_file_dir: str = "flask_session/"
+    session_sqlite_path: str = "data/sessions.sqlite3"
+    session_memory_max_entries: int = 10000
+    # Purge des sessions et journaux expirés (tâche de fond, index des expirations par tranches)
+    session_gc_interval_seconds: int = 300
+    session_gc_batch_size: int = 200
+    session_gc_concurrency: int = 4
+    session_gc_max_per_pass: int = 5000
+    session_gc_bucket_seconds: int = 3600
+    # Journal des conversations en ajout seul : "memory" ou "filesystem"
+    # (répertoire relatif au stockage : FileShare en production)
+    conversation_log_type: str = "filesystem"
+    conversation_log_dir: str = "conversations/"
+    conversation_log_cache_entries: int = 1000
     session_file_threshold: int = 100
     session_use_signer: bool = True
     session_permanent: bool = True
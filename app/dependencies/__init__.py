@@ -9,6 +9,7 @@ from .auth import (
     get_habilitations_manager,
 )
 from .session import get_session
+from .openai_client import get_azure_openai_client
 
 __all__ = [
     "get_current_user",
@@ -16,4 +17,5 @@ __all__ = [
     "oauth_client",
     "get_habilitations_manager",
     "get_session",
+    "get_azure_openai_client",
 ]
@@ -1,21 +1,29 @@
 """
 Dépendances d'authentification pour FastAPI
 """
+import logging
 import secrets
-import requests
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+
+import httpx
 from fastapi import Depends, HTTPException, status, Request
 from authlib.integrations.starlette_client import OAuth
 from starlette.config import Config as StarletteConfig
 
 from app.config import get_settings, Settings
+from core.cache_habilitations import get_cache_habilitations
 from core.habilitations_manager import HabilitationsManager
 
 
+logger = logging.getLogger(__name__)
+
 # OAuth client singleton
 _oauth_instance = None
 
+# Client HTTP partagé de l'API des habilitations (pool de connexions keep-alive)
+_habilitations_http_client: Optional[httpx.AsyncClient] = None
+
 
 def get_oauth_client():
     """Retourne l'instance OAuth (singleton)"""
@@ -56,6 +64,73 @@ def get_oauth_client():
 oauth_client = Depends(get_oauth_client)
 
 
+def get_habilitations_http_client(settings: Settings) -> httpx.AsyncClient:
+    """
+    Client HTTP asynchrone partagé pour l'API des habilitations (créé au premier appel)
+
+    Args:
+        settings: Configuration de l'application
+
+    Returns:
+        httpx.AsyncClient: Client avec pool de connexions
+    """
+    global _habilitations_http_client
+    if _habilitations_http_client is None or _habilitations_http_client.is_closed:
+        _habilitations_http_client = httpx.AsyncClient(
+            verify=settings.get_auth_ssl_verify(),
+            timeout=httpx.Timeout(settings.habilitations_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.habilitations_max_connections,
+                max_keepalive_connections=settings.habilitations_max_connections,
+            ),
+        )
+    return _habilitations_http_client
+
+
+async def close_habilitations_http_client() -> None:
+    """Ferme le client HTTP des habilitations (appelé à l'arrêt de l'application)"""
+    global _habilitations_http_client
+    if _habilitations_http_client is not None:
+        await _habilitations_http_client.aclose()
+        _habilitations_http_client = None
+
+
+async def _appeler_api_habilitations(access_token: str, settings: Settings) -> dict:
+    """
+    Appelle l'API Gauthiq des habilitations
+
+    Returns:
+        dict: Habilitations ({} si l'API refuse le jeton)
+
+    Raises:
+        httpx.HTTPError: API injoignable, trop lente ou en erreur serveur
+        ValueError: Réponse illisible
+    """
+    response = await get_habilitations_http_client(settings).get(
+        settings.gauthiq_habilitation,
+        params={"filtre": settings.gauthiq_habilitation_filtre},
+        headers={
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/json",
+        },
+    )
+
+    # Erreur serveur : API indisponible (pas de mise en cache)
+    if response.status_code >= 500:
+        response.raise_for_status()
+    if response.status_code != 200:
+        return {}
+    return response.json()
+
+
+def _requete_habilitations_valide(userinfo: dict, access_token: str, settings: Settings) -> bool:
+    return (
+        isinstance(userinfo, dict)
+        and bool(access_token) and isinstance(access_token, str)
+        and bool(settings.gauthiq_habilitation_filtre)
+    )
+
+
 async def get_user_habilitations(
     userinfo: dict,
     access_token: str,
@@ -64,6 +139,9 @@ async def get_user_habilitations(
     """
     Récupère les habilitations de l'utilisateur depuis l'API Gauthiq
 
+    Appel direct (connexion) : le résultat est enregistré dans le cache des
+    habilitations utilisé par validate_session.
+
     Args:
         userinfo: Informations utilisateur du token ID
         access_token: Token d'accès OAuth
@@ -72,51 +150,38 @@ async def get_user_habilitations(
     Returns:
         dict: Habilitations de l'utilisateur ou {} en cas d'erreur
     """
-    if not isinstance(userinfo, dict):
-        return {}
-
-    if not access_token or not isinstance(access_token, str):
+    if not _requete_habilitations_valide(userinfo, access_token, settings):
         return {}
 
-    # Récupération du filtre d'habilitations
-    filtre_habilitation = settings.gauthiq_habilitation_filtre
-
-    if not filtre_habilitation:
+    try:
+        habilitations = await _appeler_api_habilitations(access_token, settings)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning(f"Habilitations indisponibles: {e}")
         return {}
 
-    # Construction de l'URL avec le filtre
-    api_url = settings.gauthiq_habilitation
-    params = {"filtre": filtre_habilitation}
-
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Accept": "application/json",
-    }
+    get_cache_habilitations().enregistrer(access_token, habilitations)
+    return habilitations
 
-    try:
-        # Utilise le mode d'authentification pour SSL
-        ssl_verify = settings.get_auth_ssl_verify()
 
-        response = requests.get(
-            api_url,
-            params=params,
-            headers=headers,
-            timeout=10,
-            verify=ssl_verify,
-        )
+async def get_cached_user_habilitations(userinfo: dict, access_token: str, settings: Settings) -> dict:
+    """
+    Habilitations de l'utilisateur depuis le cache (API appelée seulement à expiration)
 
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {}
+    Args:
+        userinfo: Informations utilisateur du token ID
+        access_token: Token d'accès OAuth
+        settings: Configuration de l'application
 
-    except requests.exceptions.Timeout:
-        return {}
-    except requests.exceptions.RequestException:
-        return {}
-    except ValueError:
+    Returns:
+        dict: Copie des habilitations ou {} si elles sont indisponibles
+    """
+    if not _requete_habilitations_valide(userinfo, access_token, settings):
         return {}
 
+    return await get_cache_habilitations().obtenir(
+        access_token, lambda: _appeler_api_habilitations(access_token, settings)
+    )
+
 
 async def validate_session(request: Request, settings: Settings = Depends(get_settings)) -> Optional[Dict[str, Any]]:
     """
@@ -156,8 +221,8 @@ async def validate_session(request: Request, settings: Settings = Depends(get_se
     if not access_token or not user:
         return None
 
-    # Récupérer les habilitations à nouveau
-    habilitations = await get_user_habilitations(user, access_token, settings)
+    # Habilitations du cache (API rappelée à l'expiration de l'entrée)
+    habilitations = await get_cached_user_habilitations(user, access_token, settings)
 
     # Vérifier si l'utilisateur est admin
     admin_list = settings.get_admin_list()
@@ -0,0 +1,92 @@
+"""
+Client Azure OpenAI asynchrone partagé par tous les routers
+"""
+import logging
+from typing import Optional
+
+import httpx
+from openai import AsyncAzureOpenAI
+
+from app.config import get_settings, Settings
+
+
+logger = logging.getLogger(__name__)
+
+# Client singleton (créé au démarrage de l'application)
+_openai_client: Optional[AsyncAzureOpenAI] = None
+
+
+def create_openai_client(settings: Settings) -> AsyncAzureOpenAI:
+    """
+    Crée un client AsyncAzureOpenAI avec un pool de connexions HTTP keep-alive
+
+    Args:
+        settings: Configuration de l'application
+
+    Returns:
+        AsyncAzureOpenAI: Client configuré
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.azure_openai_max_connections,
+            max_keepalive_connections=settings.azure_openai_max_keepalive_connections,
+            keepalive_expiry=settings.azure_openai_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            settings.azure_openai_timeout,
+            connect=settings.azure_openai_connect_timeout,
+        ),
+    )
+
+    return AsyncAzureOpenAI(
+        api_key=settings.azure_openai_api_key,
+        api_version=settings.azure_openai_api_version,
+        azure_endpoint=settings.azure_openai_endpoint,
+        http_client=http_client,
+        # Les nouvelles tentatives sont gérées par core.resilience_llm
+        max_retries=0,
+    )
+
+
+def init_openai_client(settings: Settings) -> AsyncAzureOpenAI:
+    """
+    Initialise le client partagé (appelé dans le lifespan de l'application)
+
+    Args:
+        settings: Configuration de l'application
+
+    Returns:
+        AsyncAzureOpenAI: Client partagé
+    """
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = create_openai_client(settings)
+        logger.info(
+            "✓ Async Azure OpenAI client initialized (max_connections=%d, keepalive=%d)",
+            settings.azure_openai_max_connections,
+            settings.azure_openai_max_keepalive_connections,
+        )
+    return _openai_client
+
+
+async def close_openai_client() -> None:
+    """Ferme le client partagé et son pool de connexions"""
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+
+
+def get_azure_openai_client() -> AsyncAzureOpenAI:
+    """
+    Dépendance FastAPI retournant le client Azure OpenAI partagé
+
+    Le client est normalement créé au démarrage ; il est créé à la demande
+    si le lifespan n'a pas été exécuté (tests, scripts).
+
+    Returns:
+        AsyncAzureOpenAI: Client partagé
+    """
+    if _openai_client is None:
+        return init_openai_client(get_settings())
+    return _openai_client
@@ -1,18 +1,162 @@
 """
 Configuration du middleware de session pour FastAPI
 """
-import os
+import asyncio
+import json
+import logging
+import secrets
+from pathlib import Path
+
+import itsdangerous
+from itsdangerous.exc import BadSignature
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from fastapi import FastAPI
 from app.config import Settings
+from core.journal_conversation import TYPE_MEMOIRE as JOURNAL_MEMOIRE, get_journal_conversations
+from core.storage_manager import get_storage_manager
+from core.stockage_sessions import TYPE_MEMOIRE, StockageSessions, init_stockage_sessions
+
+logger = logging.getLogger(__name__)
+
+# SESSION_TYPE conservant l'ancien comportement (session entière dans le cookie signé)
+SESSION_TYPE_COOKIE = "cookie"
+
+# Clés de session désignant un journal de conversation, prolongé avec la session
+CLES_JOURNAUX_SESSION = ("conversation_id", "faq_conversation_id")
+
+
+def _empreinte_session(session: dict) -> str:
+    """Forme sérialisée de la session (détection des modifications)"""
+    return json.dumps(session, sort_keys=True, ensure_ascii=False)
+
+
+class ServerSessionMiddleware:
+    """
+    Sessions stockées côté serveur, identifiant signé dans le cookie
+
+    Même interface que le SessionMiddleware de Starlette (request.session) :
+    la session est lue dans le stockage au début de la requête et n'y est
+    réécrite que si elle a changé ; sinon son expiration est simplement
+    repoussée. Une session vidée (déconnexion) est supprimée du stockage, et
+    l'identifiant change à la connexion de l'utilisateur.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        secret_key: str,
+        stockage: StockageSessions,
+        session_cookie: str = "session",
+        max_age: int = 14 * 24 * 60 * 60,
+        path: str = "/",
+        same_site: str = "lax",
+        https_only: bool = False,
+        http_only: bool = True,
+    ) -> None:
+        self.app = app
+        self.signer = itsdangerous.TimestampSigner(str(secret_key))
+        self.stockage = stockage
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.security_flags = f"samesite={same_site}"
+        if http_only:
+            self.security_flags = "httponly; " + self.security_flags
+        if https_only:
+            self.security_flags += "; secure"
+        # Le stockage mémoire ne fait aucune entrée/sortie : appel direct
+        self._direct = stockage.type_stockage == TYPE_MEMOIRE
+
+    async def _executer(self, fonction, *args):
+        if self._direct:
+            return fonction(*args)
+        return await asyncio.to_thread(fonction, *args)
+
+    async def _prolonger_journaux(self, session: dict) -> None:
+        """Repousse l'expiration des journaux de conversation de la session, prolongée elle aussi"""
+        conversations = [session[cle] for cle in CLES_JOURNAUX_SESSION if session.get(cle)]
+        journal = get_journal_conversations()
+        if not conversations or journal.type_journal == JOURNAL_MEMOIRE:
+            return
+
+        def prolonger():
+            for conversation_id in conversations:
+                journal.prolonger(conversation_id)
+
+        try:
+            await asyncio.to_thread(prolonger)
+        except OSError as e:
+            logger.warning(f"Expiration des journaux de conversation non prolongée: {e}")
+
+    def _identifiant(self, connection: HTTPConnection):
+        """Identifiant de session du cookie (None si absent ou signature invalide)"""
+        valeur = connection.cookies.get(self.session_cookie)
+        if not valeur:
+            return None
+        try:
+            return self.signer.unsign(valeur.encode("utf-8"), max_age=self.max_age).decode("utf-8")
+        except (BadSignature, UnicodeDecodeError):
+            return None
+
+    def _cookie(self, valeur: str, max_age: str) -> str:
+        return f"{self.session_cookie}={valeur}; path={self.path}; {max_age}{self.security_flags}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        session_id = self._identifiant(HTTPConnection(scope))
+        donnees = await self._executer(self.stockage.lire, session_id) if session_id else None
+        if donnees is None:
+            session_id = None
+        scope["session"] = donnees or {}
+        empreinte_initiale = _empreinte_session(scope["session"])
+        authentifiee = "user" in scope["session"]
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal session_id
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                headers = MutableHeaders(scope=message)
+                headers.add_vary_header("Cookie")
+                if session and session_id is not None and not authentifiee and "user" in session:
+                    # Connexion : nouvel identifiant (l'identifiant d'avant l'authentification est abandonné)
+                    await self._executer(self.stockage.supprimer, session_id)
+                    session_id = None
+                if session:
+                    if session_id is None:
+                        session_id = secrets.token_urlsafe(32)
+                        await self._executer(self.stockage.ecrire, session_id, session)
+                    elif _empreinte_session(session) != empreinte_initiale:
+                        await self._executer(self.stockage.ecrire, session_id, session)
+                    else:
+                        await self._executer(self.stockage.toucher, session_id)
+                    await self._prolonger_journaux(session)
+                    signe = self.signer.sign(session_id.encode("utf-8")).decode("utf-8")
+                    headers.append("Set-Cookie", self._cookie(signe, f"Max-Age={self.max_age}; "))
+                elif session_id is not None:
+                    # Session vidée : supprimée côté serveur, cookie expiré
+                    await self._executer(self.stockage.supprimer, session_id)
+                    headers.append(
+                        "Set-Cookie", self._cookie("null", "expires=Thu, 01 Jan 1970 00:00:00 GMT; ")
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 
 def setup_session_middleware(app: FastAPI, settings: Settings) -> None:
     """
     Configure le middleware de session pour FastAPI
 
-    En production, les sessions sont stockées dans Azure FileShare.
-    En développement, elles sont stockées localement dans flask_session/.
+    Le contenu des sessions est stocké côté serveur (SESSION_TYPE : memory,
+    filesystem ou sqlite, core.stockage_sessions) ; le cookie ne contient que
+    l'identifiant signé. SESSION_TYPE=cookie garde la session entière dans
+    le cookie signé.
 
     Args:
         app: Application FastAPI
@@ -25,18 +169,39 @@ def setup_session_middleware(app: FastAPI, settings: Settings) -> None:
     if len(settings.secret_key) < 32:
         raise ValueError(f"SECRET_KEY too short ({len(settings.secret_key)} characters). Minimum 32 required.")
 
-    # Configuration du middleware de session
+    if settings.session_type == SESSION_TYPE_COOKIE:
+        app.add_middleware(
+            SessionMiddleware,
+            secret_key=settings.secret_key,
+            session_cookie=settings.session_cookie_name,
+            max_age=settings.session_max_age,
+            path=settings.session_cookie_path,
+            same_site=settings.session_cookie_samesite.lower(),
+            https_only=settings.session_cookie_secure,
+        )
+        return
+
+    # Répertoire relatif : dans le stockage (FileShare en production, data/ en développement)
+    repertoire = Path(settings.session_file_dir)
+    if not repertoire.is_absolute():
+        repertoire = get_storage_manager().base_path / repertoire
+
+    stockage = init_stockage_sessions(
+        settings.session_type,
+        settings.session_max_age,
+        repertoire=str(repertoire),
+        chemin_sqlite=settings.session_sqlite_path,
+        max_sessions=settings.session_memory_max_entries,
+        duree_tranche=settings.session_gc_bucket_seconds,
+    )
     app.add_middleware(
-        SessionMiddleware,
+        ServerSessionMiddleware,
         secret_key=settings.secret_key,
+        stockage=stockage,
         session_cookie=settings.session_cookie_name,
         max_age=settings.session_max_age,
+        path=settings.session_cookie_path,
         same_site=settings.session_cookie_samesite.lower(),
         https_only=settings.session_cookie_secure,
         http_only=settings.session_cookie_httponly,
     )
-
-    # Note: FastAPI's SessionMiddleware stores sessions in cookies by default
-    # For filesystem-based sessions like Flask-Session, we would need a custom implementation
-    # or use a third-party library like fastapi-sessions with a filesystem backend.
-    # For now, we'll use cookie-based sessions which is more scalable.
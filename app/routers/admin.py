@@ -1,6 +1,8 @@
 """
 Routes d'administration
 """
+import asyncio
+import json
 import logging
 from typing import Dict, Any
 from datetime import datetime
@@ -14,7 +16,20 @@ from app.dependencies.auth import get_current_admin
 from app.models.habilitations import HabilitationsConfig, HabilitationUpdate
 from core.habilitations_manager import HabilitationsManager
 from core.storage_manager import StorageManager
-from core.async_logger import async_logger
+from core.comptabilite_tokens import comptabilite_tokens
+from core.metriques_llm import statistiques_cache_prompt
+from core.pre_evaluation import get_pre_evaluation
+from core.cache_reponses_faq import get_cache_reponses_faq
+from core.profils_documents import get_table_profils
+from core.registre_corpus import CLE_SESSION_VERSION, get_registre_corpus
+from core.resilience_llm import get_resilience_llm
+from core.routeur_deploiements import get_routeur_deploiements
+from core.fonctions_fileshare import get_file_from_fileshare
+from core.stockage_blobs import get_stockage_blobs, reconstruire_prompt
+from core.stockage_sessions import get_stockage_sessions
+from core.purge_sessions import get_purge_sessions
+from core.cache_habilitations import get_cache_habilitations
+from core.async_logger import async_logger, get_async_logger
 
 
 router = APIRouter(tags=["Admin"], prefix="/admin")
@@ -143,6 +158,334 @@ async def update_habilitations(
         )
 
 
+@router.get("/llm/cache_stats")
+async def get_llm_cache_stats(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Statistiques du cache de prompt Azure OpenAI (par type d'appel)
+
+    Returns:
+        dict: Tokens servis depuis le cache et latences moyennes
+    """
+    try:
+        return {
+            "success": True,
+            "statistiques": statistiques_cache_prompt.resume(),
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting LLM cache stats: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.get("/llm/tokens_sections")
+async def get_llm_tokens_sections(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Répartition des tokens des prompts par section (derniers appels)
+
+    Returns:
+        dict: Par type de prompt (synthese, faq, client, commercial) :
+              percentiles p50/p90/p99, moyenne et part moyenne de chaque section
+    """
+    try:
+        return {
+            "success": True,
+            "tokens": comptabilite_tokens.percentiles(),
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting prompt token accounting: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.get("/llm/pre_evaluation")
+async def get_llm_pre_evaluation(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Pré-évaluations des conversations en cours
+
+    Returns:
+        dict: Activation, conversations suivies, segments évalués, échecs et consolidations
+    """
+    try:
+        gestionnaire = get_pre_evaluation()
+        return {
+            "success": True,
+            "active": gestionnaire is not None,
+            "pre_evaluation": gestionnaire.statistiques() if gestionnaire else {},
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting pre-evaluation stats: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.get("/llm/resilience")
+async def get_llm_resilience(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    État de la couche de résilience des appels Azure OpenAI
+
+    Returns:
+        dict: Compteurs (tentatives, échecs, rejets) et état des disjoncteurs par déploiement
+    """
+    try:
+        return {
+            "success": True,
+            "resilience": get_resilience_llm().statistiques(),
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting LLM resilience stats: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.get("/llm/deploiements")
+async def get_llm_deploiements(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Utilisation des déploiements Azure OpenAI
+
+    Returns:
+        dict: Pools par rôle, et par déploiement : appels, part des appels,
+              latence moyenne, taux de 429, mise à l'écart en cours
+    """
+    try:
+        return {
+            "success": True,
+            "deploiements": get_routeur_deploiements().statistiques(),
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting LLM deployment stats: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.get("/documents/stats")
+async def get_documents_stats(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Métriques des documents de référence, par version du corpus
+
+    Returns:
+        dict: Version par défaut, déploiement, et par version : tailles,
+              durées de chargement et nombre de rechargements ; couverture
+              de la table des documents de profil
+    """
+    try:
+        return {
+            "success": True,
+            "documents": get_registre_corpus().statistiques(),
+            "couverture_profils": get_table_profils().couverture,
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting reference documents stats: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.get("/sessions/stats")
+async def get_sessions_stats(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Stockage des sessions côté serveur
+
+    Returns:
+        dict: Type de stockage, durée de vie, sessions stockées, lectures,
+              écritures, sessions absentes, expirées, supprimées et purgées ;
+              passages et débit de la purge
+    """
+    try:
+        stockage = get_stockage_sessions()
+        purge = get_purge_sessions()
+        return {
+            "success": True,
+            "cote_serveur": stockage is not None,
+            "sessions": await asyncio.to_thread(stockage.statistiques) if stockage else {},
+            "purge": purge.statistiques() if purge else None,
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting sessions stats: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.post("/corpus/version")
+async def pin_corpus_version(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Rattacher la session de l'administrateur à une version du corpus
+    (vérification d'un nouveau corpus avant son déploiement)
+
+    Returns:
+        dict: Version rattachée
+    """
+    try:
+        data = await request.json()
+        version = data.get("version")
+        registre = get_registre_corpus()
+
+        if version not in registre.versions():
+            return JSONResponse(
+                {"success": False, "error": f"Version de corpus inconnue: {version}"},
+                status_code=400
+            )
+
+        request.session[CLE_SESSION_VERSION] = version
+
+        get_async_logger().info(
+            "Corpus version pinned",
+            user=user.get("preferred_username", ""),
+            version=version
+        )
+
+        return {
+            "success": True,
+            "version": version,
+        }
+
+    except Exception as e:
+        logger.error(f"Error pinning corpus version: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.post("/prompts/reconstruire")
+async def reconstruct_saved_prompt(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Reconstruire un prompt de synthèse sauvegardé sous forme de manifeste
+
+    Returns:
+        dict: Prompt complet et métriques du stockage des blobs
+    """
+    try:
+        data = await request.json()
+        file_path = data.get("file_path") or ""
+
+        if not file_path.endswith(".json") or ".." in file_path.split("/"):
+            return JSONResponse(
+                {"success": False, "error": "Chemin de manifeste invalide"},
+                status_code=400
+            )
+
+        success, contenu = await asyncio.to_thread(get_file_from_fileshare, file_path)
+        if not success:
+            return JSONResponse(
+                {"success": False, "error": "Manifeste introuvable"},
+                status_code=404
+            )
+
+        prompt = await asyncio.to_thread(reconstruire_prompt, json.loads(contenu))
+
+        return {
+            "success": True,
+            "prompt": prompt,
+            "caracteres": len(prompt),
+            "stockage": get_stockage_blobs().statistiques(),
+        }
+
+    except Exception as e:
+        logger.error(f"Error reconstructing saved prompt: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.get("/faq/cache_stats")
+async def get_faq_cache_stats(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Statistiques du cache des réponses FAQ
+
+    Returns:
+        dict: Hits par niveau (mémoire, similarité, FileShare), misses et taux de hit
+    """
+    try:
+        return {
+            "success": True,
+            "statistiques": get_cache_reponses_faq().statistiques(),
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting FAQ cache stats: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
+@router.get("/habilitations/cache_stats")
+async def get_habilitations_cache_stats(
+    request: Request,
+    user: Dict[str, Any] = Depends(get_current_admin)
+):
+    """
+    Statistiques du cache des habilitations
+
+    Returns:
+        dict: Entrées, hits, misses, appels regroupés, entrées périmées servies,
+              rafraîchissements et erreurs de l'API
+    """
+    try:
+        return {
+            "success": True,
+            "statistiques": get_cache_habilitations().statistiques(),
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting habilitations cache stats: {e}")
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
+        )
+
+
 @router.get("_fileshare_browser", response_class=templates.TemplateResponse)
 async def admin_fileshare_browser(
     request: Request,
@@ -10,6 +10,7 @@ from authlib.integrations.starlette_client import OAuth
 
 from app.config import get_settings, Settings
 from app.dependencies.auth import get_oauth_client, get_user_habilitations
+from core.cache_habilitations import get_cache_habilitations
 from core.habilitations_manager import HabilitationsManager
 
 
@@ -238,7 +239,10 @@ async def logout(request: Request):
         user_name = request.session.get("user_name", "unknown")
         logger.info("👋 Déconnexion de %s", user_name)
 
-        # Effacer la session
+        # Oublier les habilitations du jeton, puis effacer la session
+        access_token = request.session.get("access_token")
+        if access_token:
+            get_cache_habilitations().invalider(access_token)
         request.session.clear()
 
         return RedirectResponse(url="/")
@@ -1,39 +1,49 @@
 """
 Routes de chat principal
 """
+import asyncio
 import json
 import logging
-import pickle
+import secrets
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from fastapi import APIRouter, Request, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 
 from app.config import get_settings, Settings
 from app.dependencies.auth import get_current_user
+from app.dependencies.openai_client import get_azure_openai_client
 from app.models.chat import ChatMessage, ChatResponse
 from app.models.profile import ProfileRequest
 from app.models.synthesis import SynthesisRequest, SynthesisResponse
 from app.models.rating import UserRating
 
 from core.fonctions import (
-    get_next_bot_message,
+    get_next_bot_message_async,
+    stream_next_bot_message_async,
+    planifier_resume_conversation,
     init_session_lists,
     init_session_profile,
     save_profil_manager_to_session,
     restore_profil_manager_from_session,
+    charger_profil_manager_session,
+    enregistrer_profil_manager_session,
     get_user_folder_path,
     log_to_journal,
     save_user_rating_to_file,
 )
+from core.journal_conversation import TYPE_MEMOIRE, get_journal_conversations
+from core.pre_evaluation import planifier_pre_evaluation
 from core.profil_manager import ProfilManager
-from core.synthetiser import synthese_2
-from core.fonctions import charger_documents_reference, generer_rapport_html_synthese
+from core.registre_corpus import version_corpus_session
+from core.resilience_llm import echeance_llm
+from core.synthese_jobs import STATUT_TERMINE, get_gestionnaire_jobs_synthese
 from core.security import sanitize_user_input, validate_message_format
-from core.async_logger import async_logger
+from core.streaming import DecoupeurPhrases, formater_evenement_sse
+from core.async_logger import get_async_logger
 
 
 router = APIRouter(tags=["Chat"])
@@ -41,14 +51,34 @@ templates = Jinja2Templates(directory="templates")
 logger = logging.getLogger(__name__)
 
 
-# Client Azure OpenAI global
-def get_azure_openai_client(settings: Settings = Depends(get_settings)):
-    """Retourne le client Azure OpenAI"""
-    return AzureOpenAI(
-        api_key=settings.azure_openai_api_key,
-        api_version=settings.azure_openai_api_version,
-        azure_endpoint=settings.azure_openai_endpoint,
-    )
+def _conversation_id(session: Dict[str, Any]) -> str:
+    """
+    Identifiant du journal de la conversation de la session (créé au besoin)
+
+    Un historique encore gardé dans la session (sessions antérieures au
+    journal) est versé dans le journal puis retiré de la session.
+    """
+    conversation_id = session.get("conversation_id")
+    if not conversation_id:
+        conversation_id = secrets.token_urlsafe(16)
+        session["conversation_id"] = conversation_id
+    ancien_historique = session.pop("conversation_history", None)
+    if ancien_historique:
+        get_journal_conversations().ajouter(conversation_id, ancien_historique)
+    return conversation_id
+
+
+async def _journal(methode: str, *args):
+    """Appelle une méthode du journal des conversations (hors de la boucle si elle lit des fichiers)"""
+    journal = get_journal_conversations()
+    if journal.type_journal == TYPE_MEMOIRE:
+        return getattr(journal, methode)(*args)
+    return await asyncio.to_thread(getattr(journal, methode), *args)
+
+
+def _etag_historique(conversation_id: str, sequence: int) -> str:
+    """ETag de l'historique : le journal est en ajout seul, (conversation, dernier numéro) suffit"""
+    return f'"{conversation_id}-{sequence}"'
 
 
 @router.get("/", response_class=templates.TemplateResponse)
@@ -69,20 +99,10 @@ async def index(
         user_id = user.get("sub", "")
 
         # Charger le ProfilManager depuis la session ou créer un nouveau
-        if "profil_manager_pickle" in request.session:
-            try:
-                profil_manager = pickle.loads(
-                    bytes.fromhex(request.session["profil_manager_pickle"])
-                )
-            except Exception as e:
-                logger.warning(f"Failed to restore profile manager: {e}")
-                profil_manager = ProfilManager()
-        else:
-            profil_manager = ProfilManager()
+        profil_manager = charger_profil_manager_session(request.session)
 
-        # Initialiser les listes de session
-        if "conversation_history" not in request.session:
-            request.session["conversation_history"] = []
+        # Initialiser les listes de session (l'historique est dans le journal de la conversation)
+        _conversation_id(request.session)
         if "history_eval" not in request.session:
             request.session["history_eval"] = []
         if "history_conv" not in request.session:
@@ -108,12 +128,12 @@ async def index(
         request.session["user_folder"] = user_email.replace("@", "_at_").replace(".", "_")
 
         # Sauvegarder le profil manager dans la session
-        request.session["profil_manager_pickle"] = pickle.dumps(profil_manager).hex()
+        enregistrer_profil_manager_session(profil_manager, request.session)
 
         # Log de connexion
         log_to_journal(user_name, user_email, "connexion")
 
-        async_logger.info("User session complete", folder=request.session["user_folder"])
+        get_async_logger().info("User session complete", folder=request.session["user_folder"])
 
         # Récupérer le dictionnaire de profils
         dico_profil = request.session.get("profile_data", {})
@@ -241,9 +261,9 @@ async def set_profile(
 
         request.session["profile_data"] = profile_data
         request.session["profile"] = profile_request.profile_type
-        request.session["profil_manager_pickle"] = pickle.dumps(profil_manager).hex()
+        enregistrer_profil_manager_session(profil_manager, request.session)
 
-        async_logger.info(
+        get_async_logger().info(
             "Profile updated",
             profile_type=profile_request.profile_type,
             user=user.get("preferred_username", "")
@@ -275,9 +295,14 @@ async def reset_conversation(
         dict: Confirmation de réinitialisation
     """
     try:
-        request.session["conversation_history"] = []
-
-        async_logger.info(
+        # Nouvelle conversation : un flux encore en cours termine dans l'ancien journal, supprimé
+        ancien_id = request.session.pop("conversation_id", None)
+        request.session.pop("conversation_history", None)
+        if ancien_id:
+            await _journal("supprimer", ancien_id)
+        _conversation_id(request.session)
+
+        get_async_logger().info(
             "Conversation reset",
             user=user.get("preferred_username", "")
         )
@@ -300,7 +325,8 @@ async def chat(
     request: Request,
     chat_message: ChatMessage,
     user: Dict[str, Any] = Depends(get_current_user),
-    client: AzureOpenAI = Depends(get_azure_openai_client)
+    client: AsyncAzureOpenAI = Depends(get_azure_openai_client),
+    settings: Settings = Depends(get_settings)
 ):
     """
     Endpoint de chat - traitement des messages utilisateur
@@ -327,15 +353,11 @@ async def chat(
             )
 
         # Récupérer l'historique de conversation
-        conversation_history = request.session.get("conversation_history", [])
+        conversation_id = _conversation_id(request.session)
+        conversation_history = await _journal("lire", conversation_id)
 
         # Restaurer le ProfilManager
-        if "profil_manager_pickle" in request.session:
-            profil_manager = pickle.loads(
-                bytes.fromhex(request.session["profil_manager_pickle"])
-            )
-        else:
-            profil_manager = ProfilManager()
+        profil_manager = charger_profil_manager_session(request.session)
 
         # Ajouter le message utilisateur à l'historique
         msg_num = len(conversation_history) + 1
@@ -348,23 +370,33 @@ async def chat(
         conversation_history.append(user_msg)
 
         # Obtenir la réponse du bot
-        bot_response_dict = get_next_bot_message(
-            sanitized_message, client, conversation_history, profil_manager
-        )
+        with echeance_llm(settings.llm_chat_budget_seconds):
+            bot_response_dict = await get_next_bot_message_async(
+                sanitized_message, client, conversation_history, profil_manager,
+                cle_conversation=conversation_id
+            )
 
         # Ajouter la réponse du bot à l'historique
         bot_msg = {
             "msg_num": msg_num + 1,
-            "role": "Bot",
-            "text": bot_response_dict.get("text", ""),
+            "role": "Assistant",
+            "text": bot_response_dict.get("reply", ""),
             "timestamp": datetime.utcnow().isoformat(),
         }
-        conversation_history.append(bot_msg)
 
-        # Sauvegarder l'historique
-        request.session["conversation_history"] = conversation_history
+        # Ajouter le tour au journal (seuls ces deux messages sont écrits)
+        nouveaux_messages = await _journal("ajouter", conversation_id, [user_msg, bot_msg])
+        conversation_history[-1:] = nouveaux_messages
+
+        # Résumé glissant des anciens tours, préparé en tâche de fond
+        planifier_resume_conversation(conversation_history, client, profil_manager, conversation_id)
+
+        # Pré-évaluation des derniers tours (si activée), préparée en tâche de fond
+        planifier_pre_evaluation(
+            conversation_history, client, conversation_id, version_corpus_session(request.session)
+        )
 
-        async_logger.info(
+        get_async_logger().info(
             "Chat message processed",
             user=user.get("preferred_username", ""),
             msg_count=len(conversation_history)
@@ -372,8 +404,9 @@ async def chat(
 
         return {
             "success": True,
-            "response": bot_response_dict.get("text", ""),
-            "history": conversation_history,
+            "response": bot_response_dict.get("reply", ""),
+            "messages": nouveaux_messages,
+            "seq": nouveaux_messages[-1]["msg_num"],
         }
 
     except Exception as e:
@@ -384,15 +417,144 @@ async def chat(
         )
 
 
+@router.post("/chat_stream")
+async def chat_stream(
+    request: Request,
+    chat_message: ChatMessage,
+    user: Dict[str, Any] = Depends(get_current_user),
+    client: AsyncAzureOpenAI = Depends(get_azure_openai_client),
+    settings: Settings = Depends(get_settings)
+):
+    """
+    Endpoint de chat en streaming (Server-Sent Events)
+
+    Événements émis :
+        - token : fragment de la réponse ({"delta": str})
+        - sentence : phrase complète, prête pour la synthèse vocale ({"index": int, "text": str})
+        - done : fin de la réponse ({"success": True, "response": str, "messages": list, "seq": int})
+        - error : échec de la génération ({"success": False, "error": str})
+
+    Le tour n'est ajouté au journal de la conversation qu'une fois le flux terminé.
+
+    Args:
+        chat_message: Message de l'utilisateur
+        user: Utilisateur authentifié
+        client: Client Azure OpenAI
+
+    Returns:
+        StreamingResponse: Flux text/event-stream
+    """
+    sanitized_message = sanitize_user_input(chat_message.message)
+
+    is_valid, error_msg = validate_message_format(sanitized_message)
+    if not is_valid:
+        return JSONResponse(
+            {"success": False, "error": error_msg},
+            status_code=400
+        )
+
+    conversation_id = _conversation_id(request.session)
+    conversation_history = await _journal("lire", conversation_id)
+
+    # Restaurer le ProfilManager
+    profil_manager = charger_profil_manager_session(request.session)
+
+    msg_num = len(conversation_history) + 1
+    user_msg = {
+        "msg_num": msg_num,
+        "role": "Vous",
+        "text": sanitized_message,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    conversation_history.append(user_msg)
+
+    user_name = user.get("preferred_username", "")
+    version_corpus = version_corpus_session(request.session)
+
+    async def generer_evenements():
+        decoupeur = DecoupeurPhrases()
+        fragments = []
+        index_phrase = 0
+
+        try:
+            with echeance_llm(settings.llm_chat_budget_seconds):
+                async for delta in stream_next_bot_message_async(
+                    sanitized_message, client, conversation_history, profil_manager,
+                    cle_conversation=conversation_id
+                ):
+                    if await request.is_disconnected():
+                        logger.info("Client disconnected during chat stream")
+                        return
+
+                    fragments.append(delta)
+                    yield formater_evenement_sse("token", {"delta": delta})
+
+                    for phrase in decoupeur.ajouter(delta):
+                        yield formater_evenement_sse("sentence", {"index": index_phrase, "text": phrase})
+                        index_phrase += 1
+
+            for phrase in decoupeur.terminer():
+                yield formater_evenement_sse("sentence", {"index": index_phrase, "text": phrase})
+                index_phrase += 1
+
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}", exc_info=True)
+            yield formater_evenement_sse("error", {"success": False, "error": str(e)})
+            return
+
+        bot_msg = {
+            "msg_num": msg_num + 1,
+            "role": "Assistant",
+            "text": "".join(fragments).strip(),
+            "timestamp": datetime.utcnow().isoformat(),
+        }
+        try:
+            nouveaux_messages = await _journal("ajouter", conversation_id, [user_msg, bot_msg])
+        except Exception as e:
+            logger.error(f"Error saving streamed turn: {e}", exc_info=True)
+            yield formater_evenement_sse("error", {"success": False, "error": str(e)})
+            return
+        conversation_history[-1:] = nouveaux_messages
+
+        # Résumé glissant des anciens tours, préparé en tâche de fond
+        planifier_resume_conversation(conversation_history, client, profil_manager, conversation_id)
+        planifier_pre_evaluation(conversation_history, client, conversation_id, version_corpus)
+
+        get_async_logger().info(
+            "Chat message streamed",
+            user=user_name,
+            msg_count=len(conversation_history)
+        )
+
+        yield formater_evenement_sse(
+            "done",
+            {
+                "success": True,
+                "response": bot_msg["text"],
+                "messages": nouveaux_messages,
+                "seq": nouveaux_messages[-1]["msg_num"],
+            }
+        )
+
+    return StreamingResponse(
+        generer_evenements(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/synthetiser")
 async def synthetiser(
     request: Request,
     synthesis_request: SynthesisRequest,
     user: Dict[str, Any] = Depends(get_current_user),
-    client: AzureOpenAI = Depends(get_azure_openai_client)
+    client: AsyncAzureOpenAI = Depends(get_azure_openai_client)
 ):
     """
-    Synthétiser la conversation
+    Soumettre la synthèse de la conversation
+
+    La synthèse s'exécute en tâche de fond ; son état est suivi via
+    /synthese_jobs/{job_id} (polling) ou /synthese_jobs/{job_id}/events (SSE).
 
     Args:
         synthesis_request: Requête de synthèse
@@ -400,10 +562,11 @@ async def synthetiser(
         client: Client Azure OpenAI
 
     Returns:
-        SynthesisResponse: Résultat de la synthèse
+        dict: Identifiant du job soumis (HTTP 202)
     """
     try:
-        conversation_history = request.session.get("conversation_history", [])
+        conversation_id = _conversation_id(request.session)
+        conversation_history = await _journal("lire", conversation_id)
 
         if not conversation_history:
             return JSONResponse(
@@ -412,59 +575,131 @@ async def synthetiser(
             )
 
         # Restaurer le ProfilManager
-        if "profil_manager_pickle" in request.session:
-            profil_manager = pickle.loads(
-                bytes.fromhex(request.session["profil_manager_pickle"])
-            )
-        else:
-            profil_manager = ProfilManager()
+        profil_manager = charger_profil_manager_session(request.session)
 
-        # Charger les documents de référence
-        references = charger_documents_reference()
-
-        # Générer la synthèse
-        synthesis_data = synthese_2(
+        user_folder = request.session.get("user_folder", "default")
+        job = get_gestionnaire_jobs_synthese().soumettre(
             conversation_history,
             client,
-            references,
             profil_manager,
-            request.session
+            user_folder,
+            version_corpus=version_corpus_session(request.session),
+            conversation_id=conversation_id
         )
+        request.session["synthese_job_id"] = job.job_id
 
-        # Générer le rapport HTML
-        user_folder = request.session.get("user_folder", "default")
-        output_path = f"data/utilisateurs/{user_folder}/syntheses/"
-
-        html_report_path = generer_rapport_html_synthese(
-            synthesis_data,
-            output_path
+        get_async_logger().info(
+            "Synthesis job submitted",
+            user=user.get("preferred_username", ""),
+            job_id=job.job_id
         )
 
-        # Ajouter au suivi
-        if "history_eval" in request.session:
-            request.session["history_eval"].append(html_report_path)
+        return JSONResponse(
+            {
+                "success": True,
+                "job_id": job.job_id,
+                "statut": job.statut,
+                "status_url": f"/synthese_jobs/{job.job_id}",
+                "events_url": f"/synthese_jobs/{job.job_id}/events",
+            },
+            status_code=202
+        )
 
-        async_logger.info(
-            "Synthesis generated",
-            user=user.get("preferred_username", ""),
-            report_path=html_report_path
+    except Exception as e:
+        logger.error(f"Error in synthesis: {e}", exc_info=True)
+        return JSONResponse(
+            {"success": False, "error": str(e)},
+            status_code=500
         )
 
-        return {
-            "success": True,
-            "message": "Synthèse générée avec succès",
-            "synthesis_data": synthesis_data,
-            "html_report_path": html_report_path,
-        }
+
+@router.get("/synthese_jobs/{job_id}")
+async def get_synthese_job(
+    request: Request,
+    job_id: str,
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    État d'un job de synthèse (polling)
+
+    Une fois le job terminé, le rapport est ajouté au suivi de la session.
+
+    Args:
+        job_id: Identifiant du job
+        user: Utilisateur authentifié
+
+    Returns:
+        dict: État du job
+    """
+    try:
+        user_folder = request.session.get("user_folder", "default")
+        etat = await get_gestionnaire_jobs_synthese().obtenir(job_id, user_folder)
+
+        if etat is None:
+            return JSONResponse(
+                {"success": False, "error": "Job de synthèse introuvable"},
+                status_code=404
+            )
+
+        if etat["statut"] == STATUT_TERMINE:
+            history_eval = request.session.get("history_eval", [])
+            if etat["fichier_rapport"] not in history_eval:
+                history_eval.append(etat["fichier_rapport"])
+                request.session["history_eval"] = history_eval
+            if request.session.get("synthese_job_id") == job_id:
+                request.session.pop("synthese_job_id", None)
+
+        return {"success": True, **etat, "filepath": etat["fichier_rapport"]}
 
     except Exception as e:
-        logger.error(f"Error in synthesis: {e}", exc_info=True)
+        logger.error(f"Error getting synthesis job: {e}")
         return JSONResponse(
             {"success": False, "error": str(e)},
             status_code=500
         )
 
 
+@router.get("/synthese_jobs/{job_id}/events")
+async def synthese_job_events(
+    request: Request,
+    job_id: str,
+    user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Suivi d'un job de synthèse en Server-Sent Events
+
+    Un événement 'status' est émis à chaque changement d'étape ou de statut ;
+    le flux se termine quand le job est terminé ou en échec.
+
+    Args:
+        job_id: Identifiant du job
+        user: Utilisateur authentifié
+
+    Returns:
+        StreamingResponse: Flux text/event-stream
+    """
+    user_folder = request.session.get("user_folder", "default")
+    gestionnaire = get_gestionnaire_jobs_synthese()
+
+    if await gestionnaire.obtenir(job_id, user_folder) is None:
+        return JSONResponse(
+            {"success": False, "error": "Job de synthèse introuvable"},
+            status_code=404
+        )
+
+    async def generer_evenements():
+        async for etat in gestionnaire.suivre(job_id, user_folder):
+            if await request.is_disconnected():
+                return
+            yield formater_evenement_sse("status", etat)
+
+    return StreamingResponse(
+        generer_evenements(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/save_user_rating")
 async def save_user_rating(
     request: Request,
@@ -494,7 +729,7 @@ async def save_user_rating(
 
         request.session["user_rating"] = rating.note
 
-        async_logger.info(
+        get_async_logger().info(
             "User rating saved",
             user=user.get("preferred_username", ""),
             note=rating.note
@@ -516,21 +751,40 @@ async def save_user_rating(
 @router.get("/get_conversation_history")
 async def get_conversation_history(
     request: Request,
+    since: Optional[int] = Query(None, ge=0),
     user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     Récupérer l'historique de conversation
 
+    Requête conditionnelle : l'ETag identifie l'état du journal (conversation,
+    dernier numéro de message) ; un If-None-Match identique reçoit un 304.
+
+    Args:
+        since: Numéro du dernier message déjà connu (seuls les suivants sont renvoyés)
+
     Returns:
-        dict: Historique de conversation
+        dict: Messages et numéro du dernier message ("seq")
     """
     try:
-        conversation_history = request.session.get("conversation_history", [])
+        conversation_id = _conversation_id(request.session)
+        sequence = await _journal("sequence", conversation_id)
+        etag = _etag_historique(conversation_id, sequence)
+        en_tetes = {"ETag": etag, "Cache-Control": "private, no-cache"}
 
-        return {
-            "success": True,
-            "history": conversation_history,
-        }
+        if etag in [valeur.strip() for valeur in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=en_tetes)
+
+        conversation_history = await _journal("lire", conversation_id, since or 0)
+
+        return JSONResponse(
+            {
+                "success": True,
+                "history": conversation_history,
+                "seq": sequence,
+            },
+            headers=en_tetes
+        )
 
     except Exception as e:
         logger.error(f"Error getting conversation history: {e}")
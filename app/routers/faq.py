@@ -1,21 +1,36 @@
 """
 Routes FAQ
 """
+import asyncio
 import logging
+import secrets
 from typing import Dict, Any
 from datetime import datetime
 
 from fastapi import APIRouter, Request, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 
 from app.config import get_settings, Settings
 from app.dependencies.auth import get_current_user
+from app.dependencies.openai_client import get_azure_openai_client
 from app.models.faq import FAQMessage, FAQResponse
-from core.fonctions import generate_expert_response, charger_documents_reference
+from core.fonctions import (
+    generate_expert_response_async,
+    stream_expert_response_async,
+    selectionner_extraits_faq,
+    MESSAGE_ERREUR_FAQ,
+    MESSAGE_INDISPONIBLE_FAQ,
+)
+from core.cache_reponses_faq import get_cache_reponses_faq
+from core.index_documentaire import get_index_documentaire
+from core.journal_conversation import TYPE_MEMOIRE, get_journal_conversations
+from core.registre_corpus import version_corpus_session
+from core.resilience_llm import echeance_llm
 from core.security import sanitize_user_input, validate_message_format
-from core.async_logger import async_logger
+from core.streaming import formater_evenement_sse
+from core.async_logger import get_async_logger
 
 
 router = APIRouter(tags=["FAQ"], prefix="/faq")
@@ -23,13 +38,37 @@ templates = Jinja2Templates(directory="templates")
 logger = logging.getLogger(__name__)
 
 
-def get_azure_openai_client(settings: Settings = Depends(get_settings)):
-    """Retourne le client Azure OpenAI"""
-    return AzureOpenAI(
-        api_key=settings.azure_openai_api_key,
-        api_version=settings.azure_openai_api_version,
-        azure_endpoint=settings.azure_openai_endpoint,
-    )
+def _faq_conversation_id(session: Dict[str, Any]) -> str:
+    """
+    Identifiant du journal de la conversation FAQ de la session (créé au besoin)
+
+    Les échanges FAQ sont ajoutés au journal des conversations, partagé par les
+    workers : une réponse terminée en streaming y est écrite directement, sans
+    passer par la session. Un historique encore gardé dans la session
+    (sessions antérieures au journal) y est versé puis retiré de la session.
+    """
+    conversation_id = session.get("faq_conversation_id")
+    if not conversation_id:
+        conversation_id = secrets.token_urlsafe(16)
+        session["faq_conversation_id"] = conversation_id
+    session.pop("faq_en_attente", None)
+    ancien_historique = session.pop("faq_history", None)
+    if ancien_historique:
+        get_journal_conversations().ajouter(conversation_id, ancien_historique)
+    return conversation_id
+
+
+async def _journal(methode: str, *args):
+    """Appelle une méthode du journal des conversations (hors de la boucle si elle lit des fichiers)"""
+    journal = get_journal_conversations()
+    if journal.type_journal == TYPE_MEMOIRE:
+        return getattr(journal, methode)(*args)
+    return await asyncio.to_thread(getattr(journal, methode), *args)
+
+
+def _est_reponse_cachable(response_text: str) -> bool:
+    """Les messages d'erreur de l'expert FAQ ne sont pas mis en cache"""
+    return bool(response_text) and response_text not in (MESSAGE_ERREUR_FAQ, MESSAGE_INDISPONIBLE_FAQ)
 
 
 @router.get("", response_class=templates.TemplateResponse)
@@ -44,9 +83,8 @@ async def faq_page(
         TemplateResponse: Page faq.html
     """
     try:
-        # Initialiser l'historique FAQ si nécessaire
-        if "faq_history" not in request.session:
-            request.session["faq_history"] = []
+        # Initialiser la conversation FAQ si nécessaire
+        _faq_conversation_id(request.session)
 
         return templates.TemplateResponse(
             "faq.html",
@@ -63,7 +101,8 @@ async def faq_chat(
     request: Request,
     faq_message: FAQMessage,
     user: Dict[str, Any] = Depends(get_current_user),
-    client: AzureOpenAI = Depends(get_azure_openai_client)
+    client: AsyncAzureOpenAI = Depends(get_azure_openai_client),
+    settings: Settings = Depends(get_settings)
 ):
     """
     Chat FAQ - questions/réponses
@@ -90,29 +129,51 @@ async def faq_chat(
             )
 
         # Récupérer l'historique FAQ
-        faq_history = request.session.get("faq_history", [])
-
-        # Charger les documents de référence
-        references = charger_documents_reference()
-
-        # Générer la réponse
-        response_text = generate_expert_response(
-            sanitized_question,
-            client,
-            faq_history,
-            references
-        )
+        conversation_id = _faq_conversation_id(request.session)
+        faq_history = await _journal("lire", conversation_id)
+
+        # Version du corpus rattachée à la session et index correspondant
+        version_corpus = version_corpus_session(request.session)
+        version_index = (await asyncio.to_thread(get_index_documentaire, version_corpus)).version
+
+        # Réponse déjà générée pour cette question (ou une question proche)
+        cache = get_cache_reponses_faq()
+        en_cache = await asyncio.to_thread(cache.obtenir, sanitized_question, faq_history, version_index)
+
+        if en_cache:
+            response_text, sources = en_cache["response"], en_cache["sources"]
+        else:
+            # Sélectionner les extraits pertinents de la documentation (index BM25)
+            extraits = await asyncio.to_thread(
+                selectionner_extraits_faq,
+                sanitized_question,
+                faq_history,
+                version_corpus=version_corpus
+            )
 
-        # Ajouter à l'historique
-        faq_history.append({
+            # Générer la réponse
+            with echeance_llm(settings.llm_faq_budget_seconds):
+                response_text = await generate_expert_response_async(
+                    sanitized_question,
+                    client,
+                    faq_history,
+                    extraits
+                )
+            sources = [extrait.to_dict() for extrait in extraits]
+
+            if _est_reponse_cachable(response_text):
+                await asyncio.to_thread(
+                    cache.enregistrer, sanitized_question, response_text, sources, faq_history, version_index
+                )
+
+        # Ajouter l'échange au journal
+        faq_history.extend(await _journal("ajouter", conversation_id, [{
             "question": sanitized_question,
             "response": response_text,
             "timestamp": datetime.utcnow().isoformat(),
-        })
-
-        request.session["faq_history"] = faq_history
+        }]))
 
-        async_logger.info(
+        get_async_logger().info(
             "FAQ question answered",
             user=user.get("preferred_username", "")
         )
@@ -120,6 +181,8 @@ async def faq_chat(
         return {
             "success": True,
             "response": response_text,
+            "sources": sources,
+            "cache": bool(en_cache),
             "history": faq_history,
         }
 
@@ -131,6 +194,127 @@ async def faq_chat(
         )
 
 
+@router.post("_chat_stream")
+async def faq_chat_stream(
+    request: Request,
+    faq_message: FAQMessage,
+    user: Dict[str, Any] = Depends(get_current_user),
+    client: AsyncAzureOpenAI = Depends(get_azure_openai_client),
+    settings: Settings = Depends(get_settings)
+):
+    """
+    Chat FAQ en streaming (Server-Sent Events)
+
+    Événements émis :
+        - token : fragment de la réponse markdown ({"delta": str})
+        - done : fin de la réponse ({"success": True, "response": str, "sources": list, "cache": bool, "history": list})
+        - error : échec de la génération ({"success": False, "error": str})
+
+    La génération est interrompue si le navigateur se déconnecte. L'échange
+    n'est ajouté au journal de la conversation FAQ qu'une fois la réponse
+    complète, avant l'événement done : la requête suivante le retrouve, quel
+    que soit le worker qui la traite.
+
+    Args:
+        faq_message: Question de l'utilisateur
+        user: Utilisateur authentifié
+        client: Client Azure OpenAI
+
+    Returns:
+        StreamingResponse: Flux text/event-stream
+    """
+    sanitized_question = sanitize_user_input(faq_message.question)
+
+    is_valid, error_msg = validate_message_format(sanitized_question)
+    if not is_valid:
+        return JSONResponse(
+            {"success": False, "error": error_msg},
+            status_code=400
+        )
+
+    conversation_id = _faq_conversation_id(request.session)
+    faq_history = await _journal("lire", conversation_id)
+    version_corpus = version_corpus_session(request.session)
+    user_name = user.get("preferred_username", "")
+
+    async def generer_evenements():
+        fragments = []
+
+        try:
+            version_index = (await asyncio.to_thread(get_index_documentaire, version_corpus)).version
+            cache = get_cache_reponses_faq()
+            en_cache = await asyncio.to_thread(cache.obtenir, sanitized_question, faq_history, version_index)
+
+            if en_cache:
+                # Réponse en cache : envoyée en un seul fragment
+                sources = en_cache["sources"]
+                fragments.append(en_cache["response"])
+                yield formater_evenement_sse("token", {"delta": en_cache["response"]})
+            else:
+                extraits = await asyncio.to_thread(
+                    selectionner_extraits_faq,
+                    sanitized_question,
+                    faq_history,
+                    version_corpus=version_corpus
+                )
+                sources = [extrait.to_dict() for extrait in extraits]
+
+                with echeance_llm(settings.llm_faq_budget_seconds):
+                    async for delta in stream_expert_response_async(
+                        sanitized_question, client, faq_history, extraits
+                    ):
+                        if await request.is_disconnected():
+                            logger.info("Client disconnected during FAQ stream")
+                            return
+
+                        fragments.append(delta)
+                        yield formater_evenement_sse("token", {"delta": delta})
+
+        except Exception as e:
+            logger.error(f"Error in FAQ stream: {e}", exc_info=True)
+            yield formater_evenement_sse("error", {"success": False, "error": str(e)})
+            return
+
+        try:
+            nouvelles_entrees = await _journal("ajouter", conversation_id, [{
+                "question": sanitized_question,
+                "response": "".join(fragments).strip(),
+                "timestamp": datetime.utcnow().isoformat(),
+            }])
+        except Exception as e:
+            logger.error(f"Error saving streamed FAQ answer: {e}", exc_info=True)
+            yield formater_evenement_sse("error", {"success": False, "error": str(e)})
+            return
+        entree = nouvelles_entrees[-1]
+
+        if not en_cache and _est_reponse_cachable(entree["response"]):
+            await asyncio.to_thread(
+                cache.enregistrer, sanitized_question, entree["response"], sources, faq_history, version_index
+            )
+
+        get_async_logger().info(
+            "FAQ question streamed",
+            user=user_name
+        )
+
+        yield formater_evenement_sse(
+            "done",
+            {
+                "success": True,
+                "response": entree["response"],
+                "sources": sources,
+                "cache": bool(en_cache),
+                "history": faq_history + nouvelles_entrees,
+            }
+        )
+
+    return StreamingResponse(
+        generer_evenements(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("_history")
 async def faq_history(
     request: Request,
@@ -143,7 +327,7 @@ async def faq_history(
         dict: Historique FAQ
     """
     try:
-        faq_history = request.session.get("faq_history", [])
+        faq_history = await _journal("lire", _faq_conversation_id(request.session))
 
         return {
             "success": True,
@@ -170,9 +354,14 @@ async def faq_reset(
         dict: Confirmation
     """
     try:
-        request.session["faq_history"] = []
-
-        async_logger.info(
+        # Nouvelle conversation FAQ : un flux encore en cours termine dans l'ancien journal, supprimé
+        ancien_id = request.session.pop("faq_conversation_id", None)
+        request.session.pop("faq_history", None)
+        if ancien_id:
+            await _journal("supprimer", ancien_id)
+        _faq_conversation_id(request.session)
+
+        get_async_logger().info(
             "FAQ history reset",
             user=user.get("preferred_username", "")
         )
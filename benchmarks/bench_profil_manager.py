@@ -0,0 +1,68 @@
+"""
+Benchmark de l'état du ProfilManager gardé en session
+
+Compare, pour un échantillon de profils tirés au hasard :
+- l'ancien format : ProfilManager sérialisé par pickle, en hexadécimal ;
+- le descripteur compact (indices dans le jeu de personnages), en JSON.
+
+Mesures : taille en octets de la valeur stockée en session et durée médiane
+de la restauration (désérialisation / reconstruction depuis le catalogue).
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_profil_manager [--profils 200] [--iterations 50]
+"""
+import argparse
+import json
+import logging
+import pickle
+import statistics
+import time
+
+from core.profil_manager import ProfilManager, get_catalogue_personnages
+
+
+def mediane_us(fonction, iterations):
+    """Durée médiane d'un appel en microsecondes"""
+    fonction()  # préchauffage
+    durees = []
+    for _ in range(iterations):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profils", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    get_catalogue_personnages()
+
+    tailles = {"pickle": [], "descripteur": []}
+    durees = {"pickle": [], "descripteur": []}
+    for _ in range(args.profils):
+        profil_manager = ProfilManager(type_personne=None)
+        valeur_pickle = pickle.dumps(profil_manager).hex()
+        valeur_descripteur = json.dumps(profil_manager.descripteur())
+
+        tailles["pickle"].append(len(valeur_pickle))
+        tailles["descripteur"].append(len(valeur_descripteur.encode("utf-8")))
+        durees["pickle"].append(mediane_us(lambda: pickle.loads(bytes.fromhex(valeur_pickle)), args.iterations))
+        durees["descripteur"].append(mediane_us(
+            lambda: ProfilManager.depuis_descripteur(json.loads(valeur_descripteur)), args.iterations
+        ))
+
+    print(f"{args.profils} profils, {args.iterations} restaurations chacun")
+    print(f"{'format':<14}{'octets (médiane)':>18}{'octets (max)':>14}{'restauration (µs)':>20}")
+    for format_session in ("pickle", "descripteur"):
+        print(
+            f"{format_session:<14}{statistics.median(tailles[format_session]):>18.0f}"
+            f"{max(tailles[format_session]):>14}{statistics.median(durees[format_session]):>20.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
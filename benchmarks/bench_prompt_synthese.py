@@ -0,0 +1,102 @@
+"""
+Microbenchmark de la construction du prompt de synthèse
+
+Compare, sur le corpus réel et une conversation simulée :
+- rendu complet à chaque appel (comportement précédent) ;
+- squelette précompilé + rendu du seul suffixe dynamique.
+
+Mesures par appel : durée médiane et mémoire allouée (tracemalloc).
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_prompt_synthese [--iterations 200] [--tours 20] [--corpus v2_20250911]
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from core.fonctions import charger_documents_reference
+from core.prompt_synthese import (
+    _rendre_prefixe_statique,
+    construire_prefixe_statique,
+    construire_suffixe_dynamique,
+    vider_squelettes,
+)
+from core.synthetiser import JSON_HEADER_SYNTHESE
+
+
+def _historique(nb_tours):
+    lignes = []
+    for tour in range(nb_tours):
+        lignes.append(f"[{2 * tour + 1:02d}] Commercial: Question {tour} sur les garanties hospitalisation et optique.")
+        lignes.append(f"[{2 * tour + 2:02d}] Client: Réponse {tour}, je souhaite comparer avec mon contrat actuel.")
+    return "\n".join(lignes)
+
+
+def _construction_complete(documents, historique):
+    prompt_systeme = JSON_HEADER_SYNTHESE + _rendre_prefixe_statique(documents)
+    return prompt_systeme, construire_suffixe_dynamique(historique, "Document profil", None)
+
+
+def _construction_squelette(documents, historique):
+    prompt_systeme = construire_prefixe_statique(documents, JSON_HEADER_SYNTHESE)
+    return prompt_systeme, construire_suffixe_dynamique(historique, "Document profil", None)
+
+
+def mesurer(fonction, documents, historique, iterations):
+    """
+    Durée médiane et mémoire allouée par appel
+
+    Returns:
+        dict: {"duree_mediane_us", "alloue_par_appel_ko"}
+    """
+    fonction(documents, historique)  # préchauffage (rendu du squelette)
+
+    durees = []
+    for _ in range(iterations):
+        debut = time.perf_counter()
+        fonction(documents, historique)
+        durees.append(time.perf_counter() - debut)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    avant, _ = tracemalloc.get_traced_memory()
+    alloue = 0
+    for _ in range(min(iterations, 50)):
+        resultat = fonction(documents, historique)
+        _, pic = tracemalloc.get_traced_memory()
+        alloue += pic - avant
+        del resultat
+        tracemalloc.reset_peak()
+    tracemalloc.stop()
+
+    return {
+        "duree_mediane_us": round(statistics.median(durees) * 1e6, 1),
+        "alloue_par_appel_ko": round(alloue / min(iterations, 50) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--tours", type=int, default=20)
+    parser.add_argument("--corpus", default=None, help="Version du corpus (défaut : version par défaut)")
+    args = parser.parse_args()
+
+    documents = charger_documents_reference(args.corpus)
+    historique = _historique(args.tours)
+    vider_squelettes()
+
+    complet = mesurer(_construction_complete, documents, historique, args.iterations)
+    squelette = mesurer(_construction_squelette, documents, historique, args.iterations)
+
+    print(f"Corpus : {sum(len(texte) for texte in documents.values())} caractères, conversation : {args.tours} tours")
+    print(f"{'méthode':<22}{'durée médiane (µs)':>20}{'alloué / appel (Ko)':>22}")
+    for nom, mesure in (("rendu complet", complet), ("squelette précompilé", squelette)):
+        print(f"{nom:<22}{mesure['duree_mediane_us']:>20}{mesure['alloue_par_appel_ko']:>22}")
+    if squelette["duree_mediane_us"]:
+        print(f"Accélération : x{complet['duree_mediane_us'] / squelette['duree_mediane_us']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
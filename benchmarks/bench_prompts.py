@@ -0,0 +1,297 @@
+"""
+Benchmark hors ligne de la couche prompt
+
+Pour chaque version du corpus, chaque personnage de data/jeu_de_personnages.json
+et des conversations simulées de 5 à 80 tours, mesure la construction :
+- des messages du client simulé (construire_messages_openai) ;
+- du prompt de synthèse (construire_prompt_synthese) ;
+- du prompt de l'expert FAQ (_construire_prompt_expert_faq, indépendant du
+  personnage : mesuré une fois par version du corpus et longueur).
+
+Mesures par cas : durée médiane, pic mémoire (tracemalloc), taille en
+caractères et en tokens. Aucun appel au modèle.
+
+Les résultats sont écrits en JSON (un cas par entrée, triés) pour être
+comparés d'une branche à l'autre : --comparer signale les cas dont la
+taille augmente ou dont la durée dépasse le seuil.
+
+Usage (depuis la racine du projet) :
+    python -m benchmarks.bench_prompts [--iterations 20] [--tours 5 10 20 40 80]
+        [--corpus v2_20250911] [--sortie benchmarks/resultats_prompts.json]
+        [--comparer ancien.json] [--seuil-duree 1.5]
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+from core.fenetre_conversation import _get_encodage, compter_tokens
+from core.fonctions import (
+    PROMPT_CONSIGNE_CLIENT,
+    _construire_prompt_expert_faq,
+    charger_documents_reference,
+    construire_messages_openai,
+    selectionner_extraits_faq,
+)
+from core.profil_manager import construire_prompt_client
+from core.profils_documents import charger_personnages
+from core.prompt_synthese import construire_prompt_synthese
+from core.registre_corpus import get_registre_corpus
+from core.synthetiser import _charger_document_profil_client, _preparer_historique_pour_synthese
+
+TOURS_DEFAUT = (5, 10, 20, 40, 80)
+
+# Questions FAQ posées pendant la conversation simulée
+QUESTIONS_FAQ = (
+    "Quel est le délai de carence pour l'optique ?",
+    "Comment fonctionne le remboursement des dépassements d'honoraires en hospitalisation ?",
+    "Quelles garanties d'assistance sont incluses au niveau 3 ?",
+)
+
+# Champs d'un cas qui l'identifient (clé de comparaison)
+CLES_CAS = ("prompt", "corpus", "type_de_personne", "personnage", "tours")
+
+
+def personnages(donnees):
+    """Profils simulés (comme ProfilManager) de tous les personnages du jeu"""
+    profils = []
+    for type_personne in donnees.get("jeu_de_personnages", []):
+        if not isinstance(type_personne, dict) or not type_personne.get("type_de_personne"):
+            continue
+        for personne in type_personne.get("liste_personne", []):
+            scenario = {
+                "type_de_personne": type_personne["type_de_personne"],
+                "personne": personne,
+                "caracteristiques": type_personne.get("caracteristiques", [])[:2],
+                "objections": type_personne.get("objections", [])[:1],
+                "aleas": type_personne.get("alea", [])[:1],
+            }
+            profils.append(SimpleNamespace(
+                profil=scenario,
+                prompt=construire_prompt_client(
+                    personne, scenario["caracteristiques"], scenario["objections"], scenario["aleas"]
+                ),
+                get_profil_type=scenario["type_de_personne"],
+                get_person_details=lambda personne=personne: personne,
+            ))
+    return profils
+
+
+def conversation(nb_tours):
+    """Conversation simulée de nb_tours tours (commercial puis client)"""
+    historique = []
+    for tour in range(nb_tours):
+        historique.append({
+            "role": "Vous",
+            "text": f"Question {tour} : pouvez-vous me préciser vos besoins en hospitalisation, optique et dentaire ?",
+            "msg_num": 2 * tour + 1,
+            "timestamp": f"2025-10-01T10:{tour % 60:02d}:00",
+        })
+        historique.append({
+            "role": "Assistant",
+            "text": f"Réponse {tour} : alors, en fait, je voudrais surtout comparer avec mon contrat actuel.",
+            "msg_num": 2 * tour + 2,
+            "timestamp": f"2025-10-01T10:{tour % 60:02d}:30",
+        })
+    return historique
+
+
+def historique_faq(nb_tours):
+    """Questions FAQ précédentes (une question toutes les 5 répliques)"""
+    return [
+        {"question": QUESTIONS_FAQ[numero % len(QUESTIONS_FAQ)], "reponse": "### Réponse\n- Point détaillé"}
+        for numero in range(nb_tours // 5)
+    ]
+
+
+def taille(resultat):
+    """(caractères, tokens) d'un prompt : liste de messages, texte ou tuple de textes"""
+    if isinstance(resultat, list):
+        textes = [message["content"] for message in resultat]
+    elif isinstance(resultat, tuple):
+        textes = list(resultat)
+    else:
+        textes = [resultat]
+    return sum(len(texte) for texte in textes), sum(compter_tokens(texte) for texte in textes)
+
+
+def mesurer(construire, iterations):
+    """
+    Durée médiane, pic mémoire et taille d'une construction de prompt
+
+    Returns:
+        dict: {"duree_mediane_us", "pic_memoire_ko", "caracteres", "tokens"}
+    """
+    resultat = construire()  # préchauffage (squelettes, caches)
+
+    durees = []
+    for _ in range(iterations):
+        debut = time.perf_counter()
+        construire()
+        durees.append(time.perf_counter() - debut)
+
+    tracemalloc.start()
+    construire()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    caracteres, tokens = taille(resultat)
+    return {
+        "duree_mediane_us": round(statistics.median(durees) * 1e6, 1),
+        "pic_memoire_ko": round(pic / 1024, 1),
+        "caracteres": caracteres,
+        "tokens": tokens,
+    }
+
+
+def executer(versions, liste_tours, iterations):
+    """
+    Mesure tous les cas
+
+    Returns:
+        list: Cas mesurés, triés par prompt, corpus, personnage et longueur
+    """
+    profils = personnages(charger_personnages())
+    cas = []
+
+    for version in versions:
+        documents = charger_documents_reference(version)
+        for nb_tours in liste_tours:
+            historique = conversation(nb_tours)
+            historique_complet = _preparer_historique_pour_synthese(historique)
+            dernier_message = historique[-2]["text"]
+
+            for profil_manager in profils:
+                personne = profil_manager.get_person_details()
+                identite = {
+                    "corpus": version,
+                    "type_de_personne": profil_manager.get_profil_type,
+                    "personnage": personne["Nom"],
+                    "tours": nb_tours,
+                }
+                document_profil = _charger_document_profil_client(profil_manager, version)
+
+                cas.append({"prompt": "client", **identite, **mesurer(
+                    lambda: construire_messages_openai(
+                        historique[:-2], dernier_message, profil_manager.prompt, PROMPT_CONSIGNE_CLIENT
+                    ),
+                    iterations,
+                )})
+                cas.append({"prompt": "synthese", **identite, **mesurer(
+                    lambda: construire_prompt_synthese(documents, historique_complet, document_profil, profil_manager),
+                    iterations,
+                )})
+
+            histo = historique_faq(nb_tours)
+            question = QUESTIONS_FAQ[nb_tours % len(QUESTIONS_FAQ)]
+            extraits = selectionner_extraits_faq(question, histo, version_corpus=version)
+            cas.append({
+                "prompt": "faq", "corpus": version, "type_de_personne": None, "personnage": None, "tours": nb_tours,
+                **mesurer(lambda: _construire_prompt_expert_faq(extraits, question, histo), iterations),
+            })
+
+    return sorted(cas, key=lambda element: tuple(str(element[cle]) for cle in CLES_CAS[:-1]) + (element["tours"],))
+
+
+def resume(cas):
+    """Par type de prompt : tailles maximales et durée médiane de tous les cas"""
+    par_prompt = {}
+    for element in cas:
+        par_prompt.setdefault(element["prompt"], []).append(element)
+    return {
+        prompt: {
+            "cas": len(elements),
+            "tokens_max": max(element["tokens"] for element in elements),
+            "caracteres_max": max(element["caracteres"] for element in elements),
+            "pic_memoire_ko_max": max(element["pic_memoire_ko"] for element in elements),
+            "duree_mediane_us": round(statistics.median(element["duree_mediane_us"] for element in elements), 1),
+        }
+        for prompt, elements in sorted(par_prompt.items())
+    }
+
+
+def comparer(ancien, nouveau, seuil_duree=1.5):
+    """
+    Régressions d'un résultat par rapport à un résultat de référence
+
+    Returns:
+        list: Messages des cas dont la taille augmente ou la durée dépasse
+              seuil_duree fois la référence
+    """
+    reference = {tuple(element[cle] for cle in CLES_CAS): element for element in ancien.get("cas", [])}
+    regressions = []
+    for element in nouveau["cas"]:
+        precedent = reference.get(tuple(element[cle] for cle in CLES_CAS))
+        if precedent is None:
+            continue
+        nom = "/".join(str(element[cle]) for cle in CLES_CAS if element[cle] is not None)
+        if element["tokens"] > precedent["tokens"]:
+            regressions.append(f"{nom}: {precedent['tokens']} → {element['tokens']} tokens")
+        if precedent["duree_mediane_us"] and element["duree_mediane_us"] > seuil_duree * precedent["duree_mediane_us"]:
+            regressions.append(
+                f"{nom}: {precedent['duree_mediane_us']} → {element['duree_mediane_us']} µs"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--tours", type=int, nargs="+", default=list(TOURS_DEFAUT))
+    parser.add_argument("--corpus", nargs="+", default=None, help="Versions du corpus (défaut : toutes)")
+    parser.add_argument("--sortie", default="benchmarks/resultats_prompts.json")
+    parser.add_argument("--comparer", default=None, help="Résultat de référence (JSON)")
+    parser.add_argument("--seuil-duree", type=float, default=1.5)
+    args = parser.parse_args()
+
+    # Logs INFO des constructions (un par appel) : illisibles et coûteux en boucle
+    logging.disable(logging.INFO)
+
+    registre = get_registre_corpus()
+    registre.precharger()
+    versions = args.corpus or registre.versions()
+
+    debut = time.perf_counter()
+    cas = executer(versions, args.tours, args.iterations)
+    resultat = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "tokens": "tiktoken o200k_base" if _get_encodage() is not None else "estimation",
+            "iterations": args.iterations,
+            "corpus": versions,
+            "tours": args.tours,
+            "duree_secondes": round(time.perf_counter() - debut, 1),
+        },
+        "resume": resume(cas),
+        "cas": cas,
+    }
+
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump(resultat, f, ensure_ascii=False, indent=1)
+
+    print(f"{len(cas)} cas mesurés en {resultat['meta']['duree_secondes']}s → {args.sortie}")
+    print(f"{'prompt':<10}{'cas':>6}{'tokens max':>12}{'caractères max':>16}{'pic mémoire max (Ko)':>22}{'durée médiane (µs)':>20}")
+    for prompt, mesure in resultat["resume"].items():
+        print(
+            f"{prompt:<10}{mesure['cas']:>6}{mesure['tokens_max']:>12}{mesure['caracteres_max']:>16}"
+            f"{mesure['pic_memoire_ko_max']:>22}{mesure['duree_mediane_us']:>20}"
+        )
+
+    if args.comparer:
+        with open(args.comparer, "r", encoding="utf-8") as f:
+            regressions = comparer(json.load(f), resultat, args.seuil_duree)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ from datetime import datetime, timedelta
 from azure.storage.fileshare import ShareFileClient, ShareDirectoryClient, ShareServiceClient
 from pathlib import Path
 
+from core.purge_sessions import get_purge_sessions
+from core.stockage_sessions import get_stockage_sessions
+
 class AzureFileShareSync:
     """Service de synchronisation automatique vers Azure FileShare"""
 
@@ -301,13 +304,29 @@ class AzureFileShareSync:
         for file_config in self.files_to_sync:
             self.sync_file(file_config['local'], file_config['remote'])
     
+    def _sessions_purgees_en_fond(self):
+        """Le répertoire des sessions est-il celui du stockage purgé par la tâche de fond ?"""
+        purge = get_purge_sessions()
+        stockage = get_stockage_sessions()
+        if purge is None or stockage is None or "sessions" not in purge.stockages:
+            return False
+        repertoire = getattr(stockage, "repertoire", None)
+        return repertoire is not None and Path(repertoire).resolve() == self.session_dir.resolve()
+
     def clean_old_sessions(self):
         """
         Nettoie les fichiers de session dont la dernière modification 
         remonte à plus de session_max_age_hours
+
+        Ne fait rien si le répertoire est celui du stockage des sessions : la
+        purge de fond (core.purge_sessions) le nettoie via l'index des
+        expirations, sans parcourir tout le répertoire.
         """
         if not self.session_dir or not self.session_dir.exists():
             return
+
+        if self._sessions_purgees_en_fond():
+            return
         
         try:
             cutoff_time = datetime.now() - timedelta(hours=self.session_max_age_hours)
@@ -0,0 +1,170 @@
+"""
+Cache des habilitations Gauthiq par jeton d'accès
+
+validate_session interrogeait l'API des habilitations à chaque requête
+authentifiée (chargement de page, tour de /chat, appels JSON) : un aller-retour
+externe par requête, jusqu'à 10 s d'attente lorsque l'API est lente.
+
+Les habilitations sont gardées par jeton d'accès (empreinte SHA-256, le jeton
+lui-même n'est pas conservé) pendant une durée courte. Les appels concurrents
+pour un même jeton partagent un seul appel à l'API. Passé la durée de vie,
+une entrée reste utilisable pendant la période de péremption
+(stale-while-revalidate) : l'appel de rafraîchissement est lancé et attendu
+au plus attente_max_perimee secondes, sinon l'entrée périmée est servie et
+le rafraîchissement se termine en tâche de fond. Un échec de l'API n'est pas
+mis en cache : l'entrée périmée est servie si elle existe.
+"""
+import asyncio
+import copy
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def cle_jeton(access_token: str) -> str:
+    """Clé de cache d'un jeton d'accès"""
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+
+
+class CacheHabilitations:
+    """Habilitations par jeton d'accès : durée de vie, appels regroupés, entrées périmées servies"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 300,
+        periode_peremption: float = 600,
+        attente_max_perimee: float = 1.0,
+        max_entrees: int = 10000,
+    ):
+        """
+        Args:
+            ttl_seconds: Durée pendant laquelle une entrée est servie sans appel à l'API
+            periode_peremption: Durée supplémentaire pendant laquelle une entrée périmée
+                                peut être servie (0 : désactivé)
+            attente_max_perimee: Attente maximale du rafraîchissement avant de servir l'entrée périmée
+            max_entrees: Nombre maximal de jetons gardés (les moins récemment utilisés évincés)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.periode_peremption = periode_peremption
+        self.attente_max_perimee = attente_max_perimee
+        self.max_entrees = max_entrees
+        # clé → (habilitations, obtenues à (time.monotonic()))
+        self._entrees: "OrderedDict[str, tuple]" = OrderedDict()
+        self._en_cours: Dict[str, asyncio.Task] = {}
+        self._compteurs = {
+            "hits": 0, "misses": 0, "regroupes": 0, "perimees_servies": 0, "rafraichissements": 0, "erreurs": 0
+        }
+
+    def enregistrer(self, access_token: str, habilitations: Dict[str, Any]) -> None:
+        """Enregistre des habilitations obtenues hors du cache (connexion)"""
+        self._garder(cle_jeton(access_token), habilitations)
+
+    def invalider(self, access_token: str) -> None:
+        self._entrees.pop(cle_jeton(access_token), None)
+
+    def _garder(self, cle: str, habilitations: Dict[str, Any]) -> None:
+        self._entrees[cle] = (habilitations, time.monotonic())
+        self._entrees.move_to_end(cle)
+        while len(self._entrees) > self.max_entrees:
+            self._entrees.popitem(last=False)
+
+    async def _charger(self, cle: str, recuperer: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self._compteurs["rafraichissements"] += 1
+        habilitations = await recuperer()
+        self._garder(cle, habilitations)
+        return habilitations
+
+    def _fin_chargement(self, cle: str, tache: asyncio.Task) -> None:
+        if self._en_cours.get(cle) is tache:
+            del self._en_cours[cle]
+        if not tache.cancelled() and tache.exception() is not None:
+            self._compteurs["erreurs"] += 1
+            logger.warning(f"Habilitations indisponibles: {tache.exception()}")
+
+    def _rafraichir(self, cle: str, recuperer: Callable[[], Awaitable[Dict[str, Any]]]) -> asyncio.Task:
+        """Appel à l'API en cours pour la clé (un seul par clé et par worker)"""
+        tache = self._en_cours.get(cle)
+        if tache is not None and not tache.done() and tache.get_loop() is asyncio.get_running_loop():
+            self._compteurs["regroupes"] += 1
+            return tache
+        tache = asyncio.create_task(self._charger(cle, recuperer))
+        self._en_cours[cle] = tache
+        tache.add_done_callback(lambda tache_terminee: self._fin_chargement(cle, tache_terminee))
+        return tache
+
+    async def obtenir(
+        self,
+        access_token: str,
+        recuperer: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        Habilitations du jeton, depuis le cache ou l'API
+
+        Args:
+            access_token: Jeton d'accès OAuth
+            recuperer: Appel à l'API des habilitations (lève une exception si elle est indisponible)
+
+        Returns:
+            dict: Copie des habilitations ({} si l'API est indisponible et qu'aucune entrée n'est utilisable)
+        """
+        cle = cle_jeton(access_token)
+        entree = self._entrees.get(cle)
+        age = time.monotonic() - entree[1] if entree is not None else None
+
+        if entree is not None and age < self.ttl_seconds:
+            self._compteurs["hits"] += 1
+            self._entrees.move_to_end(cle)
+            return copy.deepcopy(entree[0])
+
+        self._compteurs["misses"] += 1
+        tache = self._rafraichir(cle, recuperer)
+        utilisable = entree is not None and age < self.ttl_seconds + self.periode_peremption
+
+        try:
+            if utilisable:
+                # API lente : l'entrée périmée est servie, le rafraîchissement continue en tâche de fond
+                habilitations = await asyncio.wait_for(asyncio.shield(tache), self.attente_max_perimee)
+            else:
+                # Appel partagé : l'annulation d'une requête n'interrompt pas celui des autres
+                habilitations = await asyncio.shield(tache)
+        except asyncio.TimeoutError:
+            self._compteurs["perimees_servies"] += 1
+            return copy.deepcopy(entree[0])
+        except Exception:
+            if utilisable:
+                self._compteurs["perimees_servies"] += 1
+                return copy.deepcopy(entree[0])
+            return {}
+        return copy.deepcopy(habilitations)
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "entrees": len(self._entrees),
+            "en_cours": len(self._en_cours),
+            "ttl_seconds": self.ttl_seconds,
+            "periode_peremption": self.periode_peremption,
+            **self._compteurs,
+        }
+
+
+# Instance globale
+_cache_habilitations: Optional[CacheHabilitations] = None
+
+
+def init_cache_habilitations(**options) -> CacheHabilitations:
+    """Initialise le cache des habilitations (appelé dans le lifespan)"""
+    global _cache_habilitations
+    _cache_habilitations = CacheHabilitations(**options)
+    return _cache_habilitations
+
+
+def get_cache_habilitations() -> CacheHabilitations:
+    """Retourne le cache des habilitations (valeurs par défaut s'il n'a pas été initialisé)"""
+    global _cache_habilitations
+    if _cache_habilitations is None:
+        _cache_habilitations = CacheHabilitations()
+    return _cache_habilitations
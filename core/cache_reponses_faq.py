@@ -0,0 +1,332 @@
+"""
+Cache des réponses de l'expert FAQ
+
+Les conseillers posent souvent les mêmes questions ("délai de carence",
+"tiers payant"...). La réponse, générée à température 0 à partir des mêmes
+extraits, est mise en cache :
+
+- clé : question normalisée (minuscules, sans accents ni mots neutres,
+  racinisée) ; contrairement à l'analyse de l'index BM25, la négation et
+  les mots interrogatifs sont conservés ("pourquoi ... n'est pas accepté"
+  n'a pas la clé de "est-il accepté"). Recherche par similarité lexicale
+  (Jaccard) au-delà d'un seuil, entre questions de mêmes négation et mots
+  interrogatifs seulement ;
+- portée : version du corpus documentaire (les réponses d'un ancien corpus
+  ne sont jamais servies) ;
+- niveau mémoire : LRU borné avec durée de vie ;
+- niveau persistant : un fichier JSON par question dans le FileShare,
+  partagé entre les workers et conservé après un redémarrage.
+
+Seules les questions autonomes sont mises en cache : une relance qui fait
+référence à l'échange précédent ("et pour le niveau 3 ?") dépend de
+l'historique et passe toujours par le modèle.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .fonctions_fileshare import get_file_from_fileshare, save_file_to_fileshare
+from .index_documentaire import _MOTS, _sans_accents, analyser, get_index_documentaire, raciniser
+
+logger = logging.getLogger(__name__)
+
+# Dossier du niveau persistant (sous-dossier par version du corpus)
+DOSSIER_CACHE_FAQ = "admin/cache_faq"
+
+# Une question de relance fait référence à l'échange précédent
+_RELANCE = re.compile(
+    r"^\s*(et|mais|aussi|sinon|idem)\b|\b(ca|cela|celui[- ]ci|celle[- ]ci|ce dernier|cette derniere|"
+    r"la meme chose|meme question|dans ce cas|precedent|precedente)\b"
+)
+NB_TERMES_MIN_AUTONOME = 2
+
+# Mots sans effet sur la réponse, retirés de la clé du cache
+MOTS_NEUTRES_CACHE = set("""
+a au aux c ca ce ceci cela ces cet cette d de des du elle elles en est et etre il ils j je l la le
+les leur leurs m ma me mes mon nos notre nous on par pour qu que quel quelle quelles quels qui s sa
+se ses son sont t ta te tes ton tu un une vos votre vous y svp stp merci bonjour
+""".split())
+
+# Marqueurs conservés dans la clé : une réponse n'est jamais servie à une
+# question qui en diffère (hit par similarité compris)
+MARQUEURS_NEGATION = {"ne", "pas", "sans", "jamais", "aucun", "aucune", "ni", "non", "rien", "sauf", "hors"}
+MARQUEURS_QUESTION = {"pourquoi", "comment", "quand", "combien"}
+MARQUEURS_CACHE = MARQUEURS_NEGATION | MARQUEURS_QUESTION
+
+
+def normaliser_question(question: str) -> str:
+    """
+    Forme canonique d'une question (termes dédoublonnés et triés)
+
+    "Quel est le délai de carence ?" et "délais carence" ont la même clé ;
+    "Pourquoi le tiers payant n'est pas accepté ?" n'a pas celle de
+    "Le tiers payant est-il accepté ?".
+    """
+    termes = set()
+    for mot in _MOTS.findall(_sans_accents(question.lower())):
+        if mot == "n":
+            mot = "ne"
+        if mot in MARQUEURS_CACHE:
+            termes.add(mot)
+        elif mot not in MOTS_NEUTRES_CACHE and (len(mot) > 1 or mot.isdigit()):
+            termes.add(raciniser(mot))
+    return " ".join(sorted(termes))
+
+
+def _marqueurs(cle: str) -> set:
+    """Négation et mots interrogatifs d'une clé normalisée"""
+    return set(cle.split()) & MARQUEURS_CACHE
+
+
+def est_question_autonome(question: str, histo: Optional[List[Dict[str, Any]]] = None) -> bool:
+    """
+    Indique si la réponse à la question ne dépend pas de l'historique FAQ
+
+    Args:
+        question: Question du conseiller
+        histo: Historique de la conversation FAQ
+
+    Returns:
+        bool: True si la question peut être servie depuis le cache
+    """
+    if len(analyser(question)) < NB_TERMES_MIN_AUTONOME:
+        return False
+    if not histo:
+        return True
+    return not _RELANCE.search(_sans_accents(question.lower()))
+
+
+def similarite(cle_a: str, cle_b: str) -> float:
+    """Indice de Jaccard entre deux questions normalisées"""
+    termes_a, termes_b = set(cle_a.split()), set(cle_b.split())
+    if not termes_a or not termes_b:
+        return 0.0
+    return len(termes_a & termes_b) / len(termes_a | termes_b)
+
+
+class CacheReponsesFAQ:
+    """Cache à deux niveaux (mémoire LRU + FileShare) des réponses FAQ"""
+
+    def __init__(
+        self,
+        max_entrees: int = 500,
+        ttl_seconds: int = 7 * 24 * 3600,
+        seuil_similarite: float = 0.85,
+        persistant: bool = True,
+    ):
+        self.max_entrees = max_entrees
+        self.ttl_seconds = ttl_seconds
+        self.seuil_similarite = seuil_similarite
+        self.persistant = persistant
+        self._entrees: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._compteurs = {
+            "hits_memoire": 0,
+            "hits_similaires": 0,
+            "hits_persistants": 0,
+            "misses": 0,
+            "non_cachables": 0,
+            "enregistrements": 0,
+            "evictions": 0,
+        }
+
+    def obtenir(
+        self,
+        question: str,
+        histo: Optional[List[Dict[str, Any]]] = None,
+        version: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Cherche une réponse en cache pour la question
+
+        Args:
+            question: Question du conseiller (déjà nettoyée)
+            histo: Historique de la conversation FAQ
+            version: Version du corpus (par défaut celle de l'index courant)
+
+        Returns:
+            dict: {"question", "response", "sources", "cree_le"} ou None
+        """
+        if not est_question_autonome(question, histo):
+            self._incrementer("non_cachables")
+            return None
+
+        cle = normaliser_question(question)
+        version = version or get_index_documentaire().version
+        maintenant = time.time()
+
+        with self._lock:
+            entree = self._entrees.get((version, cle))
+            if entree is not None and self._est_valide(entree, maintenant):
+                self._entrees.move_to_end((version, cle))
+                self._compteurs["hits_memoire"] += 1
+                return entree
+
+            entree = self._chercher_similaire(version, cle, maintenant)
+            if entree is not None:
+                self._compteurs["hits_similaires"] += 1
+                return entree
+
+        entree = self._lire_persistant(version, cle, maintenant)
+        if entree is not None:
+            with self._lock:
+                self._stocker_memoire((version, cle), entree)
+                self._compteurs["hits_persistants"] += 1
+            return entree
+
+        self._incrementer("misses")
+        return None
+
+    def enregistrer(
+        self,
+        question: str,
+        reponse: str,
+        sources: List[Dict[str, Any]],
+        histo: Optional[List[Dict[str, Any]]] = None,
+        version: Optional[str] = None,
+    ) -> bool:
+        """
+        Met en cache la réponse à une question autonome
+
+        Args:
+            question: Question du conseiller (déjà nettoyée)
+            reponse: Réponse de l'expert
+            sources: Sources citées (Extrait.to_dict())
+            histo: Historique de la conversation FAQ
+            version: Version du corpus (par défaut celle de l'index courant)
+
+        Returns:
+            bool: True si la réponse a été mise en cache
+        """
+        if not reponse or not est_question_autonome(question, histo):
+            return False
+
+        cle = normaliser_question(question)
+        version = version or get_index_documentaire().version
+        entree = {
+            "question": question,
+            "cle": cle,
+            "response": reponse,
+            "sources": sources,
+            "cree_le": time.time(),
+        }
+
+        with self._lock:
+            self._stocker_memoire((version, cle), entree)
+            self._compteurs["enregistrements"] += 1
+
+        if self.persistant:
+            chemin = self._chemin(version, cle)
+            if not save_file_to_fileshare(json.dumps(entree, ensure_ascii=False), chemin):
+                logger.warning(f"Réponse FAQ non persistée: {chemin}")
+        return True
+
+    def statistiques(self) -> Dict[str, Any]:
+        """
+        Compteurs du cache
+
+        Returns:
+            dict: Hits par niveau, misses, taux de hit et taille du niveau mémoire
+        """
+        with self._lock:
+            stats = dict(self._compteurs)
+            stats["entrees_memoire"] = len(self._entrees)
+        hits = stats["hits_memoire"] + stats["hits_similaires"] + stats["hits_persistants"]
+        stats["taux_hit"] = round(hits / (hits + stats["misses"]), 4) if hits + stats["misses"] else 0.0
+        return stats
+
+    def vider(self) -> None:
+        """Vide le niveau mémoire (le niveau persistant expire avec la version du corpus)"""
+        with self._lock:
+            self._entrees.clear()
+
+    def _incrementer(self, compteur: str) -> None:
+        with self._lock:
+            self._compteurs[compteur] += 1
+
+    def _est_valide(self, entree: Dict[str, Any], maintenant: float) -> bool:
+        return maintenant - entree["cree_le"] < self.ttl_seconds
+
+    def _chercher_similaire(self, version: str, cle: str, maintenant: float) -> Optional[Dict[str, Any]]:
+        """Entrée mémoire la plus proche au-delà du seuil de similarité (appelé sous verrou)"""
+        if self.seuil_similarite >= 1.0:
+            return None
+
+        meilleure, meilleur_score = None, self.seuil_similarite
+        marqueurs = _marqueurs(cle)
+        for (version_entree, cle_entree), entree in self._entrees.items():
+            if version_entree != version or not self._est_valide(entree, maintenant):
+                continue
+            if _marqueurs(cle_entree) != marqueurs:
+                continue
+            score = similarite(cle, cle_entree)
+            if score >= meilleur_score:
+                meilleure, meilleur_score = (version_entree, cle_entree), score
+
+        if meilleure is None:
+            return None
+        self._entrees.move_to_end(meilleure)
+        return self._entrees[meilleure]
+
+    def _stocker_memoire(self, cle: tuple, entree: Dict[str, Any]) -> None:
+        """Ajoute une entrée au LRU en évinçant la plus ancienne (appelé sous verrou)"""
+        self._entrees[cle] = entree
+        self._entrees.move_to_end(cle)
+        while len(self._entrees) > self.max_entrees:
+            self._entrees.popitem(last=False)
+            self._compteurs["evictions"] += 1
+
+    @staticmethod
+    def _chemin(version: str, cle: str) -> str:
+        empreinte = hashlib.sha1(cle.encode("utf-8")).hexdigest()[:20]
+        return f"{DOSSIER_CACHE_FAQ}/{version}/{empreinte}.json"
+
+    def _lire_persistant(self, version: str, cle: str, maintenant: float) -> Optional[Dict[str, Any]]:
+        """Relit une entrée du FileShare (écrite par ce worker ou un autre)"""
+        if not self.persistant:
+            return None
+
+        success, contenu = get_file_from_fileshare(self._chemin(version, cle))
+        if not success:
+            return None
+        try:
+            entree = json.loads(contenu)
+        except json.JSONDecodeError:
+            logger.warning(f"Entrée du cache FAQ illisible: {self._chemin(version, cle)}")
+            return None
+
+        if entree.get("cle") != cle or not self._est_valide(entree, maintenant):
+            return None
+        return entree
+
+
+# Instance globale
+_cache_reponses_faq: Optional[CacheReponsesFAQ] = None
+
+
+def init_cache_reponses_faq(
+    max_entrees: int = 500,
+    ttl_seconds: int = 7 * 24 * 3600,
+    seuil_similarite: float = 0.85,
+) -> CacheReponsesFAQ:
+    """Initialise le cache des réponses FAQ (appelé dans le lifespan de l'application)"""
+    global _cache_reponses_faq
+    if _cache_reponses_faq is None:
+        _cache_reponses_faq = CacheReponsesFAQ(
+            max_entrees=max_entrees,
+            ttl_seconds=ttl_seconds,
+            seuil_similarite=seuil_similarite,
+        )
+    return _cache_reponses_faq
+
+
+def get_cache_reponses_faq() -> CacheReponsesFAQ:
+    """Retourne le cache des réponses FAQ (créé à la demande)"""
+    if _cache_reponses_faq is None:
+        return init_cache_reponses_faq()
+    return _cache_reponses_faq
@@ -0,0 +1,156 @@
+"""
+Comptabilité des tokens par section de prompt
+
+Chaque prompt envoyé (synthèse, FAQ, client simulé, commercial) est découpé
+en sections nommées (instructions, documents, profil, conversation...) dont
+les tokens sont comptés hors ligne, sans appel au modèle. Les comptes sont
+écrits dans async_logger et agrégés sur les derniers appels pour savoir quoi
+réduire quand la latence ou le coût augmente.
+
+Les textes longs (documents de référence, templates) sont identiques d'un
+appel à l'autre : leur nombre de tokens est mémorisé.
+"""
+import logging
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Union
+
+from .async_logger import get_async_logger
+from .fenetre_conversation import compter_tokens
+
+logger = logging.getLogger(__name__)
+
+# Textes dont le compte est mémorisé (caractères) et taille de la mémoire
+TAILLE_MIN_MEMOIRE = 1000
+MAX_TEXTES_MEMORISES = 256
+
+# Nombre d'appels récents gardés par type de prompt
+TAILLE_FENETRE_DEFAUT = 500
+
+_memoire: "OrderedDict[str, int]" = OrderedDict()
+_memoire_lock = threading.Lock()
+
+
+def compter_tokens_section(texte: Optional[str]) -> int:
+    """Tokens d'une section (compte mémorisé pour les textes longs)"""
+    if not texte:
+        return 0
+    if len(texte) < TAILLE_MIN_MEMOIRE:
+        return compter_tokens(texte)
+
+    with _memoire_lock:
+        nombre = _memoire.get(texte)
+        if nombre is not None:
+            _memoire.move_to_end(texte)
+            return nombre
+
+    nombre = compter_tokens(texte)
+    with _memoire_lock:
+        _memoire[texte] = nombre
+        while len(_memoire) > MAX_TEXTES_MEMORISES:
+            _memoire.popitem(last=False)
+    return nombre
+
+
+def retirer(texte: str, *parties: Optional[str]) -> str:
+    """Texte privé d'une occurrence de chaque partie (isole le texte fixe d'un template)"""
+    for partie in parties:
+        if partie:
+            avant, trouve, apres = texte.partition(partie)
+            if trouve:
+                texte = avant + apres
+    return texte
+
+
+def _percentile(valeurs: List[int], rang: float) -> int:
+    """Percentile au rang le plus proche d'une liste triée"""
+    if not valeurs:
+        return 0
+    return valeurs[max(0, math.ceil(rang / 100 * len(valeurs)) - 1)]
+
+
+class ComptabiliteTokens:
+    """Comptes de tokens par section des derniers appels, par type de prompt"""
+
+    def __init__(self, taille_fenetre: int = TAILLE_FENETRE_DEFAUT):
+        self.taille_fenetre = taille_fenetre
+        self._appels: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def enregistrer(self, type_prompt: str, sections: Dict[str, int]) -> None:
+        with self._lock:
+            if type_prompt not in self._appels:
+                self._appels[type_prompt] = deque(maxlen=self.taille_fenetre)
+            self._appels[type_prompt].append(dict(sections))
+
+    def percentiles(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Percentiles par section sur les derniers appels
+
+        Returns:
+            dict: {type_prompt: {"appels": n, "sections": {section: {"p50", "p90",
+                   "p99", "max", "moyenne", "part_moyenne"}}}}
+        """
+        with self._lock:
+            appels = {type_prompt: list(fenetre) for type_prompt, fenetre in self._appels.items()}
+
+        resultat = {}
+        for type_prompt, comptes in appels.items():
+            total = sum(compte.get("total", 0) for compte in comptes)
+            noms = sorted({nom for compte in comptes for nom in compte})
+            sections = {}
+            for nom in noms:
+                valeurs = sorted(compte.get(nom, 0) for compte in comptes)
+                sections[nom] = {
+                    "p50": _percentile(valeurs, 50),
+                    "p90": _percentile(valeurs, 90),
+                    "p99": _percentile(valeurs, 99),
+                    "max": valeurs[-1],
+                    "moyenne": round(sum(valeurs) / len(valeurs), 1),
+                    "part_moyenne": round(sum(valeurs) / total, 4) if total else 0.0,
+                }
+            resultat[type_prompt] = {"appels": len(comptes), "sections": sections}
+        return resultat
+
+    def reinitialiser(self) -> None:
+        with self._lock:
+            self._appels.clear()
+
+
+# Instance globale (par processus)
+comptabilite_tokens = ComptabiliteTokens()
+
+
+def comptabiliser_prompt(type_prompt: str, sections: Dict[str, Union[str, int, None]], **contexte) -> Dict[str, int]:
+    """
+    Compte les tokens de chaque section d'un prompt, les journalise et les agrège
+
+    La comptabilité ne doit jamais faire échouer l'appel : en cas d'erreur,
+    elle est ignorée.
+
+    Args:
+        type_prompt: Type de prompt (synthese, faq, client, commercial)
+        sections: Nom de section → texte (ou nombre de tokens déjà compté)
+        **contexte: Champs ajoutés à l'entrée de journal
+
+    Returns:
+        dict: Tokens par section et "total" (vide en cas d'erreur)
+    """
+    try:
+        comptes = {
+            nom: valeur if isinstance(valeur, int) else compter_tokens_section(valeur)
+            for nom, valeur in sections.items()
+        }
+        comptes["total"] = sum(comptes.values())
+        comptabilite_tokens.enregistrer(type_prompt, comptes)
+        get_async_logger().info(
+            "Prompt token accounting",
+            type_prompt=type_prompt,
+            tokens=comptes,
+            **contexte
+        )
+        return comptes
+    except Exception as e:
+        logger.warning(f"Comptabilité des tokens du prompt {type_prompt} ignorée: {e}")
+        return {}
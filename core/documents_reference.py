@@ -0,0 +1,293 @@
+"""
+Magasin des documents de référence partagé par le processus
+
+Les documents (offre, conditions générales, méthodes commerciales, profils
+clients) étaient relus sur le FileShare à chaque synthèse, question FAQ ou
+réponse commerciale. Ils sont désormais chargés une fois au démarrage dans un
+instantané immuable partagé en lecture seule par toutes les requêtes.
+
+Une tâche de surveillance compare périodiquement taille et date de
+modification des fichiers ; un fichier modifié est relu, et s'il a vraiment
+changé (empreinte SHA-1 du contenu), un nouvel instantané remplace l'ancien
+d'un seul coup. Une requête en cours garde l'instantané qu'elle a obtenu.
+
+Un magasin correspond à une version du corpus ; les versions sont décrites et
+instanciées par le registre (core.registre_corpus).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Mapping des documents de référence selon le tableau fourni
+# (corpus racine sans manifeste ; les clés sont celles attendues par les prompts)
+FICHIERS_REFERENCE = {
+    "description_offre": "data/txt/description_offre.txt",
+    "tmgf": "data/txt/tmgf1.txt",
+    "exemples_remboursements": "data/txt/exemples_remboursements.txt",
+    "methodes_commerciales_recommendees": "data/txt/methodes_commerciales_recommendees.txt",
+    "traitement_objections": "data/txt/traitement_objections.txt",
+    "cg_vocabulaire": "data/txt/CG_GSA3_1_Vocabulaire_Facilite_lecture.txt",
+    "cg_garanties": "data/txt/CG_GSA3_2_Garanties.txt",
+    "cg_garanties_assistance": "data/txt/CG_GSA3_3_Garanties_assistance.txt",
+    "cg_contrat": "data/txt/CG_GSA3_4_contrat.txt",
+    "infos_commerciales": "data/txt/HEKA_Formation conseillers_Guide animateur_synthese_complete.txt",
+    "charte_relation_client": "data/txt/Charte_relation_client.txt"
+}
+
+# Documents de profil client utilisés par la synthèse
+FICHIERS_PROFILS = {
+    "profil_aidants": "data/txt/profil_aidants.txt",
+    "profil_familles_installees_45_54": "data/txt/profil_familles_installees_45_54.txt",
+    "profil_jeune_famille_30_44": "data/txt/Profil_jeune_famille_30_44.txt",
+    "profil_jeunes_actifs_18_29": "data/txt/Profil_jeunes_actifs_18_29.txt",
+    "profil_jeunes_senior_55_64": "data/txt/profil_jeunes_senior_55_64.txt",
+    "profil_retraite_aide_sup75": "data/txt/profil_retraite_aide_sup75.txt",
+    "profil_retraite_en_forme_65_74": "data/txt/profil_retraite_en_forme_65_74.txt",
+}
+
+# Intervalle de vérification des fichiers par défaut (secondes)
+INTERVALLE_VERIFICATION_DEFAUT = 30.0
+
+
+class DocumentCharge:
+    """Contenu d'un document et état du fichier au moment de sa lecture"""
+
+    __slots__ = ("cle", "chemin", "contenu", "taille", "mtime_ns", "empreinte", "present", "charge_le")
+
+    def __init__(self, cle: str, chemin: str, contenu: str, taille: int, mtime_ns: int, present: bool):
+        self.cle = cle
+        self.chemin = chemin
+        self.contenu = contenu
+        self.taille = taille
+        self.mtime_ns = mtime_ns
+        self.present = present
+        self.empreinte = hashlib.sha1(contenu.encode("utf-8")).hexdigest()
+        self.charge_le = time.time()
+
+    def signature(self) -> Tuple[bool, int, int]:
+        return self.present, self.taille, self.mtime_ns
+
+
+def _signature_fichier(chemin: str) -> Tuple[bool, int, int]:
+    """(présent, taille, date de modification) d'un fichier"""
+    try:
+        stat = os.stat(chemin)
+    except OSError:
+        return False, 0, 0
+    return True, stat.st_size, stat.st_mtime_ns
+
+
+def _lire_document(cle: str, chemin: str) -> DocumentCharge:
+    """Lit un document ; un fichier absent ou illisible donne un contenu vide"""
+    present, taille, mtime_ns = _signature_fichier(chemin)
+    contenu = ""
+    if present:
+        try:
+            with open(chemin, "r", encoding="utf-8") as f:
+                contenu = f.read()
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement de {chemin}: {e}")
+    else:
+        logger.warning(f"Fichier non trouvé: {chemin}")
+    return DocumentCharge(cle, chemin, contenu, taille, mtime_ns, present)
+
+
+class InstantaneDocuments:
+    """Ensemble immuable des documents chargés à un instant donné"""
+
+    def __init__(self, documents: Dict[str, DocumentCharge]):
+        self.documents: Mapping[str, DocumentCharge] = MappingProxyType(dict(documents))
+        self.contenus: Mapping[str, str] = MappingProxyType(
+            {cle: document.contenu for cle, document in documents.items()}
+        )
+        self._versions: Dict[Tuple[str, ...], str] = {}
+
+    def contenu(self, cle: str) -> str:
+        return self.contenus.get(cle, "")
+
+    def version(self, cles: Optional[Iterable[str]] = None) -> str:
+        """
+        Empreinte du contenu des documents (tous, ou ceux demandés)
+
+        Returns:
+            str: Identifiant court, stable d'un redémarrage à l'autre
+        """
+        cles = tuple(sorted(cles if cles is not None else self.documents))
+        if cles not in self._versions:
+            empreinte = hashlib.sha1()
+            for cle in cles:
+                document = self.documents.get(cle)
+                empreinte.update(f"{cle}|{document.empreinte if document else 'absent'}\n".encode("utf-8"))
+            self._versions[cles] = empreinte.hexdigest()[:12]
+        return self._versions[cles]
+
+
+class MagasinDocuments:
+    """Chargement unique, rechargement à chaud et métriques des documents"""
+
+    def __init__(
+        self,
+        fichiers: Dict[str, str],
+        intervalle_verification: float = INTERVALLE_VERIFICATION_DEFAUT,
+        contenus_partages: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Args:
+            fichiers: Clé du document → chemin du fichier
+            intervalle_verification: Secondes entre deux vérifications des fichiers
+            contenus_partages: Contenus par empreinte, partagés entre magasins
+                               (un document identique dans plusieurs versions
+                               n'est gardé qu'une fois en mémoire)
+        """
+        self.fichiers = dict(fichiers)
+        self.intervalle_verification = intervalle_verification
+        self._contenus_partages = contenus_partages
+        self._instantane: Optional[InstantaneDocuments] = None
+        self._lock = threading.Lock()
+        self._tache: Optional[asyncio.Task] = None
+        self._compteurs = {
+            "chargements_fichiers": 0,
+            "rechargements": 0,
+            "verifications": 0,
+        }
+        self._duree_dernier_chargement = 0.0
+        self._duree_totale_chargements = 0.0
+        self._derniere_verification: Optional[float] = None
+
+    @property
+    def instantane(self) -> InstantaneDocuments:
+        """Instantané courant (chargé au premier accès)"""
+        instantane = self._instantane
+        if instantane is None:
+            with self._lock:
+                if self._instantane is None:
+                    self._instantane = self._charger(self.fichiers.items())
+                instantane = self._instantane
+        return instantane
+
+    def _charger(self, fichiers: Iterable[Tuple[str, str]],
+                 base: Optional[InstantaneDocuments] = None) -> InstantaneDocuments:
+        """Lit les fichiers donnés et construit un instantané (appelé sous verrou)"""
+        debut = time.perf_counter()
+        documents = dict(base.documents) if base is not None else {}
+        nb_fichiers = 0
+        for cle, chemin in fichiers:
+            document = _lire_document(cle, chemin)
+            if self._contenus_partages is not None:
+                document.contenu = self._contenus_partages.setdefault(document.empreinte, document.contenu)
+            documents[cle] = document
+            nb_fichiers += 1
+        duree = time.perf_counter() - debut
+
+        self._compteurs["chargements_fichiers"] += nb_fichiers
+        self._duree_dernier_chargement = duree
+        self._duree_totale_chargements += duree
+        logger.info(f"{nb_fichiers} document(s) de référence chargé(s) en {duree * 1000:.0f} ms")
+        return InstantaneDocuments(documents)
+
+    def contenus(self, cles: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Contenus des documents demandés (tous par défaut)"""
+        instantane = self.instantane
+        if cles is None:
+            return dict(instantane.contenus)
+        return {cle: instantane.contenu(cle) for cle in cles}
+
+    def contenu(self, cle: str) -> str:
+        return self.instantane.contenu(cle)
+
+    def verifier(self) -> bool:
+        """
+        Recharge les fichiers modifiés depuis le dernier chargement
+
+        Returns:
+            bool: Vrai si un nouvel instantané a été publié
+        """
+        instantane = self.instantane
+        modifies = [
+            (cle, chemin) for cle, chemin in self.fichiers.items()
+            if cle not in instantane.documents
+            or instantane.documents[cle].signature() != _signature_fichier(chemin)
+        ]
+        self._compteurs["verifications"] += 1
+        self._derniere_verification = time.time()
+        if not modifies:
+            return False
+
+        with self._lock:
+            courant = self._instantane
+            nouveau = self._charger(modifies, base=courant)
+            contenu_change = any(
+                cle not in courant.documents
+                or courant.documents[cle].empreinte != nouveau.documents[cle].empreinte
+                for cle, _ in modifies
+            )
+            # Même contenu (fichier touché) : on garde seulement les nouvelles signatures
+            self._instantane = nouveau
+            if contenu_change:
+                self._compteurs["rechargements"] += 1
+
+        if contenu_change:
+            logger.info(
+                f"Documents de référence rechargés ({', '.join(cle for cle, _ in modifies)}), "
+                f"version {nouveau.version()}"
+            )
+        return contenu_change
+
+    async def _surveiller(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalle_verification)
+            try:
+                await asyncio.to_thread(self.verifier)
+            except Exception as e:
+                logger.error(f"Erreur lors de la vérification des documents de référence: {e}")
+
+    def demarrer_surveillance(self) -> None:
+        """Lance la tâche de surveillance des fichiers (boucle asyncio courante)"""
+        if self._tache is None and self.intervalle_verification > 0:
+            self._tache = asyncio.create_task(self._surveiller())
+
+    async def arreter(self) -> None:
+        """Arrête la tâche de surveillance"""
+        if self._tache is not None:
+            self._tache.cancel()
+            await asyncio.gather(self._tache, return_exceptions=True)
+            self._tache = None
+
+    def statistiques(self) -> Dict[str, Any]:
+        """
+        Métriques du magasin
+
+        Returns:
+            dict: Version, tailles par document, compteurs et durées de chargement
+        """
+        instantane = self.instantane
+        documents = {
+            cle: {
+                "chemin": document.chemin,
+                "present": document.present,
+                "caracteres": len(document.contenu),
+                "octets": document.taille,
+                "charge_le": document.charge_le,
+            }
+            for cle, document in instantane.documents.items()
+        }
+        return {
+            "version": instantane.version(),
+            "nb_documents": len(documents),
+            "caracteres_total": sum(document["caracteres"] for document in documents.values()),
+            "octets_total": sum(document["octets"] for document in documents.values()),
+            "duree_dernier_chargement_ms": round(self._duree_dernier_chargement * 1000, 1),
+            "duree_totale_chargements_ms": round(self._duree_totale_chargements * 1000, 1),
+            "derniere_verification": self._derniere_verification,
+            "intervalle_verification_secondes": self.intervalle_verification,
+            "surveillance_active": self._tache is not None,
+            **self._compteurs,
+            "documents": documents,
+        }
@@ -0,0 +1,423 @@
+"""
+Fenêtre de conversation bornée en tokens
+
+Les appels du client simulé renvoyaient tout l'historique à chaque tour : le
+nombre de tokens d'entrée (et la latence) croissait linéairement avec la
+session. La fenêtre conserve les N derniers tours mot pour mot et remplace
+les tours plus anciens par un résumé glissant.
+
+Le résumé est mis à jour de façon incrémentale en tâche de fond, après la
+réponse au commercial, jamais pendant la requête. Tant qu'il n'a pas rattrapé
+l'historique, les messages non résumés restent envoyés tels quels : aucune
+information n'est perdue, le budget est seulement dépassé temporairement.
+
+Le résumé est une annexe du journal de la conversation
+(core.journal_conversation), partagée par les workers : le tour suivant,
+traité par un autre worker, utilise et complète le même résumé.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .journal_conversation import TYPE_MEMOIRE, JournalConversations, get_journal_conversations
+from .resilience_llm import appel_llm_async
+from .routeur_deploiements import ROLE_RESUME
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # dépendance optionnelle : estimation par le nombre de caractères
+    tiktoken = None
+
+_ENCODAGE = None
+_ENCODAGE_CHARGE = False
+
+# Estimation sans tokenizer : ~3,5 caractères par token pour du français
+CARACTERES_PAR_TOKEN = 3.5
+# Surcoût de format par message (rôle, séparateurs)
+TOKENS_PAR_MESSAGE = 4
+
+# Le résumé est préparé dès que l'historique atteint cette part du budget
+SEUIL_ANTICIPATION_RESUME = 0.75
+# Nombre minimal de messages nouvellement sortis de la fenêtre pour relancer un résumé
+MESSAGES_MIN_PAR_RESUME = 4
+
+# Nom de l'annexe du journal de la conversation
+ANNEXE_RESUME = "resume"
+
+PROMPT_RESUME = """Vous résumez un entretien commercial d'assurance santé entre un conseiller
+Groupama (COMMERCIAL) et un prospect (CLIENT) pour que le client simulé garde le fil.
+
+Conservez : les informations personnelles et besoins exprimés par le client, les offres,
+garanties, niveaux et prix évoqués, les objections et les réponses apportées, les
+engagements pris et l'état d'esprit du client. Pas de commentaire ni d'évaluation.
+
+Réponse : un texte de 150 mots maximum, à la troisième personne."""
+
+
+def _get_encodage():
+    """Encodage tiktoken, chargé au premier appel (None si indisponible)"""
+    global _ENCODAGE, _ENCODAGE_CHARGE
+    if not _ENCODAGE_CHARGE:
+        _ENCODAGE_CHARGE = True
+        if tiktoken is not None:
+            try:
+                _ENCODAGE = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.warning(f"Encodage tiktoken indisponible, estimation des tokens: {e}")
+    return _ENCODAGE
+
+
+def compter_tokens(texte: str) -> int:
+    """Nombre de tokens d'un texte (tiktoken si disponible, estimation sinon)"""
+    if not texte:
+        return 0
+    encodage = _get_encodage()
+    if encodage is not None:
+        return len(encodage.encode(texte))
+    return math.ceil(len(texte) / CARACTERES_PAR_TOKEN)
+
+
+def compter_tokens_message(message: Dict[str, Any]) -> int:
+    """Tokens d'un message de l'historique (texte + surcoût de format)"""
+    return compter_tokens(message.get("text", "")) + TOKENS_PAR_MESSAGE
+
+
+def _empreinte(messages: List[Dict[str, Any]]) -> str:
+    """Empreinte du contenu d'une portion d'historique"""
+    empreinte = hashlib.sha1()
+    for message in messages:
+        empreinte.update(f"{message.get('role', '')}\x1f{message.get('text', '')}\x1e".encode("utf-8"))
+    return empreinte.hexdigest()
+
+
+def _formater_echanges(messages: List[Dict[str, Any]]) -> str:
+    """Transcription COMMERCIAL / CLIENT d'une portion d'historique"""
+    lignes = []
+    for message in messages:
+        role = "COMMERCIAL" if message.get("role") == "Vous" else "CLIENT"
+        lignes.append(f"{role} : {message.get('text', '')}")
+    return "\n".join(lignes)
+
+
+class ResumeConversation:
+    """Résumé des nb_messages premiers messages d'une conversation"""
+
+    def __init__(self, texte: str, nb_messages: int, empreinte: str, mis_a_jour_le: Optional[float] = None):
+        self.texte = texte
+        self.nb_messages = nb_messages
+        self.empreinte = empreinte
+        self.mis_a_jour_le = mis_a_jour_le if mis_a_jour_le is not None else time.time()
+
+    def descripteur(self) -> Dict[str, Any]:
+        """Forme JSON enregistrée dans le journal de la conversation"""
+        return {
+            "texte": self.texte,
+            "nb_messages": self.nb_messages,
+            "empreinte": self.empreinte,
+            "mis_a_jour_le": self.mis_a_jour_le,
+        }
+
+    @classmethod
+    def depuis_descripteur(cls, descripteur: Dict[str, Any]) -> "ResumeConversation":
+        return cls(
+            descripteur["texte"], descripteur["nb_messages"], descripteur["empreinte"],
+            descripteur.get("mis_a_jour_le"),
+        )
+
+    def couvre(self, historique: List[Dict[str, Any]]) -> bool:
+        """Vrai si le résumé porte bien sur le début de cet historique"""
+        return (
+            self.nb_messages <= len(historique)
+            and _empreinte(historique[:self.nb_messages]) == self.empreinte
+        )
+
+
+class GestionnaireFenetreConversation:
+    """
+    Budget de tokens et résumés glissants des conversations
+
+    Les résumés sont enregistrés dans le journal de la conversation
+    (identifiant de la conversation) et validés par l'empreinte des messages
+    résumés : une conversation réinitialisée n'utilise jamais le résumé de la
+    précédente. Le worker garde en plus (LRU) la dernière version qu'il
+    connaît ; appliquer ne lit que celle-ci, actualiser la met à jour depuis
+    le journal avant l'appel au modèle.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = 8000,
+        budgets_par_deploiement: Optional[Dict[str, int]] = None,
+        tours_verbatim: int = 6,
+        max_conversations: int = 1000,
+        journal: Optional[JournalConversations] = None,
+    ):
+        self.budget_tokens = budget_tokens
+        self.budgets_par_deploiement = budgets_par_deploiement or {}
+        self.tours_verbatim = tours_verbatim
+        self.max_conversations = max_conversations
+        self._journal = journal
+        self._resumes: "OrderedDict[str, ResumeConversation]" = OrderedDict()
+        self._en_cours: Dict[str, asyncio.Task] = {}
+
+    def _journal_conversations(self) -> JournalConversations:
+        return self._journal if self._journal is not None else get_journal_conversations()
+
+    async def _appeler_journal(self, methode: str, *args):
+        """Appelle une méthode du journal (hors de la boucle s'il lit des fichiers)"""
+        journal = self._journal_conversations()
+        if journal.type_journal == TYPE_MEMOIRE:
+            return getattr(journal, methode)(*args)
+        return await asyncio.to_thread(getattr(journal, methode), *args)
+
+    def _garder(self, cle_conversation: str, resume: ResumeConversation) -> None:
+        """Met à jour la version connue du worker (LRU)"""
+        self._resumes[cle_conversation] = resume
+        self._resumes.move_to_end(cle_conversation)
+        while len(self._resumes) > self.max_conversations:
+            self._resumes.popitem(last=False)
+
+    async def _lire_partage(self, cle_conversation: str) -> Optional[ResumeConversation]:
+        """Résumé enregistré dans le journal de la conversation"""
+        try:
+            descripteur = await self._appeler_journal("lire_annexe", cle_conversation, ANNEXE_RESUME)
+            return ResumeConversation.depuis_descripteur(descripteur) if descripteur else None
+        except Exception as e:
+            logger.warning(f"Résumé de conversation partagé illisible: {e}")
+            return None
+
+    def _resume_connu(self, historique: List[Dict[str, Any]], cle_conversation: str) -> Optional[ResumeConversation]:
+        """Version connue du worker, si elle porte sur le début de cet historique"""
+        resume = self._resumes.get(cle_conversation)
+        return resume if resume is not None and resume.couvre(historique) else None
+
+    async def _reprendre(self, historique: List[Dict[str, Any]], cle_conversation: str) -> Optional[ResumeConversation]:
+        """Résumé le plus avancé entre la version connue et celle du journal"""
+        resume = self._resume_connu(historique, cle_conversation)
+        partage = await self._lire_partage(cle_conversation)
+        if partage is not None and partage.couvre(historique) and (
+            resume is None or partage.nb_messages > resume.nb_messages
+        ):
+            resume = partage
+            self._garder(cle_conversation, resume)
+        return resume
+
+    def budget(self, deploiement: Optional[str] = None) -> int:
+        """Budget de tokens du prompt pour un déploiement"""
+        deploiement = deploiement or os.getenv("AZURE_OPENAI_DEPLOYMENT_n", "")
+        return self.budgets_par_deploiement.get(deploiement, self.budget_tokens)
+
+    def _debut_fenetre(self, historique: List[Dict[str, Any]]) -> int:
+        """Indice du premier message des N derniers tours (un tour = 2 messages)"""
+        return max(0, len(historique) - 2 * self.tours_verbatim)
+
+    def appliquer(
+        self,
+        historique: List[Dict[str, Any]],
+        cle_conversation: Optional[str],
+        tokens_fixes: int = 0,
+        deploiement: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Sélectionne la partie de l'historique envoyée au modèle
+
+        Args:
+            historique: Historique complet de la conversation
+            cle_conversation: Identifiant de la conversation (None : pas de résumé)
+            tokens_fixes: Tokens hors historique (prompt système, dernier message)
+            deploiement: Déploiement appelé (budget spécifique)
+
+        Returns:
+            tuple: (messages envoyés mot pour mot, texte du résumé ou None)
+        """
+        if not historique or cle_conversation is None:
+            return historique, None
+
+        disponible = self.budget(deploiement) - tokens_fixes
+        if sum(compter_tokens_message(message) for message in historique) <= disponible:
+            return historique, None
+
+        resume = self._resume_connu(historique, cle_conversation)
+        if resume is None or resume.nb_messages == 0:
+            return historique, None
+
+        # Les messages sortis de la fenêtre mais pas encore résumés restent envoyés
+        debut = min(resume.nb_messages, self._debut_fenetre(historique))
+        self._resumes.move_to_end(cle_conversation)
+        logger.debug(
+            f"Fenêtre de conversation : {len(historique) - debut}/{len(historique)} messages "
+            f"+ résumé de {resume.nb_messages} messages"
+        )
+        return historique[debut:], resume.texte
+
+    async def actualiser(
+        self,
+        historique: List[Dict[str, Any]],
+        cle_conversation: Optional[str],
+        tokens_fixes: int = 0,
+        deploiement: Optional[str] = None,
+    ) -> None:
+        """
+        Reprend le résumé du journal de la conversation avant appliquer
+
+        Sans effet tant que l'historique tient dans le budget (aucune lecture).
+        """
+        if not historique or cle_conversation is None:
+            return
+        disponible = self.budget(deploiement) - tokens_fixes
+        if sum(compter_tokens_message(message) for message in historique) > disponible:
+            await self._reprendre(historique, cle_conversation)
+
+    def planifier_resume(
+        self,
+        historique: List[Dict[str, Any]],
+        cle_conversation: Optional[str],
+        client,
+        tokens_fixes: int = 0,
+        deploiement: Optional[str] = None,
+    ) -> Optional[asyncio.Task]:
+        """
+        Lance en tâche de fond la mise à jour du résumé si nécessaire
+
+        Le résumé n'est préparé que lorsque l'historique approche du budget,
+        par lots d'au moins MESSAGES_MIN_PAR_RESUME messages.
+
+        Returns:
+            asyncio.Task: Tâche lancée, None si aucun résumé n'est nécessaire
+        """
+        if cle_conversation is None or client is None or cle_conversation in self._en_cours:
+            return None
+
+        seuil = (self.budget(deploiement) - tokens_fixes) * SEUIL_ANTICIPATION_RESUME
+        if sum(compter_tokens_message(message) for message in historique) < seuil:
+            return None
+
+        fin = self._debut_fenetre(historique)
+        resume = self._resume_connu(historique, cle_conversation)
+        deja_resumes = resume.nb_messages if resume else 0
+        if fin - deja_resumes < MESSAGES_MIN_PAR_RESUME:
+            return None
+
+        tache = asyncio.create_task(
+            self._resumer(cle_conversation, list(historique[:fin]), resume, client)
+        )
+        self._en_cours[cle_conversation] = tache
+        tache.add_done_callback(lambda _: self._en_cours.pop(cle_conversation, None))
+        return tache
+
+    async def _resumer(
+        self,
+        cle_conversation: str,
+        messages: List[Dict[str, Any]],
+        precedent: Optional[ResumeConversation],
+        client,
+    ) -> None:
+        """Intègre les nouveaux messages au résumé précédent (un appel LLM)"""
+        # Un autre worker a pu compléter le résumé entre-temps
+        partage = await self._reprendre(messages, cle_conversation)
+        if partage is not None and partage.nb_messages > (precedent.nb_messages if precedent else 0):
+            precedent = partage
+            if len(messages) - precedent.nb_messages < MESSAGES_MIN_PAR_RESUME:
+                return
+
+        debut = precedent.nb_messages if precedent else 0
+        contenu = (
+            f"RÉSUMÉ PRÉCÉDENT :\n{precedent.texte if precedent else '(aucun)'}\n\n"
+            f"NOUVEAUX ÉCHANGES :\n{_formater_echanges(messages[debut:])}"
+        )
+
+        try:
+            response = await appel_llm_async(
+                client,
+                ROLE_RESUME,
+                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_n"),
+                messages=[
+                    {"role": "system", "content": PROMPT_RESUME},
+                    {"role": "user", "content": contenu},
+                ],
+                temperature=0.0,
+                max_tokens=400,
+                timeout=60,
+            )
+            texte = response.choices[0].message.content.strip()
+        except Exception as e:
+            logger.warning(f"Résumé de conversation non mis à jour: {e}")
+            return
+
+        resume = ResumeConversation(texte, len(messages), _empreinte(messages))
+        self._garder(cle_conversation, resume)
+        try:
+            await self._appeler_journal("ecrire_annexe", cle_conversation, ANNEXE_RESUME, resume.descripteur())
+        except Exception as e:
+            logger.warning(f"Résumé non enregistré dans le journal de la conversation: {e}")
+        logger.info(f"Résumé de conversation mis à jour ({len(messages)} messages résumés)")
+
+    async def arreter(self) -> None:
+        """Annule les résumés en cours (arrêt de l'application)"""
+        taches = list(self._en_cours.values())
+        for tache in taches:
+            tache.cancel()
+        if taches:
+            await asyncio.gather(*taches, return_exceptions=True)
+
+
+def parser_budgets_par_deploiement(valeur: str) -> Dict[str, int]:
+    """
+    Lit la configuration "deploiement=budget,deploiement=budget"
+
+    Returns:
+        dict: Budget de tokens par nom de déploiement
+    """
+    budgets = {}
+    for element in (valeur or "").split(","):
+        if "=" not in element:
+            continue
+        deploiement, budget = element.split("=", 1)
+        try:
+            budgets[deploiement.strip()] = int(budget)
+        except ValueError:
+            logger.warning(f"Budget de tokens invalide ignoré: {element}")
+    return budgets
+
+
+# Instance globale
+_gestionnaire_fenetre: Optional[GestionnaireFenetreConversation] = None
+
+
+def init_fenetre_conversation(
+    budget_tokens: int = 8000,
+    budgets_par_deploiement: Optional[Dict[str, int]] = None,
+    tours_verbatim: int = 6,
+) -> GestionnaireFenetreConversation:
+    """Initialise la fenêtre de conversation (appelé dans le lifespan de l'application)"""
+    global _gestionnaire_fenetre
+    _get_encodage()
+    if _gestionnaire_fenetre is None:
+        _gestionnaire_fenetre = GestionnaireFenetreConversation(
+            budget_tokens=budget_tokens,
+            budgets_par_deploiement=budgets_par_deploiement,
+            tours_verbatim=tours_verbatim,
+        )
+    return _gestionnaire_fenetre
+
+
+def get_fenetre_conversation() -> GestionnaireFenetreConversation:
+    """Retourne le gestionnaire de fenêtre de conversation (créé à la demande)"""
+    if _gestionnaire_fenetre is None:
+        return init_fenetre_conversation()
+    return _gestionnaire_fenetre
+
+
+async def shutdown_fenetre_conversation() -> None:
+    """Annule les résumés en cours et libère le gestionnaire"""
+    global _gestionnaire_fenetre
+    if _gestionnaire_fenetre is not None:
+        await _gestionnaire_fenetre.arreter()
+        _gestionnaire_fenetre = None
@@ -27,6 +27,13 @@ from datetime import datetime, timedelta
 import logging
 import csv
 from core.profil_manager import ProfilManager
+from core.documents_reference import FICHIERS_REFERENCE
+from core.registre_corpus import get_documents_reference
+from core.index_documentaire import get_index_documentaire
+from core.comptabilite_tokens import comptabiliser_prompt, compter_tokens_section, retirer
+from core.fenetre_conversation import compter_tokens, get_fenetre_conversation
+from core.resilience_llm import appel_llm, appel_llm_async
+from core.routeur_deploiements import ROLE_CLIENT, ROLE_COMMERCIAL, ROLE_FAQ
 
 
 # Configure logging
@@ -87,15 +94,16 @@ def historique_remap_roles(conversation_list):
     return historique_conv, formatted_history
 
 
-def construire_messages_openai(conversation_history, user_message, profil_prompt, prompt_consigne):
+def construire_messages_openai(conversation_history, user_message, profil_prompt, prompt_consigne, resume_conversation=None):
     """
     Construit la liste des messages pour l'appel OpenAI en format conversation
     
     Args:
-        conversation_history (list): Historique de la conversation
+        conversation_history (list): Historique de la conversation (fenêtre envoyée mot pour mot)
         user_message (str): Dernier message du commercial
         profil_prompt (str): Prompt du profil client
         prompt_consigne (str): Consignes pour le comportement du client
+        resume_conversation (str): Résumé des échanges antérieurs à la fenêtre
         
     Returns:
         list: Liste des messages formatés pour OpenAI
@@ -109,6 +117,13 @@ def construire_messages_openai(conversation_history, user_message, profil_prompt
             "content": profil_prompt + '\n\n' + prompt_consigne
         }
     ]
+
+    # Résumé des premiers échanges (après le prompt système, qui reste identique d'un tour à l'autre)
+    if resume_conversation:
+        messages.append({
+            "role": "system",
+            "content": f"RÉSUMÉ DES ÉCHANGES PRÉCÉDENTS :\n{resume_conversation}"
+        })
     
     # Traitement de l'historique
     if conversation_history:
@@ -147,22 +162,30 @@ def construire_messages_openai(conversation_history, user_message, profil_prompt
             "content": content
         })
     
+    # Tokens par section : système, résumé, historique, dernier message
+    debut_historique = 2 if resume_conversation else 1
+    fin_historique = len(messages) - 1 if user_message else len(messages)
+    comptabiliser_prompt(
+        "client",
+        {
+            "profil": profil_prompt,
+            "consignes": prompt_consigne,
+            "resume": messages[1]["content"] if resume_conversation else None,
+            "historique": sum(
+                compter_tokens_section(message["content"])
+                for message in messages[debut_historique:fin_historique]
+            ),
+            "message": messages[-1]["content"] if user_message else None,
+        },
+        messages=len(messages),
+    )
+
     logger.info(f"Messages construits : {len(messages)} messages total")
     return messages
 
-def get_next_bot_message(user_message, openai_client, conversation_history: list=None , profil_manager=None):
-    """Obtient le prochain message du bot."""
-    logger.info(f"Traitement du message utilisateur")
 
-    if not openai_client:
-        logger.error("Client OpenAI requis")
-        return {'reply': "LA DEMANDE nécessite un client OpenAI configuré.", 'synthese': None, 'end': False}
-
-    # Récupérer le prompt du ProfilManager si disponible
-    profil_prompt = profil_manager.prompt if (profil_manager and profil_manager.prompt) else ""
-    logger.info("Génération de la réponse via OpenAI")
-
-    prompt_consigne = """
+# Consignes de comportement du client simulé (identiques à chaque tour)
+PROMPT_CONSIGNE_CLIENT = """
         RÈGLES DE CONDUITE — VOUS ÊTES LE CLIENT :
 
         1. Jouez le rôle du prospect/client dans une agence d'assurance santé. libre à vous de vous exprimer comme vous voulez.
@@ -212,16 +235,101 @@ def get_next_bot_message(user_message, openai_client, conversation_history: list
         - Laissez le conseiller mener la discussion et poser les questions. Vous ne proposez jamais de solutions commerciales.
         """
 
+# Réplique renvoyée quand l'appel au modèle échoue (filtrée lors de la synthèse)
+MESSAGE_ERREUR_TECHNIQUE_BOT = "Je suis désolé, mais je rencontre des difficultés techniques. Pouvez-vous reformuler ou essayer plus tard?"
+
+
+def _tokens_fixes_bot(user_message, profil_manager):
+    """Tokens du prompt du client simulé hors historique (profil, consignes, dernier message)"""
+    profil_prompt = profil_manager.prompt if (profil_manager and profil_manager.prompt) else ""
+    return compter_tokens(profil_prompt) + compter_tokens(PROMPT_CONSIGNE_CLIENT) + compter_tokens(user_message)
+
+
+def _preparer_messages_bot(user_message, conversation_history, profil_manager, cle_conversation=None):
+    """
+    Construit les messages OpenAI pour la prochaine réplique du client simulé
+
+    Args:
+        user_message (str): Dernier message du commercial
+        conversation_history (list): Historique de la conversation
+        profil_manager: Manager du profil client
+        cle_conversation (str): Identifiant de la conversation pour la fenêtre
+            bornée en tokens (None : historique complet)
+
+    Returns:
+        list: Liste des messages formatés pour OpenAI
+    """
+    # Récupérer le prompt du ProfilManager si disponible
+    profil_prompt = profil_manager.prompt if (profil_manager and profil_manager.prompt) else ""
+
+    # Derniers tours mot pour mot + résumé des précédents si le budget est dépassé
+    historique, resume = get_fenetre_conversation().appliquer(
+        conversation_history or [],
+        cle_conversation,
+        _tokens_fixes_bot(user_message, profil_manager),
+    )
+
+    return construire_messages_openai(
+        historique,
+        user_message,
+        profil_prompt,
+        PROMPT_CONSIGNE_CLIENT,
+        resume_conversation=resume
+    )
+
+
+async def _actualiser_fenetre_bot(user_message, conversation_history, profil_manager, cle_conversation=None):
+    """Reprend le résumé glissant partagé (journal de la conversation) avant de construire les messages"""
+    await get_fenetre_conversation().actualiser(
+        conversation_history or [],
+        cle_conversation,
+        _tokens_fixes_bot(user_message, profil_manager),
+    )
+
+
+def planifier_resume_conversation(conversation_history, openai_client, profil_manager=None, cle_conversation=None):
+    """
+    Met à jour en tâche de fond le résumé glissant de la conversation
+
+    À appeler une fois la réplique du client envoyée : l'appel de résumé
+    n'allonge jamais le temps de réponse.
+    """
+    return get_fenetre_conversation().planifier_resume(
+        conversation_history or [],
+        cle_conversation,
+        openai_client,
+        _tokens_fixes_bot("", profil_manager),
+    )
+
+
+def _parametres_appel_bot(messages):
+    """Paramètres de l'appel chat.completions pour le client simulé"""
+    return {
+        "model": os.getenv("AZURE_OPENAI_DEPLOYMENT_n"),
+        "messages": messages,
+        "temperature": 0.6,
+        "top_p": 1,
+        "presence_penalty": 0.5,
+        "frequency_penalty": 0.2,
+        "max_tokens": 300,
+    }
+
+
+def get_next_bot_message(user_message, openai_client, conversation_history: list=None , profil_manager=None):
+    """Obtient le prochain message du bot."""
+    logger.info(f"Traitement du message utilisateur")
+
+    if not openai_client:
+        logger.error("Client OpenAI requis")
+        return {'reply': "LA DEMANDE nécessite un client OpenAI configuré.", 'synthese': None, 'end': False}
+
+    logger.info("Génération de la réponse via OpenAI")
+
     try:
         logger.info("Envoi de la requête à OpenAI")
 
         # Construire les messages avec la nouvelle fonction
-        messages = construire_messages_openai(
-            conversation_history, 
-            user_message, 
-            profil_prompt, 
-            prompt_consigne
-        )
+        messages = _preparer_messages_bot(user_message, conversation_history, profil_manager)
 
         # Debug : afficher la structure des messages
         print("\n=== MESSAGES CONSTRUITS POUR OPENAI ===")
@@ -234,15 +342,7 @@ def get_next_bot_message(user_message, openai_client, conversation_history: list
         print(messages)
         print("xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx")
 
-        response = openai_client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_n"),
-            messages=messages,
-            temperature=0.6,
-            top_p=1,
-            presence_penalty=0.5,
-            frequency_penalty=0.2,
-            max_tokens=300
-        )
+        response = appel_llm(openai_client, ROLE_CLIENT, **_parametres_appel_bot(messages))
         # response = openai_client.chat.completions.create(
         #     model=os.getenv("AZURE_OPENAI_DEPLOYMENT_n"),
         #     messages=messages,
@@ -257,7 +357,72 @@ def get_next_bot_message(user_message, openai_client, conversation_history: list
         
     except Exception as e:
         logger.error(f"Erreur lors de la génération IA: {str(e)}")
-        return {'reply': f"Je suis désolé, mais je rencontre des difficultés techniques. Pouvez-vous reformuler ou essayer plus tard?", 'end': False}
+        return {'reply': MESSAGE_ERREUR_TECHNIQUE_BOT, 'end': False}
+
+
+async def get_next_bot_message_async(user_message, openai_client, conversation_history: list=None, profil_manager=None, cle_conversation=None):
+    """
+    Variante asynchrone de get_next_bot_message (client AsyncAzureOpenAI)
+
+    N'occupe pas la boucle d'événements pendant l'appel au modèle.
+
+    Returns:
+        dict: {'reply': str, 'end': bool}
+    """
+    logger.info("Traitement du message utilisateur (async)")
+
+    if not openai_client:
+        logger.error("Client OpenAI requis")
+        return {'reply': "LA DEMANDE nécessite un client OpenAI configuré.", 'synthese': None, 'end': False}
+
+    try:
+        await _actualiser_fenetre_bot(user_message, conversation_history, profil_manager, cle_conversation)
+        messages = _preparer_messages_bot(user_message, conversation_history, profil_manager, cle_conversation)
+        logger.debug(f"{len(messages)} messages envoyés à OpenAI")
+
+        response = await appel_llm_async(openai_client, ROLE_CLIENT, **_parametres_appel_bot(messages))
+
+        reply = response.choices[0].message.content.strip()
+        logger.info("Réponse OpenAI reçue")
+
+        return {'reply': reply, 'end': False}
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération IA: {str(e)}")
+        return {'reply': MESSAGE_ERREUR_TECHNIQUE_BOT, 'end': False}
+
+
+async def stream_next_bot_message_async(user_message, openai_client, conversation_history: list=None, profil_manager=None, cle_conversation=None):
+    """
+    Génère la prochaine réplique du client simulé token par token
+
+    Générateur asynchrone : produit les fragments de texte au fur et à mesure
+    de leur réception. Les erreurs d'appel sont propagées à l'appelant.
+
+    Yields:
+        str: Fragment de la réponse
+    """
+    if not openai_client:
+        raise ValueError("Client OpenAI requis")
+
+    await _actualiser_fenetre_bot(user_message, conversation_history, profil_manager, cle_conversation)
+    messages = _preparer_messages_bot(user_message, conversation_history, profil_manager, cle_conversation)
+    logger.info(f"Streaming de la réponse OpenAI ({len(messages)} messages)")
+
+    stream = await appel_llm_async(
+        openai_client,
+        ROLE_CLIENT,
+        **_parametres_appel_bot(messages),
+        stream=True
+    )
+
+    async for chunk in stream:
+        # Azure envoie d'abord un chunk sans choices (résultats du filtre de contenu)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
 
 
 
@@ -462,6 +627,42 @@ def save_profil_manager_to_session(profil_manager, session_data: Dict[str, Any])
             'prompt': profil_manager.prompt
         }
 
+def charger_profil_manager_session(session_data: Dict[str, Any]) -> ProfilManager:
+    """
+    Reconstruit le ProfilManager de la session à partir de son descripteur
+
+    Args:
+        session_data: Dictionnaire de session FastAPI
+
+    Returns:
+        ProfilManager: Profil de la session, nouveau profil aléatoire si la
+                       session n'en a pas (ou un descripteur périmé)
+    """
+    descripteur = session_data.get('profil_manager')
+    if descripteur is not None:
+        try:
+            return ProfilManager.depuis_descripteur(descripteur)
+        except ValueError as e:
+            logger.warning(f"Profil de session non restauré: {e}")
+    return ProfilManager()
+
+
+def enregistrer_profil_manager_session(profil_manager: ProfilManager, session_data: Dict[str, Any]) -> None:
+    """
+    Garde en session le descripteur compact du ProfilManager (indices dans le jeu de personnages)
+
+    Args:
+        profil_manager: Profil à enregistrer
+        session_data: Dictionnaire de session FastAPI
+    """
+    session_data.pop('profil_manager_pickle', None)
+    descripteur = profil_manager.descripteur()
+    if descripteur is None:
+        logger.warning("Profil hors du jeu de personnages, non enregistré en session")
+        return
+    session_data['profil_manager'] = descripteur
+
+
 def init_session_profile(default_profil, session_data: Dict[str, Any]):
     """Initialise le profil de session pour l'utilisateur
 
@@ -510,44 +711,20 @@ def save_user_rating_to_file(note_data):
         logger.error(f"Erreur lors de la sauvegarde de la note utilisateur: {str(e)}")
 
 
-def charger_documents_reference():
+def charger_documents_reference(version_corpus=None):
     """
-    Charge tous les documents de référence nécessaires pour l'évaluation
-    
+    Retourne tous les documents de référence nécessaires pour l'évaluation
+
+    Les documents sont lus une seule fois par le magasin partagé
+    (core.documents_reference), puis rechargés uniquement s'ils changent.
+
+    Args:
+        version_corpus (str, optional): Version du corpus (version par défaut si None)
+
     Returns:
         dict: Dictionnaire contenant tous les documents chargés
     """
-    documents = {}
-    
-    # Mapping des fichiers selon le tableau fourni
-    fichiers_reference = {
-        "description_offre": "data/txt/description_offre.txt",
-        "tmgf": "data/txt/tmgf1.txt", 
-        "exemples_remboursements": "data/txt/exemples_remboursements.txt",
-        "methodes_commerciales_recommendees": "data/txt/methodes_commerciales_recommendees.txt",
-        "traitement_objections": "data/txt/traitement_objections.txt",
-        "cg_vocabulaire": "data/txt/CG_GSA3_1_Vocabulaire_Facilite_lecture.txt",
-        "cg_garanties": "data/txt/CG_GSA3_2_Garanties.txt",
-        "cg_garanties_assistance": "data/txt/CG_GSA3_3_Garanties_assistance.txt",
-        "cg_contrat": "data/txt/CG_GSA3_4_contrat.txt",
-        "infos_commerciales": "data/txt/HEKA_Formation conseillers_Guide animateur_synthese_complete.txt",
-        "charte_relation_client": "data/txt/Charte_relation_client.txt"
-    }
-    
-    for variable, chemin_fichier in fichiers_reference.items():
-        try:
-            with open(chemin_fichier, 'r', encoding='utf-8') as f:
-                documents[variable] = f.read()
-            logger.info(f"Document chargé: {variable}")
-        except FileNotFoundError:
-            logger.warning(f"Fichier non trouvé: {chemin_fichier}")
-            documents[variable] = ""
-        except Exception as e:
-            logger.error(f"Erreur lors du chargement de {chemin_fichier}: {e}")
-            documents[variable] = ""
-    
-    return documents
-
+    return get_documents_reference(version_corpus).contenus(FICHIERS_REFERENCE)
 
 
 def generate_blob_url_with_sas(blob_name, container_name, expiry_hours=24):
@@ -745,6 +922,13 @@ def commercial_groupama_humain(historique_conversation, message_client, openai_c
         contexte=contexte_historique if contexte_historique else "SUITE DE CONVERSATION"
 
         # Construction du prompt système spécialisé pour les réponses suivantes
+        documentation = f"""📋 OFFRE GSA3: {documents_reference.get('description_offre', '')}
+            📊 GARANTIES: {documents_reference.get('tmgf', '')}
+            💰 EXEMPLES: {documents_reference.get('exemples_remboursements', '')}
+            🎯 MÉTHODES COMMERCIALES: {documents_reference.get('methodes_commerciales_recommendees', '')}
+            🛡️ OBJECTIONS: {documents_reference.get('traitement_objections', '')}
+            charte_relation_client: {documents_reference.get('charte_relation_client', '')}"""
+
         prompt_systeme = f"""
             RÔLE : Vous êtes un COMMERCIAL GROUPAMA expert en assurance santé GSA3, chaleureux et professionnel.
 
@@ -758,12 +942,7 @@ def commercial_groupama_humain(historique_conversation, message_client, openai_c
             • Persuasif sans être insistant
 
             === DOCUMENTATION GROUPAMA (à utiliser avec subtilité) ===
-            📋 OFFRE GSA3: {documents_reference.get('description_offre', '')}
-            📊 GARANTIES: {documents_reference.get('tmgf', '')}
-            💰 EXEMPLES: {documents_reference.get('exemples_remboursements', '')}
-            🎯 MÉTHODES COMMERCIALES: {documents_reference.get('methodes_commerciales_recommendees', '')}
-            🛡️ OBJECTIONS: {documents_reference.get('traitement_objections', '')}
-            charte_relation_client: {documents_reference.get('charte_relation_client', '')}
+            {documentation}
            
                         === CONTEXTE CONVERSATION ===
                         
@@ -782,6 +961,15 @@ def commercial_groupama_humain(historique_conversation, message_client, openai_c
 
             RÉPONDEZ UNIQUEMENT avec la phrase commerciale, rien d'autre.
             """
+        comptabiliser_prompt(
+            "commercial",
+            {
+                "instructions": retirer(prompt_systeme, documentation, contexte, message_client),
+                "documentation": documentation,
+                "historique": contexte,
+                "message": message_client,
+            },
+        )
         print("\n\n\n\n")
         print("contexte" , contexte)
         print("message_client", message_client)
@@ -790,7 +978,9 @@ def commercial_groupama_humain(historique_conversation, message_client, openai_c
         random_seed = random.randint(1, 100000)
         
         # Appel à l'API OpenAI GPT-4o pour la meilleure qualité humaine
-        response = openai_client.chat.completions.create(
+        response = appel_llm(
+            openai_client,
+            ROLE_COMMERCIAL,
             model=os.getenv("AZURE_OPENAI_DEPLOYMENT_4o"),
             messages=[
                 {"role": "system", "content": prompt_systeme}
@@ -2348,9 +2538,16 @@ def calcule_statistiques_conv(conversation_history):
 ############### Debut section FAQ ######################
 ########################################################
 
+# Messages renvoyés au conseiller quand l'expert FAQ ne peut pas répondre
+MESSAGE_INDISPONIBLE_FAQ = "Je ne peux pas traiter votre question actuellement. Veuillez réessayer plus tard."
+MESSAGE_ERREUR_FAQ = "Je rencontre des difficultés techniques pour traiter votre question. Pouvez-vous la reformuler ou réessayer dans quelques instants ?"
+
+# Nombre d'extraits de la documentation injectés dans le prompt FAQ
+FAQ_NB_EXTRAITS = 6
+
 # Add this method to the QuestionManager class
 
-def generate_expert_response(user_question, openai_client, histo, documents_reference):
+def generate_expert_response(user_question, openai_client, histo, extraits):
     """
     Génère une réponse d'expert basée sur la documentation Groupama
     pour le système FAQ
@@ -2359,7 +2556,7 @@ def generate_expert_response(user_question, openai_client, histo, documents_refe
         user_question (str): Question posée par l'utilisateur
         openai_client: Client OpenAI configuré
         histo: Historique de la conversation FAQ
-        documents_reference: Documents de référence chargés
+        extraits: Extraits de documentation sélectionnés (selectionner_extraits_faq)
         
     Returns:
         str: Réponse d'expert basée on la documentation
@@ -2368,22 +2565,17 @@ def generate_expert_response(user_question, openai_client, histo, documents_refe
     
     if not openai_client:
         logger.error("Client OpenAI requis pour la génération de réponse FAQ")
-        return "Je ne peux pas traiter votre question actuellement. Veuillez réessayer plus tard."
+        return MESSAGE_INDISPONIBLE_FAQ
 
     try:
         # Construire le prompt d'expert
-        expert_prompt, prompt_question = _construire_prompt_expert_faq(documents_reference, user_question, histo)
+        expert_prompt, prompt_question = _construire_prompt_expert_faq(extraits, user_question, histo)
         
         # Appeler l'API OpenAI
-        response = openai_client.chat.completions.create(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_m"),
-            messages=[
-                {"role": "system", "content": expert_prompt},
-                {"role": "user", "content": prompt_question}
-            ],
-            temperature=0.0,  # Température basse pour des réponses plus précises
-            max_tokens=1500,
-            timeout=60
+        response = appel_llm(
+            openai_client,
+            ROLE_FAQ,
+            **_parametres_appel_expert(expert_prompt, prompt_question)
         )
 
         expert_response = response.choices[0].message.content.strip()
@@ -2398,12 +2590,124 @@ def generate_expert_response(user_question, openai_client, histo, documents_refe
         
     except Exception as e:
         logger.error(f"Erreur lors de la génération de réponse d'expert: {str(e)}")
-        return "Je rencontre des difficultés techniques pour traiter votre question. Pouvez-vous la reformuler ou réessayer dans quelques instants ?"
+        return MESSAGE_ERREUR_FAQ
 
-def _construire_prompt_expert_faq(documents_reference, user_question , histo):
+async def generate_expert_response_async(user_question, openai_client, histo, extraits):
     """
-    Construit le prompt pour le système FAQ basé sur la documentation
+    Variante asynchrone de generate_expert_response (client AsyncAzureOpenAI)
+
+    Returns:
+        str: Réponse d'expert basée sur la documentation
     """
+    logger.info("Génération d'une réponse d'expert pour FAQ (async)")
+
+    if not openai_client:
+        logger.error("Client OpenAI requis pour la génération de réponse FAQ")
+        return MESSAGE_INDISPONIBLE_FAQ
+
+    try:
+        expert_prompt, prompt_question = _construire_prompt_expert_faq(extraits, user_question, histo)
+
+        response = await appel_llm_async(
+            openai_client,
+            ROLE_FAQ,
+            **_parametres_appel_expert(expert_prompt, prompt_question)
+        )
+
+        expert_response = response.choices[0].message.content.strip()
+        logger.info("Réponse d'expert générée avec succès")
+
+        return expert_response
+
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération de réponse d'expert: {str(e)}")
+        return MESSAGE_ERREUR_FAQ
+
+
+async def stream_expert_response_async(user_question, openai_client, histo, extraits):
+    """
+    Génère la réponse d'expert FAQ en streaming (markdown partiel)
+
+    Générateur asynchrone : produit les fragments de la réponse au fur et à
+    mesure de leur réception. Les erreurs d'appel sont propagées à l'appelant.
+
+    Yields:
+        str: Fragment de la réponse
+    """
+    if not openai_client:
+        raise ValueError("Client OpenAI requis pour la génération de réponse FAQ")
+
+    expert_prompt, prompt_question = _construire_prompt_expert_faq(extraits, user_question, histo)
+    logger.info("Streaming d'une réponse d'expert pour FAQ")
+
+    stream = await appel_llm_async(
+        openai_client,
+        ROLE_FAQ,
+        **_parametres_appel_expert(expert_prompt, prompt_question),
+        stream=True
+    )
+
+    async for chunk in stream:
+        # Azure envoie d'abord un chunk sans choices (résultats du filtre de contenu)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+def _parametres_appel_expert(expert_prompt, prompt_question):
+    """Paramètres de l'appel chat.completions pour l'expert FAQ"""
+    return {
+        "model": os.getenv("AZURE_OPENAI_DEPLOYMENT_m"),
+        "messages": [
+            {"role": "system", "content": expert_prompt},
+            {"role": "user", "content": prompt_question}
+        ],
+        "temperature": 0.0,  # Température basse pour des réponses plus précises
+        "max_tokens": 1500,
+        "timeout": 60,
+    }
+
+
+def selectionner_extraits_faq(user_question, histo=None, k=FAQ_NB_EXTRAITS, version_corpus=None):
+    """
+    Sélectionne les extraits de la documentation pertinents pour une question FAQ
+
+    La question précédente est ajoutée à la requête pour les questions de
+    relance ("et pour le niveau 3 ?").
+
+    Args:
+        user_question (str): Question posée par l'utilisateur
+        histo: Historique de la conversation FAQ
+        k (int): Nombre d'extraits
+        version_corpus (str, optional): Version du corpus de la session
+
+    Returns:
+        list: Extraits (core.index_documentaire.Extrait) par pertinence décroissante
+    """
+    requete = user_question
+    if histo:
+        requete = f"{user_question} {histo[-1].get('question', '')}"
+
+    index = get_index_documentaire(version_corpus)
+    extraits = [extrait for extrait, _ in index.rechercher(requete, k)]
+    logger.info(f"{len(extraits)} extraits sélectionnés pour la FAQ (corpus {index.version})")
+    return extraits
+
+
+def _construire_prompt_expert_faq(extraits, user_question , histo):
+    """
+    Construit le prompt pour le système FAQ basé sur les extraits de documentation
+    """
+    if extraits:
+        documentation = "\n\n".join(
+            f"[{numero}] Source : {extrait.source}\n{extrait.texte}"
+            for numero, extrait in enumerate(extraits, 1)
+        )
+    else:
+        documentation = "Aucun extrait de la documentation ne correspond à cette question."
+
     prompt = f"""
     RÔLE : Vous êtes un expert en assurance santé Groupama, spécialisé dans l'offre GSA3.
     
@@ -2418,41 +2722,11 @@ def _construire_prompt_expert_faq(documents_reference, user_question , histo):
     5. Mettez en gras les termes techniques importants avec **
     6. Structurez votre réponse de manière logique et progressive
     7. Utilisez un langage professionnel mais accessible
+    8. Citez les extraits utilisés par leur numéro entre crochets, par exemple [2]
     
-    DOCUMENTATION DE RÉFÉRENCE :
-    
-    📋 DESCRIPTION DE L'OFFRE GSA3 :
-    {documents_reference.get('description_offre', 'Non disponible')}
-    
-    💰 TARIFS ET CONDITIONS (TMGF) :
-    {documents_reference.get('tmgf', 'Non disponible')}
-    
-    💡 EXEMPLES DE REMBOURSEMENTS :
-    {documents_reference.get('exemples_remboursements', 'Non disponible')}
+    DOCUMENTATION DE RÉFÉRENCE (extraits les plus pertinents pour la question) :
     
-    🎯 MÉTHODES COMMERCIALES :
-    {documents_reference.get('methodes_commerciales_recommendees', 'Non disponible')}
-    
-    🔧 TRAITEMENT DES OBJECTIONS :
-    {documents_reference.get('traitement_objections', 'Non disponible')}
-    
-    📖 CONDITIONS GÉNÉRALES - VOCABULAIRE :
-    {documents_reference.get('cg_vocabulaire', 'Non disponible')}
-    
-    🛡️ CONDITIONS GÉNÉRALES - GARANTIES :
-    {documents_reference.get('cg_garanties', 'Non disponible')}
-    
-    🆘 CONDITIONS GÉNÉRALES - GARANTIES ASSISTANCE :
-    {documents_reference.get('cg_garanties_assistance', 'Non disponible')}
-    
-    📄 CONDITIONS GÉNÉRALES - CONTRAT :
-    {documents_reference.get('cg_contrat', 'Non disponible')}
-    
-    🎓 INFORMATIONS COMMERCIALES :
-    {documents_reference.get('infos_commerciales', 'Non disponible')}
-    
-    👥 CHARTE RELATION CLIENT :
-    {documents_reference.get('charte_relation_client', 'Non disponible')}
+{documentation}
     """
     prompt_question = f"""
     QUESTION DU CONSEILLER : {user_question}
@@ -2471,7 +2745,19 @@ def _construire_prompt_expert_faq(documents_reference, user_question , histo):
     
     RÉPONSE CONCISE ET STRUCTURÉE :
     """
-    
+
+    historique_texte = str(histo)
+    comptabiliser_prompt(
+        "faq",
+        {
+            "instructions": retirer(prompt, documentation) + retirer(prompt_question, user_question, historique_texte),
+            "documentation": documentation,
+            "historique": historique_texte,
+            "question": user_question,
+        },
+        extraits=len(extraits or []),
+    )
+
     return prompt , prompt_question
 
 
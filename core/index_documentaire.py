@@ -0,0 +1,366 @@
+"""
+Index de recherche lexicale (BM25) sur les documents de référence
+
+Les documents sont découpés par section ; chaque extrait conserve sa source
+(document, fichier, titre de section). La FAQ n'injecte dans le prompt que
+les extraits les plus pertinents pour la question au lieu du corpus complet.
+
+L'analyse du texte est adaptée au français : suppression des accents,
+mots vides et racinisation légère (pluriels et suffixes courants).
+L'index est construit une fois par version du corpus et partagé entre
+les requêtes.
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .registre_corpus import get_registre_corpus
+
+logger = logging.getLogger(__name__)
+
+# Paramètres BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Taille des extraits (caractères)
+TAILLE_MIN_EXTRAIT = 200
+TAILLE_MAX_EXTRAIT = 1500
+
+# Libellés des documents pour l'attribution des sources
+LIBELLES_DOCUMENTS = {
+    "description_offre": "Description de l'offre GSA3",
+    "tmgf": "Tarifs et conditions (TMGF)",
+    "exemples_remboursements": "Exemples de remboursements",
+    "methodes_commerciales_recommendees": "Méthodes commerciales",
+    "traitement_objections": "Traitement des objections",
+    "cg_vocabulaire": "Conditions générales - Vocabulaire",
+    "cg_garanties": "Conditions générales - Garanties",
+    "cg_garanties_assistance": "Conditions générales - Garanties assistance",
+    "cg_contrat": "Conditions générales - Contrat",
+    "infos_commerciales": "Informations commerciales",
+    "charte_relation_client": "Charte relation client",
+}
+
+MOTS_VIDES = set("""
+a ai aie aient aies ait alors as au aucun aucune aupres auquel aura aurai auraient aurais aurait
+auras aurez auriez aurions aurons auront aussi autre autres aux auxquelles auxquels avaient avais
+avait avant avec avez aviez avions avoir avons ayant ayez ayons c ca ce ceci cela celle celles
+celui cependant certain certaine certaines certains ces cet cette ceux chaque chez ci comme comment
+d dans de des donc dont du elle elles en encore entre es est et etaient etais etait etant ete
+etes etiez etions etre eu eue eues eurent eus eusse eussent eusses eussiez eussions eut eux
+faire fait fais faut ici il ils j je jusqu l la laquelle le lequel les lesquelles lesquels leur
+leurs lui m ma mais me meme memes mes moi mon n ne ni nos notre nous on ont ou par parce pas
+peu peut plus pour pourquoi qu quand que quel quelle quelles quels qui quoi s sa sans se sera
+serai seraient serais serait seras serez seriez serions serons seront ses si son sont sous soyez
+soyons suis sur t ta te tes toi ton tous tout toute toutes tres tu un une unes uns vers voici
+voila vos votre vous y
+""".split())
+
+# Suffixes retirés par la racinisation (du plus long au plus court)
+_SUFFIXES = (
+    "issements", "issement", "atrices", "atrice", "ateurs", "ateur", "ations", "ation",
+    "ements", "ement", "ments", "ment", "ances", "ance", "ences", "ence", "ables", "able",
+    "ibles", "ible", "iques", "ique", "ismes", "isme", "istes", "iste", "euses", "euse",
+    "ites", "ite", "ives", "ive", "ifs", "if", "eux", "aux", "ies", "ie", "ees", "ee", "es", "er", "e", "s", "x",
+)
+
+_TITRE_MARKDOWN = re.compile(r"^\s*#{1,6}\s+(.+?)\s*#*\s*$")
+_TITRE_ENCADRE = re.compile(r"^\s*={2,}\s*(.+?)\s*={2,}\s*$")
+_SEPARATEUR = re.compile(r"^\s*[=\-_*]{5,}\s*$")
+_NUMEROTATION = re.compile(r"^\s*(\d+(\.\d+)*\.?|[IVX]+\.)\s+")
+_MOTS = re.compile(r"[a-z0-9]+")
+
+
+def _sans_accents(texte: str) -> str:
+    """Supprime les accents (é → e, ç → c...)"""
+    decompose = unicodedata.normalize("NFKD", texte)
+    return "".join(c for c in decompose if not unicodedata.combining(c))
+
+
+def raciniser(mot: str) -> str:
+    """
+    Racinisation légère d'un mot français déjà normalisé (minuscules, sans accents)
+
+    Retire le suffixe le plus long connu en conservant une racine d'au
+    moins 3 caractères. Les nombres sont conservés tels quels.
+    """
+    if mot.isdigit() or len(mot) <= 3:
+        return mot
+    for suffixe in _SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= 3:
+            return mot[:-len(suffixe)]
+    return mot
+
+
+def analyser(texte: str) -> List[str]:
+    """
+    Transforme un texte en termes d'index
+
+    Args:
+        texte: Texte libre
+
+    Returns:
+        list: Termes normalisés, sans mots vides, racinisés
+    """
+    mots = _MOTS.findall(_sans_accents(texte.lower()))
+    return [raciniser(mot) for mot in mots if mot not in MOTS_VIDES and (len(mot) > 1 or mot.isdigit())]
+
+
+def _est_titre(ligne: str) -> Optional[str]:
+    """Retourne le titre si la ligne est un titre de section, None sinon"""
+    match = _TITRE_MARKDOWN.match(ligne) or _TITRE_ENCADRE.match(ligne)
+    if match:
+        return match.group(1).strip()
+
+    texte = ligne.strip()
+    if not texte or len(texte) > 80 or texte.endswith((".", ";", ",")):
+        return None
+
+    # Ligne courte majoritairement en majuscules (ex. "4.1 PRISE D'EFFET DU CONTRAT")
+    lettres = [c for c in _NUMEROTATION.sub("", texte) if c.isalpha()]
+    if len(lettres) >= 4 and sum(c.isupper() for c in lettres) / len(lettres) >= 0.8:
+        return texte.rstrip(":").strip()
+    return None
+
+
+class Extrait:
+    """Extrait d'un document de référence, avec sa source"""
+
+    def __init__(self, document: str, fichier: str, section: str, texte: str):
+        self.document = document
+        self.fichier = fichier
+        self.section = section
+        self.texte = texte
+
+    @property
+    def source(self) -> str:
+        """Attribution lisible : document › section"""
+        libelle = LIBELLES_DOCUMENTS.get(self.document, self.document)
+        return f"{libelle} › {self.section}" if self.section else libelle
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "document": self.document,
+            "fichier": os.path.basename(self.fichier),
+            "section": self.section,
+            "source": self.source,
+        }
+
+
+def decouper_document(document: str, fichier: str, contenu: str) -> List[Extrait]:
+    """
+    Découpe un document en extraits par section
+
+    Les sections trop courtes sont regroupées avec la suivante, les sections
+    trop longues sont coupées entre paragraphes.
+
+    Args:
+        document: Clé du document (description_offre, tmgf...)
+        fichier: Chemin du fichier source
+        contenu: Texte du document
+
+    Returns:
+        list: Extraits du document
+    """
+    sections: List[Tuple[str, List[str]]] = [("", [])]
+    for ligne in contenu.splitlines():
+        if _SEPARATEUR.match(ligne):
+            continue
+        titre = _est_titre(ligne)
+        if titre:
+            sections.append((titre, []))
+        else:
+            sections[-1][1].append(ligne)
+
+    extraits = []
+    titre_en_attente, texte_en_attente = None, ""
+    for titre, lignes in sections:
+        texte = "\n".join(lignes).strip()
+        if titre_en_attente is not None:
+            # Section précédente trop courte : fusion avec celle-ci
+            texte = f"{texte_en_attente}\n\n{titre}\n{texte}".strip()
+            titre = titre_en_attente or titre
+            titre_en_attente, texte_en_attente = None, ""
+
+        if len(texte) < TAILLE_MIN_EXTRAIT:
+            titre_en_attente, texte_en_attente = titre, texte
+            continue
+
+        for morceau in _couper_paragraphes(texte):
+            extraits.append(Extrait(document, fichier, titre, morceau))
+
+    if titre_en_attente is not None and (texte_en_attente or titre_en_attente):
+        extraits.append(Extrait(document, fichier, titre_en_attente, texte_en_attente or titre_en_attente))
+
+    return extraits
+
+
+def _couper_paragraphes(texte: str) -> List[str]:
+    """Coupe un texte trop long en morceaux de TAILLE_MAX_EXTRAIT caractères au plus"""
+    if len(texte) <= TAILLE_MAX_EXTRAIT:
+        return [texte]
+
+    morceaux, courant = [], ""
+    for paragraphe in re.split(r"\n\s*\n|\n(?=[-•*|])", texte):
+        if courant and len(courant) + len(paragraphe) > TAILLE_MAX_EXTRAIT:
+            morceaux.append(courant.strip())
+            courant = ""
+        # Paragraphe isolé trop long : coupe franche
+        while len(paragraphe) > TAILLE_MAX_EXTRAIT:
+            morceaux.append(paragraphe[:TAILLE_MAX_EXTRAIT])
+            paragraphe = paragraphe[TAILLE_MAX_EXTRAIT:]
+        courant = f"{courant}\n{paragraphe}" if courant else paragraphe
+    if courant.strip():
+        morceaux.append(courant.strip())
+    return morceaux
+
+
+class IndexBM25:
+    """Index inversé BM25 sur une liste d'extraits"""
+
+    def __init__(self, extraits: List[Extrait], version: str = ""):
+        self.extraits = extraits
+        self.version = version
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._longueurs: List[int] = []
+
+        for position, extrait in enumerate(extraits):
+            termes = analyser(f"{extrait.section}\n{extrait.texte}")
+            self._longueurs.append(len(termes))
+            for terme, frequence in Counter(termes).items():
+                self._postings.setdefault(terme, []).append((position, frequence))
+
+        nb_extraits = len(extraits)
+        self._longueur_moyenne = (sum(self._longueurs) / nb_extraits) if nb_extraits else 0.0
+        self._idf = {
+            terme: math.log(1 + (nb_extraits - len(postings) + 0.5) / (len(postings) + 0.5))
+            for terme, postings in self._postings.items()
+        }
+
+    def rechercher(self, requete: str, k: int = 6) -> List[Tuple[Extrait, float]]:
+        """
+        Retourne les k extraits les plus pertinents pour la requête
+
+        Args:
+            requete: Question en texte libre
+            k: Nombre d'extraits
+
+        Returns:
+            list: (extrait, score) par score décroissant
+        """
+        scores: Dict[int, float] = {}
+        for terme in set(analyser(requete)):
+            postings = self._postings.get(terme)
+            if not postings:
+                continue
+            idf = self._idf[terme]
+            for position, frequence in postings:
+                normalisation = BM25_K1 * (1 - BM25_B + BM25_B * self._longueurs[position] / self._longueur_moyenne)
+                scores[position] = scores.get(position, 0.0) + idf * frequence * (BM25_K1 + 1) / (frequence + normalisation)
+
+        meilleurs = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.extraits[position], score) for position, score in meilleurs]
+
+    def statistiques(self) -> Dict[str, int]:
+        return {
+            "extraits": len(self.extraits),
+            "termes": len(self._postings),
+            "caracteres": sum(len(extrait.texte) for extrait in self.extraits),
+        }
+
+
+def calculer_version_corpus(fichiers: Dict[str, str]) -> str:
+    """
+    Empreinte du corpus (chemin, taille et date de modification des fichiers)
+
+    Returns:
+        str: Identifiant court de la version du corpus
+    """
+    empreinte = hashlib.sha1()
+    for document, chemin in sorted(fichiers.items()):
+        try:
+            stat = os.stat(chemin)
+            empreinte.update(f"{document}|{chemin}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+        except OSError:
+            empreinte.update(f"{document}|{chemin}|absent\n".encode("utf-8"))
+    return empreinte.hexdigest()[:12]
+
+
+def construire_index(fichiers: Dict[str, str], version: str = "",
+                     contenus: Optional[Dict[str, str]] = None) -> IndexBM25:
+    """
+    Lit et découpe les fichiers du corpus puis construit l'index
+
+    Args:
+        fichiers: Clé du document → chemin du fichier
+        version: Version du corpus indexé
+        contenus: Contenus déjà chargés (les fichiers ne sont alors pas relus)
+
+    Returns:
+        IndexBM25: Index construit
+    """
+    extraits = []
+    for document, chemin in fichiers.items():
+        if contenus is not None:
+            extraits.extend(decouper_document(document, chemin, contenus.get(document, "")))
+            continue
+        try:
+            with open(chemin, "r", encoding="utf-8") as f:
+                contenu = f.read()
+        except FileNotFoundError:
+            logger.warning(f"Fichier non trouvé pour l'index: {chemin}")
+            continue
+        except Exception as e:
+            logger.error(f"Erreur lors de la lecture de {chemin}: {e}")
+            continue
+        extraits.extend(decouper_document(document, chemin, contenu))
+
+    index = IndexBM25(extraits, version)
+    stats = index.statistiques()
+    logger.info(
+        f"Index BM25 construit (version {version}): {stats['extraits']} extraits, "
+        f"{stats['termes']} termes, {stats['caracteres']} caractères"
+    )
+    return index
+
+
+# Index partagés par version du corpus, reconstruits uniquement si le contenu change
+_index: Dict[str, IndexBM25] = {}
+_index_lock = threading.Lock()
+
+
+def get_index_documentaire(version_corpus: Optional[str] = None) -> IndexBM25:
+    """
+    Retourne l'index des documents de référence (construit à la demande)
+
+    L'index est construit à partir de l'instantané du magasin de la version
+    du corpus : il n'est reconstruit que si le contenu d'un document a changé.
+
+    Args:
+        version_corpus: Version du corpus (version par défaut si None)
+
+    Returns:
+        IndexBM25: Index partagé
+    """
+    registre = get_registre_corpus()
+    version_corpus = version_corpus if version_corpus in registre.versions() else registre.version_defaut
+    documents = registre.manifeste(version_corpus).documents
+    instantane = registre.magasin(version_corpus).instantane
+    version = instantane.version(documents)
+
+    index = _index.get(version_corpus)
+    if index is not None and index.version == version:
+        return index
+
+    with _index_lock:
+        index = _index.get(version_corpus)
+        if index is None or index.version != version:
+            index = construire_index(documents, version, instantane.contenus)
+            _index[version_corpus] = index
+        return index
@@ -0,0 +1,403 @@
+"""
+Journal des conversations, en ajout seul
+
+L'historique de la conversation était gardé dans la session : chaque tour de
+/chat relisait la liste entière, y ajoutait deux messages, réécrivait la
+session complète et renvoyait tout l'historique au navigateur. Le coût de
+sérialisation et la taille des réponses croissaient avec le carré de la
+longueur de la conversation.
+
+La session ne garde plus que l'identifiant de la conversation. Les messages
+sont ajoutés à un journal propre à la conversation, sans réécrire ce qui
+précède ; chaque message y reçoit son numéro (msg_num), qui sert de numéro de
+séquence : /chat ne renvoie que les nouveaux messages et le navigateur ne
+redemande que ceux qui suivent le dernier numéro qu'il connaît.
+
+Deux journaux, choisis par CONVERSATION_LOG_TYPE :
+- "memory" : listes en mémoire du worker (développement, un seul worker) ;
+- "filesystem" : un fichier JSON Lines par conversation, partagé entre les
+  workers lorsqu'il est sur le FileShare. Chaque worker garde en cache les
+  messages déjà lus et la position atteinte dans le fichier : seule la fin
+  ajoutée depuis la dernière lecture est relue. L'expiration d'un journal
+  est repoussée à chaque message et à chaque requête de la session qui le
+  désigne (prolonger) ; les journaux inactifs depuis la durée de vie des
+  sessions sont supprimés par la purge périodique (core.purge_sessions), via
+  le même index des expirations que les sessions.
+
+À côté des messages, chaque conversation peut avoir des annexes : petits
+documents JSON dérivés de la conversation (résumé glissant, pré-évaluation),
+remplacés en entier à chaque mise à jour. Gardées avec le journal, elles sont
+partagées par les workers et supprimées avec la conversation.
+"""
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.stockage_sessions import REPERTOIRE_EXPIRATIONS, IndexExpirations
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows (développement) : verrou du worker seulement
+    fcntl = None
+
+# Types de journal (CONVERSATION_LOG_TYPE)
+TYPE_MEMOIRE = "memory"
+TYPE_FICHIERS = "filesystem"
+TYPES_JOURNAL = (TYPE_MEMOIRE, TYPE_FICHIERS)
+
+
+def _identifiant_valide(conversation_id: str) -> bool:
+    """Identifiant généré par nouvel_identifiant (secrets.token_urlsafe)"""
+    return bool(conversation_id) and len(conversation_id) <= 128 and all(
+        c.isalnum() or c in "-_" for c in conversation_id
+    )
+
+
+class JournalConversations:
+    """Interface des journaux de conversation (messages numérotés à partir de 1)"""
+
+    def __init__(self, max_conversations: int = 1000):
+        self.max_conversations = max_conversations
+        self._lock = threading.Lock()
+
+    def lire(self, conversation_id: str, depuis: int = 0) -> List[Dict[str, Any]]:
+        """
+        Messages de la conversation
+
+        Args:
+            conversation_id: Identifiant de la conversation
+            depuis: Numéro du dernier message déjà connu (0 : tous les messages)
+
+        Returns:
+            list: Messages de numéro supérieur à depuis (nouvelle liste)
+        """
+        messages = self._messages(conversation_id)
+        if depuis <= 0:
+            return list(messages)
+        # Numéros consécutifs à partir de 1 : le message n est à l'indice n - 1
+        return messages[depuis:]
+
+    def sequence(self, conversation_id: str) -> int:
+        """Numéro du dernier message (0 si la conversation est vide)"""
+        return len(self._messages(conversation_id))
+
+    def ajouter(self, conversation_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Ajoute des messages à la fin de la conversation
+
+        Les numéros (msg_num) sont attribués ici, à la suite du dernier message
+        du journal.
+
+        Returns:
+            list: Messages ajoutés, numérotés
+        """
+        raise NotImplementedError
+
+    def supprimer(self, conversation_id: str) -> None:
+        """Supprime la conversation et ses annexes"""
+        raise NotImplementedError
+
+    def lire_annexe(self, conversation_id: str, nom: str) -> Optional[Dict[str, Any]]:
+        """
+        Annexe de la conversation
+
+        Args:
+            conversation_id: Identifiant de la conversation
+            nom: Nom de l'annexe ("resume", "pre_evaluation", ...)
+
+        Returns:
+            dict: Copie de l'annexe, None si elle n'existe pas ou est illisible
+        """
+        raise NotImplementedError
+
+    def ecrire_annexe(self, conversation_id: str, nom: str, donnees: Dict[str, Any]) -> None:
+        """Remplace l'annexe de la conversation (données sérialisables en JSON)"""
+        raise NotImplementedError
+
+    def _messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Liste interne des messages (à ne pas modifier)"""
+        raise NotImplementedError
+
+    def prolonger(self, conversation_id: str) -> None:
+        """Repousse l'expiration du journal (session de la conversation toujours active)"""
+
+    def candidats_expires(self, maintenant: float, limite: int) -> List[Any]:
+        """Journaux probablement expirés (aucun : les journaux en mémoire sont bornés par le cache LRU)"""
+        return []
+
+    def purger_lot(self, candidats: List[Any], maintenant: float) -> int:
+        return 0
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._lock:
+            conversations = len(self._cache)
+        return {"type": self.type_journal, "conversations_en_cache": conversations}
+
+    @staticmethod
+    def _numeroter(messages: List[Dict[str, Any]], sequence: int) -> List[Dict[str, Any]]:
+        return [{**message, "msg_num": sequence + numero} for numero, message in enumerate(messages, start=1)]
+
+    def _garder_en_cache(self, conversation_id: str, entree) -> None:
+        """Met l'entrée en tête du cache LRU (appelé sous self._lock)"""
+        self._cache[conversation_id] = entree
+        self._cache.move_to_end(conversation_id)
+        while len(self._cache) > self.max_conversations:
+            self._cache.popitem(last=False)
+
+
+class JournalConversationsMemoire(JournalConversations):
+    """Conversations en mémoire du worker, les moins récemment utilisées évincées au-delà de max_conversations"""
+
+    type_journal = TYPE_MEMOIRE
+
+    def __init__(self, max_conversations: int = 1000):
+        super().__init__(max_conversations)
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        # conversation_id → {nom de l'annexe: données}
+        self._annexes: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+
+    def _messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            messages = self._cache.get(conversation_id)
+            if messages is None:
+                return []
+            self._cache.move_to_end(conversation_id)
+            return messages
+
+    def ajouter(self, conversation_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self._lock:
+            existants = self._cache.get(conversation_id, [])
+            ajoutes = self._numeroter(messages, len(existants))
+            existants.extend(ajoutes)
+            self._garder_en_cache(conversation_id, existants)
+        return ajoutes
+
+    def supprimer(self, conversation_id: str) -> None:
+        with self._lock:
+            self._cache.pop(conversation_id, None)
+            self._annexes.pop(conversation_id, None)
+
+    def lire_annexe(self, conversation_id: str, nom: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            donnees = self._annexes.get(conversation_id, {}).get(nom)
+            return copy.deepcopy(donnees)
+
+    def ecrire_annexe(self, conversation_id: str, nom: str, donnees: Dict[str, Any]) -> None:
+        with self._lock:
+            annexes = self._annexes.setdefault(conversation_id, {})
+            annexes[nom] = copy.deepcopy(donnees)
+            self._annexes.move_to_end(conversation_id)
+            while len(self._annexes) > self.max_conversations:
+                self._annexes.popitem(last=False)
+
+
+class JournalConversationsFichiers(JournalConversations):
+    """
+    Un fichier JSON Lines par conversation dans un répertoire
+
+    Le cache du worker associe à chaque conversation ses messages et la
+    position lue dans le fichier ; un autre worker qui a ajouté des messages
+    entre-temps a seulement allongé le fichier. Les ajouts sont sérialisés
+    entre workers par un verrou (flock) sur le fichier de la conversation.
+    """
+
+    type_journal = TYPE_FICHIERS
+
+    def __init__(
+        self,
+        repertoire: str,
+        max_conversations: int = 1000,
+        ttl_seconds: Optional[int] = None,
+        duree_tranche: int = 3600,
+    ):
+        super().__init__(max_conversations)
+        self.repertoire = Path(repertoire)
+        self.repertoire.mkdir(parents=True, exist_ok=True)
+        # Durée de vie d'un journal sans nouveau message (None : jamais purgé)
+        self.ttl_seconds = ttl_seconds
+        self.index = IndexExpirations(self.repertoire / REPERTOIRE_EXPIRATIONS, duree_tranche)
+        # conversation_id → (messages, position lue dans le fichier)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _chemin(self, conversation_id: str) -> Path:
+        return self.repertoire / f"{conversation_id}.jsonl"
+
+    def _chemin_annexe(self, conversation_id: str, nom: str) -> Path:
+        return self.repertoire / f"{conversation_id}.{nom}.json"
+
+    def _synchroniser(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Complète le cache avec la fin du fichier (appelé sous self._lock)"""
+        messages, position = self._cache.get(conversation_id, ([], 0))
+        try:
+            taille = os.stat(self._chemin(conversation_id)).st_size
+        except FileNotFoundError:
+            self._cache.pop(conversation_id, None)
+            return []
+
+        if taille < position:
+            # Fichier recréé par un autre worker : relecture complète
+            messages, position = [], 0
+        if taille > position:
+            messages = list(messages)
+            with open(self._chemin(conversation_id), "rb") as f:
+                f.seek(position)
+                for ligne in f:
+                    if not ligne.endswith(b"\n"):
+                        # Ajout en cours d'écriture par un autre worker : lu à la prochaine synchronisation
+                        break
+                    position += len(ligne)
+                    try:
+                        messages.append(json.loads(ligne))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Ligne illisible ignorée dans le journal {conversation_id}: {e}")
+
+        self._garder_en_cache(conversation_id, (messages, position))
+        return messages
+
+    def _messages(self, conversation_id: str) -> List[Dict[str, Any]]:
+        if not _identifiant_valide(conversation_id):
+            return []
+        with self._lock:
+            return self._synchroniser(conversation_id)
+
+    def ajouter(self, conversation_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not _identifiant_valide(conversation_id):
+            raise ValueError(f"Identifiant de conversation invalide: {conversation_id!r}")
+        with self._lock:
+            with open(self._chemin(conversation_id), "a", encoding="utf-8") as f:
+                # Verrou entre workers (libéré à la fermeture) : lecture de la fin du
+                # fichier, numérotation et ajout forment une seule opération
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                existants = self._synchroniser(conversation_id)
+                ajoutes = self._numeroter(messages, len(existants))
+                contenu = "".join(json.dumps(message, ensure_ascii=False) + "\n" for message in ajoutes)
+                if os.fstat(f.fileno()).st_size > self._cache.get(conversation_id, ([], 0))[1]:
+                    # Ligne incomplète d'une écriture interrompue : terminée (puis ignorée à la
+                    # lecture) pour ne pas coller le premier message ajouté à sa suite
+                    contenu = "\n" + contenu
+                # Une seule écriture en mode ajout : les lignes d'un tour restent contiguës
+                f.write(contenu)
+                f.flush()
+            self._synchroniser(conversation_id)
+        if self.ttl_seconds is not None:
+            self.index.marquer(conversation_id, time.time() + self.ttl_seconds)
+        return ajoutes
+
+    def supprimer(self, conversation_id: str) -> None:
+        if not _identifiant_valide(conversation_id):
+            return
+        with self._lock:
+            self._cache.pop(conversation_id, None)
+            self._chemin(conversation_id).unlink(missing_ok=True)
+            for chemin in self.repertoire.glob(f"{conversation_id}.*.json"):
+                chemin.unlink(missing_ok=True)
+        self.index.oublier(conversation_id)
+
+    def lire_annexe(self, conversation_id: str, nom: str) -> Optional[Dict[str, Any]]:
+        if not (_identifiant_valide(conversation_id) and _identifiant_valide(nom)):
+            return None
+        try:
+            with open(self._chemin_annexe(conversation_id, nom), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Annexe {nom} de la conversation {conversation_id} illisible: {e}")
+            return None
+
+    def ecrire_annexe(self, conversation_id: str, nom: str, donnees: Dict[str, Any]) -> None:
+        if not (_identifiant_valide(conversation_id) and _identifiant_valide(nom)):
+            raise ValueError(f"Annexe de conversation invalide: {conversation_id!r}, {nom!r}")
+        chemin = self._chemin_annexe(conversation_id, nom)
+        # Écriture dans un fichier temporaire puis remplacement : un autre worker
+        # lit l'ancienne ou la nouvelle version, jamais un fichier partiel
+        temporaire = chemin.with_name(f"{chemin.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(donnees, f, ensure_ascii=False)
+        os.replace(temporaire, chemin)
+
+    def prolonger(self, conversation_id: str) -> None:
+        if self.ttl_seconds is None or not _identifiant_valide(conversation_id):
+            return
+        try:
+            os.utime(self._chemin(conversation_id))
+        except FileNotFoundError:
+            return
+        self.index.marquer(conversation_id, time.time() + self.ttl_seconds)
+
+    def candidats_expires(self, maintenant: float, limite: int) -> List[Any]:
+        if self.ttl_seconds is None:
+            return []
+        return self.index.candidats(maintenant, limite)
+
+    def purger_lot(self, candidats: List[Any], maintenant: float) -> int:
+        supprimes = 0
+        for tranche, conversation_id in candidats:
+            chemin = self._chemin(conversation_id)
+            try:
+                if os.stat(chemin).st_mtime + self.ttl_seconds < maintenant:
+                    self.supprimer(conversation_id)
+                    supprimes += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Purge du journal {conversation_id} impossible: {e}")
+                continue
+            self.index.retirer(tranche, conversation_id)
+        return supprimes
+
+
+def creer_journal_conversations(
+    type_journal: str,
+    repertoire: str = "conversations/",
+    max_conversations: int = 1000,
+    ttl_seconds: Optional[int] = None,
+    duree_tranche: int = 3600,
+) -> JournalConversations:
+    """
+    Crée le journal des conversations configuré
+
+    Args:
+        type_journal: "memory" ou "filesystem"
+        repertoire: Répertoire des journaux (filesystem)
+        max_conversations: Nombre de conversations gardées en cache par le worker
+        ttl_seconds: Durée de vie d'un journal sans nouveau message (filesystem, None : jamais purgé)
+        duree_tranche: Durée d'une tranche de l'index des expirations (filesystem)
+
+    Raises:
+        ValueError: Type de journal inconnu
+    """
+    if type_journal == TYPE_MEMOIRE:
+        return JournalConversationsMemoire(max_conversations)
+    if type_journal == TYPE_FICHIERS:
+        return JournalConversationsFichiers(repertoire, max_conversations, ttl_seconds, duree_tranche)
+    raise ValueError(f"Type de journal de conversation inconnu: {type_journal} (attendu: {', '.join(TYPES_JOURNAL)})")
+
+
+# Instance globale
+_journal_conversations: Optional[JournalConversations] = None
+
+
+def init_journal_conversations(type_journal: str, **options) -> JournalConversations:
+    """Initialise le journal des conversations (appelé dans le lifespan)"""
+    global _journal_conversations
+    _journal_conversations = creer_journal_conversations(type_journal, **options)
+    logger.info(f"Journal des conversations initialisé ({type_journal})")
+    return _journal_conversations
+
+
+def get_journal_conversations() -> JournalConversations:
+    """Retourne le journal des conversations (en mémoire s'il n'a pas été initialisé)"""
+    global _journal_conversations
+    if _journal_conversations is None:
+        _journal_conversations = JournalConversationsMemoire()
+    return _journal_conversations
@@ -0,0 +1,107 @@
+"""
+Métriques des appels LLM
+
+Suivi de l'utilisation du cache de prompt côté fournisseur
+(usage.prompt_tokens_details.cached_tokens) pour vérifier le gain en
+latence et en coût de la mise en page préfixe statique / suffixe dynamique.
+"""
+import threading
+from typing import Any, Dict
+
+
+def extraire_usage_tokens(response) -> Dict[str, int]:
+    """
+    Extrait les compteurs de tokens d'une réponse chat.completions
+
+    Args:
+        response: Réponse du client OpenAI
+
+    Returns:
+        dict: prompt_tokens, completion_tokens, cached_tokens (0 si absents)
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) if details is not None else None
+
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "cached_tokens": cached_tokens or 0,
+    }
+
+
+class StatistiquesCachePrompt:
+    """Compteurs agrégés du cache de prompt, par type d'appel"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def enregistrer(self, type_appel: str, usage: Dict[str, int], duree_secondes: float) -> None:
+        """
+        Enregistre l'usage d'un appel
+
+        Args:
+            type_appel: Catégorie de l'appel (synthese, faq...)
+            usage: Compteurs retournés par extraire_usage_tokens
+            duree_secondes: Latence de l'appel
+        """
+        cache_utilise = usage.get("cached_tokens", 0) > 0
+        with self._lock:
+            stats = self._stats.setdefault(type_appel, {
+                "appels": 0,
+                "appels_avec_cache": 0,
+                "prompt_tokens": 0,
+                "cached_tokens": 0,
+                "completion_tokens": 0,
+                "duree_totale_avec_cache": 0.0,
+                "duree_totale_sans_cache": 0.0,
+            })
+            stats["appels"] += 1
+            stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            stats["cached_tokens"] += usage.get("cached_tokens", 0)
+            stats["completion_tokens"] += usage.get("completion_tokens", 0)
+            if cache_utilise:
+                stats["appels_avec_cache"] += 1
+                stats["duree_totale_avec_cache"] += duree_secondes
+            else:
+                stats["duree_totale_sans_cache"] += duree_secondes
+
+    def resume(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retourne les statistiques par type d'appel
+
+        Returns:
+            dict: Compteurs, taux de tokens servis depuis le cache et
+                  latence moyenne avec / sans cache
+        """
+        with self._lock:
+            resume = {}
+            for type_appel, stats in self._stats.items():
+                appels_sans_cache = stats["appels"] - stats["appels_avec_cache"]
+                resume[type_appel] = {
+                    "appels": stats["appels"],
+                    "appels_avec_cache": stats["appels_avec_cache"],
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "cached_tokens": stats["cached_tokens"],
+                    "completion_tokens": stats["completion_tokens"],
+                    "taux_tokens_caches": round(stats["cached_tokens"] / stats["prompt_tokens"], 4)
+                    if stats["prompt_tokens"] else 0.0,
+                    "latence_moyenne_avec_cache": round(stats["duree_totale_avec_cache"] / stats["appels_avec_cache"], 3)
+                    if stats["appels_avec_cache"] else None,
+                    "latence_moyenne_sans_cache": round(stats["duree_totale_sans_cache"] / appels_sans_cache, 3)
+                    if appels_sans_cache else None,
+                }
+            return resume
+
+    def reinitialiser(self) -> None:
+        """Remet les compteurs à zéro"""
+        with self._lock:
+            self._stats.clear()
+
+
+# Instance globale (par processus)
+statistiques_cache_prompt = StatistiquesCachePrompt()
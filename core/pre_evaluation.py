@@ -0,0 +1,356 @@
+"""
+Pré-évaluation de la conversation pendant l'entretien
+
+Sans pré-évaluation, rien ne se passe avant le clic sur « synthétiser » :
+toute la conversation est alors évaluée d'un coup. Lorsque la pré-évaluation
+est activée, chaque segment de quelques tours est évalué en tâche de fond
+après la réponse du client simulé (erreurs factuelles, objections et leur
+traitement, points positifs et négatifs, résumé).
+
+La synthèse finale consolide ces évaluations partielles et ne reçoit mot pour
+mot que les derniers échanges non encore pré-évalués.
+
+Les évaluations sont une annexe du journal de la conversation
+(core.journal_conversation), donc partagées par les workers : le tour suivant
+ou la synthèse, traités par un autre worker, reprennent les mêmes segments
+au lieu de réévaluer toute la conversation. Elles sont validées par
+l'empreinte des messages évalués : une conversation réinitialisée n'utilise
+jamais les évaluations de la précédente.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .documents_reference import FICHIERS_REFERENCE
+from .fenetre_conversation import _empreinte
+from .journal_conversation import TYPE_MEMOIRE, JournalConversations, get_journal_conversations
+from .prompt_synthese import construire_prefixe_pre_evaluation
+from .registre_corpus import get_documents_reference
+from .resilience_llm import appel_llm_async
+from .routeur_deploiements import ROLE_SYNTHESE
+
+logger = logging.getLogger(__name__)
+
+# Tokens générés au maximum par segment
+MAX_TOKENS_PRE_EVALUATION = 800
+
+# Nom de l'annexe du journal de la conversation
+ANNEXE_PRE_EVALUATION = "pre_evaluation"
+
+# Rôles affichés dans les échanges évalués
+ROLES_ECHANGES = {"Vous": "COMMERCIAL", "Assistant": "CLIENT"}
+
+
+def _formater_echanges_numerotes(messages: List[Dict[str, Any]], debut: int) -> str:
+    """Transcription numérotée [NN] COMMERCIAL / CLIENT (numérotation à partir de debut + 1)"""
+    return "\n".join(
+        f"[{numero:02d}] {ROLES_ECHANGES.get(message.get('role'), 'CLIENT')}: {message.get('text', '')}"
+        for numero, message in enumerate(messages, debut + 1)
+    )
+
+
+class SegmentEvalue:
+    """Évaluation partielle des messages [debut, fin[ d'une conversation"""
+
+    def __init__(self, debut: int, fin: int, evaluation: Dict[str, Any], evalue_le: Optional[float] = None):
+        self.debut = debut
+        self.fin = fin
+        self.evaluation = evaluation
+        self.evalue_le = evalue_le if evalue_le is not None else time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"echanges": f"[{self.debut + 1:02d}] à [{self.fin:02d}]", **self.evaluation}
+
+
+class PreEvaluationConversation:
+    """Segments évalués du début d'une conversation"""
+
+    def __init__(self, segments: List[SegmentEvalue], empreinte: str):
+        self.segments = segments
+        self.empreinte = empreinte
+
+    @property
+    def nb_messages(self) -> int:
+        return self.segments[-1].fin if self.segments else 0
+
+    def descripteur(self) -> Dict[str, Any]:
+        """Forme JSON enregistrée dans le journal de la conversation"""
+        return {
+            "empreinte": self.empreinte,
+            "segments": [
+                {"debut": segment.debut, "fin": segment.fin, "evaluation": segment.evaluation,
+                 "evalue_le": segment.evalue_le}
+                for segment in self.segments
+            ],
+        }
+
+    @classmethod
+    def depuis_descripteur(cls, descripteur: Dict[str, Any]) -> "PreEvaluationConversation":
+        return cls(
+            [
+                SegmentEvalue(segment["debut"], segment["fin"], segment["evaluation"], segment.get("evalue_le"))
+                for segment in descripteur["segments"]
+            ],
+            descripteur["empreinte"],
+        )
+
+    def couvre(self, historique: List[Dict[str, Any]]) -> bool:
+        """Vrai si les segments portent bien sur le début de cet historique"""
+        return (
+            self.nb_messages <= len(historique)
+            and _empreinte(historique[:self.nb_messages]) == self.empreinte
+        )
+
+    def resume(self) -> str:
+        """Résumés des segments (contexte des segments suivants)"""
+        return "\n".join(
+            f"[{segment.debut + 1:02d}] à [{segment.fin:02d}] : {segment.evaluation.get('resume', '')}"
+            for segment in self.segments
+        )
+
+    def texte(self) -> str:
+        """Évaluations partielles formatées pour la synthèse finale"""
+        return (
+            f"=== PRÉ-ÉVALUATION DES ÉCHANGES [01] À [{self.nb_messages:02d}] ===\n"
+            "(évaluations partielles réalisées pendant l'entretien, à consolider)\n\n"
+            + json.dumps([segment.to_dict() for segment in self.segments], ensure_ascii=False, indent=2)
+            + "\n\n"
+        )
+
+
+class GestionnairePreEvaluation:
+    """
+    Pré-évaluations en tâche de fond des conversations en cours
+
+    Une seule évaluation à la fois par conversation et par worker ; un segment
+    regroupe tous les tours complets non évalués (au moins tours_par_segment
+    tours). Les segments sont enregistrés dans le journal de la conversation ;
+    le worker garde en plus la dernière version qu'il connaît, pour ne pas
+    lancer d'évaluation lorsqu'aucun segment n'est prêt.
+    """
+
+    def __init__(self, tours_par_segment: int = 4, max_conversations: int = 1000,
+                 journal: Optional[JournalConversations] = None):
+        """
+        Args:
+            tours_par_segment: Tours complets au moins par segment évalué
+            max_conversations: Conversations gardées en cache par le worker
+            journal: Journal où sont enregistrés les segments (journal global si None)
+        """
+        self.tours_par_segment = max(1, tours_par_segment)
+        self.max_conversations = max_conversations
+        self._journal = journal
+        self._conversations: "OrderedDict[str, PreEvaluationConversation]" = OrderedDict()
+        self._en_cours: Dict[str, asyncio.Task] = {}
+        self._compteurs = {"segments_evalues": 0, "echecs": 0, "consolidations": 0, "reprises": 0}
+
+    def _journal_conversations(self) -> JournalConversations:
+        return self._journal if self._journal is not None else get_journal_conversations()
+
+    def _garder(self, cle_conversation: str, pre_evaluation: PreEvaluationConversation) -> None:
+        """Met à jour la version connue du worker (LRU)"""
+        self._conversations[cle_conversation] = pre_evaluation
+        self._conversations.move_to_end(cle_conversation)
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+
+    def _lire_partagee(self, cle_conversation: str) -> Optional[PreEvaluationConversation]:
+        """Segments enregistrés dans le journal de la conversation (lecture bloquante)"""
+        try:
+            descripteur = self._journal_conversations().lire_annexe(cle_conversation, ANNEXE_PRE_EVALUATION)
+            return PreEvaluationConversation.depuis_descripteur(descripteur) if descripteur else None
+        except Exception as e:
+            logger.warning(f"Pré-évaluation partagée illisible: {e}")
+            return None
+
+    def _plus_avancee(self, historique: List[Dict[str, Any]],
+                      *candidates: Optional[PreEvaluationConversation]) -> Optional[PreEvaluationConversation]:
+        """Pré-évaluation couvrant le plus de messages de cet historique"""
+        valides = [candidate for candidate in candidates
+                   if candidate is not None and candidate.segments and candidate.couvre(historique)]
+        return max(valides, key=lambda candidate: candidate.nb_messages, default=None)
+
+    def obtenir(self, historique: List[Dict[str, Any]],
+                cle_conversation: Optional[str]) -> Optional[PreEvaluationConversation]:
+        """
+        Pré-évaluation du début de cet historique
+
+        Returns:
+            PreEvaluationConversation: None si aucun segment ne correspond à l'historique
+        """
+        if cle_conversation is None:
+            return None
+        pre_evaluation = self._plus_avancee(
+            historique, self._lire_partagee(cle_conversation), self._conversations.get(cle_conversation)
+        )
+        if pre_evaluation is None:
+            return None
+        self._compteurs["consolidations"] += 1
+        return pre_evaluation
+
+    def planifier(
+        self,
+        historique: List[Dict[str, Any]],
+        cle_conversation: Optional[str],
+        client,
+        version_corpus: Optional[str] = None,
+    ) -> Optional[asyncio.Task]:
+        """
+        Lance en tâche de fond l'évaluation des tours complets non évalués
+
+        La version connue du worker décide seule si un segment est prêt ; la
+        tâche relit ensuite les segments partagés, qu'un autre worker a pu
+        compléter entre-temps.
+
+        Returns:
+            asyncio.Task: Tâche lancée, None si aucun segment n'est prêt
+        """
+        if cle_conversation is None or client is None or cle_conversation in self._en_cours:
+            return None
+
+        precedent = self._plus_avancee(historique, self._conversations.get(cle_conversation))
+        deja_evalues = precedent.nb_messages if precedent else 0
+
+        # Seuls les tours complets (commercial + client) sont évalués
+        fin = len(historique) - len(historique) % 2
+        if fin - deja_evalues < 2 * self.tours_par_segment:
+            return None
+
+        tache = asyncio.create_task(
+            self._evaluer(cle_conversation, list(historique[:fin]), precedent, client, version_corpus)
+        )
+        self._en_cours[cle_conversation] = tache
+        tache.add_done_callback(lambda _: self._en_cours.pop(cle_conversation, None))
+        return tache
+
+    async def _evaluer(
+        self,
+        cle_conversation: str,
+        messages: List[Dict[str, Any]],
+        precedent: Optional[PreEvaluationConversation],
+        client,
+        version_corpus: Optional[str] = None,
+    ) -> None:
+        """Évalue les nouveaux messages et les ajoute aux segments précédents (un appel LLM)"""
+        if self._journal_conversations().type_journal == TYPE_MEMOIRE:
+            partagee = self._lire_partagee(cle_conversation)
+        else:
+            partagee = await asyncio.to_thread(self._lire_partagee, cle_conversation)
+        plus_avancee = self._plus_avancee(messages, precedent, partagee)
+        if plus_avancee is not None and plus_avancee.nb_messages > (precedent.nb_messages if precedent else 0):
+            # Segments évalués par un autre worker : seuls les tours suivants restent à évaluer
+            self._compteurs["reprises"] += 1
+            precedent = plus_avancee
+            self._garder(cle_conversation, precedent)
+            if len(messages) - precedent.nb_messages < 2 * self.tours_par_segment:
+                return
+
+        debut = precedent.nb_messages if precedent else 0
+        documents = get_documents_reference(version_corpus).contenus(FICHIERS_REFERENCE)
+        contenu = (
+            f"RÉSUMÉ DES ÉCHANGES PRÉCÉDENTS :\n{precedent.resume() if precedent else '(aucun)'}\n\n"
+            f"NOUVEAUX ÉCHANGES :\n{_formater_echanges_numerotes(messages[debut:], debut)}"
+        )
+
+        try:
+            response = await appel_llm_async(
+                client,
+                ROLE_SYNTHESE,
+                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_m"),
+                messages=[
+                    {"role": "system", "content": construire_prefixe_pre_evaluation(documents)},
+                    {"role": "user", "content": contenu},
+                ],
+                response_format={"type": "json_object"},
+                temperature=0,
+                max_tokens=MAX_TOKENS_PRE_EVALUATION,
+                timeout=60,
+            )
+            evaluation = json.loads(response.choices[0].message.content)
+            if not isinstance(evaluation, dict):
+                raise ValueError("Pré-évaluation non structurée")
+        except Exception as e:
+            self._compteurs["echecs"] += 1
+            logger.warning(f"Pré-évaluation de la conversation non mise à jour: {e}")
+            return
+
+        segments = (precedent.segments if precedent else []) + [SegmentEvalue(debut, len(messages), evaluation)]
+        pre_evaluation = PreEvaluationConversation(segments, _empreinte(messages))
+        self._garder(cle_conversation, pre_evaluation)
+        self._compteurs["segments_evalues"] += 1
+        journal = self._journal_conversations()
+        try:
+            if journal.type_journal == TYPE_MEMOIRE:
+                journal.ecrire_annexe(cle_conversation, ANNEXE_PRE_EVALUATION, pre_evaluation.descripteur())
+            else:
+                await asyncio.to_thread(
+                    journal.ecrire_annexe, cle_conversation, ANNEXE_PRE_EVALUATION, pre_evaluation.descripteur()
+                )
+        except Exception as e:
+            logger.warning(f"Pré-évaluation non enregistrée dans le journal de la conversation: {e}")
+        logger.info(f"Pré-évaluation mise à jour (messages {debut + 1} à {len(messages)})")
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "tours_par_segment": self.tours_par_segment,
+            "conversations_en_cache": len(self._conversations),
+            "evaluations_en_cours": len(self._en_cours),
+            **self._compteurs,
+        }
+
+    async def arreter(self) -> None:
+        """Annule les pré-évaluations en cours (arrêt de l'application)"""
+        taches = list(self._en_cours.values())
+        for tache in taches:
+            tache.cancel()
+        if taches:
+            await asyncio.gather(*taches, return_exceptions=True)
+
+
+# Instance globale (None : pré-évaluation désactivée)
+_gestionnaire_pre_evaluation: Optional[GestionnairePreEvaluation] = None
+
+
+def init_pre_evaluation(tours_par_segment: int = 4) -> GestionnairePreEvaluation:
+    """Active la pré-évaluation (appelé dans le lifespan de l'application si configurée)"""
+    global _gestionnaire_pre_evaluation
+    if _gestionnaire_pre_evaluation is None:
+        _gestionnaire_pre_evaluation = GestionnairePreEvaluation(tours_par_segment=tours_par_segment)
+    return _gestionnaire_pre_evaluation
+
+
+def get_pre_evaluation() -> Optional[GestionnairePreEvaluation]:
+    """Retourne le gestionnaire de pré-évaluation (None si désactivée)"""
+    return _gestionnaire_pre_evaluation
+
+
+def planifier_pre_evaluation(historique, client, cle_conversation: Optional[str],
+                             version_corpus: Optional[str] = None) -> Optional[asyncio.Task]:
+    """
+    Pré-évalue en tâche de fond les derniers tours de la conversation
+
+    À appeler une fois la réplique du client envoyée ; sans effet si la
+    pré-évaluation est désactivée.
+    """
+    if _gestionnaire_pre_evaluation is None:
+        return None
+    return _gestionnaire_pre_evaluation.planifier(historique or [], cle_conversation, client, version_corpus)
+
+
+def pre_evaluation_conversation(historique, cle_conversation: Optional[str]) -> Optional[PreEvaluationConversation]:
+    """Pré-évaluation disponible pour cet historique (None si désactivée ou absente)"""
+    if _gestionnaire_pre_evaluation is None:
+        return None
+    return _gestionnaire_pre_evaluation.obtenir(historique or [], cle_conversation)
+
+
+async def shutdown_pre_evaluation() -> None:
+    """Annule les pré-évaluations en cours et libère le gestionnaire"""
+    global _gestionnaire_pre_evaluation
+    if _gestionnaire_pre_evaluation is not None:
+        await _gestionnaire_pre_evaluation.arreter()
+        _gestionnaire_pre_evaluation = None
@@ -2,10 +2,59 @@
 core/profil_manager.py
 User profile management logic for Groupama training bot.
 """
+import hashlib
 import logging , json , random
 from pathlib import Path
 
 
+def construire_prompt_client(personne, caracteristiques, objections, aleas):
+    """
+    Construit le prompt du client simulé pour une personne et les éléments sélectionnés
+
+    Args:
+        personne (dict): Personne du jeu de personnages
+        caracteristiques (list): Caractéristiques à révéler
+        objections (list): Objections à exprimer
+        aleas (list): Aléas à mentionner
+
+    Returns:
+        str: Prompt du client
+    """
+    return f"""
+Vous incarnez **le client** lors d'un rendez-vous d'assurance santé avec un conseiller Groupama (l'utilisateur).
+
+## 👤 VOTRE PROFIL
+
+**Identité :**
+- Nom : {personne['Nom']}
+- Âge : {personne['Age']} ans
+- Sexe : {personne['Sexe']}
+- Profession : {personne['Profession']}
+- Localisation : {personne['Localisation']}
+
+**Situation personnelle :**
+- Situation maritale : {personne['situation_maritale']}
+- Nombre d'enfants : {personne['nombre_enfants']}
+- Profil passerelle : {personne['profil_passerelle']}
+- Aidant : {personne['aidant']}
+- Contrat GMA existant : {personne['a_deja_contrat_gma']}
+- Hobby : {personne['hobby']}
+
+## 🎭 ÉLÉMENTS À INTÉGRER PROGRESSIVEMENT
+
+**Votre situation personnelle** (à révéler naturellement, avec vos propres mots) :
+{chr(10).join(f"• {carac}" for carac in caracteristiques)}
+
+**Vos préoccupations** (EXPRIMER UNE SEULE FOIS au bon moment et s'en souvenir ) :
+{chr(10).join(f"{i+1}. {obj}" for i, obj in enumerate(objections))}
+
+**Événements personnels** (à mentionner progressivement, selon le contexte) :
+{chr(10).join(f"{i+1}. {alea_item}" for i, alea_item in enumerate(aleas))}
+
+
+"""
+
+
 def select_profil(chemin_fichier, type_personne=None, nb_caracteristiques=2, nb_objections=1, nb_aleas=1):
     """
     Charge le fichier de jeu de personnages et sélectionne des éléments pour un scénario.
@@ -100,77 +149,182 @@ def select_profil(chemin_fichier, type_personne=None, nb_caracteristiques=2, nb_
     }
     
     # 8. Créer le prompt pour le client avec les nouveaux champs
-    prompt_client =f"""
-Vous incarnez **le client** lors d'un rendez-vous d'assurance santé avec un conseiller Groupama (l'utilisateur).
-
-## 👤 VOTRE PROFIL
+    prompt_client = construire_prompt_client(personne, caracteristiques, objections, aleas)
+    print("aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa")
+    print("voici les types de personnes dispos : ")
+    print(personne)
+    print("aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa")
+    print("ssssssssssssssssssssssssssssssssssssss")
 
-**Identité :**
-- Nom : {personne['Nom']}
-- Âge : {personne['Age']} ans
-- Sexe : {personne['Sexe']}
-- Profession : {personne['Profession']}
-- Localisation : {personne['Localisation']}
+    # Retourner le dictionnaire et le prompt
+    return scenario, prompt_client
 
-**Situation personnelle :**
-- Situation maritale : {personne['situation_maritale']}
-- Nombre d'enfants : {personne['nombre_enfants']}
-- Profil passerelle : {personne['profil_passerelle']}
-- Aidant : {personne['aidant']}
-- Contrat GMA existant : {personne['a_deja_contrat_gma']}
-- Hobby : {personne['hobby']}
 
-## 🎭 ÉLÉMENTS À INTÉGRER PROGRESSIVEMENT
+CHEMIN_JEU_DE_PERSONNAGES = 'data/jeu_de_personnages.json'
 
-**Votre situation personnelle** (à révéler naturellement, avec vos propres mots) :
-{chr(10).join(f"• {carac}" for carac in caracteristiques)}
+# Version du prompt du client (construire_prompt_client) enregistrée dans les descripteurs
+VERSION_PROMPT_CLIENT = 1
 
-**Vos préoccupations** (EXPRIMER UNE SEULE FOIS au bon moment et s'en souvenir ) :
-{chr(10).join(f"{i+1}. {obj}" for i, obj in enumerate(objections))}
+# Format des descripteurs de ProfilManager
+FORMAT_DESCRIPTEUR = 1
 
-**Événements personnels** (à mentionner progressivement, selon le contexte) :
-{chr(10).join(f"{i+1}. {alea_item}" for i, alea_item in enumerate(aleas))}
 
+class CataloguePersonnages:
+    """
+    Jeu de personnages chargé une fois et partagé par tous les ProfilManager
 
-"""
-    print("aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa")
-    print("voici les types de personnes dispos : ")
-    print(personne)
-    print("aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa")
-    print("ssssssssssssssssssssssssssssssssssssss")
+    Un scénario y est désigné par des indices (type de personne, personne,
+    caractéristiques, objections, aléas) : c'est ce qui est gardé en session
+    à la place du ProfilManager sérialisé.
+    """
 
-    # Retourner le dictionnaire et le prompt
-    return scenario, prompt_client
+    def __init__(self, chemin_fichier=CHEMIN_JEU_DE_PERSONNAGES):
+        with open(chemin_fichier, 'rb') as f:
+            contenu = f.read()
+        donnees = json.loads(contenu)
+        # Mêmes types que select_profil (le type "format_entretien" est exclu)
+        self.types = [type_p for type_p in donnees["jeu_de_personnages"]
+                      if isinstance(type_p, dict) and type_p.get("type_de_personne")]
+        self.version = hashlib.sha1(contenu).hexdigest()[:8]
+
+    def indice_type(self, type_personne):
+        """Indice du type de personne (None si inconnu)"""
+        for indice, type_p in enumerate(self.types):
+            if type_personne and type_p["type_de_personne"].lower() == type_personne.lower():
+                return indice
+        return None
+
+    def tirer(self, type_personne=None, nb_caracteristiques=2, nb_objections=1, nb_aleas=1):
+        """
+        Tire un scénario au hasard (mêmes règles que select_profil)
+
+        Returns:
+            dict: Indices {"t", "p", "c", "o", "a"} du scénario
+        """
+        indice = self.indice_type(type_personne)
+        if indice is None:
+            if type_personne:
+                logging.warning(f"Type de personne '{type_personne}' non trouvé. Sélection aléatoire à la place.")
+            indice = random.randrange(len(self.types))
+        type_p = self.types[indice]
+
+        def _tirer_indices(cle, nombre):
+            disponibles = len(type_p.get(cle, []))
+            return sorted(random.sample(range(disponibles), min(nombre, disponibles))) if disponibles else []
+
+        return {
+            "t": indice,
+            "p": random.randrange(len(type_p["liste_personne"])),
+            "c": _tirer_indices("caracteristiques", nb_caracteristiques),
+            "o": _tirer_indices("objections", nb_objections),
+            "a": _tirer_indices("alea", nb_aleas),
+        }
+
+    def scenario(self, indices):
+        """
+        Scénario et prompt du client désignés par des indices
+
+        Raises:
+            ValueError: Indices hors du catalogue
+        """
+        try:
+            type_p = self.types[indices["t"]]
+            personne = type_p["liste_personne"][indices["p"]]
+            caracteristiques = [type_p.get("caracteristiques", [])[i] for i in indices["c"]]
+            objections = [type_p.get("objections", [])[i] for i in indices["o"]]
+            aleas = [type_p.get("alea", [])[i] for i in indices["a"]]
+        except (IndexError, KeyError, TypeError) as e:
+            raise ValueError(f"Scénario absent du jeu de personnages: {indices}") from e
+
+        scenario = {
+            "type_de_personne": type_p["type_de_personne"],
+            "personne": personne,
+            "caracteristiques": caracteristiques,
+            "objections": objections,
+            "aleas": aleas
+        }
+        return scenario, construire_prompt_client(personne, caracteristiques, objections, aleas)
+
+
+_catalogue_personnages = None
+
+
+def get_catalogue_personnages():
+    """Catalogue partagé du jeu de personnages (chargé au premier appel)"""
+    global _catalogue_personnages
+    if _catalogue_personnages is None:
+        _catalogue_personnages = CataloguePersonnages()
+    return _catalogue_personnages
 
 
 class ProfilManager:
   def __init__(self, type_personne='Particulier', nb_caracteristiques=2, nb_objections=1, nb_aleas=1):
-    chemin_jeu_de_personnages = 'data/jeu_de_personnages.json' 
     self._type_personne = type_personne
     self._personne= None
     self._profil = None
     self._prompt = None
+    self._indices = None
     self._liste_questions = []
     self._current_profil = None
-    self._initialize_profil(chemin_jeu_de_personnages, type_personne, nb_caracteristiques, nb_objections, nb_aleas)
+    self._initialize_profil(type_personne, nb_caracteristiques, nb_objections, nb_aleas)
 
-  def _initialize_profil(self, chemin_jeu_de_personnages, type_personne, nb_caracteristiques, nb_objections, nb_aleas):
-    """Initialize the profil using select_profil function"""
+  def _initialize_profil(self, type_personne, nb_caracteristiques, nb_objections, nb_aleas):
+    """Initialize the profil from the shared catalog (random scenario)"""
+    try:
+      catalogue = get_catalogue_personnages()
+      self._appliquer_scenario(catalogue, catalogue.tirer(
+        type_personne,
+        nb_caracteristiques=nb_caracteristiques,
+        nb_objections=nb_objections,
+        nb_aleas=nb_aleas
+      ))
+    except Exception as e:
+      logging.error(f"Aucun profil valide sélectionné: {e}")
+
+  def _appliquer_scenario(self, catalogue, indices):
+    self._profil, self._prompt = catalogue.scenario(indices)
+    self._indices = indices
+    self._type_personne = self._profil.get('type_de_personne')
+    self._personne = self._profil.get('personne')
+    self._current_profil = self._profil  # Keep current_profil in sync
+
+  def descripteur(self):
+    """
+    Descripteur compact du profil, à garder en session
 
+    Returns:
+        dict: Indices du scénario, version du prompt et du catalogue
+              (None si le profil ne vient pas du catalogue)
+    """
+    if self._indices is None:
+      return None
+    return {
+      "v": FORMAT_DESCRIPTEUR,
+      "cat": get_catalogue_personnages().version,
+      "pv": VERSION_PROMPT_CLIENT,
+      **self._indices,
+    }
 
-    self._profil, self._prompt = select_profil(
-      chemin_jeu_de_personnages,
-      type_personne=type_personne,
-      nb_caracteristiques=nb_caracteristiques,
-      nb_objections=nb_objections,
-      nb_aleas=nb_aleas
+  @classmethod
+  def depuis_descripteur(cls, descripteur):
+    """
+    Reconstruit un ProfilManager à partir de son descripteur (catalogue partagé, sans lecture de fichier)
+
+    Raises:
+        ValueError: Descripteur d'un autre format ou d'une autre version du jeu de personnages
+    """
+    catalogue = get_catalogue_personnages()
+    if not isinstance(descripteur, dict) or descripteur.get("v") != FORMAT_DESCRIPTEUR:
+      raise ValueError("Descripteur de profil invalide")
+    if descripteur.get("cat") != catalogue.version:
+      raise ValueError(f"Descripteur d'une autre version du jeu de personnages: {descripteur.get('cat')}")
+
+    profil_manager = cls.__new__(cls)
+    profil_manager._liste_questions = []
+    profil_manager._appliquer_scenario(
+      catalogue, {cle: descripteur[cle] for cle in ("t", "p", "c", "o", "a") if cle in descripteur}
     )
-    if self._profil:
-      self._type_personne = self._profil.get('type_de_personne')
-      self._personne = self._profil.get('personne')
-      self._current_profil = self._profil  # Keep current_profil in sync
-    else:
-      logging.error("select_profil n'a pas renvoyé de profil valide.")
+    return profil_manager
 
   @property
   def profil(self):
@@ -182,6 +336,7 @@ class ProfilManager:
     """Set the current profil"""
     self._profil = value
     self._prompt = None
+    self._indices = None
 
   @property
   def current_profil(self):
@@ -194,6 +349,7 @@ class ProfilManager:
     self._current_profil = value
     self._profil = value  # Sync with _profil if needed
     self._prompt = None  # Reset prompt when switching profiles
+    self._indices = None
 
   @property
   def prompt(self):
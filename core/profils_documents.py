@@ -0,0 +1,160 @@
+"""
+Table des documents de profil client
+
+La synthèse joint au prompt le document du profil du client (aidants,
+familles, jeunes actifs, seniors...), choisi selon son profil passerelle et
+son âge. Ce choix est décrit par une table déclarative, indexée au démarrage
+pour chaque (profil passerelle, âge) : la recherche par synthèse est un accès
+direct, et le contenu vient du magasin de documents préchargé (aucune lecture
+de fichier).
+
+Au démarrage, la table est confrontée au jeu de personnages et aux versions
+du corpus : les personnages sans document de profil et les documents absents
+d'une version sont signalés au lieu de donner silencieusement un document
+vide à la synthèse.
+"""
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Jeu de personnages confronté à la table
+CHEMIN_PERSONNAGES = "data/jeu_de_personnages.json"
+
+# (profil passerelle, âge minimum, âge maximum inclus) → clé du document de profil
+# (None : pas de borne ; clés "profils" des manifestes du corpus)
+TABLE_DOCUMENTS_PROFILS = (
+    ("Aidant", None, None, "profil_aidants"),
+    ("Famille", 30, 44, "profil_jeune_famille_30_44"),
+    ("Famille", 45, 54, "profil_familles_installees_45_54"),
+    ("Jeune client", 18, 29, "profil_jeunes_actifs_18_29"),
+    ("Senior", 55, 64, "profil_jeunes_senior_55_64"),
+    ("Senior", 65, 74, "profil_retraite_en_forme_65_74"),
+    ("Senior", 75, None, "profil_retraite_aide_sup75"),
+)
+
+# Âges indexés (au-delà, l'âge maximum est utilisé)
+AGE_MAX = 120
+
+
+def _age(valeur: Any) -> Optional[int]:
+    """Âge entier d'un profil (None s'il est illisible)"""
+    try:
+        return max(0, min(AGE_MAX, int(valeur)))
+    except (TypeError, ValueError):
+        return None
+
+
+class TableDocumentsProfils:
+    """Index (profil passerelle, âge) → clé du document de profil"""
+
+    def __init__(self, table: Iterable[Tuple[str, Optional[int], Optional[int], str]] = TABLE_DOCUMENTS_PROFILS):
+        self.table = tuple(table)
+        self._index: Dict[Tuple[str, int], str] = {}
+        for profil_passerelle, age_min, age_max, cle in self.table:
+            for age in range(age_min or 0, (AGE_MAX if age_max is None else age_max) + 1):
+                if (profil_passerelle, age) in self._index:
+                    logger.warning(
+                        f"Tranches de profil qui se chevauchent ({profil_passerelle}, {age} ans) : "
+                        f"{self._index[(profil_passerelle, age)]} conservé, {cle} ignoré"
+                    )
+                    continue
+                self._index[(profil_passerelle, age)] = cle
+        self.couverture: Dict[str, Any] = {}
+
+    def cle_document(self, profil_passerelle: str, age: Any) -> Optional[str]:
+        """Clé du document de profil (None si aucune tranche ne correspond)"""
+        age = _age(age)
+        if age is None:
+            return None
+        return self._index.get((profil_passerelle, age))
+
+    def cles(self) -> List[str]:
+        """Clés des documents référencés par la table"""
+        return sorted({cle for _, _, _, cle in self.table})
+
+    def verifier_couverture(self, personnages: Dict[str, Any], magasins: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Confronte la table au jeu de personnages et aux versions du corpus
+
+        Args:
+            personnages: Contenu de data/jeu_de_personnages.json
+            magasins: Version du corpus → magasin de documents
+
+        Returns:
+            dict: {"personnages", "personnages_sans_document", "documents_absents"}
+        """
+        nb_personnages = 0
+        sans_document = []
+        for type_personne in personnages.get("jeu_de_personnages", []):
+            if not isinstance(type_personne, dict) or not type_personne.get("type_de_personne"):
+                continue
+            for personne in type_personne.get("liste_personne", []):
+                nb_personnages += 1
+                if self.cle_document(personne.get("profil_passerelle"), personne.get("Age")) is None:
+                    sans_document.append({
+                        "type_de_personne": type_personne["type_de_personne"],
+                        "nom": personne.get("Nom"),
+                        "age": personne.get("Age"),
+                        "profil_passerelle": personne.get("profil_passerelle"),
+                    })
+
+        documents_absents = {}
+        for version, magasin in magasins.items():
+            absents = [cle for cle in self.cles() if not magasin.contenu(cle)]
+            if absents:
+                documents_absents[version] = absents
+
+        self.couverture = {
+            "personnages": nb_personnages,
+            "personnages_sans_document": sans_document,
+            "documents_absents": documents_absents,
+        }
+        return self.couverture
+
+
+def charger_personnages(chemin: str = CHEMIN_PERSONNAGES) -> Dict[str, Any]:
+    """Jeu de personnages (vide si le fichier est absent ou invalide)"""
+    try:
+        with open(chemin, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Jeu de personnages illisible ({chemin}): {e}")
+        return {}
+
+
+# Instance globale
+_table_profils: Optional[TableDocumentsProfils] = None
+
+
+def init_table_profils(magasins: Dict[str, Any], chemin_personnages: str = CHEMIN_PERSONNAGES) -> TableDocumentsProfils:
+    """
+    Construit la table et signale ses lacunes (appelé dans le lifespan, après le chargement du corpus)
+
+    Args:
+        magasins: Version du corpus → magasin de documents
+        chemin_personnages: Jeu de personnages confronté à la table
+    """
+    global _table_profils
+    table = TableDocumentsProfils()
+    couverture = table.verifier_couverture(charger_personnages(chemin_personnages), magasins)
+
+    for personne in couverture["personnages_sans_document"]:
+        logger.warning(
+            f"Aucun document profil pour {personne['nom']} ({personne['type_de_personne']}, "
+            f"{personne['profil_passerelle']}, {personne['age']} ans)"
+        )
+    for version, absents in couverture["documents_absents"].items():
+        logger.warning(f"Documents profil absents ou vides du corpus {version}: {', '.join(absents)}")
+
+    _table_profils = table
+    return _table_profils
+
+
+def get_table_profils() -> TableDocumentsProfils:
+    """Retourne la table des documents de profil (créée à la demande, sans vérification)"""
+    global _table_profils
+    if _table_profils is None:
+        _table_profils = TableDocumentsProfils()
+    return _table_profils
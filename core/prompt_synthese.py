@@ -5,23 +5,147 @@
 Module pour la gestion du prompt de synthèse des conversations
 Contient les templates et fonctions pour construire le prompt d'évaluation
 Version améliorée avec évaluation plus stricte des erreurs factuelles
+
+La partie statique du prompt (mission, format JSON, instructions, documents
+de référence) est rendue une seule fois par (version du corpus, version du
+prompt) et gardée comme squelette : une synthèse ne fait plus que le rendu
+du profil et de la conversation.
+
+En mode parallèle, chaque dimension de la vision détaillée est évaluée par
+un appel distinct qui ne reçoit que les documents utiles à cette dimension,
+puis un appel léger produit la synthèse et les recommandations.
 """
+import json
+import threading
+from collections import OrderedDict
+
+from .comptabilite_tokens import comptabiliser_prompt, retirer
+
+# Version des templates du prompt de synthèse (à changer à chaque modification des templates)
+VERSION_PROMPT_SYNTHESE = "2025.10"
+
+# Nombre maximal de squelettes gardés (versions du corpus x variantes du prompt)
+MAX_SQUELETTES = 32
+
+# Documents de référence insérés dans le prompt
+CLES_DOCUMENTS_PROMPT = (
+    "description_offre",
+    "infos_commerciales",
+    "methodes_commerciales_recommendees",
+    "cg_vocabulaire",
+    "cg_garanties",
+    "cg_garanties_assistance",
+    "cg_contrat",
+    "tmgf",
+    "traitement_objections",
+    "exemples_remboursement",
+    "charte_relation_client",
+)
+
+# Dimensions de la vision détaillée
+DIMENSIONS_SYNTHESE = (
+    "maitrise_produit_technique",
+    "decouverte_client_relationnel_conclusion",
+    "traitement_objections_argumentation",
+    "cross_selling_opportunites",
+    "posture_charte_relation_client",
+)
+
+# Mode parallèle : intitulé et critères de chaque dimension
+CRITERES_DIMENSIONS = {
+    "maitrise_produit_technique": (
+        "Maîtrise produit & technique",
+        """- Exactitude ABSOLUE des infos sur l'offre GSA3 et garanties.
+    - Adapter les propositions au profil.
+    - Ne pas détailler inutilement les aspects techniques.
+    - ⚠️ UNE SEULE ERREUR FACTUELLE = niveau "À améliorer" AUTOMATIQUE.""",
+    ),
+    "decouverte_client_relationnel_conclusion": (
+        "Découverte client, relationnel & conclusion",
+        """- Pertinence des questions.
+    - Courtoisie, empathie, professionnalisme.
+    - Personnalisation et qualité d'écoute.""",
+    ),
+    "traitement_objections_argumentation": (
+        "Traitement des objections & argumentation",
+        """- Détection et reformulation.
+    - Utilisation de la méthode A.C.T.E.
+    - Arguments adaptés et concrets.""",
+    ),
+    "cross_selling_opportunites": (
+        "Cross-selling & opportunités",
+        """- Détecter besoins complémentaires.
+    - Proposer produits pertinents Groupama.
+    - Identifier les opportunités manquées au regard du document profil client.""",
+    ),
+    "posture_charte_relation_client": (
+        "Posture & respect de la charte relation client",
+        """- Empathie, adaptation, facilitation, esprit collectif.""",
+    ),
+}
+
+# Mode parallèle : documents de référence transmis à chaque dimension
+DOCUMENTS_PAR_DIMENSION = {
+    "maitrise_produit_technique": (
+        "description_offre",
+        "tmgf",
+        "exemples_remboursements",
+        "cg_vocabulaire",
+        "cg_garanties",
+        "cg_garanties_assistance",
+        "cg_contrat",
+    ),
+    "decouverte_client_relationnel_conclusion": (
+        "methodes_commerciales_recommendees",
+        "infos_commerciales",
+    ),
+    "traitement_objections_argumentation": (
+        "traitement_objections",
+        "methodes_commerciales_recommendees",
+        "description_offre",
+    ),
+    "cross_selling_opportunites": (
+        "description_offre",
+        "infos_commerciales",
+    ),
+    "posture_charte_relation_client": (
+        "charte_relation_client",
+        "methodes_commerciales_recommendees",
+    ),
+}
 
-from datetime import datetime
+# Pré-évaluation en cours d'entretien : documents utiles aux erreurs factuelles et aux objections
+CLES_DOCUMENTS_PRE_EVALUATION = tuple(dict.fromkeys(
+    DOCUMENTS_PAR_DIMENSION["maitrise_produit_technique"] + DOCUMENTS_PAR_DIMENSION["traitement_objections_argumentation"]
+))
+
+# Présentation des documents de référence (prompts par dimension et pré-évaluation)
+DESCRIPTIONS_DOCUMENTS = {
+    "description_offre": "Document officiel décrivant l'offre Groupama Santé 3 (GSA3). AUCUNE APPROXIMATION N'EST TOLÉRÉE.",
+    "tmgf": "Tableau des Montants de Garanties et Franchises - LA SOURCE DE VÉRITÉ ABSOLUE pour tous les chiffres.",
+    "exemples_remboursements": "Exemples de remboursements de l'offre GSA3.",
+    "cg_vocabulaire": "Conditions générales GSA3 : vocabulaire.",
+    "cg_garanties": "Conditions générales GSA3 : garanties.",
+    "cg_garanties_assistance": "Conditions générales GSA3 : garanties d'assistance.",
+    "cg_contrat": "Conditions générales GSA3 : vie du contrat.",
+    "methodes_commerciales_recommendees": "Méthodes commerciales recommandées par Groupama.",
+    "infos_commerciales": "Guide de formation des conseillers (démarche commerciale).",
+    "traitement_objections": "Traitement des objections (méthode A.C.T.E.).",
+    "charte_relation_client": "Charte relation client Groupama.",
+}
 
 def get_format_json():
     """
     Retourne le format JSON attendu pour la synthèse
     
     Returns:
-        str: Template JSON avec placeholder pour timestamp
+        str: Template JSON (le timestamp est renseigné après la réponse)
     """
     return """
     {
         "synthese": {
         "niveau_general": "[Très bien/Bien/Satisfaisant/À améliorer]",
-        "commentaire_global": "[Appréciation générale de la performance du conseiller]",
-        "timestamp": "TIMESTAMP_PLACEHOLDER"
+        "commentaire_global": "[Appréciation générale de la performance du conseiller]"
         },
         "vision_detaillee": {
         "maitrise_produit_technique": {
@@ -82,15 +206,16 @@ def get_format_json():
 
 def get_mission_template():
     """
-    Retourne le template de la mission d'évaluation
+    Retourne le template de la mission d'évaluation (partie statique du prompt)
     
     Returns:
-        str: Template de mission avec placeholders
+        str: Template de mission, identique pour toutes les conversations
     """
     return """
     # 🎯 Mission
     Vous êtes **coach qualité-conseil** (assurance santé Groupama).  
     À partir de l'historique d'appel, générez une **analyse concise, utile et personnalisée** au **profil client**, en vous basant sur la documentation de référence.
+    Le **profil client** et l'**historique de l'appel** sont fournis à la fin, après la documentation de référence.
 
     ### ⚖️ Principes clés
     - Adapter l'évaluation et les recommandations au **profil du client** (âge, profession, sexe, situation personnelle).
@@ -104,27 +229,6 @@ def get_mission_template():
     - ⚠️ TOUTE erreur factuelle (chiffres, garanties, structure de l'offre) est RÉDHIBITOIRE.
     
 
-    ---
-
-    # 👤 Profil client
-    - Nom: {profil_nom}  
-    - Âge: {profil_age}  
-    - Profession: {profil_profession}  
-    - Situation: {profil_situation}  
-    - Localisation: {profil_localisation}  
-    - Type de profil: {profil_type}  
-    - Profil passerelle: {profil_passerelle}  
-    - Aidant: {profil_aidant}  
-    - Contrat GMA existant: {profil_contrat_gma}  
-    - Nombre d'enfants: {profil_enfants}  
-    - Hobby: {profil_hobby}  
-
-    ---
-
-    # 📞 Contexte
-    Historique de la conversation :  
-    {historique_complet}
-
     ---
 
     # 📝 Critères d'évaluation
@@ -160,6 +264,40 @@ def get_mission_template():
     Réponds **uniquement** au format JSON suivant (aucun texte additionnel) :
     """
 
+def get_contexte_template():
+    """
+    Retourne le template du contexte de la conversation évaluée
+    (partie dynamique du prompt : profil client et historique)
+    
+    Returns:
+        str: Template de contexte avec placeholders
+    """
+    return """
+    # 👤 Profil client
+    - Nom: {profil_nom}  
+    - Âge: {profil_age}  
+    - Profession: {profil_profession}  
+    - Situation: {profil_situation}  
+    - Localisation: {profil_localisation}  
+    - Type de profil: {profil_type}  
+    - Profil passerelle: {profil_passerelle}  
+    - Aidant: {profil_aidant}  
+    - Contrat GMA existant: {profil_contrat_gma}  
+    - Nombre d'enfants: {profil_enfants}  
+    - Hobby: {profil_hobby}  
+
+    ---
+
+    # 📄 Document profil client
+    {document_profil_specifique}
+
+    ---
+
+    # 📞 Contexte
+    Historique de la conversation :  
+    {historique_complet}
+    """
+
 def get_instructions_template():
     """
     Retourne le template des instructions spécifiques
@@ -323,29 +461,351 @@ def get_documents_reference_template():
 </DocumentsReference>
 """
 
-def construire_prompt_synthese(documents_reference, historique_complet, document_profil_specifique, profil_manager):
+class SqueletteSynthese:
+    """Partie statique du prompt rendue pour un jeu de documents et un en-tête"""
+
+    __slots__ = ("prefixe", "documents")
+
+    def __init__(self, prefixe, documents):
+        self.prefixe = prefixe
+        # Références aux documents rendus : la clé du squelette repose sur leur identité
+        self.documents = documents
+
+
+_squelettes = OrderedDict()
+_squelettes_lock = threading.Lock()
+_statistiques_squelettes = {"hits": 0, "rendus": 0}
+
+
+def construire_prefixe_statique(documents_reference, entete=""):
     """
-    Construit le prompt d'évaluation en utilisant les templates externalisés
-    
+    Construit la partie statique du prompt d'évaluation
+
+    Ne dépend que des documents de référence : deux synthèses sur le même
+    corpus partagent exactement ce préfixe, ce qui permet au fournisseur de
+    réutiliser son cache de prompt.
+
+    Le préfixe est rendu une fois puis réutilisé tant que les documents sont
+    les mêmes objets : les documents d'une version du corpus sont partagés
+    par le magasin (core.documents_reference), un rechargement produit de
+    nouveaux objets et donc un nouveau squelette.
+
+    Args:
+        documents_reference (dict): Documents de référence chargés
+        entete (str): Texte placé avant la mission (en-tête JSON de la synthèse)
+
+    Returns:
+        str: En-tête, mission, format JSON, instructions et documents de référence
+    """
+    documents = tuple(documents_reference.get(cle) for cle in CLES_DOCUMENTS_PROMPT)
+    return _obtenir_squelette("complet", entete, documents, lambda: _rendre_prefixe_statique(documents_reference))
+
+
+def construire_prefixe_dimension(documents_reference, dimension, entete=""):
+    """
+    Construit la partie statique du prompt d'une dimension (mode parallèle)
+
+    Même principe que construire_prefixe_statique, limité aux critères de la
+    dimension et aux documents de DOCUMENTS_PAR_DIMENSION.
+
+    Args:
+        documents_reference (dict): Documents de référence chargés
+        dimension (str): Dimension de la vision détaillée
+        entete (str): Texte placé avant la mission
+
+    Returns:
+        str: En-tête, mission, format JSON, instructions et documents de la dimension
+    """
+    documents = tuple(documents_reference.get(cle) for cle in DOCUMENTS_PAR_DIMENSION[dimension])
+    return _obtenir_squelette(
+        dimension, entete, documents, lambda: _rendre_prefixe_dimension(documents_reference, dimension)
+    )
+
+
+def _obtenir_squelette(variante, entete, documents, rendu):
+    """Préfixe gardé pour (variante, en-tête, documents), rendu au premier appel"""
+    cle_squelette = (VERSION_PROMPT_SYNTHESE, variante, entete, tuple(id(document) for document in documents))
+
+    with _squelettes_lock:
+        squelette = _squelettes.get(cle_squelette)
+        if squelette is not None and all(a is b for a, b in zip(squelette.documents, documents)):
+            _squelettes.move_to_end(cle_squelette)
+            _statistiques_squelettes["hits"] += 1
+            return squelette.prefixe
+
+    prefixe = entete + rendu()
+
+    with _squelettes_lock:
+        _squelettes[cle_squelette] = SqueletteSynthese(prefixe, documents)
+        _squelettes.move_to_end(cle_squelette)
+        while len(_squelettes) > MAX_SQUELETTES:
+            _squelettes.popitem(last=False)
+        _statistiques_squelettes["rendus"] += 1
+    return prefixe
+
+
+def statistiques_squelettes():
+    """
+    Utilisation des squelettes du prompt de synthèse
+
+    Returns:
+        dict: Squelettes gardés, réutilisations et rendus
+    """
+    with _squelettes_lock:
+        return {
+            "version_prompt": VERSION_PROMPT_SYNTHESE,
+            "squelettes": len(_squelettes),
+            "caracteres": sum(len(squelette.prefixe) for squelette in _squelettes.values()),
+            **_statistiques_squelettes,
+        }
+
+
+def vider_squelettes():
+    """Oublie les squelettes rendus (le prochain appel refait le rendu)"""
+    with _squelettes_lock:
+        _squelettes.clear()
+
+
+def _rendre_prefixe_statique(documents_reference):
+    """Rendu complet de la partie statique (sans cache)"""
+    # Le timestamp de la synthèse est renseigné après la réponse, pas dans le prompt
+    format_json = get_format_json()
+
+    mission = get_mission_template()
+    instructions = get_instructions_template()
+
+    documents_ref = get_documents_reference_template().format(
+        doc_description_offre=documents_reference.get('description_offre', 'Non disponible'),
+        doc_infos_commerciales=documents_reference.get('infos_commerciales', 'Non disponible'),
+        doc_methodes_commerciales_recommendees=documents_reference.get('methodes_commerciales_recommendees', 'Non disponible'),
+        doc_cg_vocabulaire=documents_reference.get('cg_vocabulaire', 'Non disponible'),
+        doc_cg_garanties=documents_reference.get('cg_garanties', 'Non disponible'),
+        doc_cg_garanties_assistance=documents_reference.get('cg_garanties_assistance', 'Non disponible'),
+        doc_cg_contrat=documents_reference.get('cg_contrat', 'Non disponible'),
+        doc_tmgf=documents_reference.get('tmgf', 'Non disponible'),
+        doc_traitement_objections=documents_reference.get('traitement_objections', 'Non disponible'),
+        doc_exemples_remboursement=documents_reference.get('exemples_remboursement', 'Non disponible'),
+        doc_charte_relation_client=documents_reference.get('charte_relation_client', 'Non disponible')
+    )
+
+    return mission + format_json + instructions + documents_ref
+
+def get_format_json_dimension(dimension):
+    """
+    Retourne le format JSON attendu pour une dimension (mode parallèle)
+
+    Returns:
+        str: Extrait de get_format_json limité à la dimension
+    """
+    format_complet = json.loads(get_format_json())
+    return json.dumps({dimension: format_complet["vision_detaillee"][dimension]}, ensure_ascii=False, indent=4)
+
+def get_format_json_synthese_globale():
+    """
+    Retourne le format JSON attendu pour la synthèse globale (mode parallèle)
+
+    Returns:
+        str: Extrait de get_format_json sans la vision détaillée ni le timestamp
+    """
+    format_complet = json.loads(get_format_json())
+    format_complet["synthese"].pop("timestamp", None)
+    return json.dumps(
+        {"synthese": format_complet["synthese"], "recommandations": format_complet["recommandations"]},
+        ensure_ascii=False,
+        indent=4
+    )
+
+def get_mission_dimension_template():
+    """
+    Retourne le template de la mission d'évaluation d'une seule dimension
+
+    Returns:
+        str: Template de mission avec placeholders (intitulé et critères de la dimension)
+    """
+    return """
+    # 🎯 Mission
+    Vous êtes **coach qualité-conseil** (assurance santé Groupama).
+    À partir de l'historique d'appel, évaluez **uniquement la dimension "{titre}"** de la performance du conseiller,
+    de façon concise, utile et personnalisée au **profil client**, en vous basant sur la documentation de référence.
+    Le **profil client** et l'**historique de l'appel** sont fournis à la fin, après la documentation de référence.
+
+    ### ⚖️ Principes clés
+    - Adapter l'évaluation au **profil du client** (âge, profession, sexe, situation personnelle).
+    - ✅ Privilégier simplicité, naturel, respect des refus, et conseils actionnables.
+    - ❌ Interdit : ton moralisateur ou infantilisant.
+    - ⚠️ CRITIQUE: Vérifier que les informations fournies sont EXACTES et correspondent STRICTEMENT aux documents de référence.
+
+    ---
+
+    # 📝 Critères d'évaluation : {titre}
+    Niveaux : **"Très bien" / "Bien" / "Satisfaisant" / "À améliorer"**
+    {criteres}
+
+    ---
+
+    # 📤 Format de réponse attendu
+    Réponds **uniquement** au format JSON suivant (aucun texte additionnel) :
+    """
+
+def get_mission_synthese_globale_template():
+    """
+    Retourne le template de la mission de synthèse globale (mode parallèle)
+
+    Returns:
+        str: Mission et format JSON de la synthèse globale
+    """
+    return """
+    # 🎯 Mission
+    Vous êtes **coach qualité-conseil** (assurance santé Groupama).
+    Les 5 dimensions de la performance du conseiller ont déjà été évaluées (fournies à la fin).
+    À partir de ces évaluations et du **profil client**, produisez l'appréciation générale
+    et les recommandations prioritaires, sans réévaluer les dimensions.
+
+    ### ⚖️ Principes clés
+    - Une erreur factuelle relevée en maîtrise produit ne peut JAMAIS être compensée par des qualités relationnelles.
+    - Recommandations concrètes, actionnables et adaptées au profil client.
+    - Il FAUT ETRE LE MOINS VERBEUX POSSIBLE, et aller droit au but.
+
+    ---
+
+    # 📤 Format de réponse attendu
+    Réponds **uniquement** au format JSON suivant (aucun texte additionnel) :
+    """ + get_format_json_synthese_globale()
+
+def get_contexte_synthese_globale_template():
+    """
+    Retourne le template du contexte de la synthèse globale (mode parallèle)
+
+    Returns:
+        str: Template avec placeholders (profil client et évaluations des dimensions)
+    """
+    return """
+    # 👤 Profil client
+    - Nom: {profil_nom}
+    - Âge: {profil_age}
+    - Profession: {profil_profession}
+    - Situation: {profil_situation}
+    - Type de profil: {profil_type}
+    - Contrat GMA existant: {profil_contrat_gma}
+
+    ---
+
+    # 📊 Évaluations par dimension
+    {evaluations}
+    """
+
+def _rendre_prefixe_dimension(documents_reference, dimension):
+    """Rendu complet de la partie statique d'une dimension (sans cache)"""
+    titre, criteres = CRITERES_DIMENSIONS[dimension]
+    mission = get_mission_dimension_template().format(titre=titre, criteres=criteres)
+    documents_ref = _rendre_documents(documents_reference, DOCUMENTS_PAR_DIMENSION[dimension])
+
+    return mission + get_format_json_dimension(dimension) + get_instructions_template() + documents_ref
+
+def _rendre_documents(documents_reference, cles):
+    """Bloc <DocumentsReference> limité aux documents demandés"""
+    blocs = []
+    for cle in cles:
+        blocs.append(
+            f'    <Document nom="{cle}">\n'
+            f'        <description>{DESCRIPTIONS_DOCUMENTS.get(cle, "")}</description>\n'
+            f'        <contenu>\n{documents_reference.get(cle, "Non disponible")}\n        </contenu>\n'
+            f'    </Document>'
+        )
+    return "\n<DocumentsReference>\n" + "\n".join(blocs) + "\n</DocumentsReference>\n"
+
+def get_mission_pre_evaluation_template():
+    """
+    Retourne le template de la pré-évaluation d'un segment de conversation
+
+    Returns:
+        str: Mission et format JSON de la pré-évaluation
+    """
+    return """
+    # 🎯 Mission
+    Vous êtes **coach qualité-conseil** (assurance santé Groupama).
+    L'entretien est en cours : vous pré-évaluez **uniquement les nouveaux échanges** fournis à la fin
+    (le résumé des échanges précédents n'est là que pour le contexte). Cette pré-évaluation sera
+    consolidée dans l'évaluation finale de l'entretien.
+
+    ### ⚖️ Principes clés
+    - ⚠️ CRITIQUE: relever TOUTE information du conseiller contredite par les documents de référence
+      (chiffres, garanties, structure de l'offre). Le TMGF fait autorité pour TOUS les chiffres.
+    - Relever chaque objection du client et la façon dont le conseiller l'a traitée (méthode A.C.T.E.).
+    - Citer les numéros des échanges concernés. Être le moins verbeux possible.
+
+    # 📤 Format de réponse attendu
+    Réponds **uniquement** au format JSON suivant (aucun texte additionnel) :
+    {
+        "resume": "[Résumé factuel des nouveaux échanges en 2 phrases maximum]",
+        "erreurs_factuelles": ["[NN] Erreur du conseiller → information exacte selon les documents"],
+        "objections": [
+            {"objection": "[NN] Objection du client", "traitement": "Réponse du conseiller", "appreciation": "[Bien traitée/Partiellement traitée/Non traitée]"}
+        ],
+        "points_positifs": ["[NN] Ce qui a été bien fait"],
+        "points_negatifs": ["[NN] Ce qui a été mal fait ou manqué"]
+    }
+    """
+
+def construire_prefixe_pre_evaluation(documents_reference, entete=""):
+    """
+    Construit la partie statique du prompt de pré-évaluation (core.pre_evaluation)
+
     Args:
         documents_reference (dict): Documents de référence chargés
+        entete (str): Texte placé avant la mission
+
+    Returns:
+        str: En-tête, mission, format JSON et documents utiles aux erreurs factuelles et objections
+    """
+    documents = tuple(documents_reference.get(cle) for cle in CLES_DOCUMENTS_PRE_EVALUATION)
+    return _obtenir_squelette(
+        "pre_evaluation",
+        entete,
+        documents,
+        lambda: get_mission_pre_evaluation_template() + _rendre_documents(documents_reference, CLES_DOCUMENTS_PRE_EVALUATION)
+    )
+
+def construire_contexte_synthese_globale(vision_detaillee, profil_manager):
+    """
+    Construit le contexte de la synthèse globale (mode parallèle)
+
+    Args:
+        vision_detaillee (dict): Évaluations des 5 dimensions
+        profil_manager: Manager des profils clients
+
+    Returns:
+        str: Profil client et évaluations des dimensions
+    """
+    profil_info = _extraire_infos_profil(profil_manager)
+
+    return get_contexte_synthese_globale_template().format(
+        evaluations=json.dumps(vision_detaillee, ensure_ascii=False, indent=2),
+        profil_nom=profil_info['nom'],
+        profil_age=profil_info['age'],
+        profil_profession=profil_info['profession'],
+        profil_situation=profil_info['situation_maritale'],
+        profil_type=profil_info['type_personne'],
+        profil_contrat_gma=profil_info['a_deja_contrat_gma']
+    )
+
+def construire_suffixe_dynamique(historique_complet, document_profil_specifique, profil_manager):
+    """
+    Construit la partie dynamique du prompt d'évaluation (propre à la conversation)
+
+    Args:
         historique_complet (str): Historique de la conversation
         document_profil_specifique (str): Document spécifique au profil client
         profil_manager: Manager des profils clients
-        
+
     Returns:
-        str: Prompt d'évaluation complet
+        str: Profil client, document profil et historique de la conversation
     """
-    # Récupérer les informations du profil client
     profil_info = _extraire_infos_profil(profil_manager)
-    
-    # Récupérer et formater le JSON avec timestamp
-    format_json = get_format_json()
-    format_json = format_json.replace("TIMESTAMP_PLACEHOLDER", datetime.now().isoformat())
-    
-    # Construire la partie mission avec les infos du profil
-    mission = get_mission_template().format(
+
+    return get_contexte_template().format(
         historique_complet=historique_complet,
+        document_profil_specifique=document_profil_specifique if document_profil_specifique else 'Profil générique',
         profil_nom=profil_info['nom'],
         profil_age=profil_info['age'],
         profil_profession=profil_info['profession'],
@@ -357,32 +817,84 @@ def construire_prompt_synthese(documents_reference, historique_complet, document
         profil_contrat_gma=profil_info['a_deja_contrat_gma'],
         profil_enfants=profil_info['nombre_enfants'],
         profil_hobby=profil_info['hobby']
-
-    )
-    
-    # Instructions
-    instructions = get_instructions_template()
-    
-    # Documents de référence
-    documents_ref = get_documents_reference_template().format(
-        doc_description_offre=documents_reference.get('description_offre', 'Non disponible'),
-        doc_infos_commerciales=documents_reference.get('infos_commerciales', 'Non disponible'),
-        doc_methodes_commerciales_recommendees=documents_reference.get('methodes_commerciales_recommendees', 'Non disponible'),
-        doc_cg_vocabulaire=documents_reference.get('cg_vocabulaire', 'Non disponible'),
-        doc_cg_garanties=documents_reference.get('cg_garanties', 'Non disponible'),
-        doc_cg_garanties_assistance=documents_reference.get('cg_garanties_assistance', 'Non disponible'),
-        doc_cg_contrat=documents_reference.get('cg_contrat', 'Non disponible'),
-        doc_tmgf=documents_reference.get('tmgf', 'Non disponible'),
-        document_profil_specifique=document_profil_specifique if document_profil_specifique else 'Profil générique',
-        doc_traitement_objections=documents_reference.get('traitement_objections', 'Non disponible'),
-        doc_exemples_remboursement=documents_reference.get('exemples_remboursement', 'Non disponible'),
-        doc_charte_relation_client=documents_reference.get('charte_relation_client', 'Non disponible')
     )
+
+def construire_prompt_synthese(documents_reference, historique_complet, document_profil_specifique, profil_manager):
+    """
+    Construit le prompt d'évaluation en utilisant les templates externalisés
+
+    Le prompt est composé d'un préfixe statique (mission, format JSON,
+    instructions, documents de référence) suivi d'un suffixe dynamique
+    (profil client, conversation).
     
-    # Assembler toutes les parties du prompt
-    prompt = mission + format_json + instructions + documents_ref
+    Args:
+        documents_reference (dict): Documents de référence chargés
+        historique_complet (str): Historique de la conversation
+        document_profil_specifique (str): Document spécifique au profil client
+        profil_manager: Manager des profils clients
+        
+    Returns:
+        str: Prompt d'évaluation complet
+    """
+    suffixe = construire_suffixe_dynamique(historique_complet, document_profil_specifique, profil_manager)
+    comptabiliser_prompt_synthese(documents_reference, historique_complet, document_profil_specifique, suffixe)
+    return construire_prefixe_statique(documents_reference) + suffixe
+
+def parties_partagees_prompt_synthese(documents_reference, document_profil_specifique="", entete=""):
+    """
+    Parties du prompt de synthèse communes à plusieurs synthèses
 
-    return prompt
+    Utilisées pour sauvegarder le prompt sous forme de manifeste
+    (core.stockage_blobs) : ces parties sont stockées une seule fois.
+
+    Args:
+        documents_reference (dict): Documents de référence insérés dans le prompt
+        document_profil_specifique (str): Document spécifique au profil client
+        entete (str): En-tête placé avant la mission
+
+    Returns:
+        dict: Nom de la partie → texte
+    """
+    parties = {
+        "entete": entete,
+        "mission": get_mission_template(),
+        "format_json": get_format_json(),
+        "instructions": get_instructions_template(),
+    }
+    for cle in CLES_DOCUMENTS_PROMPT:
+        parties[f"document.{cle}"] = documents_reference.get(cle) or ""
+    parties["document_profil"] = document_profil_specifique or ""
+    return parties
+
+def comptabiliser_prompt_synthese(documents_reference, historique_complet, document_profil_specifique, suffixe,
+                                  entete="", **contexte):
+    """
+    Compte les tokens du prompt de synthèse par section (core.comptabilite_tokens)
+
+    Args:
+        documents_reference (dict): Documents de référence insérés dans le prompt
+        historique_complet (str): Historique de la conversation
+        document_profil_specifique (str): Document spécifique au profil client
+        suffixe (str): Partie dynamique rendue (construire_suffixe_dynamique)
+        entete (str): En-tête placé avant la mission
+        **contexte: Champs ajoutés à l'entrée de journal
+
+    Returns:
+        dict: Tokens par section
+    """
+    sections = {
+        "entete": entete,
+        "mission": get_mission_template(),
+        "format_json": get_format_json(),
+        "instructions": get_instructions_template(),
+        "documents_balises": get_documents_reference_template(),
+    }
+    for cle in CLES_DOCUMENTS_PROMPT:
+        sections[f"document.{cle}"] = documents_reference.get(cle, 'Non disponible')
+    sections["profil"] = retirer(suffixe, historique_complet, document_profil_specifique)
+    sections["document_profil"] = document_profil_specifique
+    sections["conversation"] = historique_complet
+    return comptabiliser_prompt("synthese", sections, **contexte)
 
 def _extraire_infos_profil(profil_manager):
     """
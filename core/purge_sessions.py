@@ -0,0 +1,171 @@
+"""
+Purge périodique des sessions et des journaux de conversation expirés
+
+Une session expirée n'est supprimée à la lecture que si son cookie revient :
+les sessions abandonnées (navigateur fermé, stagiaire parti) restaient dans
+le stockage. La purge parcourait auparavant tout le répertoire des sessions
+sur le FileShare et consultait la date de chaque fichier à chaque passage
+(AzureFileShareSync.clean_old_sessions), en supprimant au fil de l'eau dans
+le thread de synchronisation.
+
+La purge ne lit désormais que les candidats de l'index des expirations de
+chaque stockage (tranches passées pour les fichiers, index SQLite) et
+supprime par lots, plusieurs lots en parallèle au plus (concurrence bornée),
+depuis une tâche de fond. Chaque passage rapporte son débit.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeSessions:
+    """Tâche de fond supprimant par lots les éléments expirés de stockages (sessions, journaux)"""
+
+    def __init__(
+        self,
+        stockages: Dict[str, Any],
+        intervalle_secondes: int = 300,
+        taille_lot: int = 200,
+        concurrence: int = 4,
+        max_par_passage: int = 5000,
+    ):
+        """
+        Args:
+            stockages: Nom → stockage (candidats_expires, purger_lot)
+            intervalle_secondes: Délai entre deux passages
+            taille_lot: Éléments par lot de suppression
+            concurrence: Lots supprimés en parallèle au plus
+            max_par_passage: Candidats examinés au plus par stockage et par passage
+        """
+        self.stockages = stockages
+        self.intervalle_secondes = intervalle_secondes
+        self.taille_lot = max(1, taille_lot)
+        self.concurrence = max(1, concurrence)
+        self.max_par_passage = max_par_passage
+        self._tache: Optional[asyncio.Task] = None
+        self._statistiques = {
+            "passages": 0,
+            "examines": 0,
+            "supprimes": 0,
+            "dernier_passage": None,
+        }
+
+    async def _purger_stockage(self, stockage: Any, maintenant: float) -> Dict[str, Any]:
+        """Supprime les candidats expirés d'un stockage, lot par lot"""
+        candidats = await asyncio.to_thread(stockage.candidats_expires, maintenant, self.max_par_passage)
+        lots = [candidats[i:i + self.taille_lot] for i in range(0, len(candidats), self.taille_lot)]
+        semaphore = asyncio.Semaphore(self.concurrence)
+
+        async def purger(lot: List[Any]) -> int:
+            async with semaphore:
+                return await asyncio.to_thread(stockage.purger_lot, lot, maintenant)
+
+        supprimes = sum(await asyncio.gather(*(purger(lot) for lot in lots)))
+        if hasattr(stockage, "index"):
+            await asyncio.to_thread(stockage.index.nettoyer_tranches, maintenant)
+        return {"examines": len(candidats), "supprimes": supprimes, "lots": len(lots)}
+
+    async def purger(self) -> Dict[str, Any]:
+        """
+        Un passage de purge sur tous les stockages
+
+        Returns:
+            dict: Par stockage, candidats examinés et éléments supprimés ;
+                  durée et débit (suppressions par seconde) du passage
+        """
+        debut = time.perf_counter()
+        maintenant = time.time()
+        resultats = {}
+        for nom, stockage in self.stockages.items():
+            try:
+                resultats[nom] = await self._purger_stockage(stockage, maintenant)
+            except Exception as e:
+                logger.error(f"Purge de {nom} en échec: {e}", exc_info=True)
+                resultats[nom] = {"erreur": str(e)}
+
+        duree = time.perf_counter() - debut
+        examines = sum(resultat.get("examines", 0) for resultat in resultats.values())
+        supprimes = sum(resultat.get("supprimes", 0) for resultat in resultats.values())
+        passage = {
+            "stockages": resultats,
+            "duree_secondes": round(duree, 3),
+            "suppressions_par_seconde": round(supprimes / duree, 1) if duree > 0 else None,
+        }
+
+        self._statistiques["passages"] += 1
+        self._statistiques["examines"] += examines
+        self._statistiques["supprimes"] += supprimes
+        self._statistiques["dernier_passage"] = passage
+        if examines:
+            logger.info(
+                f"Purge des sessions : {supprimes} supprimés sur {examines} candidats en {duree:.2f}s "
+                f"({passage['suppressions_par_seconde']}/s)"
+            )
+        return passage
+
+    async def _boucle(self) -> None:
+        # Stockages par fichiers antérieurs à l'index : indexés une fois au premier passage
+        for nom, stockage in self.stockages.items():
+            if hasattr(stockage, "indexer_existants"):
+                try:
+                    indexes = await asyncio.to_thread(stockage.indexer_existants)
+                    if indexes:
+                        logger.info(f"{indexes} éléments existants de {nom} ajoutés à l'index des expirations")
+                except Exception as e:
+                    logger.error(f"Indexation des expirations de {nom} en échec: {e}")
+
+        while True:
+            try:
+                await self.purger()
+            except Exception as e:
+                logger.error(f"Erreur de la purge des sessions: {e}", exc_info=True)
+            await asyncio.sleep(self.intervalle_secondes)
+
+    def demarrer(self) -> None:
+        """Lance la tâche de purge (boucle asyncio courante)"""
+        if self._tache is None and self.intervalle_secondes > 0 and self.stockages:
+            self._tache = asyncio.create_task(self._boucle())
+
+    async def arreter(self) -> None:
+        """Arrête la tâche de purge"""
+        if self._tache is not None:
+            self._tache.cancel()
+            await asyncio.gather(self._tache, return_exceptions=True)
+            self._tache = None
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {
+            "intervalle_secondes": self.intervalle_secondes,
+            "taille_lot": self.taille_lot,
+            "concurrence": self.concurrence,
+            "stockages": list(self.stockages),
+            **self._statistiques,
+        }
+
+
+# Instance globale
+_purge_sessions: Optional[PurgeSessions] = None
+
+
+def init_purge_sessions(stockages: Dict[str, Any], **options) -> PurgeSessions:
+    """Crée et démarre la purge (appelé dans le lifespan)"""
+    global _purge_sessions
+    _purge_sessions = PurgeSessions(stockages, **options)
+    _purge_sessions.demarrer()
+    return _purge_sessions
+
+
+def get_purge_sessions() -> Optional[PurgeSessions]:
+    """Retourne la purge (None si elle n'a pas été démarrée)"""
+    return _purge_sessions
+
+
+async def shutdown_purge_sessions() -> None:
+    """Arrête la purge"""
+    global _purge_sessions
+    if _purge_sessions is not None:
+        await _purge_sessions.arreter()
+        _purge_sessions = None
@@ -0,0 +1,271 @@
+"""
+Registre des versions du corpus documentaire
+
+data/txt contient plusieurs générations du corpus (racine, v1_20250625,
+v2_20250911). Chaque version est décrite par un manifeste manifest.json dans
+son répertoire :
+
+    {
+      "version": "v2_20250911",
+      "description": "...",
+      "documents": {"description_offre": "description_offre.txt", ...},
+      "profils": {"profil_aidants": "profil_aidants.txt", ...}
+    }
+
+Les clés sont celles attendues par les prompts, les fichiers sont relatifs au
+répertoire du manifeste. Publier un nouveau corpus revient à déposer un
+répertoire avec son manifeste : aucune modification de code.
+
+Toutes les versions sont préchargées au démarrage (un magasin par version,
+contenus identiques partagés entre versions). Chaque session est rattachée à
+une version (défaut, ou déploiement progressif sur un pourcentage
+d'utilisateurs) et la conserve : aucune lecture de fichier par requête.
+"""
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, MutableMapping, Optional
+
+from .documents_reference import (
+    FICHIERS_PROFILS,
+    FICHIERS_REFERENCE,
+    INTERVALLE_VERIFICATION_DEFAUT,
+    MagasinDocuments,
+)
+
+logger = logging.getLogger(__name__)
+
+REPERTOIRE_CORPUS_DEFAUT = "data/txt"
+NOM_MANIFESTE = "manifest.json"
+
+# Version du corpus historique (fichiers à la racine de data/txt)
+VERSION_RACINE = "racine"
+
+# Clé de session de la version rattachée
+CLE_SESSION_VERSION = "corpus_version"
+
+
+class ManifesteCorpus:
+    """Description d'une version du corpus"""
+
+    def __init__(self, version: str, documents: Dict[str, str], profils: Dict[str, str], description: str = ""):
+        self.version = version
+        self.documents = dict(documents)
+        self.profils = dict(profils)
+        self.description = description
+
+    @classmethod
+    def depuis_fichier(cls, chemin: str) -> "ManifesteCorpus":
+        """
+        Lit un manifeste ; les fichiers sont résolus par rapport à son répertoire
+
+        Raises:
+            ValueError: Manifeste sans version ni documents
+        """
+        with open(chemin, "r", encoding="utf-8") as f:
+            donnees = json.load(f)
+
+        repertoire = os.path.dirname(chemin)
+        version = donnees.get("version") or os.path.basename(repertoire)
+        documents = donnees.get("documents") or {}
+        if not documents:
+            raise ValueError(f"Manifeste sans documents: {chemin}")
+        return cls(
+            version,
+            {cle: os.path.join(repertoire, fichier) for cle, fichier in documents.items()},
+            {cle: os.path.join(repertoire, fichier) for cle, fichier in (donnees.get("profils") or {}).items()},
+            donnees.get("description", ""),
+        )
+
+    def fichiers(self) -> Dict[str, str]:
+        """Tous les fichiers de la version (documents puis profils)"""
+        return {**self.documents, **self.profils}
+
+
+def parser_deploiement_corpus(valeur: str) -> Dict[str, int]:
+    """
+    Lit la configuration "version=pourcentage,version=pourcentage"
+
+    Returns:
+        dict: Pourcentage d'utilisateurs par version
+    """
+    deploiement = {}
+    for element in (valeur or "").split(","):
+        if "=" not in element:
+            continue
+        version, pourcentage = element.split("=", 1)
+        try:
+            deploiement[version.strip()] = max(0, min(100, int(pourcentage)))
+        except ValueError:
+            logger.warning(f"Déploiement de corpus invalide ignoré: {element}")
+    return deploiement
+
+
+class RegistreCorpus:
+    """Versions du corpus préchargées et rattachement des sessions"""
+
+    def __init__(
+        self,
+        repertoire: str = REPERTOIRE_CORPUS_DEFAUT,
+        version_defaut: str = VERSION_RACINE,
+        deploiement: Optional[Dict[str, int]] = None,
+        intervalle_verification: float = INTERVALLE_VERIFICATION_DEFAUT,
+    ):
+        self.repertoire = repertoire
+        self.intervalle_verification = intervalle_verification
+        self._contenus_partages: Dict[str, str] = {}
+        self._manifestes = self._decouvrir()
+        self._magasins: Dict[str, MagasinDocuments] = {
+            version: MagasinDocuments(manifeste.fichiers(), intervalle_verification, self._contenus_partages)
+            for version, manifeste in self._manifestes.items()
+        }
+
+        if version_defaut not in self._manifestes:
+            logger.warning(f"Version de corpus par défaut inconnue: {version_defaut}, utilisation de {VERSION_RACINE}")
+            version_defaut = VERSION_RACINE
+        self.version_defaut = version_defaut
+
+        self.deploiement = {}
+        for version, pourcentage in (deploiement or {}).items():
+            if version in self._manifestes:
+                self.deploiement[version] = pourcentage
+            else:
+                logger.warning(f"Déploiement ignoré, version de corpus inconnue: {version}")
+        if sum(self.deploiement.values()) > 100:
+            logger.warning("Déploiement de corpus supérieur à 100 % : les dernières versions sont tronquées")
+
+    def _decouvrir(self) -> Dict[str, ManifesteCorpus]:
+        """Manifestes de data/txt et de ses sous-répertoires"""
+        manifestes = {
+            VERSION_RACINE: ManifesteCorpus(VERSION_RACINE, FICHIERS_REFERENCE, FICHIERS_PROFILS, "Corpus historique"),
+        }
+        chemins = [os.path.join(self.repertoire, NOM_MANIFESTE)]
+        chemins += sorted(glob.glob(os.path.join(self.repertoire, "*", NOM_MANIFESTE)))
+        for chemin in chemins:
+            if not os.path.isfile(chemin):
+                continue
+            try:
+                manifeste = ManifesteCorpus.depuis_fichier(chemin)
+            except Exception as e:
+                logger.error(f"Manifeste de corpus ignoré ({chemin}): {e}")
+                continue
+            manifestes[manifeste.version] = manifeste
+        logger.info(f"Versions du corpus: {', '.join(manifestes)}")
+        return manifestes
+
+    def versions(self) -> List[str]:
+        return list(self._manifestes)
+
+    def manifeste(self, version: Optional[str] = None) -> ManifesteCorpus:
+        return self._manifestes.get(version or self.version_defaut) or self._manifestes[self.version_defaut]
+
+    def magasin(self, version: Optional[str] = None) -> MagasinDocuments:
+        """Magasin de la version (version par défaut si absente ou inconnue)"""
+        return self._magasins.get(version or self.version_defaut) or self._magasins[self.version_defaut]
+
+    def precharger(self) -> None:
+        """Charge toutes les versions en mémoire"""
+        for magasin in self._magasins.values():
+            magasin.instantane
+
+    def attribuer_version(self, identifiant: str) -> str:
+        """
+        Version d'un utilisateur selon le déploiement progressif
+
+        L'attribution est déterministe : un même utilisateur obtient la même
+        version sur tous les workers.
+        """
+        if not self.deploiement or not identifiant:
+            return self.version_defaut
+        seau = int(hashlib.sha1(identifiant.encode("utf-8")).hexdigest()[:8], 16) % 100
+        cumul = 0
+        for version, pourcentage in self.deploiement.items():
+            cumul += pourcentage
+            if seau < cumul:
+                return version
+        return self.version_defaut
+
+    def version_session(self, session: MutableMapping[str, Any]) -> str:
+        """
+        Version rattachée à la session (attribuée et enregistrée au premier appel)
+
+        Une version retirée du registre est remplacée par une nouvelle attribution.
+        """
+        version = session.get(CLE_SESSION_VERSION)
+        if version not in self._manifestes:
+            version = self.attribuer_version(session.get("user_email") or session.get("user_folder") or "")
+            session[CLE_SESSION_VERSION] = version
+        return version
+
+    def demarrer_surveillance(self) -> None:
+        for magasin in self._magasins.values():
+            magasin.demarrer_surveillance()
+
+    async def arreter(self) -> None:
+        await asyncio.gather(*(magasin.arreter() for magasin in self._magasins.values()))
+
+    def statistiques(self) -> Dict[str, Any]:
+        """
+        Versions, déploiement et métriques de chaque magasin
+
+        Returns:
+            dict: {"version_defaut", "deploiement", "contenus_distincts", "versions": {...}}
+        """
+        return {
+            "version_defaut": self.version_defaut,
+            "deploiement": dict(self.deploiement),
+            "contenus_distincts": len(self._contenus_partages),
+            "caracteres_distincts": sum(len(contenu) for contenu in self._contenus_partages.values()),
+            "versions": {
+                version: {
+                    "description": self._manifestes[version].description,
+                    **magasin.statistiques(),
+                }
+                for version, magasin in self._magasins.items()
+            },
+        }
+
+
+# Instance globale
+_registre: Optional[RegistreCorpus] = None
+
+
+def init_registre_corpus(
+    repertoire: str = REPERTOIRE_CORPUS_DEFAUT,
+    version_defaut: str = VERSION_RACINE,
+    deploiement: Optional[Dict[str, int]] = None,
+    intervalle_verification: float = INTERVALLE_VERIFICATION_DEFAUT,
+) -> RegistreCorpus:
+    """Initialise le registre du corpus (appelé dans le lifespan de l'application)"""
+    global _registre
+    if _registre is None:
+        _registre = RegistreCorpus(repertoire, version_defaut, deploiement, intervalle_verification)
+    return _registre
+
+
+def get_registre_corpus() -> RegistreCorpus:
+    """Retourne le registre du corpus (créé à la demande, sans surveillance)"""
+    if _registre is None:
+        return init_registre_corpus()
+    return _registre
+
+
+def get_documents_reference(version: Optional[str] = None) -> MagasinDocuments:
+    """Magasin de documents d'une version du corpus (version par défaut si None)"""
+    return get_registre_corpus().magasin(version)
+
+
+def version_corpus_session(session: MutableMapping[str, Any]) -> str:
+    """Version du corpus rattachée à la session"""
+    return get_registre_corpus().version_session(session)
+
+
+async def shutdown_registre_corpus() -> None:
+    """Arrête la surveillance des fichiers et libère le registre"""
+    global _registre
+    if _registre is not None:
+        await _registre.arreter()
+        _registre = None
@@ -0,0 +1,467 @@
+"""
+Couche de résilience des appels Azure OpenAI
+
+Tous les appels chat.completions passent par appel_llm / appel_llm_async :
+
+- nouvelles tentatives sur les erreurs transitoires (429, 408, 5xx, timeouts,
+  erreurs réseau) avec backoff exponentiel et jitter ;
+- respect de l'en-tête Retry-After (retry-after-ms / retry-after) des 429 ;
+- disjoncteur par déploiement : après plusieurs échecs consécutifs, les
+  appels échouent immédiatement pendant un délai, puis un appel test décide
+  de la refermeture ;
+- échéance : chaque tentative reçoit comme timeout le temps restant du
+  budget de la requête en cours (echeance_llm), aucune pause n'est faite si
+  elle dépasse ce budget ;
+- routage : avec un rôle (role="client"...), chaque tentative est envoyée au
+  déploiement le plus sain du pool du rôle (core.routeur_deploiements) ; une
+  erreur transitoire est réessayée sans attendre sur un autre déploiement.
+
+Le client partagé est créé avec max_retries=0 : les tentatives ne sont pas
+doublées par celles du SDK.
+"""
+import asyncio
+import contextvars
+import email.utils
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Set, Tuple
+
+import openai
+
+from .routeur_deploiements import get_routeur_deploiements
+
+logger = logging.getLogger(__name__)
+
+# États du disjoncteur
+ETAT_FERME = "ferme"
+ETAT_OUVERT = "ouvert"
+ETAT_SEMI_OUVERT = "semi_ouvert"
+
+# Codes HTTP pour lesquels une nouvelle tentative a un sens
+CODES_TRANSITOIRES = (408, 409, 429, 500, 502, 503, 504)
+
+# Timeout d'une tentative quand l'appel n'en précise pas
+TIMEOUT_APPEL_DEFAUT = 120.0
+
+# Échéance (horloge monotone) de la requête en cours
+_echeance: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("echeance_llm", default=None)
+
+
+class CircuitOuvertError(RuntimeError):
+    """Le déploiement est considéré dégradé : appel refusé sans être tenté"""
+
+
+class EcheanceDepasseeError(TimeoutError):
+    """Le budget de temps de la requête est épuisé"""
+
+
+@contextmanager
+def echeance_llm(secondes: Optional[float]):
+    """
+    Fixe le budget de temps des appels LLM du bloc (requête, job, tâche)
+
+    Une échéance imbriquée ne peut que raccourcir l'échéance englobante.
+
+    Args:
+        secondes: Budget en secondes (None : pas de limite supplémentaire)
+    """
+    if secondes is None:
+        yield
+        return
+
+    echeance = time.monotonic() + secondes
+    englobante = _echeance.get()
+    if englobante is not None:
+        echeance = min(echeance, englobante)
+    jeton = _echeance.set(echeance)
+    try:
+        yield
+    finally:
+        _echeance.reset(jeton)
+
+
+def temps_restant() -> Optional[float]:
+    """Secondes restantes avant l'échéance courante (None si aucune)"""
+    echeance = _echeance.get()
+    if echeance is None:
+        return None
+    return echeance - time.monotonic()
+
+
+def est_erreur_transitoire(erreur: BaseException) -> bool:
+    """Vrai si l'erreur justifie une nouvelle tentative"""
+    if isinstance(erreur, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(erreur, openai.APIStatusError):
+        return erreur.status_code in CODES_TRANSITOIRES
+    return isinstance(erreur, (asyncio.TimeoutError, TimeoutError, ConnectionError))
+
+
+def extraire_retry_after(erreur: BaseException) -> Optional[float]:
+    """
+    Délai demandé par le serveur avant une nouvelle tentative
+
+    Returns:
+        float: Délai en secondes, None si absent ou illisible
+    """
+    reponse = getattr(erreur, "response", None)
+    entetes = getattr(reponse, "headers", None)
+    if not entetes:
+        return None
+
+    valeur_ms = entetes.get("retry-after-ms")
+    if valeur_ms:
+        try:
+            return max(0.0, float(valeur_ms) / 1000)
+        except ValueError:
+            pass
+
+    valeur = entetes.get("retry-after")
+    if not valeur:
+        return None
+    try:
+        return max(0.0, float(valeur))
+    except ValueError:
+        pass
+    # Format date HTTP
+    try:
+        date = email.utils.parsedate_to_datetime(valeur)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class Disjoncteur:
+    """Disjoncteur d'un déploiement (fermé → ouvert → semi-ouvert → fermé)"""
+
+    def __init__(self, nom: str, seuil_echecs: int = 5, delai_reouverture: float = 30.0):
+        self.nom = nom
+        self.seuil_echecs = seuil_echecs
+        self.delai_reouverture = delai_reouverture
+        self.etat = ETAT_FERME
+        self.echecs_consecutifs = 0
+        self.ouvert_depuis: Optional[float] = None
+        self._essai_en_cours = False
+        self._lock = threading.Lock()
+
+    def autoriser(self) -> bool:
+        """Indique si un appel peut être tenté"""
+        with self._lock:
+            if self.etat == ETAT_FERME:
+                return True
+            if self.etat == ETAT_OUVERT:
+                if time.monotonic() - self.ouvert_depuis < self.delai_reouverture:
+                    return False
+                self.etat = ETAT_SEMI_OUVERT
+                self._essai_en_cours = False
+            # Semi-ouvert : un seul appel test à la fois
+            if self._essai_en_cours:
+                return False
+            self._essai_en_cours = True
+            return True
+
+    def est_disponible(self) -> bool:
+        """Indique, sans le réserver, si un appel pourrait être tenté"""
+        with self._lock:
+            if self.etat == ETAT_FERME:
+                return True
+            if self.etat == ETAT_OUVERT:
+                return time.monotonic() - self.ouvert_depuis >= self.delai_reouverture
+            return not self._essai_en_cours
+
+    def succes(self) -> None:
+        with self._lock:
+            if self.etat != ETAT_FERME:
+                logger.info(f"Disjoncteur {self.nom} refermé")
+            self.etat = ETAT_FERME
+            self.echecs_consecutifs = 0
+            self._essai_en_cours = False
+
+    def abandon(self) -> None:
+        """Appel annulé avant sa réponse : libère l'appel test sans conclure sur le déploiement"""
+        with self._lock:
+            self._essai_en_cours = False
+
+    def echec(self) -> None:
+        with self._lock:
+            self.echecs_consecutifs += 1
+            self._essai_en_cours = False
+            if self.etat == ETAT_SEMI_OUVERT or self.echecs_consecutifs >= self.seuil_echecs:
+                if self.etat != ETAT_OUVERT:
+                    logger.warning(
+                        f"Disjoncteur {self.nom} ouvert après {self.echecs_consecutifs} échecs consécutifs"
+                    )
+                self.etat = ETAT_OUVERT
+                self.ouvert_depuis = time.monotonic()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "etat": self.etat,
+                "echecs_consecutifs": self.echecs_consecutifs,
+                "ouvert_depuis_secondes": round(time.monotonic() - self.ouvert_depuis, 1)
+                if self.etat != ETAT_FERME and self.ouvert_depuis is not None else None,
+            }
+
+
+class CoucheResilienceLLM:
+    """Tentatives, backoff, disjoncteurs et échéances des appels chat.completions"""
+
+    def __init__(
+        self,
+        max_tentatives: int = 4,
+        delai_base: float = 0.5,
+        delai_max: float = 20.0,
+        seuil_echecs: int = 5,
+        delai_reouverture: float = 30.0,
+    ):
+        self.max_tentatives = max_tentatives
+        self.delai_base = delai_base
+        self.delai_max = delai_max
+        self.seuil_echecs = seuil_echecs
+        self.delai_reouverture = delai_reouverture
+        self._disjoncteurs: Dict[str, Disjoncteur] = {}
+        self._lock = threading.Lock()
+        self._compteurs = {
+            "appels": 0,
+            "nouvelles_tentatives": 0,
+            "echecs": 0,
+            "rejets_disjoncteur": 0,
+            "echeances_depassees": 0,
+        }
+
+    def disjoncteur(self, deploiement: str) -> Disjoncteur:
+        """Disjoncteur du déploiement (créé au premier appel)"""
+        with self._lock:
+            if deploiement not in self._disjoncteurs:
+                self._disjoncteurs[deploiement] = Disjoncteur(
+                    deploiement, self.seuil_echecs, self.delai_reouverture
+                )
+            return self._disjoncteurs[deploiement]
+
+    def _incrementer(self, compteur: str) -> None:
+        with self._lock:
+            self._compteurs[compteur] += 1
+
+    def _est_disponible(self, deploiement: str) -> bool:
+        with self._lock:
+            disjoncteur = self._disjoncteurs.get(deploiement)
+        return disjoncteur is None or disjoncteur.est_disponible()
+
+    def _preparer_tentative(self, params: Dict[str, Any], role: Optional[str],
+                            exclus: Set[str]) -> Tuple[Disjoncteur, Dict[str, Any]]:
+        """Choisit le déploiement, vérifie disjoncteur et échéance, et borne le timeout de la tentative"""
+        if role is not None:
+            deploiement = get_routeur_deploiements().choisir(
+                role, params.get("model"), exclus, self._est_disponible
+            )
+            params = {**params, "model": deploiement}
+
+        restant = temps_restant()
+        timeout = params.get("timeout") or TIMEOUT_APPEL_DEFAUT
+        if restant is not None:
+            if restant <= 0:
+                self._incrementer("echeances_depassees")
+                raise EcheanceDepasseeError("Budget de temps de la requête épuisé avant l'appel LLM")
+            timeout = min(timeout, restant)
+
+        disjoncteur = self.disjoncteur(params.get("model") or "inconnu")
+        if not disjoncteur.autoriser():
+            self._incrementer("rejets_disjoncteur")
+            raise CircuitOuvertError(f"Déploiement {disjoncteur.nom} indisponible (disjoncteur ouvert)")
+        return disjoncteur, {**params, "timeout": timeout}
+
+    def _delai_avant_tentative(self, tentative: int, erreur: BaseException) -> Optional[float]:
+        """
+        Pause avant la tentative suivante
+
+        Returns:
+            float: Délai en secondes, None s'il ne faut plus réessayer
+        """
+        if tentative >= self.max_tentatives or not est_erreur_transitoire(erreur):
+            return None
+
+        retry_after = extraire_retry_after(erreur)
+        if retry_after is not None:
+            delai = retry_after + random.uniform(0, self.delai_base)
+        else:
+            # Backoff exponentiel, jitter complet
+            delai = random.uniform(0, min(self.delai_max, self.delai_base * 2 ** tentative))
+
+        restant = temps_restant()
+        if restant is not None and delai >= restant:
+            logger.warning(f"Pas de nouvelle tentative : pause de {delai:.1f}s au-delà de l'échéance")
+            return None
+        return delai
+
+    def _enregistrer_succes(self, disjoncteur: Disjoncteur, debut: float) -> None:
+        disjoncteur.succes()
+        get_routeur_deploiements().fin_appel(disjoncteur.nom, time.monotonic() - debut)
+
+    def _apres_abandon(self, disjoncteur: Disjoncteur) -> None:
+        """Tentative annulée (asyncio.CancelledError, KeyboardInterrupt) : l'appel n'est plus en cours"""
+        disjoncteur.abandon()
+        get_routeur_deploiements().abandon_appel(disjoncteur.nom)
+
+    def _apres_echec(self, disjoncteur: Disjoncteur, erreur: BaseException, tentative: int, debut: float,
+                     role: Optional[str], exclus: Set[str]) -> Optional[float]:
+        """
+        Enregistre l'échec d'une tentative et décide de la suite
+
+        Returns:
+            float: Pause avant la tentative suivante, None pour abandonner
+        """
+        transitoire = est_erreur_transitoire(erreur)
+        retry_after = extraire_retry_after(erreur)
+        get_routeur_deploiements().fin_appel(
+            disjoncteur.nom,
+            time.monotonic() - debut,
+            code_http=getattr(erreur, "status_code", None),
+            erreur=True,
+            retry_after=retry_after,
+        )
+        if transitoire:
+            disjoncteur.echec()
+        else:
+            # Erreur de la requête (400, 401...) : le déploiement n'est pas en cause
+            disjoncteur.succes()
+        logger.warning(
+            f"Appel LLM {disjoncteur.nom} en échec (tentative {tentative}/{self.max_tentatives}): "
+            f"{type(erreur).__name__}: {erreur}"
+        )
+
+        delai = self._delai_avant_tentative(tentative, erreur)
+        if delai is None:
+            self._incrementer("echecs")
+            return None
+
+        self._incrementer("nouvelles_tentatives")
+        exclus.add(disjoncteur.nom)
+        if role is not None and get_routeur_deploiements().a_alternative(role, exclus, self._est_disponible):
+            # Un autre déploiement du pool peut répondre tout de suite
+            return 0.0
+        return delai
+
+    async def appeler_async(self, client, role: Optional[str] = None, **params):
+        """
+        Appel chat.completions.create asynchrone avec la politique de résilience
+
+        Avec stream=True, seule l'ouverture du flux est réessayée.
+
+        Args:
+            client: Client AsyncAzureOpenAI
+            role: Rôle logique de l'appel (routage dans le pool de déploiements),
+                  None pour appeler uniquement params["model"]
+            **params: Paramètres de chat.completions.create
+
+        Returns:
+            Réponse (ou flux) du client OpenAI
+        """
+        self._incrementer("appels")
+        exclus: Set[str] = set()
+        for tentative in range(1, self.max_tentatives + 1):
+            disjoncteur, params_tentative = self._preparer_tentative(params, role, exclus)
+            debut = time.monotonic()
+            get_routeur_deploiements().debut_appel(disjoncteur.nom)
+            try:
+                response = await client.chat.completions.create(**params_tentative)
+            except Exception as e:
+                delai = self._apres_echec(disjoncteur, e, tentative, debut, role, exclus)
+                if delai is None:
+                    raise
+                if delai:
+                    await asyncio.sleep(delai)
+                continue
+            except BaseException:
+                # Annulation (synthèse parallèle en échec, client déconnecté) : fin_appel jamais atteint
+                self._apres_abandon(disjoncteur)
+                raise
+            self._enregistrer_succes(disjoncteur, debut)
+            return response
+
+    def appeler(self, client, role: Optional[str] = None, **params):
+        """
+        Variante synchrone de appeler_async (client AzureOpenAI)
+
+        Returns:
+            Réponse du client OpenAI
+        """
+        self._incrementer("appels")
+        exclus: Set[str] = set()
+        for tentative in range(1, self.max_tentatives + 1):
+            disjoncteur, params_tentative = self._preparer_tentative(params, role, exclus)
+            debut = time.monotonic()
+            get_routeur_deploiements().debut_appel(disjoncteur.nom)
+            try:
+                response = client.chat.completions.create(**params_tentative)
+            except Exception as e:
+                delai = self._apres_echec(disjoncteur, e, tentative, debut, role, exclus)
+                if delai is None:
+                    raise
+                if delai:
+                    time.sleep(delai)
+                continue
+            except BaseException:
+                self._apres_abandon(disjoncteur)
+                raise
+            self._enregistrer_succes(disjoncteur, debut)
+            return response
+
+    def statistiques(self) -> Dict[str, Any]:
+        """
+        Compteurs et état des disjoncteurs
+
+        Returns:
+            dict: {"compteurs": {...}, "disjoncteurs": {deploiement: {...}}}
+        """
+        with self._lock:
+            compteurs = dict(self._compteurs)
+            disjoncteurs = list(self._disjoncteurs.values())
+        return {
+            "compteurs": compteurs,
+            "disjoncteurs": {disjoncteur.nom: disjoncteur.to_dict() for disjoncteur in disjoncteurs},
+        }
+
+
+# Instance globale
+_couche_resilience: Optional[CoucheResilienceLLM] = None
+
+
+def init_resilience_llm(
+    max_tentatives: int = 4,
+    delai_base: float = 0.5,
+    delai_max: float = 20.0,
+    seuil_echecs: int = 5,
+    delai_reouverture: float = 30.0,
+) -> CoucheResilienceLLM:
+    """Initialise la couche de résilience (appelé dans le lifespan de l'application)"""
+    global _couche_resilience
+    if _couche_resilience is None:
+        _couche_resilience = CoucheResilienceLLM(
+            max_tentatives=max_tentatives,
+            delai_base=delai_base,
+            delai_max=delai_max,
+            seuil_echecs=seuil_echecs,
+            delai_reouverture=delai_reouverture,
+        )
+    return _couche_resilience
+
+
+def get_resilience_llm() -> CoucheResilienceLLM:
+    """Retourne la couche de résilience (créée à la demande)"""
+    if _couche_resilience is None:
+        return init_resilience_llm()
+    return _couche_resilience
+
+
+async def appel_llm_async(client, role: Optional[str] = None, **params):
+    """chat.completions.create asynchrone via la couche de résilience"""
+    return await get_resilience_llm().appeler_async(client, role, **params)
+
+
+def appel_llm(client, role: Optional[str] = None, **params):
+    """chat.completions.create synchrone via la couche de résilience"""
+    return get_resilience_llm().appeler(client, role, **params)
@@ -0,0 +1,243 @@
+"""
+Répartition des appels entre plusieurs déploiements Azure OpenAI
+
+Chaque rôle logique (client simulé, expert FAQ, synthèse...) dispose d'un
+pool de déploiements. Pour chaque tentative, le routeur choisit le candidat
+le plus sain d'après les mesures en direct :
+
+- latence moyenne glissante (EWMA) des derniers appels ;
+- taux de 429 glissant, et mise à l'écart pendant le Retry-After ;
+- nombre d'appels en cours ;
+- disjoncteur ouvert (couche de résilience).
+
+Un 429 sur un déploiement est ainsi réessayé immédiatement sur un autre
+déploiement du pool qui a encore du quota.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rôles logiques des appels LLM
+ROLE_CLIENT = "client"
+ROLE_RESUME = "resume"
+ROLE_FAQ = "faq"
+ROLE_SYNTHESE = "synthese"
+ROLE_COMMERCIAL = "commercial"
+
+# Poids des nouvelles mesures dans les moyennes glissantes
+ALPHA_EWMA = 0.2
+# Pénalité du score par point de taux de 429
+PENALITE_429 = 4.0
+
+
+class StatistiquesDeploiement:
+    """Mesures en direct d'un déploiement"""
+
+    def __init__(self, nom: str):
+        self.nom = nom
+        self.appels = 0
+        self.en_cours = 0
+        self.reponses_429 = 0
+        self.erreurs = 0
+        self.latence_ewma: Optional[float] = None
+        self.taux_429_ewma = 0.0
+        self.ecarte_jusqu_a = 0.0
+
+    def score(self) -> float:
+        """Coût estimé d'un nouvel appel (plus bas = plus sain)"""
+        latence = self.latence_ewma or 0.0
+        return latence * (1 + self.en_cours) * (1 + PENALITE_429 * self.taux_429_ewma)
+
+    def to_dict(self, maintenant: float) -> Dict:
+        return {
+            "appels": self.appels,
+            "en_cours": self.en_cours,
+            "reponses_429": self.reponses_429,
+            "erreurs": self.erreurs,
+            "latence_moyenne_ms": round(self.latence_ewma * 1000) if self.latence_ewma is not None else None,
+            "taux_429": round(self.taux_429_ewma, 4),
+            "ecarte_pendant_secondes": round(self.ecarte_jusqu_a - maintenant, 1)
+            if self.ecarte_jusqu_a > maintenant else 0,
+        }
+
+
+class RouteurDeploiements:
+    """Choix du déploiement de chaque appel parmi le pool de son rôle"""
+
+    def __init__(self, pools: Optional[Dict[str, List[str]]] = None):
+        self._pools: Dict[str, List[str]] = {role: list(noms) for role, noms in (pools or {}).items() if noms}
+        self._stats: Dict[str, StatistiquesDeploiement] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, role: Optional[str], defaut: Optional[str] = None) -> List[str]:
+        """Déploiements du rôle (le déploiement par défaut de l'appel si aucun pool)"""
+        noms = self._pools.get(role) if role else None
+        if noms:
+            return noms
+        return [defaut] if defaut else []
+
+    def _stat(self, nom: str) -> StatistiquesDeploiement:
+        """Statistiques du déploiement (appelé sous verrou)"""
+        if nom not in self._stats:
+            self._stats[nom] = StatistiquesDeploiement(nom)
+        return self._stats[nom]
+
+    def choisir(
+        self,
+        role: Optional[str],
+        defaut: Optional[str] = None,
+        exclus: Iterable[str] = (),
+        est_disponible: Optional[Callable[[str], bool]] = None,
+    ) -> Optional[str]:
+        """
+        Choisit le déploiement le plus sain pour un appel
+
+        Args:
+            role: Rôle logique de l'appel
+            defaut: Déploiement de l'appel quand le rôle n'a pas de pool
+            exclus: Déploiements déjà en échec pour cet appel
+            est_disponible: Prédicat externe (disjoncteur fermé)
+
+        Returns:
+            str: Nom du déploiement. Si aucun candidat n'est sain, celui qui
+                 redevient disponible le plus tôt (l'appelant temporise).
+        """
+        candidats = self.pool(role, defaut)
+        if not candidats:
+            return defaut
+
+        exclus = set(exclus)
+        maintenant = time.monotonic()
+        with self._lock:
+            sains = [
+                nom for nom in candidats
+                if nom not in exclus
+                and self._stat(nom).ecarte_jusqu_a <= maintenant
+                and (est_disponible is None or est_disponible(nom))
+            ]
+            if sains:
+                # Les déploiements jamais mesurés (score 0) sont essayés en premier
+                return min(sains, key=lambda nom: (self._stat(nom).score(), self._stat(nom).appels))
+            return min(candidats, key=lambda nom: self._stat(nom).ecarte_jusqu_a)
+
+    def a_alternative(
+        self,
+        role: Optional[str],
+        exclus: Iterable[str],
+        est_disponible: Optional[Callable[[str], bool]] = None,
+    ) -> bool:
+        """Vrai si un autre déploiement sain du pool peut prendre l'appel immédiatement"""
+        exclus = set(exclus)
+        maintenant = time.monotonic()
+        with self._lock:
+            return any(
+                nom not in exclus
+                and self._stat(nom).ecarte_jusqu_a <= maintenant
+                and (est_disponible is None or est_disponible(nom))
+                for nom in self.pool(role)
+            )
+
+    def debut_appel(self, nom: str) -> None:
+        with self._lock:
+            stat = self._stat(nom)
+            stat.appels += 1
+            stat.en_cours += 1
+
+    def abandon_appel(self, nom: str) -> None:
+        """Appel annulé avant sa réponse : ni erreur ni latence enregistrées"""
+        with self._lock:
+            stat = self._stat(nom)
+            stat.en_cours = max(0, stat.en_cours - 1)
+
+    def fin_appel(
+        self,
+        nom: str,
+        duree: float,
+        code_http: Optional[int] = None,
+        erreur: bool = False,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """
+        Enregistre le résultat d'un appel
+
+        Args:
+            nom: Déploiement appelé
+            duree: Durée de l'appel en secondes
+            code_http: Code de l'erreur HTTP éventuelle
+            erreur: Vrai si l'appel a échoué
+            retry_after: Délai demandé par le serveur (429)
+        """
+        with self._lock:
+            stat = self._stat(nom)
+            stat.en_cours = max(0, stat.en_cours - 1)
+
+            est_429 = code_http == 429
+            stat.taux_429_ewma = (1 - ALPHA_EWMA) * stat.taux_429_ewma + ALPHA_EWMA * (1.0 if est_429 else 0.0)
+            if est_429:
+                stat.reponses_429 += 1
+                stat.ecarte_jusqu_a = time.monotonic() + (retry_after if retry_after is not None else 1.0)
+            elif erreur:
+                stat.erreurs += 1
+            else:
+                # Latence mesurée sur les seuls succès
+                stat.latence_ewma = duree if stat.latence_ewma is None else (
+                    (1 - ALPHA_EWMA) * stat.latence_ewma + ALPHA_EWMA * duree
+                )
+
+    def statistiques(self) -> Dict:
+        """
+        Utilisation par rôle et par déploiement
+
+        Returns:
+            dict: {"pools": {role: [deploiements]}, "deploiements": {nom: {...,"part_appels"}}}
+        """
+        maintenant = time.monotonic()
+        with self._lock:
+            total = sum(stat.appels for stat in self._stats.values())
+            deploiements = {}
+            for nom, stat in self._stats.items():
+                deploiements[nom] = stat.to_dict(maintenant)
+                deploiements[nom]["part_appels"] = round(stat.appels / total, 4) if total else 0.0
+            return {"pools": {role: list(noms) for role, noms in self._pools.items()}, "deploiements": deploiements}
+
+
+def parser_pools_deploiements(valeur: str) -> Dict[str, List[str]]:
+    """
+    Lit la configuration "role=deploiement1,deploiement2;role=deploiement3"
+
+    Returns:
+        dict: Déploiements par rôle
+    """
+    pools = {}
+    for element in (valeur or "").split(";"):
+        if "=" not in element:
+            continue
+        role, noms = element.split("=", 1)
+        noms = [nom.strip() for nom in noms.split(",") if nom.strip()]
+        if noms:
+            pools[role.strip()] = noms
+    return pools
+
+
+# Instance globale
+_routeur: Optional[RouteurDeploiements] = None
+
+
+def init_routeur_deploiements(pools: Optional[Dict[str, List[str]]] = None) -> RouteurDeploiements:
+    """Initialise le routeur (appelé dans le lifespan de l'application)"""
+    global _routeur
+    if _routeur is None:
+        _routeur = RouteurDeploiements(pools)
+        for role, noms in (pools or {}).items():
+            logger.info(f"Pool de déploiements {role}: {', '.join(noms)}")
+    return _routeur
+
+
+def get_routeur_deploiements() -> RouteurDeploiements:
+    """Retourne le routeur de déploiements (sans pool : déploiement de chaque appel)"""
+    if _routeur is None:
+        return init_routeur_deploiements()
+    return _routeur
@@ -0,0 +1,172 @@
+"""
+Schéma typé de la réponse de synthèse
+
+La structure attendue (synthese, vision_detaillee avec ses 5 dimensions,
+recommandations) est déclarée une seule fois par des modèles pydantic. Ils
+servent à la fois :
+- de schéma strict envoyé au modèle (response_format json_schema), ce qui
+  garantit une réponse complète et bien typée ;
+- de validateur compilé, en une passe, des réponses reçues.
+
+Le timestamp de la synthèse n'est pas demandé au modèle : il est ajouté
+après la réponse.
+"""
+import copy
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel, Field, ValidationError, create_model
+
+from .prompt_synthese import DIMENSIONS_SYNTHESE
+
+NIVEAUX = ("Très bien", "Bien", "Satisfaisant", "À améliorer")
+
+
+def _niveau(description: str):
+    # Niveau contraint dans le schéma envoyé au modèle ; un niveau inattendu
+    # reste accepté à la validation et ramené à "Satisfaisant" au parsing
+    return Field(description=description, json_schema_extra={"enum": list(NIVEAUX)})
+
+
+class EvaluationDimension(BaseModel):
+    """Évaluation d'une dimension de la vision détaillée"""
+    niveau: str = _niveau("Niveau de la dimension")
+    points_positifs: str
+    points_negatifs: str
+    ce_qui_devrait_etre_dit: str
+    reponse_suggeree: str
+
+
+class SyntheseGenerale(BaseModel):
+    """Appréciation générale"""
+    niveau_general: str = _niveau("Niveau général")
+    commentaire_global: str
+
+
+# Une entrée par dimension (même ordre que DIMENSIONS_SYNTHESE)
+VisionDetaillee = create_model(
+    "VisionDetaillee",
+    __doc__="Évaluations des 5 dimensions",
+    **{dimension: (EvaluationDimension, ...) for dimension in DIMENSIONS_SYNTHESE},
+)
+
+
+class Recommandations(BaseModel):
+    """Recommandations prioritaires"""
+    principales_forces: List[str]
+    axes_amelioration_prioritaires: List[str]
+    actions_correctives_immediates: List[str]
+
+
+class ResultatSynthese(BaseModel):
+    """Réponse complète de synthèse"""
+    synthese: SyntheseGenerale
+    vision_detaillee: VisionDetaillee
+    recommandations: Recommandations
+
+
+class SyntheseGlobale(BaseModel):
+    """Réponse de la synthèse globale du mode parallèle"""
+    synthese: SyntheseGenerale
+    recommandations: Recommandations
+
+
+@lru_cache(maxsize=None)
+def modele_dimension(dimension: str) -> Type[BaseModel]:
+    """Réponse attendue pour une seule dimension ({dimension: {...}})"""
+    return create_model(f"Dimension_{dimension}", **{dimension: (EvaluationDimension, ...)})
+
+
+def _strict(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Adapte un schéma JSON pydantic au mode strict (objets fermés, propriétés toutes requises)"""
+    if isinstance(schema, dict):
+        schema.pop("title", None)
+        if schema.get("type") == "object" and "properties" in schema:
+            schema["additionalProperties"] = False
+            schema["required"] = list(schema["properties"])
+        for valeur in schema.values():
+            if isinstance(valeur, (dict, list)):
+                _strict(valeur)
+    elif isinstance(schema, list):
+        for element in schema:
+            _strict(element)
+    return schema
+
+
+_formats_reponse: Dict[str, Dict[str, Any]] = {}
+
+# Sortie structurée stricte (SYNTHESE_STRUCTURED_OUTPUT, fixée au démarrage)
+_sortie_structuree = True
+
+
+def configurer_sortie_structuree(active: bool) -> None:
+    """Active ou désactive la sortie structurée stricte (appelé dans le lifespan)"""
+    global _sortie_structuree
+    _sortie_structuree = active
+
+
+def format_reponse(modele: Type[BaseModel], nom: str) -> Dict[str, Any]:
+    """
+    response_format imposant le schéma du modèle (sortie structurée stricte)
+
+    Sans sortie structurée (SYNTHESE_STRUCTURED_OUTPUT=false, déploiement qui
+    ne la supporte pas), seul un objet JSON est demandé.
+
+    Returns:
+        dict: Paramètre response_format de chat.completions
+    """
+    if not _sortie_structuree:
+        return {"type": "json_object"}
+    if nom not in _formats_reponse:
+        _formats_reponse[nom] = {
+            "type": "json_schema",
+            "json_schema": {"name": nom, "strict": True, "schema": _strict(modele.model_json_schema())},
+        }
+    return copy.deepcopy(_formats_reponse[nom])
+
+
+def _message_erreur(erreur: Dict[str, Any]) -> str:
+    """Message lisible d'une erreur de validation (mêmes libellés que la validation historique)"""
+    chemin = [str(element) for element in erreur["loc"]]
+    if erreur["type"] == "missing":
+        if len(chemin) == 1:
+            return f"Clé manquante au premier niveau: {chemin[0]}"
+        if chemin[0] == "vision_detaillee" and len(chemin) == 2:
+            return f"Dimension manquante dans 'vision_detaillee': {chemin[1]}"
+        return f"Clé manquante dans '{chemin[-2]}': {chemin[-1]}"
+    return f"{'.'.join(chemin) or 'racine'}: {erreur['msg']}"
+
+
+def erreurs_schema(data: Any, modele: Type[BaseModel] = ResultatSynthese) -> List[Tuple[Tuple[Any, ...], str]]:
+    """
+    Valide une réponse en une passe
+
+    Returns:
+        list: (chemin, message) de chaque erreur, vide si la réponse est valide
+    """
+    try:
+        modele.model_validate(data)
+    except ValidationError as e:
+        return [(tuple(erreur["loc"]), _message_erreur(erreur)) for erreur in e.errors()]
+    return []
+
+
+def dimensions_a_regenerer(erreurs: List[Tuple[Tuple[Any, ...], str]]) -> Optional[Set[str]]:
+    """
+    Dimensions à regénérer si toutes les erreurs portent sur des dimensions
+
+    Returns:
+        set: Dimensions en erreur, None si une erreur porte ailleurs (ou aucune erreur)
+    """
+    dimensions = set()
+    for chemin, _ in erreurs:
+        if not chemin or chemin[0] != "vision_detaillee":
+            return None
+        if len(chemin) == 1:
+            # vision_detaillee absente ou mal formée : toutes les dimensions
+            dimensions.update(DIMENSIONS_SYNTHESE)
+        elif chemin[1] in DIMENSIONS_SYNTHESE:
+            dimensions.add(chemin[1])
+        else:
+            return None
+    return dimensions or None
@@ -0,0 +1,201 @@
+"""
+Stockage adressé par contenu (blobs) sur le FileShare
+
+Chaque synthèse sauvegardait son prompt complet (~300 Ko) dans le dossier de
+l'utilisateur, alors que presque tout ce texte (templates, documents de
+référence, document profil) est identique d'une synthèse à l'autre et d'une
+version du corpus à l'autre.
+
+Un blob est un texte stocké une seule fois sous blobs/<2 premiers>/<sha256>.
+Un prompt sauvegardé devient un manifeste JSON : la liste ordonnée de ses
+sections, chacune soit une référence à un blob (parties partagées), soit le
+texte lui-même (profil, conversation). Le prompt est reconstruit à
+l'identique à partir du manifeste (empreinte vérifiée).
+"""
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .storage_manager import get_storage_manager
+
+logger = logging.getLogger(__name__)
+
+# Répertoire des blobs dans le stockage
+FILESHARE_BLOBS_DIR = "blobs"
+
+# Format des manifestes de prompt
+FORMAT_MANIFESTE_PROMPT = "prompt_manifeste/1"
+
+# Parties partagées plus courtes (caractères) gardées dans le manifeste
+TAILLE_MIN_BLOB = 1000
+
+
+def empreinte_blob(texte: str) -> str:
+    """Clé d'un blob (SHA-256 du texte UTF-8)"""
+    return hashlib.sha256(texte.encode("utf-8")).hexdigest()
+
+
+class StockageBlobs:
+    """Blobs texte dédoublonnés par empreinte"""
+
+    def __init__(self, racine: Path):
+        self.racine = Path(racine)
+        self._connus: set = set()
+        self._lock = threading.Lock()
+        self._compteurs = {"ecritures": 0, "deja_presents": 0, "octets_ecrits": 0, "octets_evites": 0}
+
+    def _chemin(self, empreinte: str) -> Path:
+        return self.racine / empreinte[:2] / empreinte
+
+    def enregistrer(self, texte: str) -> str:
+        """
+        Stocke un texte s'il n'est pas déjà présent
+
+        L'écriture passe par un fichier temporaire renommé : deux workers qui
+        écrivent le même blob produisent le même fichier.
+
+        Returns:
+            str: Empreinte du blob
+        """
+        empreinte = empreinte_blob(texte)
+        taille = len(texte.encode("utf-8"))
+        chemin = self._chemin(empreinte)
+
+        if empreinte in self._connus or chemin.exists():
+            with self._lock:
+                self._connus.add(empreinte)
+                self._compteurs["deja_presents"] += 1
+                self._compteurs["octets_evites"] += taille
+            return empreinte
+
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        temporaire = chemin.with_name(f"{empreinte}.{uuid.uuid4().hex}.tmp")
+        temporaire.write_text(texte, encoding="utf-8")
+        os.replace(temporaire, chemin)
+
+        with self._lock:
+            self._connus.add(empreinte)
+            self._compteurs["ecritures"] += 1
+            self._compteurs["octets_ecrits"] += taille
+        return empreinte
+
+    def lire(self, empreinte: str) -> Optional[str]:
+        """Texte d'un blob (None s'il est absent)"""
+        if not empreinte.isalnum():
+            return None
+        chemin = self._chemin(empreinte)
+        if not chemin.exists():
+            return None
+        return chemin.read_text(encoding="utf-8")
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"racine": str(self.racine), "blobs_connus": len(self._connus), **self._compteurs}
+
+
+def decouper_texte(texte: str, parties: Dict[str, str]) -> List[Tuple[Optional[str], str]]:
+    """
+    Découpe un texte selon les occurrences de parties connues
+
+    Args:
+        texte: Texte à découper
+        parties: Nom → texte des parties partagées (les plus courtes que
+                 TAILLE_MIN_BLOB sont ignorées)
+
+    Returns:
+        list: Segments (nom de la partie ou None, texte) dont la concaténation
+              redonne le texte
+    """
+    occurrences = []
+    for nom, partie in parties.items():
+        if not partie or len(partie) < TAILLE_MIN_BLOB:
+            continue
+        position = texte.find(partie)
+        while position != -1:
+            occurrences.append((position, position + len(partie), nom))
+            position = texte.find(partie, position + len(partie))
+
+    segments = []
+    curseur = 0
+    # Parties les plus longues d'abord à position égale ; chevauchements ignorés
+    for debut, fin, nom in sorted(occurrences, key=lambda occurrence: (occurrence[0], -occurrence[1])):
+        if debut < curseur:
+            continue
+        if debut > curseur:
+            segments.append((None, texte[curseur:debut]))
+        segments.append((nom, texte[debut:fin]))
+        curseur = fin
+    if curseur < len(texte):
+        segments.append((None, texte[curseur:]))
+    return segments
+
+
+def construire_manifeste_prompt(texte: str, parties: Dict[str, str],
+                                stockage: Optional[StockageBlobs] = None) -> Dict[str, Any]:
+    """
+    Stocke les parties partagées d'un prompt en blobs et retourne son manifeste
+
+    Args:
+        texte: Prompt complet
+        parties: Parties partagées du prompt (templates, documents)
+        stockage: Stockage des blobs (stockage du FileShare par défaut)
+
+    Returns:
+        dict: Manifeste {"format", "empreinte", "caracteres", "sections"}
+    """
+    stockage = stockage or get_stockage_blobs()
+    sections = []
+    for nom, segment in decouper_texte(texte, parties):
+        if nom is None:
+            sections.append({"texte": segment})
+        else:
+            sections.append({"nom": nom, "blob": stockage.enregistrer(segment), "caracteres": len(segment)})
+    return {
+        "format": FORMAT_MANIFESTE_PROMPT,
+        "empreinte": empreinte_blob(texte),
+        "caracteres": len(texte),
+        "sections": sections,
+    }
+
+
+def reconstruire_prompt(manifeste: Dict[str, Any], stockage: Optional[StockageBlobs] = None) -> str:
+    """
+    Reconstruit le prompt décrit par un manifeste
+
+    Raises:
+        ValueError: Format inconnu, blob manquant ou prompt reconstruit différent
+    """
+    if manifeste.get("format") != FORMAT_MANIFESTE_PROMPT:
+        raise ValueError(f"Format de manifeste inconnu: {manifeste.get('format')}")
+
+    stockage = stockage or get_stockage_blobs()
+    morceaux = []
+    for section in manifeste.get("sections", []):
+        if "blob" not in section:
+            morceaux.append(section.get("texte", ""))
+            continue
+        contenu = stockage.lire(section["blob"])
+        if contenu is None:
+            raise ValueError(f"Blob manquant pour la section {section.get('nom')}: {section['blob']}")
+        morceaux.append(contenu)
+
+    texte = "".join(morceaux)
+    if empreinte_blob(texte) != manifeste.get("empreinte"):
+        raise ValueError("Le prompt reconstruit ne correspond pas à l'empreinte du manifeste")
+    return texte
+
+
+# Instance globale
+_stockage_blobs: Optional[StockageBlobs] = None
+
+
+def get_stockage_blobs() -> StockageBlobs:
+    """Stockage des blobs dans le FileShare (créé à la demande)"""
+    global _stockage_blobs
+    if _stockage_blobs is None:
+        _stockage_blobs = StockageBlobs(get_storage_manager().base_path / FILESHARE_BLOBS_DIR)
+    return _stockage_blobs
@@ -0,0 +1,520 @@
+"""
+Stockage des sessions côté serveur
+
+Les sessions (historique de conversation, historique FAQ, profil, jeton
+d'accès, habilitations, ProfilManager sérialisé) étaient entièrement
+stockées dans le cookie signé : chaque requête renvoyait plusieurs Ko et les
+longues conversations dépassaient la taille maximale d'un cookie.
+
+Le contenu de la session est désormais gardé côté serveur, le cookie ne
+contient plus que l'identifiant signé de la session
+(app.middleware.session). Trois stockages, choisis par SESSION_TYPE :
+- "memory" : dictionnaire LRU du worker (développement, un seul worker) ;
+- "filesystem" : un fichier JSON par session dans un répertoire, partagé
+  entre les workers lorsqu'il est sur le FileShare ;
+- "sqlite" : une table dans une base SQLite locale.
+
+Chaque session expire après sa durée de vie sans activité : une session
+expirée est ignorée et supprimée à la lecture. Les sessions qui ne sont plus
+jamais lues sont supprimées par la purge périodique (core.purge_sessions),
+qui ne parcourt que les candidats d'un index des expirations : tranches de
+temps pour les fichiers (IndexExpirations), index sur la date d'expiration
+pour SQLite.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Types de stockage (SESSION_TYPE)
+TYPE_MEMOIRE = "memory"
+TYPE_FICHIERS = "filesystem"
+TYPE_SQLITE = "sqlite"
+TYPES_STOCKAGE = (TYPE_MEMOIRE, TYPE_FICHIERS, TYPE_SQLITE)
+
+# Sous-répertoire de l'index des expirations (stockages par fichiers)
+REPERTOIRE_EXPIRATIONS = "_expirations"
+
+
+def _identifiant_valide(session_id: str) -> bool:
+    """Identifiant généré par le middleware (secrets.token_urlsafe)"""
+    return bool(session_id) and len(session_id) <= 128 and all(c.isalnum() or c in "-_" for c in session_id)
+
+
+class IndexExpirations:
+    """
+    Index des expirations par tranches de temps, dans un répertoire
+
+    Un élément (session, journal de conversation) expirant à l'instant t est
+    marqué par un fichier vide <repertoire>/<tranche de t>/<identifiant>. La
+    purge ne liste que les tranches entièrement passées, au lieu de consulter
+    la date de chaque fichier du stockage. Un élément prolongé depuis reçoit
+    une marque dans une tranche plus récente : la purge vérifie donc la date
+    réelle de chaque candidat avant de le supprimer.
+    """
+
+    def __init__(self, repertoire: Path, duree_tranche: int = 3600, max_marques: int = 100000):
+        self.repertoire = Path(repertoire)
+        self.duree_tranche = max(1, int(duree_tranche))
+        self.max_marques = max_marques
+        # Tranche déjà marquée par ce worker pour chaque élément (évite une création de fichier par requête)
+        self._marques: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tranche(self, instant: float) -> int:
+        return int(instant // self.duree_tranche)
+
+    def existe(self) -> bool:
+        return self.repertoire.is_dir()
+
+    def marquer(self, element_id: str, expire_le: float) -> None:
+        """Enregistre l'expiration d'un élément (une création de fichier par tranche et par worker)"""
+        tranche = self._tranche(expire_le)
+        with self._lock:
+            if self._marques.get(element_id) == tranche:
+                self._marques.move_to_end(element_id)
+                return
+        repertoire_tranche = self.repertoire / str(tranche)
+        repertoire_tranche.mkdir(parents=True, exist_ok=True)
+        (repertoire_tranche / element_id).touch()
+        with self._lock:
+            self._marques[element_id] = tranche
+            self._marques.move_to_end(element_id)
+            while len(self._marques) > self.max_marques:
+                self._marques.popitem(last=False)
+
+    def oublier(self, element_id: str) -> None:
+        with self._lock:
+            self._marques.pop(element_id, None)
+
+    def candidats(self, maintenant: float, limite: int) -> List[tuple]:
+        """
+        Marques des tranches entièrement passées
+
+        Returns:
+            list: (tranche, identifiant), des tranches les plus anciennes d'abord
+        """
+        if not self.existe():
+            return []
+        courante = self._tranche(maintenant)
+        tranches = sorted(
+            int(entree.name) for entree in os.scandir(self.repertoire)
+            if entree.is_dir() and entree.name.isdigit() and int(entree.name) < courante
+        )
+        candidats = []
+        for tranche in tranches:
+            for entree in os.scandir(self.repertoire / str(tranche)):
+                candidats.append((tranche, entree.name))
+                if len(candidats) >= limite:
+                    return candidats
+        return candidats
+
+    def retirer(self, tranche: int, element_id: str) -> None:
+        """Supprime une marque traitée par la purge"""
+        (self.repertoire / str(tranche) / element_id).unlink(missing_ok=True)
+
+    def nettoyer_tranches(self, maintenant: float) -> None:
+        """Supprime les tranches passées devenues vides"""
+        if not self.existe():
+            return
+        courante = self._tranche(maintenant)
+        for entree in os.scandir(self.repertoire):
+            if entree.is_dir() and entree.name.isdigit() and int(entree.name) < courante:
+                try:
+                    os.rmdir(entree.path)
+                except OSError:
+                    pass
+
+    def nombre_tranches(self) -> int:
+        if not self.existe():
+            return 0
+        return sum(1 for entree in os.scandir(self.repertoire) if entree.is_dir())
+
+
+class StockageSessions:
+    """Interface des stockages de sessions (données JSON, durée de vie glissante)"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._compteurs = {
+            "lectures": 0, "absentes": 0, "expirees": 0, "ecritures": 0, "suppressions": 0, "purgees": 0
+        }
+        self._lock_compteurs = threading.Lock()
+
+    def _compter(self, compteur: str) -> None:
+        with self._lock_compteurs:
+            self._compteurs[compteur] += 1
+
+    def lire(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Données de la session (None si absente ou expirée)"""
+        raise NotImplementedError
+
+    def ecrire(self, session_id: str, donnees: Dict[str, Any]) -> None:
+        """Enregistre la session et repousse son expiration"""
+        raise NotImplementedError
+
+    def toucher(self, session_id: str) -> None:
+        """Repousse l'expiration d'une session inchangée"""
+        raise NotImplementedError
+
+    def supprimer(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def nombre_sessions(self) -> int:
+        raise NotImplementedError
+
+    def candidats_expires(self, maintenant: float, limite: int) -> List[Any]:
+        """Sessions probablement expirées, trouvées par l'index des expirations (au plus limite)"""
+        raise NotImplementedError
+
+    def purger_lot(self, candidats: List[Any], maintenant: float) -> int:
+        """
+        Supprime les candidats réellement expirés
+
+        Returns:
+            int: Nombre de sessions supprimées
+        """
+        raise NotImplementedError
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._lock_compteurs:
+            compteurs = dict(self._compteurs)
+        return {
+            "type": self.type_stockage,
+            "ttl_seconds": self.ttl_seconds,
+            "sessions": self.nombre_sessions(),
+            **compteurs,
+        }
+
+    def fermer(self) -> None:
+        """Libère les ressources du stockage"""
+
+
+class StockageSessionsMemoire(StockageSessions):
+    """Sessions en mémoire du worker, les moins récemment utilisées évincées au-delà de max_sessions"""
+
+    type_stockage = TYPE_MEMOIRE
+
+    def __init__(self, ttl_seconds: int, max_sessions: int = 10000):
+        super().__init__(ttl_seconds)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lire(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self._compter("lectures")
+        with self._lock:
+            entree = self._sessions.get(session_id)
+            if entree is None:
+                self._compter("absentes")
+                return None
+            donnees, expire_le = entree
+            if expire_le < time.time():
+                del self._sessions[session_id]
+                self._compter("expirees")
+                return None
+            self._sessions.move_to_end(session_id)
+        # Copie : les modifications de la requête ne touchent pas la session stockée
+        return json.loads(donnees)
+
+    def ecrire(self, session_id: str, donnees: Dict[str, Any]) -> None:
+        contenu = json.dumps(donnees, ensure_ascii=False)
+        self._compter("ecritures")
+        with self._lock:
+            self._sessions[session_id] = (contenu, time.time() + self.ttl_seconds)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def toucher(self, session_id: str) -> None:
+        with self._lock:
+            entree = self._sessions.get(session_id)
+            if entree is not None:
+                self._sessions[session_id] = (entree[0], time.time() + self.ttl_seconds)
+
+    def supprimer(self, session_id: str) -> None:
+        self._compter("suppressions")
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def nombre_sessions(self) -> int:
+        return len(self._sessions)
+
+    def candidats_expires(self, maintenant: float, limite: int) -> List[Any]:
+        with self._lock:
+            candidats = []
+            for session_id, (_, expire_le) in self._sessions.items():
+                if expire_le < maintenant:
+                    candidats.append(session_id)
+                    if len(candidats) >= limite:
+                        break
+            return candidats
+
+    def purger_lot(self, candidats: List[Any], maintenant: float) -> int:
+        supprimees = 0
+        with self._lock:
+            for session_id in candidats:
+                entree = self._sessions.get(session_id)
+                if entree is not None and entree[1] < maintenant:
+                    del self._sessions[session_id]
+                    supprimees += 1
+        with self._lock_compteurs:
+            self._compteurs["purgees"] += supprimees
+        return supprimees
+
+
+class StockageSessionsFichiers(StockageSessions):
+    """
+    Un fichier JSON par session dans un répertoire
+
+    La date de modification du fichier est celle de la dernière activité ;
+    l'écriture passe par un fichier temporaire renommé. L'expiration de
+    chaque session est aussi marquée dans l'index des expirations.
+    """
+
+    type_stockage = TYPE_FICHIERS
+
+    def __init__(self, ttl_seconds: int, repertoire: str, duree_tranche: int = 3600):
+        super().__init__(ttl_seconds)
+        self.repertoire = Path(repertoire)
+        self.repertoire.mkdir(parents=True, exist_ok=True)
+        self.index = IndexExpirations(self.repertoire / REPERTOIRE_EXPIRATIONS, duree_tranche)
+
+    def _chemin(self, session_id: str) -> Path:
+        return self.repertoire / f"{session_id}.json"
+
+    def lire(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self._compter("lectures")
+        if not _identifiant_valide(session_id):
+            self._compter("absentes")
+            return None
+        chemin = self._chemin(session_id)
+        try:
+            if os.stat(chemin).st_mtime + self.ttl_seconds < time.time():
+                chemin.unlink(missing_ok=True)
+                self._compter("expirees")
+                return None
+            with open(chemin, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            self._compter("absentes")
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Session illisible ignorée ({chemin.name}): {e}")
+            return None
+
+    def ecrire(self, session_id: str, donnees: Dict[str, Any]) -> None:
+        if not _identifiant_valide(session_id):
+            return
+        chemin = self._chemin(session_id)
+        temporaire = chemin.with_name(f"{session_id}.{uuid.uuid4().hex}.tmp")
+        temporaire.write_text(json.dumps(donnees, ensure_ascii=False), encoding="utf-8")
+        os.replace(temporaire, chemin)
+        self.index.marquer(session_id, time.time() + self.ttl_seconds)
+        self._compter("ecritures")
+
+    def toucher(self, session_id: str) -> None:
+        if not _identifiant_valide(session_id):
+            return
+        try:
+            os.utime(self._chemin(session_id))
+            self.index.marquer(session_id, time.time() + self.ttl_seconds)
+        except OSError:
+            pass
+
+    def supprimer(self, session_id: str) -> None:
+        if not _identifiant_valide(session_id):
+            return
+        self._chemin(session_id).unlink(missing_ok=True)
+        self.index.oublier(session_id)
+        self._compter("suppressions")
+
+    def nombre_sessions(self) -> int:
+        return sum(1 for _ in self.repertoire.glob("*.json"))
+
+    def indexer_existants(self) -> int:
+        """
+        Marque dans l'index les sessions écrites avant sa création (parcours complet, une seule fois)
+
+        Returns:
+            int: Nombre de sessions indexées
+        """
+        if self.index.existe():
+            return 0
+        indexees = 0
+        for entree in os.scandir(self.repertoire):
+            if entree.is_file() and entree.name.endswith(".json"):
+                try:
+                    self.index.marquer(entree.name[:-len(".json")], entree.stat().st_mtime + self.ttl_seconds)
+                    indexees += 1
+                except OSError:
+                    pass
+        # Index créé même vide : le parcours complet n'est plus refait
+        self.index.repertoire.mkdir(parents=True, exist_ok=True)
+        return indexees
+
+    def candidats_expires(self, maintenant: float, limite: int) -> List[Any]:
+        return self.index.candidats(maintenant, limite)
+
+    def purger_lot(self, candidats: List[Any], maintenant: float) -> int:
+        supprimees = 0
+        for tranche, session_id in candidats:
+            chemin = self._chemin(session_id)
+            try:
+                if os.stat(chemin).st_mtime + self.ttl_seconds < maintenant:
+                    chemin.unlink(missing_ok=True)
+                    self.index.oublier(session_id)
+                    supprimees += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Purge de la session {session_id} impossible: {e}")
+                continue
+            # Session supprimée ou prolongée (marquée dans une tranche plus récente)
+            self.index.retirer(tranche, session_id)
+        with self._lock_compteurs:
+            self._compteurs["purgees"] += supprimees
+        return supprimees
+
+    def statistiques(self) -> Dict[str, Any]:
+        return {**super().statistiques(), "tranches_expiration": self.index.nombre_tranches()}
+
+
+class StockageSessionsSqlite(StockageSessions):
+    """Sessions dans une table SQLite (une connexion partagée, accès sérialisés)"""
+
+    type_stockage = TYPE_SQLITE
+
+    def __init__(self, ttl_seconds: int, chemin: str):
+        super().__init__(ttl_seconds)
+        self.chemin = chemin
+        Path(chemin).parent.mkdir(parents=True, exist_ok=True)
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connexion.execute("PRAGMA journal_mode=WAL")
+            self._connexion.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, donnees TEXT NOT NULL, expire_le REAL NOT NULL)"
+            )
+            # Index des expirations : la purge ne lit que les sessions expirées
+            self._connexion.execute("CREATE INDEX IF NOT EXISTS sessions_expire_le ON sessions (expire_le)")
+
+    def lire(self, session_id: str) -> Optional[Dict[str, Any]]:
+        self._compter("lectures")
+        with self._lock:
+            ligne = self._connexion.execute(
+                "SELECT donnees, expire_le FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if ligne is None:
+                self._compter("absentes")
+                return None
+            if ligne[1] < time.time():
+                self._connexion.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self._compter("expirees")
+                return None
+        return json.loads(ligne[0])
+
+    def ecrire(self, session_id: str, donnees: Dict[str, Any]) -> None:
+        contenu = json.dumps(donnees, ensure_ascii=False)
+        with self._lock:
+            self._connexion.execute(
+                "INSERT OR REPLACE INTO sessions (id, donnees, expire_le) VALUES (?, ?, ?)",
+                (session_id, contenu, time.time() + self.ttl_seconds),
+            )
+        self._compter("ecritures")
+
+    def toucher(self, session_id: str) -> None:
+        with self._lock:
+            self._connexion.execute(
+                "UPDATE sessions SET expire_le = ? WHERE id = ?", (time.time() + self.ttl_seconds, session_id)
+            )
+
+    def supprimer(self, session_id: str) -> None:
+        with self._lock:
+            self._connexion.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self._compter("suppressions")
+
+    def nombre_sessions(self) -> int:
+        with self._lock:
+            return self._connexion.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def candidats_expires(self, maintenant: float, limite: int) -> List[Any]:
+        with self._lock:
+            return [ligne[0] for ligne in self._connexion.execute(
+                "SELECT id FROM sessions WHERE expire_le < ? ORDER BY expire_le LIMIT ?", (maintenant, limite)
+            )]
+
+    def purger_lot(self, candidats: List[Any], maintenant: float) -> int:
+        if not candidats:
+            return 0
+        marques = ", ".join("?" * len(candidats))
+        with self._lock:
+            supprimees = self._connexion.execute(
+                f"DELETE FROM sessions WHERE id IN ({marques}) AND expire_le < ?", (*candidats, maintenant)
+            ).rowcount
+        with self._lock_compteurs:
+            self._compteurs["purgees"] += supprimees
+        return supprimees
+
+    def fermer(self) -> None:
+        with self._lock:
+            self._connexion.close()
+
+
+def creer_stockage_sessions(
+    type_stockage: str,
+    ttl_seconds: int,
+    repertoire: str = "flask_session/",
+    chemin_sqlite: str = "data/sessions.sqlite3",
+    max_sessions: int = 10000,
+    duree_tranche: int = 3600,
+) -> StockageSessions:
+    """
+    Crée le stockage de sessions configuré
+
+    Args:
+        type_stockage: "memory", "filesystem" ou "sqlite"
+        ttl_seconds: Durée de vie d'une session sans activité
+        repertoire: Répertoire des sessions (filesystem)
+        chemin_sqlite: Base des sessions (sqlite)
+        max_sessions: Nombre maximal de sessions gardées (memory)
+        duree_tranche: Durée d'une tranche de l'index des expirations (filesystem)
+
+    Raises:
+        ValueError: Type de stockage inconnu
+    """
+    if type_stockage == TYPE_MEMOIRE:
+        return StockageSessionsMemoire(ttl_seconds, max_sessions)
+    if type_stockage == TYPE_FICHIERS:
+        return StockageSessionsFichiers(ttl_seconds, repertoire, duree_tranche)
+    if type_stockage == TYPE_SQLITE:
+        return StockageSessionsSqlite(ttl_seconds, chemin_sqlite)
+    raise ValueError(f"Type de stockage de sessions inconnu: {type_stockage} (attendu: {', '.join(TYPES_STOCKAGE)})")
+
+
+# Instance globale (None : sessions dans le cookie)
+_stockage_sessions: Optional[StockageSessions] = None
+
+
+def init_stockage_sessions(type_stockage: str, ttl_seconds: int, **options) -> StockageSessions:
+    """Initialise le stockage de sessions (appelé à la création de l'application)"""
+    global _stockage_sessions
+    if _stockage_sessions is None:
+        _stockage_sessions = creer_stockage_sessions(type_stockage, ttl_seconds, **options)
+        logger.info(f"Sessions stockées côté serveur ({type_stockage})")
+    return _stockage_sessions
+
+
+def get_stockage_sessions() -> Optional[StockageSessions]:
+    """Retourne le stockage de sessions (None si les sessions sont dans le cookie)"""
+    return _stockage_sessions
+
@@ -0,0 +1,88 @@
+"""
+Outils pour le streaming des réponses LLM (Server-Sent Events)
+
+- formatage des événements SSE
+- découpage incrémental d'un flux de tokens en phrases (synthèse vocale anticipée)
+"""
+import json
+import re
+from typing import Any, Dict, List
+
+
+def formater_evenement_sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    Formate un événement Server-Sent Events
+
+    Args:
+        event: Nom de l'événement (token, sentence, done, error...)
+        data: Données sérialisées en JSON
+
+    Returns:
+        str: Bloc SSE terminé par une ligne vide
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class DecoupeurPhrases:
+    """
+    Découpe un flux de tokens en phrases complètes au fil de l'eau
+
+    Une phrase se termine par . ! ? ou … suivi d'un espace. Les abréviations
+    courantes (M., Mme., etc.) et les nombres décimaux ne coupent pas la phrase.
+    """
+
+    _FIN_PHRASE = re.compile(r'[.!?…]+["»)\]]*\s+')
+    _ABREVIATIONS = {"m", "mme", "mlle", "mr", "dr", "pr", "me", "etc", "cf", "ex", "env", "p", "n°", "art"}
+
+    def __init__(self):
+        self._tampon = ""
+        self._debut_recherche = 0
+
+    def ajouter(self, delta: str) -> List[str]:
+        """
+        Ajoute un fragment de texte et retourne les phrases désormais complètes
+
+        Args:
+            delta: Fragment de texte reçu du modèle
+
+        Returns:
+            list: Phrases complètes (éventuellement vide)
+        """
+        self._tampon += delta
+        phrases = []
+
+        while True:
+            match = self._FIN_PHRASE.search(self._tampon, self._debut_recherche)
+            if not match:
+                break
+
+            fin = match.end()
+            if self._est_abreviation(match.start()):
+                self._debut_recherche = fin
+                continue
+
+            phrase = self._tampon[:fin].strip()
+            if phrase:
+                phrases.append(phrase)
+            self._tampon = self._tampon[fin:]
+            self._debut_recherche = 0
+
+        return phrases
+
+    def terminer(self) -> List[str]:
+        """Retourne le texte restant comme dernière phrase"""
+        reste = self._tampon.strip()
+        self._tampon = ""
+        self._debut_recherche = 0
+        return [reste] if reste else []
+
+    def _est_abreviation(self, position_ponctuation: int) -> bool:
+        """Vérifie si la ponctuation suit une abréviation connue"""
+        if self._tampon[position_ponctuation] != ".":
+            return False
+        debut_mot = position_ponctuation
+        while debut_mot > 0 and not self._tampon[debut_mot - 1].isspace():
+            debut_mot -= 1
+        mot = self._tampon[debut_mot:position_ponctuation].lower().lstrip("(«\"")
+        return mot in self._ABREVIATIONS
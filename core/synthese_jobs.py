@@ -0,0 +1,387 @@
+"""
+Exécution des synthèses en tâches de fond
+
+La synthèse d'une conversation (jusqu'à 4 appels LLM de 120 s) ne bloque plus
+la requête HTTP : /synthetiser soumet un job et retourne immédiatement son
+identifiant. Un pool borné de workers exécute les étapes
+préparation du prompt → appel LLM → validation JSON → rendu HTML.
+
+L'état des jobs est consultable par polling ou par Server-Sent Events, et
+persisté dans le dossier syntheses/ de l'utilisateur pour survivre à un
+rechargement de page (ou être lu depuis un autre worker).
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .fonctions import charger_documents_reference, generer_rapport_html_synthese
+from .fonctions_fileshare import get_file_from_fileshare, save_file_to_azure, save_file_to_fileshare
+from .resilience_llm import echeance_llm
+from .synthetiser import (
+    MODE_SYNTHESE_PARALLELE,
+    MODE_SYNTHESE_UNIQUE,
+    MODES_SYNTHESE,
+    synthese_2_async,
+    synthese_parallele_async,
+)
+
+logger = logging.getLogger(__name__)
+
+# Statuts d'un job
+STATUT_EN_ATTENTE = "en_attente"
+STATUT_EN_COURS = "en_cours"
+STATUT_TERMINE = "termine"
+STATUT_ECHEC = "echec"
+STATUTS_FINAUX = (STATUT_TERMINE, STATUT_ECHEC)
+
+# Étapes du pipeline de synthèse
+ETAPES_SYNTHESE = ("preparation_prompt", "appel_llm", "validation_json", "rendu_html")
+
+# Sous-dossier de syntheses/ contenant l'état des jobs
+DOSSIER_JOBS = "jobs"
+
+
+class JobSynthese:
+    """État d'un job de synthèse"""
+
+    def __init__(self, job_id: str, user_folder: str):
+        self.job_id = job_id
+        self.user_folder = user_folder
+        self.statut = STATUT_EN_ATTENTE
+        self.etape: Optional[str] = None
+        self.tentative = 0
+        self.erreur: Optional[str] = None
+        self.fichier_rapport: Optional[str] = None
+        self.fichier_synthese: Optional[str] = None
+        self.cree_le = datetime.now().isoformat()
+        self.mis_a_jour_le = self.cree_le
+        self.termine_a: Optional[float] = None
+        self.synthesis_data: Optional[Dict[str, Any]] = None
+
+    @property
+    def est_termine(self) -> bool:
+        return self.statut in STATUTS_FINAUX
+
+    def to_dict(self) -> Dict[str, Any]:
+        """État sérialisable du job (sans les données de synthèse)"""
+        return {
+            "job_id": self.job_id,
+            "statut": self.statut,
+            "etape": self.etape,
+            "tentative": self.tentative,
+            "erreur": self.erreur,
+            "fichier_rapport": self.fichier_rapport,
+            "fichier_synthese": self.fichier_synthese,
+            "cree_le": self.cree_le,
+            "mis_a_jour_le": self.mis_a_jour_le,
+        }
+
+
+class GestionnaireJobsSynthese:
+    """
+    Soumission, exécution et suivi des jobs de synthèse
+
+    Les jobs tournent dans la boucle d'événements de l'application ; un
+    sémaphore limite le nombre de synthèses simultanées, les suivants restent
+    en attente.
+    """
+
+    def __init__(self, max_workers: int = 2, ttl_seconds: int = 3600, intervalle_polling: float = 2.0,
+                 budget_seconds: float = 600.0, mode: str = MODE_SYNTHESE_UNIQUE):
+        if mode not in MODES_SYNTHESE:
+            logger.warning(f"Mode de synthèse inconnu: {mode}, utilisation de {MODE_SYNTHESE_UNIQUE}")
+            mode = MODE_SYNTHESE_UNIQUE
+        self.mode = mode
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._ttl_seconds = ttl_seconds
+        self._budget_seconds = budget_seconds
+        self._intervalle_polling = intervalle_polling
+        self._jobs: Dict[str, JobSynthese] = {}
+        self._abonnes: Dict[str, List[asyncio.Queue]] = {}
+        self._taches: set = set()
+        # Dernière écriture de l'état de chaque job en cours (écritures enchaînées, dans l'ordre)
+        self._persistances: Dict[str, asyncio.Task] = {}
+
+    def soumettre(self, history, client, profil_manager, user_folder: str,
+                  version_corpus: Optional[str] = None, conversation_id: Optional[str] = None) -> JobSynthese:
+        """
+        Crée un job de synthèse et planifie son exécution
+
+        Args:
+            history: Historique de la conversation (copié)
+            client: Client AsyncAzureOpenAI
+            profil_manager: Manager du profil client simulé
+            user_folder: Dossier de stockage de l'utilisateur
+            version_corpus: Version du corpus de la session (version par défaut si None)
+            conversation_id: Identifiant de la conversation (pré-évaluation partagée)
+
+        Returns:
+            JobSynthese: Job créé (statut en_attente)
+        """
+        self._purger()
+
+        job = JobSynthese(uuid.uuid4().hex, user_folder)
+        self._jobs[job.job_id] = job
+
+        tache = asyncio.create_task(self._executer(
+            job, list(history), client, profil_manager, version_corpus, conversation_id
+        ))
+        self._taches.add(tache)
+        tache.add_done_callback(self._taches.discard)
+
+        logger.info(f"Job de synthèse {job.job_id} soumis")
+        return job
+
+    async def obtenir(self, job_id: str, user_folder: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne l'état d'un job de l'utilisateur
+
+        Le job est cherché en mémoire puis dans le stockage (job lancé par un
+        autre worker ou avant un redémarrage).
+
+        Returns:
+            dict: État du job, None si inconnu pour cet utilisateur
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict() if job.user_folder == user_folder else None
+
+        return await asyncio.to_thread(self._charger_etat, job_id, user_folder)
+
+    async def suivre(self, job_id: str, user_folder: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Produit les états successifs d'un job jusqu'à son état final
+
+        Yields:
+            dict: État du job à chaque changement
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.user_folder != user_folder:
+            # Job hors de ce processus : suivi par relecture du stockage
+            dernier = None
+            while True:
+                etat = await asyncio.to_thread(self._charger_etat, job_id, user_folder)
+                if etat is None:
+                    return
+                if etat != dernier:
+                    yield etat
+                    dernier = etat
+                if etat["statut"] in STATUTS_FINAUX:
+                    return
+                await asyncio.sleep(self._intervalle_polling)
+
+        file = asyncio.Queue()
+        self._abonnes.setdefault(job_id, []).append(file)
+        try:
+            etat = job.to_dict()
+            yield etat
+            while etat["statut"] not in STATUTS_FINAUX:
+                etat = await file.get()
+                yield etat
+        finally:
+            abonnes = self._abonnes.get(job_id, [])
+            if file in abonnes:
+                abonnes.remove(file)
+            if not abonnes:
+                self._abonnes.pop(job_id, None)
+
+    async def arreter(self) -> None:
+        """Annule les jobs en cours (arrêt de l'application)"""
+        for tache in list(self._taches):
+            tache.cancel()
+        if self._taches:
+            await asyncio.gather(*self._taches, return_exceptions=True)
+
+    async def _executer(self, job: JobSynthese, history, client, profil_manager,
+                        version_corpus: Optional[str] = None, conversation_id: Optional[str] = None) -> None:
+        """Exécute le pipeline de synthèse d'un job"""
+        await self._persister(job)
+
+        try:
+            async with self._semaphore:
+                self._mettre_a_jour(job, statut=STATUT_EN_COURS, etape="preparation_prompt")
+                await self._persister(job)
+
+                # Documents partagés en mémoire : pas de lecture de fichier
+                references = charger_documents_reference(version_corpus)
+
+                # Budget de temps des appels LLM du job (compté à partir de son démarrage)
+                # Mode parallèle : un appel par dimension (plus court pour l'utilisateur)
+                synthese = synthese_parallele_async if self.mode == MODE_SYNTHESE_PARALLELE else synthese_2_async
+                with echeance_llm(self._budget_seconds):
+                    synthesis_data = await synthese(
+                        history,
+                        client,
+                        references,
+                        profil_manager,
+                        {
+                            "user_folder": job.user_folder,
+                            "corpus_version": version_corpus,
+                            "conversation_id": conversation_id,
+                        },
+                        suivi_etape=lambda etape, tentative: self._changer_etape(job, etape, tentative),
+                    )
+
+                if not synthesis_data or "erreur" in synthesis_data:
+                    erreur = (synthesis_data or {}).get("erreur", "Synthèse indisponible")
+                    raise RuntimeError(erreur)
+
+                self._changer_etape(job, "rendu_html")
+                await asyncio.to_thread(self._enregistrer_resultat, job, synthesis_data)
+
+            job.synthesis_data = synthesis_data
+            self._mettre_a_jour(job, notifier=False, statut=STATUT_TERMINE)
+            logger.info(f"Job de synthèse {job.job_id} terminé: {job.fichier_rapport}")
+
+        except asyncio.CancelledError:
+            self._mettre_a_jour(job, notifier=False, statut=STATUT_ECHEC, erreur="Job interrompu")
+            raise
+
+        except Exception as e:
+            logger.error(f"Erreur dans le job de synthèse {job.job_id}: {e}", exc_info=True)
+            self._mettre_a_jour(job, notifier=False, statut=STATUT_ECHEC, erreur=str(e))
+
+        finally:
+            # L'état final est persisté avant d'être notifié
+            if job.est_termine:
+                job.termine_a = time.time()
+                await self._persister(job)
+            self._persistances.pop(job.job_id, None)
+            self._notifier(job)
+
+    def _changer_etape(self, job: JobSynthese, etape: str, tentative: int = 0) -> None:
+        """
+        Nouvelle étape du job (callback du pipeline, dans la boucle d'événements)
+
+        L'état est aussi persisté en tâche de fond : un suivi servi par un
+        autre worker, qui relit le stockage, voit la progression.
+        """
+        if (job.etape, job.tentative) == (etape, tentative):
+            return
+        self._mettre_a_jour(job, etape=etape, tentative=tentative)
+        self._persister(job)
+
+    def _persister(self, job: JobSynthese) -> asyncio.Task:
+        """
+        Persiste l'état courant du job après les écritures précédentes
+
+        Returns:
+            asyncio.Task: Écriture (à attendre pour un état qui doit être persisté avant la suite)
+        """
+        etat = job.to_dict()
+        precedente = self._persistances.get(job.job_id)
+
+        async def persister():
+            if precedente is not None:
+                await asyncio.gather(precedente, return_exceptions=True)
+            try:
+                await asyncio.to_thread(self._persister_etat, etat, job.user_folder)
+            except Exception as e:
+                logger.warning(f"État du job {etat['job_id']} non persisté: {e}")
+
+        tache = asyncio.create_task(persister())
+        self._persistances[job.job_id] = tache
+        return tache
+
+    def _mettre_a_jour(self, job: JobSynthese, notifier: bool = True, **champs) -> None:
+        """Met à jour l'état d'un job et notifie les abonnés SSE"""
+        for nom, valeur in champs.items():
+            setattr(job, nom, valeur)
+        job.mis_a_jour_le = datetime.now().isoformat()
+        if notifier:
+            self._notifier(job)
+
+    def _notifier(self, job: JobSynthese) -> None:
+        """Transmet l'état courant du job à ses abonnés"""
+        etat = job.to_dict()
+        for file in self._abonnes.get(job.job_id, []):
+            file.put_nowait(etat)
+
+    def _enregistrer_resultat(self, job: JobSynthese, synthesis_data: Dict[str, Any]) -> None:
+        """Rend le rapport HTML et sauvegarde synthèse et rapport dans syntheses/"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        html_content = generer_rapport_html_synthese(synthesis_data)
+
+        fichier_synthese = f"synthese_{timestamp}_{job.job_id[:8]}.json"
+        fichier_rapport = f"rapport_synthese_{timestamp}_{job.job_id[:8]}.html"
+
+        succes_json, _ = save_file_to_azure(
+            json.dumps(synthesis_data, ensure_ascii=False, indent=2),
+            "synthese",
+            fichier_synthese,
+            job.user_folder
+        )
+        succes_html, _ = save_file_to_azure(html_content, "synthese", fichier_rapport, job.user_folder)
+        if not (succes_json and succes_html):
+            raise IOError("Échec de la sauvegarde de la synthèse")
+
+        job.fichier_synthese = fichier_synthese
+        job.fichier_rapport = fichier_rapport
+
+    @staticmethod
+    def _chemin_etat(job_id: str, user_folder: str) -> str:
+        return f"{user_folder}/syntheses/{DOSSIER_JOBS}/{job_id}.json"
+
+    def _persister_etat(self, etat: Dict[str, Any], user_folder: str) -> None:
+        """Sauvegarde l'état d'un job dans le stockage"""
+        if not save_file_to_fileshare(json.dumps(etat, ensure_ascii=False), self._chemin_etat(etat["job_id"], user_folder)):
+            logger.warning(f"État du job {etat['job_id']} non persisté")
+
+    def _charger_etat(self, job_id: str, user_folder: str) -> Optional[Dict[str, Any]]:
+        """Relit l'état persisté d'un job"""
+        if not job_id.isalnum():
+            return None
+        success, contenu = get_file_from_fileshare(self._chemin_etat(job_id, user_folder))
+        if not success:
+            return None
+        try:
+            return json.loads(contenu)
+        except json.JSONDecodeError:
+            logger.warning(f"État du job {job_id} illisible")
+            return None
+
+    def _purger(self) -> None:
+        """Oublie les jobs terminés depuis plus de ttl_seconds (ils restent persistés)"""
+        limite = time.time() - self._ttl_seconds
+        expires = [
+            job_id for job_id, job in self._jobs.items()
+            if job.termine_a is not None and job.termine_a < limite
+        ]
+        for job_id in expires:
+            del self._jobs[job_id]
+
+
+# Instance globale
+_gestionnaire_jobs: Optional[GestionnaireJobsSynthese] = None
+
+
+def init_gestionnaire_jobs_synthese(max_workers: int = 2, ttl_seconds: int = 3600,
+                                    budget_seconds: float = 600.0,
+                                    mode: str = MODE_SYNTHESE_UNIQUE) -> GestionnaireJobsSynthese:
+    """Initialise le gestionnaire de jobs (appelé dans le lifespan de l'application)"""
+    global _gestionnaire_jobs
+    if _gestionnaire_jobs is None:
+        _gestionnaire_jobs = GestionnaireJobsSynthese(
+            max_workers=max_workers, ttl_seconds=ttl_seconds, budget_seconds=budget_seconds, mode=mode
+        )
+    return _gestionnaire_jobs
+
+
+def get_gestionnaire_jobs_synthese() -> GestionnaireJobsSynthese:
+    """Retourne le gestionnaire de jobs de synthèse (créé à la demande)"""
+    if _gestionnaire_jobs is None:
+        return init_gestionnaire_jobs_synthese()
+    return _gestionnaire_jobs
+
+
+async def shutdown_gestionnaire_jobs_synthese() -> None:
+    """Annule les jobs en cours et libère le gestionnaire"""
+    global _gestionnaire_jobs
+    if _gestionnaire_jobs is not None:
+        await _gestionnaire_jobs.arreter()
+        _gestionnaire_jobs = None
@@ -9,6 +9,7 @@ Fournit des fonctions autonomes pour la synthèse et le traitement des historiqu
 import os
 import json
 import time
+import asyncio
 import glob
 import re
 import logging
@@ -18,8 +19,34 @@ import openai
 from openai import AzureOpenAI
 # Flask removed - migrated to FastAPI
 from typing import Dict, Any
-from .prompt_synthese import construire_prompt_synthese
+from .comptabilite_tokens import comptabiliser_prompt
+from .prompt_synthese import (
+    DIMENSIONS_SYNTHESE,
+    comptabiliser_prompt_synthese,
+    construire_contexte_synthese_globale,
+    construire_prefixe_dimension,
+    construire_prefixe_statique,
+    construire_suffixe_dynamique,
+    get_mission_synthese_globale_template,
+    parties_partagees_prompt_synthese,
+)
 from .fonctions_fileshare import save_file_to_azure
+from .metriques_llm import extraire_usage_tokens, statistiques_cache_prompt
+from .pre_evaluation import pre_evaluation_conversation
+from .profils_documents import get_table_profils
+from .schema_synthese import (
+    EvaluationDimension,
+    ResultatSynthese,
+    SyntheseGlobale,
+    dimensions_a_regenerer,
+    erreurs_schema,
+    format_reponse,
+    modele_dimension,
+)
+from .registre_corpus import get_documents_reference
+from .stockage_blobs import construire_manifeste_prompt
+from .resilience_llm import appel_llm, appel_llm_async
+from .routeur_deploiements import ROLE_SYNTHESE
 
 # Configuration du logger pour utiliser le système centralisé
 logger = logging.getLogger("synthetiser")
@@ -80,7 +107,7 @@ def extraire_json_robuste(texte):
 
 def valider_schema_synthese(data):
     """
-    Valide que le JSON de synthèse contient toutes les clés obligatoires
+    Valide le JSON de synthèse contre le schéma typé (core.schema_synthese)
     
     Args:
         data (dict): Données à valider
@@ -88,48 +115,11 @@ def valider_schema_synthese(data):
     Returns:
         tuple: (bool, list) - (est_valide, liste_des_erreurs)
     """
-    erreurs = []
-    
-    # Vérifier les clés de premier niveau
-    cles_obligatoires = ['synthese', 'vision_detaillee', 'recommandations']
-    for cle in cles_obligatoires:
-        if cle not in data:
-            erreurs.append(f"Clé manquante au premier niveau: {cle}")
-    
-    # Vérifier la structure de 'synthese'
-    if 'synthese' in data:
-        cles_synthese = ['niveau_general', 'commentaire_global', 'timestamp']
-        for cle in cles_synthese:
-            if cle not in data['synthese']:
-                erreurs.append(f"Clé manquante dans 'synthese': {cle}")
-    
-    # Vérifier la structure de 'vision_detaillee'
-    if 'vision_detaillee' in data:
-        dimensions_requises = [
-            'maitrise_produit_technique',
-            'decouverte_client_relationnel_conclusion',
-            'traitement_objections_argumentation',
-            'cross_selling_opportunites',
-            'posture_charte_relation_client'
-        ]
-        for dimension in dimensions_requises:
-            if dimension not in data['vision_detaillee']:
-                erreurs.append(f"Dimension manquante dans 'vision_detaillee': {dimension}")
-            else:
-                # Vérifier les sous-clés de chaque dimension
-                cles_dimension = ['niveau', 'points_positifs', 'points_negatifs', 
-                                'ce_qui_devrait_etre_dit', 'reponse_suggeree']
-                for cle in cles_dimension:
-                    if cle not in data['vision_detaillee'][dimension]:
-                        erreurs.append(f"Clé manquante dans '{dimension}': {cle}")
-    
-    # Vérifier la structure de 'recommandations'
-    if 'recommandations' in data:
-        cles_recommandations = ['principales_forces', 'axes_amelioration_prioritaires', 
-                               'actions_correctives_immediates']
-        for cle in cles_recommandations:
-            if cle not in data['recommandations']:
-                erreurs.append(f"Clé manquante dans 'recommandations': {cle}")
+    erreurs = [message for _, message in erreurs_schema(data)]
+    
+    # Le timestamp est ajouté après la réponse du modèle
+    if isinstance(data, dict) and isinstance(data.get('synthese'), dict) and 'timestamp' not in data['synthese']:
+        erreurs.append("Clé manquante dans 'synthese': timestamp")
     
     est_valide = len(erreurs) == 0
     return est_valide, erreurs
@@ -250,52 +240,73 @@ def historique_remap_roles(history):
     return historique, historique_formate
 
 
-def synthese_2(history, client, documents_reference, profil_manager, session_data: Dict[str, Any] = None):
+# En-tête ajouté au prompt système pour imposer une réponse JSON stricte
+JSON_HEADER_SYNTHESE = """
+⚠️ **CONSIGNES CRITIQUES DE FORMAT** ⚠️
+Vous DEVEZ répondre EXCLUSIVEMENT avec un objet JSON valide.
+- ❌ AUCUN texte explicatif avant le JSON
+- ❌ AUCUN texte explicatif après le JSON
+- ❌ AUCUNE balise markdown (pas de ```json ni ```)
+- ✅ Commencez DIRECTEMENT par le caractère {
+- ✅ Terminez DIRECTEMENT par le caractère }
+- ✅ Toutes les chaînes doivent être entre guillemets doubles "
+- ✅ Respectez EXACTEMENT la structure JSON fournie
+
+"""
+
+# Nombre maximal de tentatives de synthèse (réponse JSON invalide)
+# Les erreurs d'appel (429, 5xx, timeouts) sont réessayées par core.resilience_llm
+MAX_TENTATIVES_SYNTHESE = 4
+
+# Modes de synthèse : un appel pour toute l'évaluation, ou un appel par dimension en parallèle
+MODE_SYNTHESE_UNIQUE = "unique"
+MODE_SYNTHESE_PARALLELE = "parallele"
+MODES_SYNTHESE = (MODE_SYNTHESE_UNIQUE, MODE_SYNTHESE_PARALLELE)
+
+# Mode parallèle : tokens générés au maximum par dimension et pour la synthèse globale
+MAX_TOKENS_DIMENSION = 1200
+MAX_TOKENS_SYNTHESE_GLOBALE = 1000
+
+# Clés attendues pour chaque dimension de la vision détaillée
+CLES_DIMENSION = tuple(EvaluationDimension.model_fields)
+
+
+def _preparer_prompt_synthese_complet(history, documents_reference, profil_manager, session_data=None):
     """
-    Effectue une évaluation unique sur tout l'historique de la conversation
-    en utilisant les documents de référence Groupama.
-    VERSION AMÉLIORÉE avec garantie de JSON valide.
+    Prépare le prompt de la synthèse et le sauvegarde pour debugging
+
+    Le prompt système ne contient que la partie statique (en-tête JSON,
+    mission, format, documents de référence) pour bénéficier du cache de
+    prompt ; le profil et la conversation sont envoyés ensuite.
 
     Args:
         history: Historique de la conversation
-        client: Client OpenAI configuré
         documents_reference: Documents de référence chargés
         profil_manager: Manager des profils clients
         session_data: Dictionnaire de session FastAPI (optionnel)
 
     Returns:
-        dict: Résultats d'évaluation structurés pour automatisation
+        tuple: (prompt_systeme, contexte_conversation)
     """
-    logger.info("Début de l'évaluation complète avec synthese_2 (version améliorée)")
-    
-    # 1. Préparer l'historique complet de la conversation
-    historique_complet = _preparer_historique_pour_synthese(history)
-
-    # 2. Détecter le profil client et charger le document spécifique
-    document_profil_specifique = _charger_document_profil_client(profil_manager)
-
-    # 3. Construire le prompt d'évaluation avec instructions JSON renforcées
-    prompt_synthese = construire_prompt_synthese(
-        documents_reference, 
-        historique_complet, 
-        document_profil_specifique, 
-        profil_manager
+    # 1-2. Historique complet, profil client et document spécifique
+    version_corpus = session_data.get('corpus_version') if session_data else None
+    cle_conversation = session_data.get('conversation_id') if session_data else None
+    historique_complet, document_profil_specifique, contexte_conversation = _preparer_contexte_conversation(
+        history, profil_manager, version_corpus, cle_conversation
     )
-    
-    # Ajouter un header JSON strict au début du prompt système
-    json_header = """
-⚠️ **CONSIGNES CRITIQUES DE FORMAT** ⚠️
-Vous DEVEZ répondre EXCLUSIVEMENT avec un objet JSON valide.
-- ❌ AUCUN texte explicatif avant le JSON
-- ❌ AUCUN texte explicatif après le JSON
-- ❌ AUCUNE balise markdown (pas de ```json ni ```)
-- ✅ Commencez DIRECTEMENT par le caractère {
-- ✅ Terminez DIRECTEMENT par le caractère }
-- ✅ Toutes les chaînes doivent être entre guillemets doubles "
-- ✅ Respectez EXACTEMENT la structure JSON fournie
 
-"""
-    prompt_synthese_complet = json_header + prompt_synthese
+    # 3. Construire le prompt d'évaluation : préfixe statique puis suffixe dynamique
+    # (header JSON strict au début du prompt système)
+    prompt_systeme = construire_prefixe_statique(documents_reference, JSON_HEADER_SYNTHESE)
+    comptabiliser_prompt_synthese(
+        documents_reference,
+        historique_complet,
+        document_profil_specifique,
+        contexte_conversation,
+        entete=JSON_HEADER_SYNTHESE,
+        corpus=version_corpus,
+    )
+    prompt_synthese_complet = prompt_systeme + contexte_conversation
     
     # Sauvegarde du prompt pour debugging dans Azure FileShare
     try:
@@ -303,10 +314,17 @@ Vous DEVEZ répondre EXCLUSIVEMENT avec un objet JSON valide.
 
         if user_folder:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"prompt_synthese_{timestamp}.txt"
+            filename = f"prompt_synthese_{timestamp}.json"
+
+            # Manifeste : parties partagées (templates, documents) stockées une seule fois
+            # en blobs, seuls le profil et la conversation sont écrits (core.stockage_blobs)
+            manifeste = construire_manifeste_prompt(
+                prompt_synthese_complet,
+                parties_partagees_prompt_synthese(documents_reference, document_profil_specifique, JSON_HEADER_SYNTHESE)
+            )
             
             success, azure_path = save_file_to_azure(
-                prompt_synthese_complet,
+                json.dumps(manifeste, ensure_ascii=False),
                 'conversation',
                 filename,
                 user_folder
@@ -320,9 +338,213 @@ Vous DEVEZ répondre EXCLUSIVEMENT avec un objet JSON valide.
             logger.warning("user_folder non disponible dans la session, prompt non sauvegardé")
     except Exception as e:
         logger.error(f"Erreur lors de la sauvegarde du prompt: {str(e)}")
+
+    return prompt_systeme, contexte_conversation
+
+
+def _preparer_contexte_conversation(history, profil_manager, version_corpus=None, cle_conversation=None):
+    """
+    Prépare la partie dynamique du prompt (profil client et conversation)
+
+    Si la conversation a été pré-évaluée pendant l'entretien (core.pre_evaluation),
+    les évaluations partielles remplacent les échanges qu'elles couvrent.
+
+    Returns:
+        tuple: (historique_complet, document_profil_specifique, contexte_conversation)
+    """
+    historique_complet = _preparer_historique_pour_synthese(
+        history, pre_evaluation_conversation(history, cle_conversation)
+    )
+    document_profil_specifique = _charger_document_profil_client(profil_manager, version_corpus)
+    contexte_conversation = construire_suffixe_dynamique(
+        historique_complet,
+        document_profil_specifique,
+        profil_manager
+    )
+    return historique_complet, document_profil_specifique, contexte_conversation
+
+
+def _parametres_appel_synthese(prompt_systeme, contexte_conversation, max_tokens=4000,
+                               consigne="Évaluez cette conversation et répondez UNIQUEMENT avec le JSON structuré demandé.",
+                               response_format=None):
+    """
+    Paramètres de l'appel chat.completions pour la synthèse
+
+    Args:
+        response_format: Schéma imposé à la réponse (synthèse complète par défaut)
+    """
+    return {
+        "model": os.getenv("AZURE_OPENAI_DEPLOYMENT_m"),
+        "messages": [
+            {
+                "role": "system",
+                "content": prompt_systeme
+            },
+            {
+                "role": "user",
+                "content": contexte_conversation
+                + "\n\n" + consigne
+            }
+        ],
+        # Sortie structurée stricte : la réponse respecte le schéma typé
+        "response_format": response_format or format_reponse(ResultatSynthese, "synthese_conversation"),
+        "temperature": 0,      # Déterminisme maximal
+        "top_p": 1,
+        "seed": 42,            # Reproductibilité
+        "max_tokens": max_tokens,  # 4000 pour la synthèse complète
+        "n": 1,
+        "stream": False,
+        "timeout": 120
+    }
+
+
+def _enregistrer_usage_synthese(response, debut_appel):
+    """
+    Enregistre l'usage en tokens d'un appel de synthèse (dont les tokens servis par le cache)
+
+    Returns:
+        dict: Compteurs de tokens de l'appel
+    """
+    usage = extraire_usage_tokens(response)
+    duree = time.time() - debut_appel
+    statistiques_cache_prompt.enregistrer("synthese", usage, duree)
+    logger.info(
+        f"Usage synthèse: {usage['prompt_tokens']} tokens prompt dont "
+        f"{usage['cached_tokens']} en cache, {usage['completion_tokens']} tokens générés ({duree:.2f}s)"
+    )
+    return usage
+
+
+def _traiter_reponse_synthese(synthese_text, attempt, max_retries, history, profil_manager, start_time,
+                              usage=None):
+    """
+    Extrait, valide et enrichit la réponse brute d'une tentative de synthèse
+
+    Returns:
+        tuple: (resultat, reessayer) - resultat est None si une nouvelle tentative est nécessaire
+    """
+    # Log de la réponse brute pour debugging
+    logger.debug(f"Réponse brute (100 premiers chars): {synthese_text[:100]}")
+    
+    # 5. Extraction robuste du JSON
+    try:
+        resultats_json = extraire_json_robuste(synthese_text)
+        logger.info("JSON extrait avec succès")
+        # Le timestamp n'est pas demandé au modèle (préfixe de prompt statique)
+        if isinstance(resultats_json.get("synthese"), dict):
+            resultats_json["synthese"]["timestamp"] = datetime.now().isoformat()
+    except ValueError as e:
+        logger.error(f"Échec d'extraction du JSON (tentative {attempt}/{max_retries}): {e}")
+        if attempt == max_retries:
+            return _creer_reponse_erreur(
+                "Échec d'extraction du JSON après toutes les tentatives",
+                synthese_text,
+                str(e),
+                history,
+                profil_manager,
+                max_retries
+            ), False
+        return None, False
+    
+    # 6. Validation du schéma
+    est_valide, erreurs = valider_schema_synthese(resultats_json)
+    
+    if not est_valide:
+        logger.warning(f"Schéma JSON invalide (tentative {attempt}/{max_retries})")
+        logger.warning(f"Erreurs de validation: {erreurs}")
+        
+        if attempt == max_retries:
+            # Dernière tentative : on retourne quand même avec warning
+            logger.error("Schéma invalide après toutes les tentatives, retour avec données partielles")
+            resultats_json["_avertissements_validation"] = {
+                "schema_invalide": True,
+                "erreurs": erreurs,
+                "message": "Le JSON a été retourné malgré des erreurs de validation"
+            }
+        else:
+            # On réessaie
+            return None, True
+    
+    # 7. Parser et enrichir les résultats
+    resultats_structures = _parser_resultats_synthese_2(
+        history, 
+        json.dumps(resultats_json),  # Convertir en string pour compatibilité
+        profil_manager
+    )
+    
+    # Vérifier si le parsing a échoué
+    if "erreur" in resultats_structures and "echec_parsing" in resultats_structures.get("statut", ""):
+        logger.warning(f"Erreur de parsing détectée (tentative {attempt}/{max_retries})")
+        if attempt == max_retries:
+            logger.error("Nombre maximum de tentatives atteint - échec du parsing")
+            return resultats_structures, False
+        return None, True
+    
+    # ✅ Succès !
+    duree_totale = time.time() - start_time
+    logger.info(f"✅ Évaluation réussie à la tentative {attempt}/{max_retries}")
+    logger.info(f"Durée totale: {duree_totale:.2f} secondes")
+    
+    # Ajouter des métadonnées de succès
+    resultats_structures["_metadata_appel"] = {
+        "mode": MODE_SYNTHESE_UNIQUE,
+        "tentative_reussie": attempt,
+        "duree_totale_secondes": round(duree_totale, 2),
+        "schema_valide": est_valide,
+        "timestamp_reussite": datetime.now().isoformat(),
+        "usage_tokens": usage or {}
+    }
+    
+    return resultats_structures, False
+
+
+def _creer_reponse_echec_api(erreur, max_retries, start_time, history, profil_manager):
+    """
+    Crée la réponse d'erreur retournée quand toutes les tentatives d'appel ont échoué
+    """
+    total_failed_duration = time.time() - start_time
+    logger.error("❌ Nombre maximum de tentatives atteint - échec de l'évaluation")
     
-    # 4. Appeler l'API avec mécanisme de retry amélioré
-    max_retries = 4
+    return {
+        "erreur": str(erreur),
+        "type_erreur": type(erreur).__name__,
+        "timestamp": datetime.now().isoformat(),
+        "statut": "echec_api",
+        "tentatives": max_retries,
+        "derniere_erreur": str(erreur),
+        "duree_totale_echec": f"{total_failed_duration:.2f}s",
+        "details_client": _extraire_details_client_securise(profil_manager),
+        "contexte": {
+            "nombre_messages": len(history) if history else 0,
+            "date_erreur": datetime.now().isoformat()
+        }
+    }
+
+
+def synthese_2(history, client, documents_reference, profil_manager, session_data: Dict[str, Any] = None):
+    """
+    Effectue une évaluation unique sur tout l'historique de la conversation
+    en utilisant les documents de référence Groupama.
+    VERSION AMÉLIORÉE avec garantie de JSON valide.
+
+    Args:
+        history: Historique de la conversation
+        client: Client OpenAI configuré
+        documents_reference: Documents de référence chargés
+        profil_manager: Manager des profils clients
+        session_data: Dictionnaire de session FastAPI (optionnel)
+
+    Returns:
+        dict: Résultats d'évaluation structurés pour automatisation
+    """
+    logger.info("Début de l'évaluation complète avec synthese_2 (version améliorée)")
+    
+    prompt_systeme, contexte_conversation = _preparer_prompt_synthese_complet(
+        history, documents_reference, profil_manager, session_data
+    )
+    
+    # 4. Appeler l'API (nouvelle tentative si le JSON retourné est invalide)
+    max_retries = MAX_TENTATIVES_SYNTHESE
     logger.info(f"Tentatives d'évaluation avec un maximum de {max_retries} tentatives")
     
     for attempt in range(1, max_retries + 1):
@@ -331,132 +553,351 @@ Vous DEVEZ répondre EXCLUSIVEMENT avec un objet JSON valide.
         
         try:
             # Appel à l'API OpenAI avec response_format pour garantir le JSON
-            response = client.chat.completions.create(
-                model=os.getenv("AZURE_OPENAI_DEPLOYMENT_m"),
-                messages=[
-                    {
-                        "role": "system",
-                        "content": prompt_synthese_complet
-                    },
-                    {
-                        "role": "user",
-                        "content": "Évaluez cette conversation et répondez UNIQUEMENT avec le JSON structuré demandé."
-                    }
-                ],
-                response_format={"type": "json_object"},  # ← CRUCIAL pour forcer le JSON
-                temperature=0,      # Déterminisme maximal
-                top_p=1,
-                seed=42,            # Reproductibilité
-                max_tokens=4000,    # Augmenté pour les réponses complètes
-                n=1,
-                stream=False,
-                timeout=120
+            debut_appel = time.time()
+            response = appel_llm(
+                client,
+                ROLE_SYNTHESE,
+                **_parametres_appel_synthese(prompt_systeme, contexte_conversation)
             )
+            usage = _enregistrer_usage_synthese(response, debut_appel)
 
             # Traitement de la réponse
-            api_response_time = time.time()
             logger.info("Réponse de l'API reçue, traitement en cours...")
             synthese_text = response.choices[0].message.content
-            
-            # Log de la réponse brute pour debugging
-            logger.debug(f"Réponse brute (100 premiers chars): {synthese_text[:100]}")
-            
-            # 5. Extraction robuste du JSON
-            try:
-                resultats_json = extraire_json_robuste(synthese_text)
-                logger.info("JSON extrait avec succès")
-            except ValueError as e:
-                logger.error(f"Échec d'extraction du JSON (tentative {attempt}/{max_retries}): {e}")
-                if attempt == max_retries:
-                    return _creer_reponse_erreur(
-                        "Échec d'extraction du JSON après toutes les tentatives",
-                        synthese_text,
-                        str(e),
-                        history,
-                        profil_manager,
-                        max_retries
-                    )
-                continue
-            
-            # 6. Validation du schéma
-            est_valide, erreurs = valider_schema_synthese(resultats_json)
-            
-            if not est_valide:
-                logger.warning(f"Schéma JSON invalide (tentative {attempt}/{max_retries})")
-                logger.warning(f"Erreurs de validation: {erreurs}")
-                
-                if attempt == max_retries:
-                    # Dernière tentative : on retourne quand même avec warning
-                    logger.error("Schéma invalide après toutes les tentatives, retour avec données partielles")
-                    resultats_json["_avertissements_validation"] = {
-                        "schema_invalide": True,
-                        "erreurs": erreurs,
-                        "message": "Le JSON a été retourné malgré des erreurs de validation"
-                    }
-                else:
-                    # On réessaie
-                    time.sleep(2)
-                    continue
-            
-            # 7. Parser et enrichir les résultats
-            resultats_structures = _parser_resultats_synthese_2(
-                history, 
-                json.dumps(resultats_json),  # Convertir en string pour compatibilité
-                profil_manager
+
+            resultat, _ = _traiter_reponse_synthese(
+                synthese_text, attempt, max_retries, history, profil_manager, start_time, usage
             )
-            
-            # Vérifier si le parsing a échoué
-            if "erreur" in resultats_structures and "echec_parsing" in resultats_structures.get("statut", ""):
-                logger.warning(f"Erreur de parsing détectée (tentative {attempt}/{max_retries})")
-                if attempt == max_retries:
-                    logger.error("Nombre maximum de tentatives atteint - échec du parsing")
-                    return resultats_structures
-                time.sleep(2)
-                continue
-            
-            # ✅ Succès !
-            duree_totale = time.time() - start_time
-            logger.info(f"✅ Évaluation réussie à la tentative {attempt}/{max_retries}")
-            logger.info(f"Durée totale: {duree_totale:.2f} secondes")
-            
-            # Ajouter des métadonnées de succès
-            resultats_structures["_metadata_appel"] = {
-                "tentative_reussie": attempt,
-                "duree_totale_secondes": round(duree_totale, 2),
-                "schema_valide": est_valide,
-                "timestamp_reussite": datetime.now().isoformat()
-            }
-            
-            return resultats_structures
+            if resultat is not None:
+                return resultat
 
         except Exception as e:
             error_duration = time.time() - start_time
             
+            # Les erreurs transitoires ont déjà été réessayées par la couche de résilience
             logger.error(f"Erreur lors de l'évaluation (tentative {attempt}/{max_retries}): {e}")
             logger.error(f"Type d'erreur: {type(e).__name__}")
             logger.info(f"Durée avant erreur: {error_duration:.2f} secondes")
             
-            if attempt == max_retries:
-                total_failed_duration = time.time() - start_time
-                logger.error("❌ Nombre maximum de tentatives atteint - échec de l'évaluation")
-                
-                return {
-                    "erreur": str(e),
-                    "type_erreur": type(e).__name__,
-                    "timestamp": datetime.now().isoformat(),
-                    "statut": "echec_api",
-                    "tentatives": max_retries,
-                    "derniere_erreur": str(e),
-                    "duree_totale_echec": f"{total_failed_duration:.2f}s",
-                    "details_client": _extraire_details_client_securise(profil_manager),
-                    "contexte": {
-                        "nombre_messages": len(history) if history else 0,
-                        "date_erreur": datetime.now().isoformat()
-                    }
-                }
-            else:
-                logger.info(f"Nouvelle tentative dans 2 secondes... ({attempt + 1}/{max_retries})")
-                time.sleep(2)
+            return _creer_reponse_echec_api(e, attempt, start_time, history, profil_manager)
+
+
+async def synthese_2_async(history, client, documents_reference, profil_manager,
+                           session_data: Dict[str, Any] = None, suivi_etape=None):
+    """
+    Variante asynchrone de synthese_2 (client AsyncAzureOpenAI)
+
+    La construction du prompt (lecture de fichiers, sauvegarde FileShare) est
+    déportée dans un thread et l'appel ne bloque pas la boucle d'événements.
+
+    Args:
+        suivi_etape: Callback optionnel appelé à chaque étape,
+                     suivi_etape(etape, tentative) avec etape parmi
+                     "preparation_prompt", "appel_llm", "validation_json"
+
+    Returns:
+        dict: Résultats d'évaluation structurés pour automatisation
+    """
+    logger.info("Début de l'évaluation complète avec synthese_2_async")
+
+    def _notifier(etape, tentative=0):
+        if suivi_etape:
+            suivi_etape(etape, tentative)
+
+    _notifier("preparation_prompt")
+    prompt_systeme, contexte_conversation = await asyncio.to_thread(
+        _preparer_prompt_synthese_complet,
+        history, documents_reference, profil_manager, session_data
+    )
+
+    max_retries = MAX_TENTATIVES_SYNTHESE
+    logger.info(f"Tentatives d'évaluation avec un maximum de {max_retries} tentatives")
+
+    for attempt in range(1, max_retries + 1):
+        start_time = time.time()
+        logger.info(f"Tentative {attempt}/{max_retries} - Début")
+
+        try:
+            _notifier("appel_llm", attempt)
+            debut_appel = time.time()
+            response = await appel_llm_async(
+                client,
+                ROLE_SYNTHESE,
+                **_parametres_appel_synthese(prompt_systeme, contexte_conversation)
+            )
+            usage = _enregistrer_usage_synthese(response, debut_appel)
+
+            logger.info("Réponse de l'API reçue, traitement en cours...")
+            synthese_text = response.choices[0].message.content
+
+            _notifier("validation_json", attempt)
+            synthese_text, usage_regeneration = await _regenerer_dimensions_invalides(
+                synthese_text, client, documents_reference, contexte_conversation,
+                session_data.get('corpus_version') if session_data else None
+            )
+            if usage_regeneration:
+                usage = _additionner_usages([usage, usage_regeneration])
+            resultat, _ = _traiter_reponse_synthese(
+                synthese_text, attempt, max_retries, history, profil_manager, start_time, usage
+            )
+            if resultat is not None:
+                return resultat
+
+        except Exception as e:
+            # Les erreurs transitoires ont déjà été réessayées par la couche de résilience
+            logger.error(f"Erreur lors de l'évaluation (tentative {attempt}/{max_retries}): {e}")
+            logger.error(f"Type d'erreur: {type(e).__name__}")
+
+            return _creer_reponse_echec_api(e, attempt, start_time, history, profil_manager)
+
+
+async def _regenerer_dimensions_invalides(synthese_text, client, documents_reference, contexte_conversation,
+                                         version_corpus=None):
+    """
+    Regénère uniquement les dimensions invalides d'une réponse de synthèse
+
+    Quand toutes les erreurs de schéma portent sur des dimensions de la vision
+    détaillée (dimension absente, tronquée ou mal typée), seules ces
+    dimensions sont redemandées, en parallèle, par des appels courts
+    (_evaluer_dimension) au lieu de refaire toute l'évaluation.
+
+    Returns:
+        tuple: (synthese_text, usage) - texte complété (inchangé si la réponse
+               est valide, illisible ou invalide ailleurs), usage des appels
+               de regénération (vide si aucun appel)
+    """
+    try:
+        resultats_json = extraire_json_robuste(synthese_text)
+    except ValueError:
+        return synthese_text, {}
+
+    dimensions = dimensions_a_regenerer(erreurs_schema(resultats_json))
+    if not dimensions:
+        return synthese_text, {}
+
+    dimensions = [dimension for dimension in DIMENSIONS_SYNTHESE if dimension in dimensions]
+    logger.warning(f"Dimensions invalides regénérées: {dimensions}")
+    try:
+        evaluations = await asyncio.gather(*[
+            _evaluer_dimension(client, dimension, documents_reference, contexte_conversation, version_corpus)
+            for dimension in dimensions
+        ])
+    except Exception as e:
+        # La réponse est alors traitée telle quelle (nouvelle tentative complète)
+        logger.error(f"Échec de la regénération des dimensions: {e}")
+        return synthese_text, {}
+
+    if not isinstance(resultats_json.get("vision_detaillee"), dict):
+        resultats_json["vision_detaillee"] = {}
+    for dimension, (partie, erreurs, _, _, _) in zip(dimensions, evaluations):
+        if not erreurs:
+            resultats_json["vision_detaillee"][dimension] = partie
+    return json.dumps(resultats_json, ensure_ascii=False), _additionner_usages(
+        evaluation[2] for evaluation in evaluations
+    )
+
+
+def _additionner_usages(usages):
+    """Somme des compteurs de tokens de plusieurs appels"""
+    total = {}
+    for usage in usages:
+        for cle, valeur in usage.items():
+            total[cle] = total.get(cle, 0) + valeur
+    return total
+
+
+async def _appel_json_synthese(client, prompt_systeme, contexte, max_tokens, consigne, extraire, libelle,
+                               response_format=None):
+    """
+    Appel de synthèse dont la réponse JSON est extraite et vérifiée par `extraire`
+
+    Le JSON invalide ou incomplet est redemandé jusqu'à MAX_TENTATIVES_SYNTHESE
+    fois ; les erreurs d'appel (déjà réessayées par core.resilience_llm) sont
+    propagées.
+
+    Args:
+        extraire: Fonction (json) -> (partie, erreurs)
+        libelle: Nom de l'appel pour les logs
+        response_format: Schéma imposé à la réponse
+
+    Returns:
+        tuple: (partie, erreurs, usage, tentatives, duree) - la partie de la
+               dernière tentative est retournée même incomplète
+    """
+    debut = time.time()
+    usages = []
+    partie, erreurs = {}, []
+    for attempt in range(1, MAX_TENTATIVES_SYNTHESE + 1):
+        debut_appel = time.time()
+        response = await appel_llm_async(
+            client,
+            ROLE_SYNTHESE,
+            **_parametres_appel_synthese(prompt_systeme, contexte, max_tokens, consigne, response_format)
+        )
+        usages.append(_enregistrer_usage_synthese(response, debut_appel))
+
+        try:
+            partie, erreurs = extraire(extraire_json_robuste(response.choices[0].message.content))
+        except ValueError as e:
+            partie, erreurs = {}, [str(e)]
+        if not erreurs:
+            break
+        logger.warning(f"Réponse invalide pour {libelle} (tentative {attempt}/{MAX_TENTATIVES_SYNTHESE}): {erreurs}")
+
+    return partie, erreurs, _additionner_usages(usages), attempt, round(time.time() - debut, 2)
+
+
+async def _evaluer_dimension(client, dimension, documents_reference, contexte_conversation, version_corpus=None):
+    """Évalue une dimension de la vision détaillée (mode parallèle)"""
+    prompt_systeme = construire_prefixe_dimension(documents_reference, dimension, JSON_HEADER_SYNTHESE)
+    comptabiliser_prompt(
+        "synthese_dimension",
+        {"prefixe": prompt_systeme, "contexte": contexte_conversation},
+        dimension=dimension,
+        corpus=version_corpus,
+    )
+
+    def extraire(donnees):
+        # Le modèle peut renvoyer la dimension seule, sans la clé englobante
+        partie = donnees.get(dimension, donnees)
+        if not isinstance(partie, dict):
+            return {}, [f"Dimension {dimension} absente"]
+        return partie, [message for _, message in erreurs_schema({dimension: partie}, modele_dimension(dimension))]
+
+    return await _appel_json_synthese(
+        client,
+        prompt_systeme,
+        contexte_conversation,
+        MAX_TOKENS_DIMENSION,
+        f"Évaluez uniquement la dimension {dimension} et répondez UNIQUEMENT avec le JSON structuré demandé.",
+        extraire,
+        dimension,
+        format_reponse(modele_dimension(dimension), f"dimension_{dimension}"),
+    )
+
+
+async def _synthese_globale(client, vision_detaillee, profil_manager):
+    """Produit synthese et recommandations à partir des dimensions évaluées (mode parallèle)"""
+    prompt_systeme = JSON_HEADER_SYNTHESE + get_mission_synthese_globale_template()
+    contexte = construire_contexte_synthese_globale(vision_detaillee, profil_manager)
+
+    def extraire(donnees):
+        partie = {cle: donnees.get(cle) for cle in ("synthese", "recommandations")}
+        return partie, [message for _, message in erreurs_schema(partie, SyntheseGlobale)]
+
+    return await _appel_json_synthese(
+        client,
+        prompt_systeme,
+        contexte,
+        MAX_TOKENS_SYNTHESE_GLOBALE,
+        "Rédigez la synthèse globale et répondez UNIQUEMENT avec le JSON structuré demandé.",
+        extraire,
+        "synthese_globale",
+        format_reponse(SyntheseGlobale, "synthese_globale"),
+    )
+
+
+async def synthese_parallele_async(history, client, documents_reference, profil_manager,
+                                   session_data: Dict[str, Any] = None, suivi_etape=None):
+    """
+    Évaluation en parallèle : un appel par dimension, puis la synthèse globale
+
+    Chaque dimension de la vision détaillée est évaluée par un appel plus
+    court qui ne reçoit que ses documents de référence
+    (DOCUMENTS_PAR_DIMENSION) ; les appels sont simultanés, la durée est
+    celle de la dimension la plus lente plus un appel léger qui rédige
+    synthese et recommandations. Le résultat fusionné a la même structure
+    que celui de synthese_2_async et passe par la même validation.
+
+    Args:
+        suivi_etape: Callback optionnel, mêmes étapes que synthese_2_async
+
+    Returns:
+        dict: Résultats d'évaluation structurés pour automatisation
+    """
+    logger.info("Début de l'évaluation complète en parallèle par dimension")
+    start_time = time.time()
+
+    def _notifier(etape, tentative=0):
+        if suivi_etape:
+            suivi_etape(etape, tentative)
+
+    _notifier("preparation_prompt")
+    version_corpus = session_data.get('corpus_version') if session_data else None
+    cle_conversation = session_data.get('conversation_id') if session_data else None
+    _, _, contexte_conversation = await asyncio.to_thread(
+        _preparer_contexte_conversation, history, profil_manager, version_corpus, cle_conversation
+    )
+
+    try:
+        _notifier("appel_llm", 1)
+        taches = [
+            asyncio.ensure_future(
+                _evaluer_dimension(client, dimension, documents_reference, contexte_conversation, version_corpus)
+            )
+            for dimension in DIMENSIONS_SYNTHESE
+        ]
+        try:
+            evaluations = await asyncio.gather(*taches)
+        except Exception:
+            # Une dimension en échec : inutile d'attendre les autres
+            for tache in taches:
+                tache.cancel()
+            raise
+
+        vision_detaillee = {
+            dimension: evaluation[0] for dimension, evaluation in zip(DIMENSIONS_SYNTHESE, evaluations)
+        }
+        globale = await _synthese_globale(client, vision_detaillee, profil_manager)
+
+    except Exception as e:
+        # Les erreurs transitoires ont déjà été réessayées par la couche de résilience
+        logger.error(f"Erreur lors de l'évaluation parallèle: {e}")
+        logger.error(f"Type d'erreur: {type(e).__name__}")
+        return _creer_reponse_echec_api(e, 1, start_time, history, profil_manager)
+
+    _notifier("validation_json", 1)
+    resultats_json = {
+        "synthese": dict(globale[0].get("synthese") or {}),
+        "vision_detaillee": vision_detaillee,
+        "recommandations": globale[0].get("recommandations") or {},
+    }
+    resultats_json["synthese"]["timestamp"] = datetime.now().isoformat()
+
+    est_valide, erreurs = valider_schema_synthese(resultats_json)
+    if not est_valide:
+        logger.error(f"Schéma invalide après fusion des dimensions: {erreurs}")
+        resultats_json["_avertissements_validation"] = {
+            "schema_invalide": True,
+            "erreurs": erreurs,
+            "message": "Le JSON a été retourné malgré des erreurs de validation"
+        }
+
+    resultats_structures = _parser_resultats_synthese_2(history, json.dumps(resultats_json), profil_manager)
+    if "erreur" in resultats_structures and "echec_parsing" in resultats_structures.get("statut", ""):
+        return resultats_structures
+
+    appels = dict(zip(DIMENSIONS_SYNTHESE, evaluations))
+    appels["synthese_globale"] = globale
+    duree_totale = time.time() - start_time
+    logger.info(
+        f"✅ Évaluation parallèle réussie en {duree_totale:.2f}s "
+        f"(dimension la plus lente: {max(evaluation[4] for evaluation in evaluations):.2f}s)"
+    )
+
+    resultats_structures["_metadata_appel"] = {
+        "mode": MODE_SYNTHESE_PARALLELE,
+        "tentative_reussie": max(appel[3] for appel in appels.values()),
+        "duree_totale_secondes": round(duree_totale, 2),
+        "schema_valide": est_valide,
+        "timestamp_reussite": datetime.now().isoformat(),
+        "usage_tokens": _additionner_usages(appel[2] for appel in appels.values()),
+        "appels": {
+            nom: {"tentatives": appel[3], "duree_secondes": appel[4], "usage_tokens": appel[2]}
+            for nom, appel in appels.items()
+        },
+    }
+    return resultats_structures
 
 
 def _creer_reponse_erreur(message_erreur, synthese_brute, erreur_parsing, 
@@ -498,17 +939,30 @@ def _extraire_details_client_securise(profil_manager):
         return {"erreur_extraction": str(e)}
 
 
-def _preparer_historique_pour_synthese(history):
+def _preparer_historique_pour_synthese(history, pre_evaluation=None):
     """
     Prépare l'historique complet de la conversation pour l'évaluation
     Filtre les messages d'erreur technique et leurs messages précédents
-    
+
+    Args:
+        history: Historique de la conversation
+        pre_evaluation: Pré-évaluation du début de la conversation (optionnel) ;
+                        seuls les échanges suivants sont repris mot pour mot
+
     Returns:
         str: Historique formaté pour l'évaluation
     """
     logger.info("Préparation de l'historique pour l'évaluation")
     if not history:
         return "Aucune conversation à évaluer."
+
+    premier_numero = 1
+    entete = "=== HISTORIQUE COMPLET DE LA CONVERSATION ===\n\n"
+    if pre_evaluation is not None:
+        logger.info(f"Pré-évaluation consolidée: {pre_evaluation.nb_messages} messages déjà évalués")
+        history = history[pre_evaluation.nb_messages:]
+        premier_numero = pre_evaluation.nb_messages + 1
+        entete = pre_evaluation.texte() + "=== DERNIERS ÉCHANGES (NON PRÉ-ÉVALUÉS) ===\n\n"
     
     # Message d'erreur technique à filtrer
     message_erreur_technique = "Je suis désolé, mais je rencontre des difficultés techniques. Pouvez-vous reformuler ou essayer plus tard?"
@@ -552,14 +1006,17 @@ def _preparer_historique_pour_synthese(history):
     # Utilisation de la fonction historique_remap_roles pour convertir les rôles
     historique, formatted_history = historique_remap_roles(history_filtered)
 
-    historique_formate = "=== HISTORIQUE COMPLET DE LA CONVERSATION ===\n\n"
+    historique_formate = entete
     
+    if not historique and pre_evaluation is not None:
+        return historique_formate + "Aucun échange après la pré-évaluation.\n"
+
     if not historique:
         historique_formate += "Aucune conversation valide à évaluer après filtrage.\n"
         logger.warning("Aucun message valide après filtrage")
         return historique_formate
     
-    for i, message in enumerate(historique, 1):
+    for i, message in enumerate(historique, premier_numero):
         role = message.get('role', 'Inconnu')
         contenu = message.get('text', '')
         
@@ -774,50 +1231,35 @@ def _formater_historique_erreur(history):
         }
 
 
-def _charger_document_profil_client(profil_manager):
+def _charger_document_profil_client(profil_manager, version_corpus=None):
     """
-    Charge le document de profil spécifique selon l'âge et le profil_passerelle du client
-    
+    Retourne le document de profil spécifique selon l'âge et le profil_passerelle du client
+
+    Le document provient du magasin partagé (aucune lecture de fichier par synthèse).
+
+    Args:
+        profil_manager: Manager du profil client
+        version_corpus: Version du corpus de la session (version par défaut si None)
+
     Returns:
         str: Contenu du document de profil ou chaîne vide si non trouvé
     """
-    # Extraire les informations du client
-    age_client = profil_manager.profil.get('Age', 40)
-    profil_passerelle = profil_manager.profil.get('profil_passerelle', 'Famille')
-
-    # Mapping des fichiers selon le tableau fourni
-    fichier_profil = None
-    
-    if profil_passerelle == "Aidant":
-        fichier_profil = "data/txt/profil_aidants.txt"
-    elif profil_passerelle == "Famille":
-        if 45 <= age_client <= 54:
-            fichier_profil = "data/txt/profil_familles_installees_45_54.txt"
-        elif 30 <= age_client <= 44:
-            fichier_profil = "data/txt/Profil_jeune_famille_30_44.txt"
-    elif profil_passerelle == "Jeune client":
-        if 18 <= age_client <= 29:
-            fichier_profil = "data/txt/Profil_jeunes_actifs_18_29.txt"
-    elif profil_passerelle == "Senior":
-        if 55 <= age_client <= 64:
-            fichier_profil = "data/txt/profil_jeunes_senior_55_64.txt"
-        elif age_client >= 75:
-            fichier_profil = "data/txt/profil_retraite_aide_sup75.txt"
-        elif 65 <= age_client <= 74:
-            fichier_profil = "data/txt/profil_retraite_en_forme_65_74.txt"
-    
-    if fichier_profil:
-        try:
-            with open(fichier_profil, 'r', encoding='utf-8') as f:
-                contenu = f.read()
-            logger.info(f"Document profil chargé: {fichier_profil}")
-            return contenu
-        except FileNotFoundError:
-            logger.warning(f"Fichier profil non trouvé: {fichier_profil}")
-            return ""
-        except Exception as e:
-            logger.error(f"Erreur lors du chargement du profil {fichier_profil}: {e}")
-            return ""
+    # Extraire les informations du client (profil_manager.profil est le scénario,
+    # l'âge et le profil passerelle sont dans la personne)
+    personne = profil_manager.get_person_details() or {}
+    age_client = personne.get('Age', 40)
+    profil_passerelle = personne.get('profil_passerelle', 'Famille')
+
+    # Table (profil passerelle, âge) → document, indexée au démarrage (core.profils_documents)
+    document_profil = get_table_profils().cle_document(profil_passerelle, age_client)
+
+    if document_profil:
+        contenu = get_documents_reference(version_corpus).contenu(document_profil)
+        if contenu:
+            logger.info(f"Document profil utilisé: {document_profil} (corpus {version_corpus or 'par défaut'})")
+        else:
+            logger.warning(f"Document profil vide ou absent: {document_profil} (corpus {version_corpus or 'par défaut'})")
+        return contenu
     else:
         logger.warning(f"Aucun document profil trouvé pour âge={age_client}, profil={profil_passerelle}")
         return ""
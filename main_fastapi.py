@@ -2,9 +2,11 @@
 Point d'entrée principal de l'application FastAPI
 GMA Training Bot IHM - Migré de Flask vers FastAPI
 """
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -15,6 +17,27 @@ from app.config import get_settings
 from app.middleware.logging import LoggingMiddleware
 from app.middleware.session import setup_session_middleware
 from app.exceptions import setup_exception_handlers
+from app.dependencies.openai_client import init_openai_client, close_openai_client
+from app.dependencies.auth import close_habilitations_http_client
+from core.synthese_jobs import init_gestionnaire_jobs_synthese, shutdown_gestionnaire_jobs_synthese
+from core.schema_synthese import configurer_sortie_structuree
+from core.registre_corpus import init_registre_corpus, parser_deploiement_corpus, shutdown_registre_corpus
+from core.index_documentaire import get_index_documentaire
+from core.cache_reponses_faq import init_cache_reponses_faq
+from core.resilience_llm import init_resilience_llm
+from core.routeur_deploiements import init_routeur_deploiements, parser_pools_deploiements
+from core.pre_evaluation import init_pre_evaluation, shutdown_pre_evaluation
+from core.profils_documents import init_table_profils
+from core.journal_conversation import get_journal_conversations, init_journal_conversations
+from core.purge_sessions import init_purge_sessions, shutdown_purge_sessions
+from core.cache_habilitations import init_cache_habilitations
+from core.stockage_sessions import get_stockage_sessions
+from core.storage_manager import get_storage_manager
+from core.fenetre_conversation import (
+    init_fenetre_conversation,
+    parser_budgets_par_deploiement,
+    shutdown_fenetre_conversation,
+)
 from app.routers import (
     auth_router,
     chat_router,
@@ -66,6 +89,126 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"❌ Failed to initialize Azure Monitor: {e}")
 
+    # Client Azure OpenAI asynchrone partagé (pool de connexions keep-alive)
+    init_openai_client(settings)
+
+    # Nouvelles tentatives et disjoncteurs des appels Azure OpenAI
+    init_resilience_llm(
+        max_tentatives=settings.llm_max_attempts,
+        delai_base=settings.llm_backoff_base_seconds,
+        delai_max=settings.llm_backoff_max_seconds,
+        seuil_echecs=settings.llm_circuit_failure_threshold,
+        delai_reouverture=settings.llm_circuit_reset_seconds,
+    )
+
+    # Répartition des appels entre les déploiements de chaque rôle
+    init_routeur_deploiements(parser_pools_deploiements(settings.azure_openai_deployment_pools))
+
+    # Pool de workers pour les synthèses en tâche de fond
+    init_gestionnaire_jobs_synthese(
+        max_workers=settings.synthese_max_workers,
+        ttl_seconds=settings.synthese_job_ttl_seconds,
+        budget_seconds=settings.synthese_job_budget_seconds,
+        mode=settings.synthese_mode,
+    )
+    logger.info(
+        f"✓ Synthesis job workers initialized (max_workers={settings.synthese_max_workers}, "
+        f"mode={settings.synthese_mode})"
+    )
+    configurer_sortie_structuree(settings.synthese_structured_output)
+
+    # Fenêtre de conversation bornée en tokens (résumés glissants)
+    init_fenetre_conversation(
+        budget_tokens=settings.conversation_token_budget,
+        budgets_par_deploiement=parser_budgets_par_deploiement(settings.conversation_token_budgets),
+        tours_verbatim=settings.conversation_verbatim_turns,
+    )
+
+    # Journal des conversations en ajout seul (répertoire relatif : dans le stockage)
+    repertoire_conversations = Path(settings.conversation_log_dir)
+    if not repertoire_conversations.is_absolute():
+        repertoire_conversations = get_storage_manager().base_path / repertoire_conversations
+    init_journal_conversations(
+        settings.conversation_log_type,
+        repertoire=str(repertoire_conversations),
+        max_conversations=settings.conversation_log_cache_entries,
+        ttl_seconds=settings.session_max_age,
+        duree_tranche=settings.session_gc_bucket_seconds,
+    )
+    logger.info(f"✓ Conversation log initialized ({settings.conversation_log_type})")
+
+    # Purge des sessions et journaux expirés (candidats de l'index des expirations, par lots)
+    stockages_purges = {"journaux": get_journal_conversations()}
+    if get_stockage_sessions() is not None:
+        stockages_purges["sessions"] = get_stockage_sessions()
+    init_purge_sessions(
+        stockages_purges,
+        intervalle_secondes=settings.session_gc_interval_seconds,
+        taille_lot=settings.session_gc_batch_size,
+        concurrence=settings.session_gc_concurrency,
+        max_par_passage=settings.session_gc_max_per_pass,
+    )
+    logger.info(
+        f"✓ Session purge started (every {settings.session_gc_interval_seconds}s, "
+        f"batches of {settings.session_gc_batch_size}, concurrency {settings.session_gc_concurrency})"
+    )
+
+    # Pré-évaluation de la conversation pendant l'entretien (optionnelle)
+    if settings.pre_evaluation_enabled:
+        init_pre_evaluation(tours_par_segment=settings.pre_evaluation_turns_per_segment)
+        logger.info(
+            f"✓ Conversation pre-evaluation enabled "
+            f"(every {settings.pre_evaluation_turns_per_segment} turns)"
+        )
+
+    # Cache des habilitations Gauthiq par jeton d'accès
+    init_cache_habilitations(
+        ttl_seconds=settings.habilitations_cache_ttl_seconds,
+        periode_peremption=settings.habilitations_stale_seconds,
+        attente_max_perimee=settings.habilitations_stale_wait_seconds,
+        max_entrees=settings.habilitations_cache_max_entries,
+    )
+
+    # Cache des réponses FAQ
+    init_cache_reponses_faq(
+        max_entrees=settings.faq_cache_max_entries,
+        ttl_seconds=settings.faq_cache_ttl_seconds,
+        seuil_similarite=settings.faq_cache_similarity_threshold,
+    )
+
+    # Versions du corpus préchargées une fois, rechargées à chaud si un document change
+    try:
+        registre_corpus = init_registre_corpus(
+            repertoire=settings.corpus_directory,
+            version_defaut=settings.corpus_default_version,
+            deploiement=parser_deploiement_corpus(settings.corpus_rollout),
+            intervalle_verification=settings.documents_reload_interval_seconds,
+        )
+        await asyncio.to_thread(registre_corpus.precharger)
+        registre_corpus.demarrer_surveillance()
+        logger.info(
+            f"✓ Reference documents loaded (corpus versions: {', '.join(registre_corpus.versions())}, "
+            f"default: {registre_corpus.version_defaut})"
+        )
+
+        # Table des documents de profil, confrontée au jeu de personnages et au corpus
+        table_profils = init_table_profils(
+            {version: registre_corpus.magasin(version) for version in registre_corpus.versions()}
+        )
+        logger.info(
+            f"✓ Profile documents table built "
+            f"({len(table_profils.couverture['personnages_sans_document'])} characters without profile document)"
+        )
+    except Exception as e:
+        logger.error(f"❌ Failed to load reference documents: {e}")
+
+    # Index BM25 des documents de référence (FAQ)
+    try:
+        index = await asyncio.to_thread(get_index_documentaire)
+        logger.info(f"✓ Reference documents index built (version {index.version})")
+    except Exception as e:
+        logger.error(f"❌ Failed to build reference documents index: {e}")
+
     logger.info("✓ Application startup complete")
 
     yield
@@ -73,6 +216,55 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("👋 Shutting down application")
 
+    # Annulation des synthèses en cours (avant la fermeture du client OpenAI)
+    try:
+        await shutdown_gestionnaire_jobs_synthese()
+        logger.info("✓ Synthesis jobs stopped")
+    except Exception as e:
+        logger.error(f"Error stopping synthesis jobs: {e}")
+
+    # Arrêt de la surveillance des documents de référence
+    try:
+        await shutdown_registre_corpus()
+        logger.info("✓ Reference documents watcher stopped")
+    except Exception as e:
+        logger.error(f"Error stopping reference documents watcher: {e}")
+
+    # Annulation des résumés de conversation en cours
+    try:
+        await shutdown_fenetre_conversation()
+        logger.info("✓ Conversation summaries stopped")
+    except Exception as e:
+        logger.error(f"Error stopping conversation summaries: {e}")
+
+    # Arrêt de la purge des sessions
+    try:
+        await shutdown_purge_sessions()
+        logger.info("✓ Session purge stopped")
+    except Exception as e:
+        logger.error(f"Error stopping session purge: {e}")
+
+    # Annulation des pré-évaluations en cours
+    try:
+        await shutdown_pre_evaluation()
+        logger.info("✓ Conversation pre-evaluations stopped")
+    except Exception as e:
+        logger.error(f"Error stopping conversation pre-evaluations: {e}")
+
+    # Fermeture du pool de connexions Azure OpenAI
+    try:
+        await close_openai_client()
+        logger.info("✓ Azure OpenAI client closed")
+    except Exception as e:
+        logger.error(f"Error closing Azure OpenAI client: {e}")
+
+    # Fermeture du client HTTP des habilitations
+    try:
+        await close_habilitations_http_client()
+        logger.info("✓ Habilitations HTTP client closed")
+    except Exception as e:
+        logger.error(f"Error closing habilitations HTTP client: {e}")
+
     # Arrêt propre du logger asynchrone
     try:
         from core.async_logger import shutdown_async_logger
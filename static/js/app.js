@@ -522,8 +522,10 @@ document.addEventListener('DOMContentLoaded', function() {
         liveTextContent.innerHTML = displayText;
     }
 
-    // Envoi au serveur
+    // Envoi au serveur (réponse en streaming, repli sur /chat si indisponible)
     async function sendMessageToServer(message) {
+        // Messages affichés en attendant le tour enregistré par le serveur
+        let nbProvisoires = 0;
         try {
             // Afficher immédiatement le message utilisateur
             const userTimestamp = new Date().toISOString();
@@ -532,39 +534,139 @@ document.addEventListener('DOMContentLoaded', function() {
                 text: message,
                 timestamp: userTimestamp
             });
+            nbProvisoires = 1;
             updateConversation();
             
             updateStatus("Envoi du message au serveur...");
-            const response = await fetch('/chat', {
+            const response = await fetch('/chat_stream', {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
+                headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
                 body: JSON.stringify({ message })
             });
-            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-            
-            const data = await response.json();
-            if (data.error) {
-                updateStatus(`Erreur: ${data.error}`);
+            if (!response.ok || !response.body) {
+                await sendMessageToServerSansStreaming(message);
+                nbProvisoires = 0;
                 return;
             }
-            
-            // Mettre à jour avec l'historique complet du serveur
-            conversationHistory = data.history;
-            updateConversation();
 
-            if (currentMode === 'voice' && synthesizer) {
-                const lastBotMessage = conversationHistory.filter(entry => entry.role === 'Assistant').pop();
-                if (lastBotMessage) {
+            // Message bot affiché progressivement
+            const botEntry = { role: 'Assistant', text: '', timestamp: new Date().toISOString() };
+            conversationHistory.push(botEntry);
+            nbProvisoires = 2;
+
+            // File de phrases à prononcer dès qu'elles sont complètes
+            const speakVoice = currentMode === 'voice' && synthesizer;
+            let speechQueue = Promise.resolve();
+
+            await readEventStream(response, (event, data) => {
+                if (event === 'token') {
+                    botEntry.text += data.delta;
+                    updateConversation();
+                } else if (event === 'sentence' && speakVoice) {
                     isSpeaking = true;
-                    await speakText(lastBotMessage.text);
+                    speechQueue = speechQueue.then(() => speakText(data.text)).catch(err => {
+                        console.error("Erreur lors de la synthèse vocale:", err);
+                    });
+                } else if (event === 'done') {
+                    // Messages provisoires (utilisateur et bot) remplacés par ceux du serveur
+                    appliquerNouveauxMessages(data.messages, nbProvisoires);
+                    nbProvisoires = 0;
+                    updateConversation();
+                } else if (event === 'error') {
+                    // Rien n'a été enregistré par le serveur : le tour affiché est retiré
+                    appliquerNouveauxMessages([], nbProvisoires);
+                    nbProvisoires = 0;
+                    updateConversation();
+                    updateStatus(`Erreur: ${data.error}`);
                 }
+            });
+
+            await speechQueue;
+            if (nbProvisoires) {
+                // Flux interrompu avant la fin : le tour n'a pas été enregistré
+                appliquerNouveauxMessages([], nbProvisoires);
+                nbProvisoires = 0;
+                updateConversation();
+                updateStatus("Erreur: Réponse interrompue, message non enregistré");
+                return;
             }
             updateStatus("Prêt");
         } catch (error) {
             console.error("Erreur lors de l'envoi du message:", error);
+            if (nbProvisoires) {
+                appliquerNouveauxMessages([], nbProvisoires);
+                updateConversation();
+            }
             updateStatus("Erreur: Impossible de communiquer avec le serveur");
         }
-    }    // Synthèse vocale (demi-duplex)
+    }
+
+    // Lecture d'un flux Server-Sent Events depuis une réponse fetch
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let separator;
+            while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, separator);
+                buffer = buffer.slice(separator + 2);
+
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                }
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+
+    // Remplace les derniers messages affichés provisoirement par les messages numérotés du serveur
+    function appliquerNouveauxMessages(messages, nbProvisoires) {
+        conversationHistory.splice(conversationHistory.length - nbProvisoires, nbProvisoires, ...messages);
+        window.conversationHistory = conversationHistory;
+    }
+
+    // Envoi classique (réponse complète)
+    async function sendMessageToServerSansStreaming(message) {
+        const response = await fetch('/chat', {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ message })
+        });
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        
+        const data = await response.json();
+        if (data.error) {
+            // Tour non enregistré : message utilisateur provisoire retiré
+            appliquerNouveauxMessages([], 1);
+            updateConversation();
+            updateStatus(`Erreur: ${data.error}`);
+            return;
+        }
+        
+        // Message utilisateur provisoire remplacé par le tour enregistré par le serveur
+        appliquerNouveauxMessages(data.messages, 1);
+        updateConversation();
+
+        if (currentMode === 'voice' && synthesizer) {
+            const lastBotMessage = conversationHistory.filter(entry => entry.role === 'Assistant').pop();
+            if (lastBotMessage) {
+                isSpeaking = true;
+                await speakText(lastBotMessage.text);
+            }
+        }
+        updateStatus("Prêt");
+    }
+
+    // Synthèse vocale (demi-duplex)
     async function speakText(text) {
         return new Promise((resolve, reject) => {
             try {
@@ -18,6 +18,7 @@ os.environ["GAUTHIQ_REDIRECT_URI"] = "https://test.app.com/oauth2callback"
 os.environ["GAUTHIQ_HABILITATION"] = "https://test.gauthiq.com/habilitations"
 os.environ["GAUTHIQ_HABILITATION_FILTRE"] = "test-filter"
 os.environ["GAUTHIQ_SSL_VERIFY"] = "false"
+os.environ["SESSION_TYPE"] = "memory"
 
 
 @pytest.fixture
@@ -55,3 +56,41 @@ def authenticated_client(client):
         session["user_id"] = "test-user-id"
 
     return client
+
+
+@pytest.fixture
+def fileshare_memoire(monkeypatch):
+    """
+    Stockage FileShare remplacé par un dictionnaire
+
+    Returns:
+        callable: brancher(module) remplace les fonctions de stockage importées
+                  par le module et retourne le dictionnaire chemin → contenu
+    """
+    fichiers = {}
+
+    def save_file_to_fileshare(data, file_path):
+        fichiers[file_path] = data
+        return True
+
+    def get_file_from_fileshare(file_path):
+        return (file_path in fichiers), fichiers.get(file_path)
+
+    def save_file_to_azure(data, file_type, filename, user_folder):
+        path = f"{user_folder}/syntheses/{filename}"
+        fichiers[path] = data
+        return True, path
+
+    remplacements = {
+        "save_file_to_fileshare": save_file_to_fileshare,
+        "get_file_from_fileshare": get_file_from_fileshare,
+        "save_file_to_azure": save_file_to_azure,
+    }
+
+    def brancher(module):
+        for nom, fonction in remplacements.items():
+            if hasattr(module, nom):
+                monkeypatch.setattr(module, nom, fonction)
+        return fichiers
+
+    return brancher
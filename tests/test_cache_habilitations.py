@@ -0,0 +1,101 @@
+"""
+Tests du cache des habilitations (durée de vie, appels regroupés, entrées périmées)
+"""
+import asyncio
+
+import httpx
+
+from app.config import get_settings
+from app.dependencies import auth
+from core import cache_habilitations
+from core.cache_habilitations import CacheHabilitations
+
+HABILITATIONS = {"roles": {"GR_SIMSAN_UTILISATEURS_PVL": ["USER"]}}
+
+
+class FausseApi:
+    def __init__(self, delai=0.0, erreur=False):
+        self.appels = 0
+        self.delai = delai
+        self.erreur = erreur
+
+    async def __call__(self):
+        self.appels += 1
+        await asyncio.sleep(self.delai)
+        if self.erreur:
+            raise httpx.ConnectError("API injoignable")
+        return {"roles": {"GR_SIMSAN_UTILISATEURS_PVL": ["USER"]}, "appel": self.appels}
+
+
+def test_appels_concurrents_regroupes_puis_servis_du_cache():
+    async def scenario():
+        cache = CacheHabilitations(ttl_seconds=60)
+        api = FausseApi(delai=0.05)
+        resultats = await asyncio.gather(*(cache.obtenir("jeton", api) for _ in range(10)))
+        resultats[0]["roles"]["GR_SIMSAN_ADMIN"] = ["ADMIN"]
+        suivant = await cache.obtenir("jeton", api)
+        return cache, api, resultats, suivant
+
+    cache, api, resultats, suivant = asyncio.run(scenario())
+    assert api.appels == 1
+    assert all(resultat["appel"] == 1 for resultat in resultats)
+    # Copie : la modification d'un appelant ne touche pas le cache
+    assert "GR_SIMSAN_ADMIN" not in suivant["roles"]
+    assert cache.statistiques()["regroupes"] == 9
+    assert cache.statistiques()["hits"] == 1
+
+
+def test_entree_perimee_servie_pendant_le_rafraichissement():
+    async def scenario():
+        cache = CacheHabilitations(ttl_seconds=0, periode_peremption=60, attente_max_perimee=0.01)
+        api = FausseApi()
+        await cache.obtenir("jeton", api)
+        api.delai = 0.1
+        perimee = await cache.obtenir("jeton", api)
+        await asyncio.sleep(0.15)
+        cache.ttl_seconds = 60
+        rafraichie = await cache.obtenir("jeton", api)
+        return cache, perimee, rafraichie
+
+    cache, perimee, rafraichie = asyncio.run(scenario())
+    assert perimee["appel"] == 1
+    assert rafraichie["appel"] == 2
+    assert cache.statistiques()["perimees_servies"] == 1
+
+
+def test_echec_de_l_api_non_mis_en_cache():
+    async def scenario():
+        cache = CacheHabilitations(ttl_seconds=60)
+        api = FausseApi(erreur=True)
+        premier = await cache.obtenir("jeton", api)
+        api.erreur = False
+        second = await cache.obtenir("jeton", api)
+        return cache, premier, second
+
+    cache, premier, second = asyncio.run(scenario())
+    assert premier == {}
+    assert second["appel"] == 2
+    assert cache.statistiques()["erreurs"] == 1
+
+
+def test_validate_session_interroge_l_api_une_fois(monkeypatch):
+    appels = []
+
+    def repondre(requete):
+        appels.append(requete)
+        assert requete.headers["Authorization"] == "Bearer jeton-test"
+        return httpx.Response(200, json=HABILITATIONS)
+
+    async def scenario():
+        monkeypatch.setattr(cache_habilitations, "_cache_habilitations", CacheHabilitations(ttl_seconds=60))
+        monkeypatch.setattr(
+            auth, "_habilitations_http_client", httpx.AsyncClient(transport=httpx.MockTransport(repondre))
+        )
+        settings = get_settings()
+        user = {"email": "test@example.com"}
+        resultats = [await auth.get_cached_user_habilitations(user, "jeton-test", settings) for _ in range(5)]
+        await auth.close_habilitations_http_client()
+        return resultats
+
+    assert asyncio.run(scenario()) == [HABILITATIONS] * 5
+    assert len(appels) == 1
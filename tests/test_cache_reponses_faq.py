@@ -0,0 +1,80 @@
+"""
+Tests du cache des réponses FAQ
+"""
+import core.cache_reponses_faq as cache_reponses_faq
+from core.cache_reponses_faq import CacheReponsesFAQ, est_question_autonome, normaliser_question
+
+
+SOURCES = [{"document": "cg_garanties", "section": "Carence", "source": "CG › Carence"}]
+
+
+def test_normalisation_et_questions_autonomes():
+    """Les variantes d'une question ont la même clé, les relances ne sont pas cachables"""
+    assert normaliser_question("Quel est le délai de carence ?") == normaliser_question("délais carence")
+
+    historique = [{"question": "Délai de carence ?", "response": "..."}]
+    assert est_question_autonome("Comment fonctionne le tiers payant ?", historique)
+    assert not est_question_autonome("Et pour le niveau 3 ?", historique)
+    assert not est_question_autonome("carence")
+
+
+def test_negation_et_mots_interrogatifs_jamais_confondus(fileshare_memoire):
+    """Une question et sa négation n'ont ni la même clé ni de hit par similarité"""
+    fileshare_memoire(cache_reponses_faq)
+    affirmative = "Le tiers payant est-il accepté pour l'optique ?"
+    negative = "Pourquoi le tiers payant n'est pas accepté pour l'optique ?"
+    assert normaliser_question(affirmative) != normaliser_question(negative)
+    assert normaliser_question("délai de carence avant hospitalisation") != normaliser_question(
+        "délai de carence sans hospitalisation"
+    )
+
+    cache = CacheReponsesFAQ(seuil_similarite=0.5)
+    cache.enregistrer(affirmative, "### Oui", SOURCES, version="v1")
+    cache.enregistrer("délai de carence avant hospitalisation", "### Avant", SOURCES, version="v1")
+
+    assert cache.obtenir(negative, version="v1") is None
+    assert cache.obtenir("délai de carence sans hospitalisation", version="v1") is None
+    assert cache.obtenir("Tiers payant accepté pour l'optique", version="v1")["response"] == "### Oui"
+
+
+def test_hit_exact_similaire_et_version(fileshare_memoire):
+    """Hit sur la question normalisée ou proche, jamais sur une autre version du corpus"""
+    fileshare_memoire(cache_reponses_faq)
+    cache = CacheReponsesFAQ(seuil_similarite=0.6)
+
+    assert cache.obtenir("Quel est le délai de carence ?", version="v1") is None
+    cache.enregistrer("Quel est le délai de carence ?", "### Carence", SOURCES, version="v1")
+
+    assert cache.obtenir("Délais de carence ?", version="v1")["response"] == "### Carence"
+    assert cache.obtenir("délai de carence hospitalisation", version="v1")["response"] == "### Carence"
+    assert cache.obtenir("Quel est le délai de carence ?", version="v2") is None
+
+    stats = cache.statistiques()
+    assert (stats["hits_memoire"], stats["hits_similaires"], stats["misses"]) == (1, 1, 2)
+
+
+def test_niveau_persistant_partage_entre_workers(fileshare_memoire):
+    """Une réponse enregistrée par un worker est servie par un autre depuis le FileShare"""
+    fileshare_memoire(cache_reponses_faq)
+    CacheReponsesFAQ().enregistrer("Résiliation du contrat", "### Résiliation", SOURCES, version="v1")
+
+    autre_worker = CacheReponsesFAQ()
+    entree = autre_worker.obtenir("résiliation contrat", version="v1")
+
+    assert entree["sources"] == SOURCES
+    assert autre_worker.statistiques()["hits_persistants"] == 1
+
+
+def test_eviction_lru_et_expiration(fileshare_memoire):
+    """Le niveau mémoire est borné et les entrées expirent"""
+    fileshare_memoire(cache_reponses_faq)
+    cache = CacheReponsesFAQ(max_entrees=1, seuil_similarite=1.0, persistant=False)
+    cache.enregistrer("tiers payant pharmacie", "A", SOURCES, version="v1")
+    cache.enregistrer("remboursement optique lunettes", "B", SOURCES, version="v1")
+
+    assert cache.obtenir("tiers payant pharmacie", version="v1") is None
+    assert cache.statistiques()["evictions"] == 1
+
+    expire = CacheReponsesFAQ(ttl_seconds=0, persistant=False)
+    expire.enregistrer("tiers payant pharmacie", "A", SOURCES, version="v1")
+    assert expire.obtenir("tiers payant pharmacie", version="v1") is None
@@ -0,0 +1,42 @@
+"""
+Tests de la comptabilité des tokens par section de prompt
+"""
+from core.comptabilite_tokens import ComptabiliteTokens, comptabilite_tokens, retirer
+from core.fonctions import _construire_prompt_expert_faq, construire_messages_openai
+
+
+def test_sections_du_prompt_faq():
+    """Les tokens du prompt FAQ sont répartis entre instructions, documentation, historique et question"""
+    comptabilite_tokens.reinitialiser()
+    _construire_prompt_expert_faq([], "Quel est le délai de carence ?", [])
+    construire_messages_openai(
+        [
+            {"msg_num": 1, "role": "Vous", "text": "Bonjour"},
+            {"msg_num": 2, "role": "Assistant", "text": "Bonjour, je vous écoute"},
+        ],
+        "Parlons de vos besoins",
+        "Vous êtes Marie, 45 ans",
+        "Consignes du client",
+    )
+
+    stats = comptabilite_tokens.percentiles()
+    faq = stats["faq"]["sections"]
+    assert stats["faq"]["appels"] == 1
+    assert faq["question"]["p50"] > 0 and faq["documentation"]["p50"] > 0
+    assert faq["instructions"]["p50"] > faq["question"]["p50"]
+    assert faq["total"]["p50"] == sum(faq[nom]["p50"] for nom in ("instructions", "documentation", "historique", "question"))
+    assert stats["client"]["sections"]["historique"]["p50"] > 0
+
+
+def test_percentiles_sur_les_derniers_appels():
+    """Les percentiles portent sur la fenêtre des derniers appels"""
+    comptabilite = ComptabiliteTokens(taille_fenetre=10)
+    for valeur in range(1, 21):
+        comptabilite.enregistrer("synthese", {"documents": valeur * 10, "conversation": valeur, "total": valeur * 11})
+
+    sections = comptabilite.percentiles()["synthese"]["sections"]
+    assert comptabilite.percentiles()["synthese"]["appels"] == 10
+    assert sections["documents"]["p50"] == 150
+    assert sections["documents"]["p99"] == sections["documents"]["max"] == 200
+    assert sections["documents"]["part_moyenne"] == round(10 / 11, 4)
+    assert retirer("AAA doc BBB", "doc ") == "AAA BBB"
@@ -0,0 +1,51 @@
+"""
+Tests du magasin de documents de référence
+"""
+import os
+
+from core.documents_reference import MagasinDocuments
+
+
+def _ecrire(chemin, texte, decalage_mtime=0):
+    chemin.write_text(texte, encoding="utf-8")
+    if decalage_mtime:
+        stat = os.stat(chemin)
+        os.utime(chemin, ns=(stat.st_atime_ns, stat.st_mtime_ns + decalage_mtime))
+
+
+def test_chargement_unique_et_document_absent(tmp_path):
+    """Les documents sont lus une fois ; un fichier absent donne un contenu vide"""
+    _ecrire(tmp_path / "offre.txt", "Offre GSA3")
+    magasin = MagasinDocuments({"offre": str(tmp_path / "offre.txt"), "absent": str(tmp_path / "absent.txt")})
+
+    assert magasin.contenus() == {"offre": "Offre GSA3", "absent": ""}
+    magasin.contenus()
+    magasin.contenu("offre")
+
+    stats = magasin.statistiques()
+    assert stats["chargements_fichiers"] == 2
+    assert stats["documents"]["absent"]["present"] is False
+    assert stats["caracteres_total"] == len("Offre GSA3")
+
+
+def test_rechargement_atomique_si_le_contenu_change(tmp_path):
+    """Un fichier modifié est relu dans un nouvel instantané ; l'ancien reste intact"""
+    _ecrire(tmp_path / "offre.txt", "version 1")
+    _ecrire(tmp_path / "cg.txt", "conditions")
+    magasin = MagasinDocuments({"offre": str(tmp_path / "offre.txt"), "cg": str(tmp_path / "cg.txt")})
+    ancien = magasin.instantane
+    version_cg = ancien.version(["cg"])
+
+    assert magasin.verifier() is False
+
+    _ecrire(tmp_path / "offre.txt", "version 2", decalage_mtime=10**9)
+    assert magasin.verifier() is True
+
+    assert ancien.contenu("offre") == "version 1"
+    assert magasin.contenu("offre") == "version 2"
+    assert magasin.instantane.version() != ancien.version()
+    # Seul le fichier modifié est relu ; la version des autres documents ne change pas
+    assert magasin.instantane.version(["cg"]) == version_cg
+    stats = magasin.statistiques()
+    assert stats["chargements_fichiers"] == 3
+    assert stats["rechargements"] == 1
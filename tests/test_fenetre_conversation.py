@@ -0,0 +1,95 @@
+"""
+Tests de la fenêtre de conversation bornée en tokens
+"""
+import asyncio
+from types import SimpleNamespace
+
+from core.fenetre_conversation import GestionnaireFenetreConversation, parser_budgets_par_deploiement
+from core.journal_conversation import JournalConversationsFichiers, JournalConversationsMemoire
+
+
+def _historique(nb_tours):
+    historique = []
+    for tour in range(nb_tours):
+        historique.append({"role": "Vous", "text": f"Question {tour} du conseiller " + "détail " * 20})
+        historique.append({"role": "Assistant", "text": f"Réponse {tour} du client " + "précision " * 20})
+    return historique
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.appels = []
+
+    async def create(self, **kwargs):
+        self.appels.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Résumé des échanges"))])
+
+
+def test_historique_complet_sous_le_budget():
+    """Une conversation courte est envoyée telle quelle, sans résumé"""
+    fenetre = GestionnaireFenetreConversation(budget_tokens=100000, tours_verbatim=2)
+    historique = _historique(3)
+
+    assert fenetre.appliquer(historique, "user_a") == (historique, None)
+    assert fenetre.planifier_resume(historique, "user_a", object()) is None
+
+
+def test_resume_glissant_hors_requete():
+    """Au-delà du budget, les anciens tours sont résumés en tâche de fond puis remplacés par le résumé"""
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    fenetre = GestionnaireFenetreConversation(budget_tokens=500, tours_verbatim=2, journal=JournalConversationsMemoire())
+    historique = _historique(10)
+
+    # Pas encore de résumé : rien n'est perdu
+    assert fenetre.appliquer(historique, "user_a") == (historique, None)
+
+    async def scenario():
+        tache = fenetre.planifier_resume(historique, "user_a", client)
+        await tache
+
+    asyncio.run(scenario())
+
+    fenetre_envoyee, resume = fenetre.appliquer(historique, "user_a")
+    assert resume == "Résumé des échanges"
+    assert fenetre_envoyee == historique[-4:]
+    assert "Question 0" in completions.appels[0]["messages"][1]["content"]
+
+    # Une autre conversation (ou une conversation réinitialisée) n'utilise pas ce résumé
+    assert fenetre.appliquer(_historique(12)[2:], "user_a")[1] is None
+
+
+def test_resume_partage_entre_workers(tmp_path):
+    """Le résumé enregistré par un worker est repris et complété par un autre"""
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    worker_a = GestionnaireFenetreConversation(
+        budget_tokens=500, tours_verbatim=2, journal=JournalConversationsFichiers(str(tmp_path))
+    )
+    worker_b = GestionnaireFenetreConversation(
+        budget_tokens=500, tours_verbatim=2, journal=JournalConversationsFichiers(str(tmp_path))
+    )
+    historique = _historique(10)
+
+    async def scenario():
+        await worker_a.planifier_resume(historique, "c1", client)
+        await worker_b.actualiser(historique, "c1")
+        assert worker_b.appliquer(historique, "c1") == (historique[-4:], "Résumé des échanges")
+        await worker_b.planifier_resume(_historique(12), "c1", client)
+
+    asyncio.run(scenario())
+
+    # Le second résumé ne reprend que les tours sortis de la fenêtre depuis le premier
+    assert len(completions.appels) == 2
+    contenu = completions.appels[1]["messages"][1]["content"]
+    assert "RÉSUMÉ PRÉCÉDENT :\nRésumé des échanges" in contenu
+    assert "Question 8" in contenu and "Question 7" not in contenu
+
+
+def test_budget_par_deploiement():
+    """Le budget peut être fixé par déploiement"""
+    budgets = parser_budgets_par_deploiement("gpt-4o-mini=4000, gpt-4o=12000,invalide")
+    fenetre = GestionnaireFenetreConversation(budget_tokens=8000, budgets_par_deploiement=budgets)
+
+    assert fenetre.budget("gpt-4o") == 12000
+    assert fenetre.budget("autre") == 8000
@@ -0,0 +1,62 @@
+"""
+Tests de l'index BM25 des documents de référence
+"""
+from core.index_documentaire import (
+    IndexBM25,
+    analyser,
+    calculer_version_corpus,
+    decouper_document,
+)
+
+
+DOCUMENT_TEST = """# Hospitalisation
+Les frais d'hospitalisation sont remboursés à 100 % de la base de remboursement,
+y compris le forfait journalier hospitalier, sans limitation de durée de séjour.
+Une chambre particulière peut être prise en charge selon le niveau de garantie choisi.
+
+# Optique
+Les lunettes sont remboursées une fois tous les deux ans pour les adultes.
+Le remboursement des verres dépend de la correction et du niveau de garantie,
+avec un forfait monture plafonné à 100 euros conformément au contrat responsable.
+
+# Dentaire
+Les prothèses dentaires du panier 100 % santé sont intégralement remboursées.
+Les soins conservateurs sont pris en charge sur la base du tarif de convention,
+l'orthodontie fait l'objet d'un forfait annuel selon l'âge du bénéficiaire.
+"""
+
+
+def test_analyser_normalise_le_francais():
+    """Accents, mots vides et pluriels sont normalisés"""
+    assert analyser("Les Prothèses dentaires") == analyser("prothese dentaire")
+    assert "les" not in analyser("les lunettes")
+
+
+def test_decoupage_par_section_avec_source():
+    """Chaque section devient un extrait attribué à son document"""
+    extraits = decouper_document("cg_garanties", "cg.txt", DOCUMENT_TEST)
+
+    assert [extrait.section for extrait in extraits] == ["Hospitalisation", "Optique", "Dentaire"]
+    assert "Optique" in extraits[1].source
+    assert extraits[1].to_dict()["document"] == "cg_garanties"
+
+
+def test_recherche_classe_la_section_pertinente():
+    """La section qui répond à la question arrive en tête"""
+    index = IndexBM25(decouper_document("cg_garanties", "cg.txt", DOCUMENT_TEST))
+
+    resultats = index.rechercher("Combien sont remboursées mes lunettes ?", k=2)
+
+    assert resultats[0][0].section == "Optique"
+    assert index.rechercher("xyz inconnu") == []
+
+
+def test_version_corpus_change_avec_le_fichier(tmp_path):
+    """L'empreinte du corpus suit les modifications des fichiers"""
+    chemin = tmp_path / "doc.txt"
+    chemin.write_text("version 1", encoding="utf-8")
+    version_initiale = calculer_version_corpus({"doc": str(chemin)})
+
+    chemin.write_text("version 2 plus longue", encoding="utf-8")
+
+    assert calculer_version_corpus({"doc": str(chemin)}) != version_initiale
@@ -0,0 +1,145 @@
+"""
+Tests du journal des conversations en ajout seul et des réponses différentielles de /chat
+"""
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import core.journal_conversation as journal_conversation
+from app.dependencies.auth import get_current_user
+from app.dependencies.openai_client import get_azure_openai_client
+from app.middleware.session import ServerSessionMiddleware
+from app.routers import chat
+from core.journal_conversation import JournalConversationsFichiers, JournalConversationsMemoire
+from core.stockage_sessions import StockageSessionsMemoire
+
+
+def _tour(numero):
+    return [{"role": "Vous", "text": f"question {numero}"}, {"role": "Assistant", "text": f"réponse {numero}"}]
+
+
+def test_journal_memoire_numerote_et_lit_depuis():
+    journal = JournalConversationsMemoire()
+    assert journal.ajouter("c1", _tour(1))[-1]["msg_num"] == 2
+    ajoutes = journal.ajouter("c1", _tour(2))
+
+    assert [message["msg_num"] for message in ajoutes] == [3, 4]
+    assert journal.sequence("c1") == 4
+    assert [message["text"] for message in journal.lire("c1", depuis=2)] == ["question 2", "réponse 2"]
+    assert journal.lire("c1", depuis=4) == []
+    journal.supprimer("c1")
+    assert journal.sequence("c1") == 0
+
+
+def test_journal_fichiers_partage_entre_workers(tmp_path):
+    worker_a = JournalConversationsFichiers(str(tmp_path))
+    worker_b = JournalConversationsFichiers(str(tmp_path))
+
+    worker_a.ajouter("c1", _tour(1))
+    assert worker_b.sequence("c1") == 2
+    worker_b.ajouter("c1", _tour(2))
+
+    # Le worker A ne relit que la fin ajoutée par le worker B
+    assert [message["msg_num"] for message in worker_a.lire("c1", depuis=2)] == [3, 4]
+    assert len((tmp_path / "c1.jsonl").read_text(encoding="utf-8").splitlines()) == 4
+
+    # Annexes remplacées en entier, lues par l'autre worker
+    worker_a.ecrire_annexe("c1", "resume", {"texte": "v1"})
+    worker_a.ecrire_annexe("c1", "resume", {"texte": "v2"})
+    assert worker_b.lire_annexe("c1", "resume") == {"texte": "v2"}
+    assert worker_b.lire_annexe("c1", "pre_evaluation") is None
+
+    worker_b.supprimer("c1")
+    assert worker_a.lire("c1") == []
+    assert worker_a.lire_annexe("c1", "resume") is None
+    assert worker_a.lire("../c1") == []
+    assert list(tmp_path.glob("c1*")) == []
+
+
+def test_journal_fichiers_ajouts_simultanes(tmp_path):
+    """Deux workers qui ajoutent en même temps à une conversation ne se marchent pas dessus"""
+    workers = [JournalConversationsFichiers(str(tmp_path)) for _ in range(2)]
+    depart = threading.Barrier(len(workers))
+
+    def ajouter(journal):
+        depart.wait()
+        for numero in range(200):
+            journal.ajouter("c1", _tour(numero))
+
+    threads = [threading.Thread(target=ajouter, args=(journal,)) for journal in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lecteur = JournalConversationsFichiers(str(tmp_path))
+    messages = lecteur.lire("c1")
+    assert [message["msg_num"] for message in messages] == list(range(1, 801))
+    assert len((tmp_path / "c1.jsonl").read_text(encoding="utf-8").splitlines()) == 800
+    # Les tours restent contigus
+    assert all(messages[i]["text"].split()[-1] == messages[i + 1]["text"].split()[-1] for i in range(0, 800, 2))
+
+
+def test_journal_fichiers_ligne_incomplete(tmp_path):
+    """Une ligne laissée sans fin par une écriture interrompue n'absorbe pas le message suivant"""
+    journal = JournalConversationsFichiers(str(tmp_path))
+    journal.ajouter("c1", _tour(1))
+    with open(tmp_path / "c1.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"role": "Vous", "te')
+
+    ajoutes = journal.ajouter("c1", _tour(2))
+    assert [message["msg_num"] for message in ajoutes] == [3, 4]
+    assert [message["text"] for message in JournalConversationsFichiers(str(tmp_path)).lire("c1")] == [
+        "question 1", "réponse 1", "question 2", "réponse 2"
+    ]
+
+
+def _client(monkeypatch):
+    monkeypatch.setattr(journal_conversation, "_journal_conversations", JournalConversationsMemoire())
+
+    async def reponse_bot(message, client, historique, profil_manager, cle_conversation=None):
+        return {"reply": f"réponse au message {len(historique)}"}
+
+    monkeypatch.setattr(chat, "get_next_bot_message_async", reponse_bot)
+    monkeypatch.setattr(chat, "planifier_resume_conversation", lambda *args, **kwargs: None)
+    monkeypatch.setattr(chat, "planifier_pre_evaluation", lambda *args, **kwargs: None)
+
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.dependency_overrides[get_current_user] = lambda: {"preferred_username": "test_user"}
+    app.dependency_overrides[get_azure_openai_client] = lambda: None
+    app.add_middleware(
+        ServerSessionMiddleware,
+        secret_key="test-secret-key-minimum-32-characters-long-for-security",
+        stockage=StockageSessionsMemoire(60),
+    )
+    return TestClient(app)
+
+
+def test_chat_renvoie_seulement_les_nouveaux_messages(monkeypatch):
+    client = _client(monkeypatch)
+
+    for tour in range(3):
+        donnees = client.post("/chat", json={"message": f"Bonjour {tour}"}).json()
+        assert donnees["success"] is True
+        assert "history" not in donnees
+        assert [message["msg_num"] for message in donnees["messages"]] == [2 * tour + 1, 2 * tour + 2]
+        assert donnees["seq"] == 2 * tour + 2
+
+    reponse = client.get("/get_conversation_history", params={"since": 4})
+    assert [message["msg_num"] for message in reponse.json()["history"]] == [5, 6]
+    assert reponse.json()["seq"] == 6
+
+    # Journal inchangé : 304 sans corps
+    etag = reponse.headers["etag"]
+    assert client.get("/get_conversation_history", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/chat", json={"message": "Encore une question"})
+    reponse = client.get("/get_conversation_history", headers={"If-None-Match": etag})
+    assert reponse.status_code == 200
+    assert len(reponse.json()["history"]) == 8
+
+    # Réinitialisation : nouvelle conversation vide
+    client.post("/reset_conversation")
+    assert client.get("/get_conversation_history").json() == {"success": True, "history": [], "seq": 0}
@@ -0,0 +1,22 @@
+"""
+Tests du client Azure OpenAI partagé
+"""
+import asyncio
+
+from openai import AsyncAzureOpenAI
+
+from app.dependencies.openai_client import (
+    get_azure_openai_client,
+    close_openai_client,
+)
+
+
+def test_client_is_shared_async_instance():
+    """Le même client asynchrone est retourné à chaque requête"""
+    client = get_azure_openai_client()
+    assert isinstance(client, AsyncAzureOpenAI)
+    assert get_azure_openai_client() is client
+
+    asyncio.run(close_openai_client())
+    assert get_azure_openai_client() is not client
+    asyncio.run(close_openai_client())
@@ -0,0 +1,92 @@
+"""
+Tests de la pré-évaluation de la conversation pendant l'entretien
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import core.pre_evaluation as pre_evaluation
+from core.journal_conversation import JournalConversationsFichiers, JournalConversationsMemoire
+from core.pre_evaluation import GestionnairePreEvaluation
+from core.synthetiser import _preparer_historique_pour_synthese
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.appels = []
+
+    async def create(self, **params):
+        self.appels.append(params)
+        evaluation = {
+            "resume": f"Segment {len(self.appels)}",
+            "erreurs_factuelles": ["[03] 5 blocs au lieu de 6"],
+            "objections": [],
+            "points_positifs": [],
+            "points_negatifs": [],
+        }
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(evaluation)))])
+
+
+def _historique(nb_messages, prefixe="Message"):
+    return [
+        {"role": "Vous" if i % 2 == 0 else "Assistant", "text": f"{prefixe} {i + 1}", "msg_num": i + 1}
+        for i in range(nb_messages)
+    ]
+
+
+def test_segments_evalues_puis_consolides(monkeypatch):
+    """Les tours complets sont évalués par segments ; la synthèse ne reprend que les suivants"""
+    monkeypatch.setattr(pre_evaluation, "get_documents_reference", lambda version=None: SimpleNamespace(contenus=lambda cles: {}))
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    gestionnaire = GestionnairePreEvaluation(tours_par_segment=2, journal=JournalConversationsMemoire())
+
+    async def scenario():
+        # Moins de 2 tours complets : rien à évaluer
+        assert gestionnaire.planifier(_historique(3), "user_a", client) is None
+        await gestionnaire.planifier(_historique(5), "user_a", client)
+        assert gestionnaire.planifier(_historique(7), "user_a", client) is None
+        await gestionnaire.planifier(_historique(9), "user_a", client)
+
+    asyncio.run(scenario())
+
+    historique = _historique(11)
+    resultat = gestionnaire.obtenir(historique, "user_a")
+    assert [(segment.debut, segment.fin) for segment in resultat.segments] == [(0, 4), (4, 8)]
+    assert "Segment 1" in completions.appels[1]["messages"][1]["content"]
+    assert "[05] COMMERCIAL: Message 5" in completions.appels[1]["messages"][1]["content"]
+
+    texte = _preparer_historique_pour_synthese(historique, resultat)
+    assert "5 blocs au lieu de 6" in texte
+    assert "Message 8" not in texte
+    assert "[09] Vous: Message 9" in texte
+
+    # Conversation réinitialisée : les segments de la précédente sont ignorés
+    assert gestionnaire.obtenir(_historique(11, "Autre"), "user_a") is None
+    assert gestionnaire.obtenir(historique, "user_b") is None
+
+
+def test_segments_partages_entre_workers(monkeypatch, tmp_path):
+    """Un autre worker reprend les segments enregistrés au lieu de réévaluer toute la conversation"""
+    monkeypatch.setattr(pre_evaluation, "get_documents_reference", lambda version=None: SimpleNamespace(contenus=lambda cles: {}))
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    worker_a = GestionnairePreEvaluation(tours_par_segment=2, journal=JournalConversationsFichiers(str(tmp_path)))
+    worker_b = GestionnairePreEvaluation(tours_par_segment=2, journal=JournalConversationsFichiers(str(tmp_path)))
+
+    async def scenario():
+        await worker_a.planifier(_historique(5), "c1", client)
+        # Le worker B ne connaît pas la conversation : sa tâche relit les segments du worker A
+        await worker_b.planifier(_historique(7), "c1", client)
+        assert len(completions.appels) == 1
+        await worker_b.planifier(_historique(9), "c1", client)
+
+    asyncio.run(scenario())
+
+    assert len(completions.appels) == 2
+    assert "[05] COMMERCIAL: Message 5" in completions.appels[1]["messages"][1]["content"]
+    assert "Segment 1" in completions.appels[1]["messages"][1]["content"]
+    assert "COMMERCIAL: Message 1" not in completions.appels[1]["messages"][1]["content"]
+    resultat = worker_a.obtenir(_historique(11), "c1")
+    assert [(segment.debut, segment.fin) for segment in resultat.segments] == [(0, 4), (4, 8)]
+    assert worker_b.statistiques()["reprises"] == 1
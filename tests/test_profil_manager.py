@@ -0,0 +1,44 @@
+"""
+Tests du descripteur compact du ProfilManager gardé en session
+"""
+import json
+
+import pytest
+
+from core.fonctions import charger_profil_manager_session, enregistrer_profil_manager_session
+from core.profil_manager import ProfilManager
+
+
+def test_descripteur_reconstruit_le_meme_profil():
+    for _ in range(20):
+        profil_manager = ProfilManager(type_personne=None)
+        descripteur = json.loads(json.dumps(profil_manager.descripteur()))
+
+        restaure = ProfilManager.depuis_descripteur(descripteur)
+
+        assert restaure.profil == profil_manager.profil
+        assert restaure.prompt == profil_manager.prompt
+        assert restaure.descripteur() == profil_manager.descripteur()
+        assert len(json.dumps(descripteur)) < 200
+
+
+def test_descripteur_d_un_autre_jeu_de_personnages_refuse():
+    descripteur = ProfilManager().descripteur()
+    with pytest.raises(ValueError):
+        ProfilManager.depuis_descripteur({**descripteur, "cat": "00000000"})
+    with pytest.raises(ValueError):
+        ProfilManager.depuis_descripteur({**descripteur, "t": 999})
+
+
+def test_session_garde_le_descripteur():
+    profil_manager = ProfilManager()
+    session = {"profil_manager_pickle": "80049500"}
+
+    enregistrer_profil_manager_session(profil_manager, session)
+
+    assert "profil_manager_pickle" not in session
+    assert session["profil_manager"] == profil_manager.descripteur()
+    assert charger_profil_manager_session(session).prompt == profil_manager.prompt
+    # Descripteur périmé : nouveau profil plutôt qu'une erreur
+    session["profil_manager"]["cat"] = "00000000"
+    assert charger_profil_manager_session(session).prompt
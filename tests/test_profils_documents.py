@@ -0,0 +1,48 @@
+"""
+Tests de la table des documents de profil client
+"""
+from types import SimpleNamespace
+
+from core.profils_documents import TableDocumentsProfils
+
+PERSONNAGES = {
+    "jeu_de_personnages": [
+        {"type_de_personne": "Particulier", "liste_personne": [
+            {"Nom": "Jacques", "Age": 62, "profil_passerelle": "Senior"},
+            {"Nom": "Bernadette", "Age": 79, "profil_passerelle": "Senior"},
+            {"Nom": "Abdel", "Age": 30, "profil_passerelle": "Jeune client"},
+        ]},
+        {"type_de_personne": "Agriculteur", "liste_personne": [
+            {"Nom": "Patrice", "Age": 54, "profil_passerelle": "Aidant"},
+            {"Nom": "Fanny", "Age": 35, "profil_passerelle": "Famille"},
+        ]},
+        {"format_entretien": "ignoré"},
+    ]
+}
+
+
+def test_recherche_par_profil_et_age():
+    table = TableDocumentsProfils()
+    assert table.cle_document("Famille", 45) == "profil_familles_installees_45_54"
+    assert table.cle_document("Famille", 44) == "profil_jeune_famille_30_44"
+    assert table.cle_document("Senior", 75) == "profil_retraite_aide_sup75"
+    assert table.cle_document("Senior", 130) == "profil_retraite_aide_sup75"
+    assert table.cle_document("Aidant", 54) == "profil_aidants"
+    assert table.cle_document("Jeune client", "25") == "profil_jeunes_actifs_18_29"
+    assert table.cle_document("Famille", 60) is None
+    assert table.cle_document("Inconnu", 40) is None
+    assert table.cle_document("Famille", None) is None
+
+
+def test_couverture_signale_les_lacunes():
+    table = TableDocumentsProfils()
+    magasins = {
+        "v1": SimpleNamespace(contenu=lambda cle: "contenu"),
+        "v2": SimpleNamespace(contenu=lambda cle: "" if cle == "profil_aidants" else "contenu"),
+    }
+    couverture = table.verifier_couverture(PERSONNAGES, magasins)
+
+    assert couverture["personnages"] == 5
+    assert [personne["nom"] for personne in couverture["personnages_sans_document"]] == ["Abdel"]
+    assert couverture["documents_absents"] == {"v2": ["profil_aidants"]}
+    assert table.couverture is couverture
@@ -0,0 +1,73 @@
+"""
+Tests de la mise en page du prompt de synthèse (préfixe statique / suffixe dynamique)
+"""
+from types import SimpleNamespace
+
+from core.metriques_llm import StatistiquesCachePrompt, extraire_usage_tokens
+from core.prompt_synthese import (
+    construire_prefixe_statique,
+    construire_prompt_synthese,
+    construire_suffixe_dynamique,
+    statistiques_squelettes,
+)
+
+
+DOCUMENTS = {"description_offre": "Offre GSA3", "tmgf": "Tableau TMGF"}
+
+
+def test_prefixe_statique_identique_entre_conversations():
+    """Le préfixe ne dépend ni de l'heure ni de la conversation"""
+    prefixe = construire_prefixe_statique(DOCUMENTS)
+    assert construire_prefixe_statique(dict(DOCUMENTS)) == prefixe
+    assert "Tableau TMGF" in prefixe
+
+    prompt_a = construire_prompt_synthese(DOCUMENTS, "[01] Commercial: Bonjour", "", None)
+    prompt_b = construire_prompt_synthese(DOCUMENTS, "[01] Commercial: Bonsoir", "Doc senior", None)
+    assert prompt_a.startswith(prefixe)
+    assert prompt_b.startswith(prefixe)
+
+
+def test_squelette_rendu_une_fois_par_jeu_de_documents():
+    """Le préfixe n'est rendu qu'une fois tant que les documents sont les mêmes objets"""
+    documents = {"description_offre": "Offre " + "GSA3", "tmgf": "Tableau " + "TMGF"}
+    rendus = statistiques_squelettes()["rendus"]
+
+    prefixe = construire_prefixe_statique(documents, "ENTETE\n")
+    assert construire_prefixe_statique(dict(documents), "ENTETE\n") is prefixe
+    assert prefixe.startswith("ENTETE\n")
+    assert statistiques_squelettes()["rendus"] == rendus + 1
+
+    # Document rechargé (nouvel objet) : nouveau rendu
+    recharge = {**documents, "tmgf": "Tableau " + "TMGF 2026"}
+    assert "TMGF 2026" in construire_prefixe_statique(recharge, "ENTETE\n")
+    assert statistiques_squelettes()["rendus"] == rendus + 2
+
+
+def test_suffixe_dynamique_contient_profil_et_historique():
+    """Le profil, son document et la conversation sont dans le suffixe"""
+    suffixe = construire_suffixe_dynamique("[01] Commercial: Bonjour", "Doc senior", None)
+    assert "[01] Commercial: Bonjour" in suffixe
+    assert "Doc senior" in suffixe
+    assert "Profil client" in suffixe
+
+
+def test_usage_tokens_caches():
+    """cached_tokens est extrait de usage.prompt_tokens_details et agrégé"""
+    response = SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=1000,
+        completion_tokens=200,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=768),
+    ))
+    usage = extraire_usage_tokens(response)
+    assert usage == {"prompt_tokens": 1000, "completion_tokens": 200, "cached_tokens": 768}
+    assert extraire_usage_tokens(SimpleNamespace(usage=None))["cached_tokens"] == 0
+
+    stats = StatistiquesCachePrompt()
+    stats.enregistrer("synthese", usage, 2.0)
+    stats.enregistrer("synthese", {"prompt_tokens": 1000, "cached_tokens": 0}, 4.0)
+    resume = stats.resume()["synthese"]
+    assert resume["appels"] == 2
+    assert resume["appels_avec_cache"] == 1
+    assert resume["taux_tokens_caches"] == 0.384
+    assert resume["latence_moyenne_avec_cache"] == 2.0
+    assert resume["latence_moyenne_sans_cache"] == 4.0
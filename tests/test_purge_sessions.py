@@ -0,0 +1,128 @@
+"""
+Tests de l'index des expirations et de la purge par lots des sessions
+"""
+import asyncio
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import core.journal_conversation as journal_conversation
+from app.middleware.session import ServerSessionMiddleware
+from core.journal_conversation import JournalConversationsFichiers
+from core.purge_sessions import PurgeSessions
+from core.stockage_sessions import StockageSessionsFichiers, StockageSessionsSqlite
+
+
+def _vieillir(stockage, session_id, age):
+    """Session écrite il y a age secondes (fichier et marque d'expiration)"""
+    instant = time.time() - age
+    os.utime(stockage._chemin(session_id), (instant, instant))
+    stockage.index.oublier(session_id)
+    stockage.index.marquer(session_id, instant + stockage.ttl_seconds)
+
+
+def test_purge_des_seuls_candidats_expires(tmp_path):
+    stockage = StockageSessionsFichiers(60, str(tmp_path), duree_tranche=1)
+    for numero in range(7):
+        stockage.ecrire(f"ancienne_{numero}", {"numero": numero})
+        _vieillir(stockage, f"ancienne_{numero}", 120)
+    # Marquée dans une tranche passée mais prolongée depuis : conservée
+    stockage.ecrire("prolongee", {})
+    _vieillir(stockage, "prolongee", 120)
+    stockage.toucher("prolongee")
+    stockage.ecrire("recente", {})
+
+    purge = PurgeSessions({"sessions": stockage}, taille_lot=3, concurrence=2)
+    passage = asyncio.run(purge.purger())
+
+    assert passage["stockages"]["sessions"] == {"examines": 8, "supprimes": 7, "lots": 3}
+    assert passage["suppressions_par_seconde"] > 0
+    assert stockage.nombre_sessions() == 2
+    assert stockage.lire("prolongee") == {} and stockage.lire("recente") == {}
+    assert stockage.statistiques()["purgees"] == 7
+
+    # Index vidé des tranches traitées : le passage suivant n'examine rien
+    assert asyncio.run(purge.purger())["stockages"]["sessions"]["examines"] == 0
+
+
+def test_indexation_des_sessions_existantes(tmp_path):
+    (tmp_path / "ancienne.json").write_text("{}", encoding="utf-8")
+    instant = time.time() - 120
+    os.utime(tmp_path / "ancienne.json", (instant, instant))
+
+    stockage = StockageSessionsFichiers(60, str(tmp_path), duree_tranche=1)
+    assert stockage.indexer_existants() == 1
+    assert stockage.indexer_existants() == 0
+
+    asyncio.run(PurgeSessions({"sessions": stockage}).purger())
+    assert not (tmp_path / "ancienne.json").exists()
+
+
+def test_purge_sqlite_par_l_index(tmp_path):
+    stockage = StockageSessionsSqlite(-1, str(tmp_path / "sessions.sqlite3"))
+    for numero in range(5):
+        stockage.ecrire(f"s{numero}", {})
+    stockage.ttl_seconds = 60
+    stockage.ecrire("active", {})
+
+    plan = " ".join(str(ligne) for ligne in stockage._connexion.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM sessions WHERE expire_le < ? ORDER BY expire_le LIMIT ?", (0, 10)
+    ))
+    assert "sessions_expire_le" in plan
+
+    passage = asyncio.run(PurgeSessions({"sessions": stockage}, taille_lot=2).purger())
+    assert passage["stockages"]["sessions"]["supprimes"] == 5
+    assert stockage.nombre_sessions() == 1
+    stockage.fermer()
+
+
+def test_purge_des_journaux_de_conversation(tmp_path):
+    journal = JournalConversationsFichiers(str(tmp_path), ttl_seconds=60, duree_tranche=1)
+    journal.ajouter("c1", [{"role": "Vous", "text": "Bonjour"}])
+    instant = time.time() - 120
+    os.utime(tmp_path / "c1.jsonl", (instant, instant))
+    journal.index.oublier("c1")
+    journal.index.marquer("c1", instant + 60)
+
+    asyncio.run(PurgeSessions({"journaux": journal}).purger())
+    assert journal.lire("c1") == []
+    assert not (tmp_path / "c1.jsonl").exists()
+
+
+def test_journal_prolonge_avec_la_session(monkeypatch, tmp_path):
+    """Une session active sans nouveau message garde son journal de conversation"""
+    journal = JournalConversationsFichiers(str(tmp_path / "conversations"), ttl_seconds=60, duree_tranche=1)
+    monkeypatch.setattr(journal_conversation, "_journal_conversations", journal)
+    stockage = StockageSessionsFichiers(60, str(tmp_path / "sessions"), duree_tranche=1)
+
+    app = FastAPI()
+
+    @app.get("/demarrer")
+    async def demarrer(request: Request):
+        request.session["conversation_id"] = "c1"
+        journal.ajouter("c1", [{"role": "Vous", "text": "Bonjour"}])
+        return {}
+
+    @app.get("/consulter")
+    async def consulter(request: Request):
+        return {"messages": len(journal.lire(request.session["conversation_id"]))}
+
+    app.add_middleware(
+        ServerSessionMiddleware,
+        secret_key="test-secret-key-minimum-32-characters-long-for-security",
+        stockage=stockage,
+    )
+    client = TestClient(app)
+    client.get("/demarrer")
+
+    # Dernier message il y a 2 minutes, mais la session vient d'être consultée
+    instant = time.time() - 120
+    os.utime(tmp_path / "conversations" / "c1.jsonl", (instant, instant))
+    journal.index.oublier("c1")
+    journal.index.marquer("c1", instant + 60)
+    assert client.get("/consulter").json() == {"messages": 1}
+
+    asyncio.run(PurgeSessions({"journaux": journal}).purger())
+    assert journal.lire("c1") != []
@@ -0,0 +1,47 @@
+"""
+Tests du registre des versions du corpus
+"""
+import json
+
+from core.registre_corpus import RegistreCorpus, parser_deploiement_corpus
+
+
+def _version(racine, nom, documents):
+    repertoire = racine / nom
+    repertoire.mkdir()
+    for fichier, texte in documents.items():
+        (repertoire / fichier).write_text(texte, encoding="utf-8")
+    manifeste = {"version": nom, "documents": {"description_offre": "offre.txt"}, "profils": {"profil_aidants": "aidants.txt"}}
+    (repertoire / "manifest.json").write_text(json.dumps(manifeste), encoding="utf-8")
+
+
+def test_versions_decrites_par_manifeste(tmp_path):
+    """Chaque répertoire avec manifeste est une version ; les contenus identiques sont partagés"""
+    _version(tmp_path, "v1", {"offre.txt": "Offre v1", "aidants.txt": "Profil aidants"})
+    _version(tmp_path, "v2", {"offre.txt": "Offre v2", "aidants.txt": "Profil aidants"})
+    registre = RegistreCorpus(str(tmp_path), version_defaut="v1", intervalle_verification=0)
+    registre.precharger()
+
+    assert {"v1", "v2"} <= set(registre.versions())
+    assert registre.magasin("v2").contenu("description_offre") == "Offre v2"
+    assert registre.magasin("inconnue").contenu("description_offre") == "Offre v1"
+    assert registre.magasin("v1").contenu("profil_aidants") is registre.magasin("v2").contenu("profil_aidants")
+
+
+def test_session_rattachee_et_deploiement_progressif(tmp_path):
+    """La version attribuée dépend de l'utilisateur et reste celle de la session"""
+    _version(tmp_path, "v1", {"offre.txt": "Offre v1"})
+    _version(tmp_path, "v2", {"offre.txt": "Offre v2"})
+    registre = RegistreCorpus(str(tmp_path), "v1", parser_deploiement_corpus("v2=50, inconnue=10"), 0)
+
+    attributions = {registre.attribuer_version(f"user{i}@groupama.fr") for i in range(50)}
+    assert attributions == {"v1", "v2"}
+    assert registre.deploiement == {"v2": 50}
+
+    session = {"user_email": "user1@groupama.fr"}
+    version = registre.version_session(session)
+    assert session["corpus_version"] == version == registre.attribuer_version("user1@groupama.fr")
+
+    # Version rattachée explicitement : conservée
+    session = {"user_email": "user1@groupama.fr", "corpus_version": "v2"}
+    assert registre.version_session(session) == "v2"
@@ -0,0 +1,139 @@
+"""
+Tests de la couche de résilience des appels Azure OpenAI
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import core.resilience_llm as resilience_llm
+import core.routeur_deploiements as routeur_deploiements
+from core.resilience_llm import (
+    ETAT_SEMI_OUVERT,
+    CircuitOuvertError,
+    CoucheResilienceLLM,
+    EcheanceDepasseeError,
+    echeance_llm,
+)
+
+
+def _erreur_http(classe, code, entetes=None):
+    requete = httpx.Request("POST", "https://azure.example/openai/deployments/gpt/chat/completions")
+    reponse = httpx.Response(code, headers=entetes or {}, request=requete)
+    return classe(f"HTTP {code}", response=reponse, body=None)
+
+
+class FakeCompletions:
+    """Lève les erreurs prévues puis retourne une réponse"""
+
+    def __init__(self, erreurs):
+        self.erreurs = list(erreurs)
+        self.appels = []
+
+    async def create(self, **params):
+        self.appels.append(params)
+        if self.erreurs:
+            raise self.erreurs.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+
+def _client(erreurs):
+    completions = FakeCompletions(erreurs)
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions)), completions
+
+
+@pytest.fixture
+def pauses(monkeypatch):
+    """Remplace asyncio.sleep et enregistre les pauses demandées"""
+    durees = []
+
+    async def fake_sleep(duree):
+        durees.append(duree)
+
+    monkeypatch.setattr(resilience_llm.asyncio, "sleep", fake_sleep)
+    return durees
+
+
+def test_retry_after_respecte_sur_429(pauses):
+    """Un 429 est réessayé après le délai demandé par le serveur"""
+    client, completions = _client([_erreur_http(openai.RateLimitError, 429, {"retry-after": "3"})])
+    couche = CoucheResilienceLLM(delai_base=0.01)
+
+    response = asyncio.run(couche.appeler_async(client, model="gpt", messages=[], timeout=60))
+
+    assert response.choices[0].message.content == "ok"
+    assert len(completions.appels) == 2
+    assert 3 <= pauses[0] < 3.1
+
+
+def test_erreur_de_requete_non_reessayee(pauses):
+    """Une erreur 400 est propagée sans nouvelle tentative"""
+    client, completions = _client([_erreur_http(openai.BadRequestError, 400)])
+    couche = CoucheResilienceLLM()
+
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(couche.appeler_async(client, model="gpt", messages=[]))
+    assert len(completions.appels) == 1
+
+
+def test_disjoncteur_echoue_immediatement(pauses):
+    """Après des échecs répétés, le déploiement est court-circuité sans appel"""
+    erreurs = [_erreur_http(openai.InternalServerError, 503) for _ in range(4)]
+    client, completions = _client(erreurs)
+    couche = CoucheResilienceLLM(max_tentatives=2, seuil_echecs=2, delai_reouverture=60)
+
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(couche.appeler_async(client, model="gpt", messages=[]))
+    with pytest.raises(CircuitOuvertError):
+        asyncio.run(couche.appeler_async(client, model="gpt", messages=[]))
+
+    assert len(completions.appels) == 2
+    assert couche.statistiques()["disjoncteurs"]["gpt"]["etat"] == "ouvert"
+
+
+def test_echeance_bornee_par_le_budget_de_la_requete(pauses):
+    """Le timeout de l'appel est borné par le temps restant ; aucun appel après l'échéance"""
+    client, completions = _client([])
+    couche = CoucheResilienceLLM()
+
+    async def scenario():
+        with echeance_llm(5):
+            await couche.appeler_async(client, model="gpt", messages=[], timeout=60)
+        with echeance_llm(-1):
+            await couche.appeler_async(client, model="gpt", messages=[])
+
+    with pytest.raises(EcheanceDepasseeError):
+        asyncio.run(scenario())
+    assert len(completions.appels) == 1
+    assert completions.appels[0]["timeout"] <= 5
+
+
+def test_appel_annule_libere_le_deploiement(monkeypatch):
+    """Un appel annulé n'est plus compté en cours et libère l'appel test du disjoncteur"""
+    routeur = routeur_deploiements.RouteurDeploiements()
+    monkeypatch.setattr(routeur_deploiements, "_routeur", routeur)
+
+    class CompletionsBloquees:
+        async def create(self, **params):
+            await asyncio.Event().wait()
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=CompletionsBloquees()))
+    couche = CoucheResilienceLLM()
+    disjoncteur = couche.disjoncteur("dep-a")
+    disjoncteur.etat = ETAT_SEMI_OUVERT
+
+    async def scenario():
+        tache = asyncio.create_task(couche.appeler_async(client, model="dep-a", messages=[]))
+        await asyncio.sleep(0.01)
+        assert routeur.statistiques()["deploiements"]["dep-a"]["en_cours"] == 1
+        tache.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tache
+
+    asyncio.run(scenario())
+    stats = routeur.statistiques()["deploiements"]["dep-a"]
+    assert stats["en_cours"] == 0
+    assert stats["erreurs"] == 0
+    assert disjoncteur.autoriser()
@@ -0,0 +1,87 @@
+"""
+Tests de la répartition des appels entre déploiements Azure OpenAI
+"""
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+import core.resilience_llm as resilience_llm
+import core.routeur_deploiements as routeur_deploiements
+from core.resilience_llm import CoucheResilienceLLM
+from core.routeur_deploiements import RouteurDeploiements, parser_pools_deploiements
+
+
+def _erreur_429(retry_after="10"):
+    requete = httpx.Request("POST", "https://azure.example/openai/deployments/gpt/chat/completions")
+    reponse = httpx.Response(429, headers={"retry-after": retry_after}, request=requete)
+    return openai.RateLimitError("HTTP 429", response=reponse, body=None)
+
+
+class FakeCompletions:
+    """Répond 429 pour les déploiements saturés"""
+
+    def __init__(self, satures):
+        self.satures = set(satures)
+        self.appels = []
+
+    async def create(self, **params):
+        self.appels.append(params["model"])
+        if params["model"] in self.satures:
+            raise _erreur_429()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=params["model"]))])
+
+
+@pytest.fixture
+def routeur(monkeypatch):
+    """Routeur global avec un pool de deux déploiements pour le rôle client"""
+    instance = RouteurDeploiements(parser_pools_deploiements("client=dep-a,dep-b; faq=dep-c"))
+    monkeypatch.setattr(routeur_deploiements, "_routeur", instance)
+    pauses = []
+
+    async def fake_sleep(duree):
+        pauses.append(duree)
+
+    monkeypatch.setattr(resilience_llm.asyncio, "sleep", fake_sleep)
+    instance.pauses = pauses
+    return instance
+
+
+def test_429_bascule_immediatement_sur_un_autre_deploiement(routeur):
+    """Un 429 est réessayé sans attendre sur un déploiement qui a encore du quota, puis évité"""
+    completions = FakeCompletions(satures={"dep-a"})
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    couche = CoucheResilienceLLM()
+
+    async def scenario():
+        premiere = await couche.appeler_async(client, "client", model="gpt", messages=[])
+        seconde = await couche.appeler_async(client, "client", model="gpt", messages=[])
+        return premiere, seconde
+
+    premiere, seconde = asyncio.run(scenario())
+
+    assert premiere.choices[0].message.content == "dep-b"
+    assert seconde.choices[0].message.content == "dep-b"
+    # dep-a est écarté pendant son Retry-After : un seul appel lui a été envoyé
+    assert completions.appels == ["dep-a", "dep-b", "dep-b"]
+    assert routeur.pauses == []
+
+    stats = routeur.statistiques()["deploiements"]
+    assert stats["dep-a"]["reponses_429"] == 1
+    assert stats["dep-a"]["ecarte_pendant_secondes"] > 0
+    assert stats["dep-b"]["part_appels"] == pytest.approx(2 / 3, abs=1e-3)
+
+
+def test_choix_du_deploiement_le_plus_rapide(routeur):
+    """Le déploiement dont la latence récente est la plus basse est préféré"""
+    for nom, duree in (("dep-a", 2.0), ("dep-b", 0.5)):
+        routeur.debut_appel(nom)
+        routeur.fin_appel(nom, duree)
+
+    assert routeur.choisir("client", "gpt") == "dep-b"
+    # Un disjoncteur ouvert écarte le déploiement
+    assert routeur.choisir("client", "gpt", est_disponible=lambda nom: nom != "dep-b") == "dep-a"
+    # Rôle sans pool : déploiement de l'appel
+    assert routeur.choisir("synthese", "gpt") == "gpt"
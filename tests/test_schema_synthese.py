@@ -0,0 +1,141 @@
+"""
+Tests du schéma typé de synthèse et de la regénération des dimensions invalides
+"""
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+from core.prompt_synthese import DIMENSIONS_SYNTHESE
+from core.schema_synthese import ResultatSynthese, configurer_sortie_structuree, format_reponse
+from core.synthetiser import CLES_DIMENSION, synthese_2_async, valider_schema_synthese
+
+DOCUMENTS = {
+    "tmgf": "Tableau TMGF",
+    "charte_relation_client": "Charte relation client",
+    "traitement_objections": "Méthode ACTE",
+}
+
+HISTORIQUE = [
+    {"role": "Vous", "text": "Bonjour, je vous appelle pour votre complémentaire santé", "msg_num": 1,
+     "timestamp": "2025-10-01T10:00:00"},
+    {"role": "Assistant", "text": "Bonjour, je vous écoute", "msg_num": 2, "timestamp": "2025-10-01T10:00:05"},
+]
+
+PROFIL = {"Nom": "Martin", "Age": 48, "profil_passerelle": "Famille"}
+
+
+def _dimension(dimension):
+    return {cle: "Bien" if cle == "niveau" else f"{cle} {dimension}" for cle in CLES_DIMENSION}
+
+
+def _synthese_complete():
+    return {
+        "synthese": {"niveau_general": "Bien", "commentaire_global": "Bon appel"},
+        "vision_detaillee": {dimension: _dimension(dimension) for dimension in DIMENSIONS_SYNTHESE},
+        "recommandations": {
+            "principales_forces": ["Écoute"],
+            "axes_amelioration_prioritaires": ["Découverte"],
+            "actions_correctives_immediates": ["Reformuler"],
+        },
+    }
+
+
+def _objets(schema):
+    """Tous les sous-schémas de type objet"""
+    if isinstance(schema, dict):
+        if schema.get("type") == "object":
+            yield schema
+        for valeur in schema.values():
+            yield from _objets(valeur)
+    elif isinstance(schema, list):
+        for element in schema:
+            yield from _objets(element)
+
+
+def test_schema_strict_et_desactivable():
+    format_json = format_reponse(ResultatSynthese, "synthese_conversation")
+    assert format_json["type"] == "json_schema" and format_json["json_schema"]["strict"] is True
+
+    objets = list(_objets(format_json["json_schema"]["schema"]))
+    assert objets
+    for objet in objets:
+        assert objet["additionalProperties"] is False
+        assert set(objet["required"]) == set(objet["properties"])
+    assert "Satisfaisant" in json.dumps(format_json, ensure_ascii=False)
+
+    configurer_sortie_structuree(False)
+    try:
+        assert format_reponse(ResultatSynthese, "synthese_conversation") == {"type": "json_object"}
+    finally:
+        configurer_sortie_structuree(True)
+    assert format_reponse(ResultatSynthese, "synthese_conversation") == format_json
+
+
+def test_format_du_prompt_conforme_au_schema():
+    """Le gabarit JSON du prompt ne demande que les clés admises par le schéma strict"""
+    from core.prompt_synthese import get_format_json
+
+    gabarit = json.loads(get_format_json())
+    schema = format_reponse(ResultatSynthese, "synthese_conversation")["json_schema"]["schema"]
+    assert set(gabarit) == set(schema["properties"])
+    assert set(gabarit["synthese"]) == set(schema["$defs"]["SyntheseGenerale"]["properties"])
+    assert "timestamp" not in gabarit["synthese"]
+
+
+def test_sortie_structuree_lue_dans_la_configuration(monkeypatch):
+    from app.config import Settings
+
+    assert Settings().synthese_structured_output is True
+    monkeypatch.setenv("SYNTHESE_STRUCTURED_OUTPUT", "false")
+    assert Settings().synthese_structured_output is False
+
+
+def test_validation_en_une_passe():
+    data = _synthese_complete()
+    data["synthese"]["timestamp"] = "2025-10-01T10:00:00"
+    assert valider_schema_synthese(data) == (True, [])
+
+    del data["vision_detaillee"]["cross_selling_opportunites"]
+    data["vision_detaillee"]["maitrise_produit_technique"]["points_positifs"] = ["liste au lieu d'un texte"]
+    del data["synthese"]["timestamp"]
+    est_valide, erreurs = valider_schema_synthese(data)
+    assert not est_valide
+    assert "Dimension manquante dans 'vision_detaillee': cross_selling_opportunites" in erreurs
+    assert "Clé manquante dans 'synthese': timestamp" in erreurs
+    assert any(erreur.startswith("vision_detaillee.maitrise_produit_technique.points_positifs") for erreur in erreurs)
+
+
+class FakeCompletions:
+    """Synthèse complète sans la dimension cross-selling, puis cette dimension seule"""
+
+    def __init__(self):
+        self.appels = []
+
+    async def create(self, **params):
+        self.appels.append(params)
+        dimension = re.search(r"uniquement la dimension (\w+)", params["messages"][1]["content"])
+        if dimension is None:
+            contenu = _synthese_complete()
+            del contenu["vision_detaillee"]["cross_selling_opportunites"]
+        else:
+            contenu = {dimension.group(1): _dimension(dimension.group(1))}
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(contenu)))],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20, prompt_tokens_details=None),
+        )
+
+
+def test_seule_la_dimension_manquante_est_regeneree():
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    profil_manager = SimpleNamespace(profil=PROFIL, get_person_details=lambda: PROFIL, get_profil_type="Famille")
+
+    resultat = asyncio.run(synthese_2_async(HISTORIQUE, client, DOCUMENTS, profil_manager))
+
+    # Un appel complet puis un appel court pour la dimension manquante, pas de nouvelle tentative complète
+    assert len(completions.appels) == 2
+    assert completions.appels[1]["response_format"]["json_schema"]["name"] == "dimension_cross_selling_opportunites"
+    assert resultat["_metadata_appel"]["tentative_reussie"] == 1
+    assert resultat["_metadata_appel"]["schema_valide"] is True
+    assert resultat["_metadata_appel"]["usage_tokens"]["prompt_tokens"] == 200
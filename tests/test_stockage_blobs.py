@@ -0,0 +1,43 @@
+"""
+Tests du stockage adressé par contenu et des manifestes de prompt
+"""
+import json
+
+import pytest
+
+from core.fonctions import charger_documents_reference
+from core.prompt_synthese import construire_prefixe_statique, construire_suffixe_dynamique, parties_partagees_prompt_synthese
+from core.stockage_blobs import StockageBlobs, construire_manifeste_prompt, reconstruire_prompt
+
+
+def _prompt(documents, conversation):
+    return construire_prefixe_statique(documents, "ENTETE\n") + construire_suffixe_dynamique(conversation, "", None)
+
+
+def test_prompts_sauvegardes_en_manifestes(tmp_path):
+    """Les parties partagées ne sont écrites qu'une fois ; le prompt est reconstruit à l'identique"""
+    stockage = StockageBlobs(tmp_path)
+    documents = charger_documents_reference("racine")
+    prompt_a = _prompt(documents, "[01] Commercial: Bonjour")
+    prompt_b = _prompt(documents, "[01] Commercial: Bonsoir, je vous appelle")
+
+    manifeste_a = construire_manifeste_prompt(prompt_a, parties_partagees_prompt_synthese(documents), stockage)
+    ecrits = stockage.statistiques()["octets_ecrits"]
+    manifeste_b = construire_manifeste_prompt(prompt_b, parties_partagees_prompt_synthese(documents), stockage)
+
+    # Deuxième synthèse : aucun nouveau blob, seul le manifeste est écrit
+    assert stockage.statistiques()["octets_ecrits"] == ecrits
+    assert len(json.dumps(manifeste_b, ensure_ascii=False)) < len(prompt_b) / 20
+    assert reconstruire_prompt(manifeste_a, stockage) == prompt_a
+    assert reconstruire_prompt(manifeste_b, stockage) == prompt_b
+
+
+def test_blob_manquant_detecte(tmp_path):
+    stockage = StockageBlobs(tmp_path)
+    partie = "Document partagé " * 100
+    manifeste = construire_manifeste_prompt("Début " + partie + " fin", {"document": partie}, stockage)
+    assert [section.get("nom") for section in manifeste["sections"]] == [None, "document", None]
+
+    (tmp_path / manifeste["sections"][1]["blob"][:2] / manifeste["sections"][1]["blob"]).unlink()
+    with pytest.raises(ValueError):
+        reconstruire_prompt(manifeste, StockageBlobs(tmp_path))
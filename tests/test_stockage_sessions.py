@@ -0,0 +1,98 @@
+"""
+Tests des sessions stockées côté serveur
+"""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.middleware.session import ServerSessionMiddleware
+from core.stockage_sessions import TYPES_STOCKAGE, StockageSessionsMemoire, creer_stockage_sessions
+
+SECRET = "test-secret-key-minimum-32-characters-long-for-security"
+
+
+@pytest.mark.parametrize("type_stockage", TYPES_STOCKAGE)
+def test_stockages_lecture_ecriture_expiration(type_stockage, tmp_path):
+    stockage = creer_stockage_sessions(
+        type_stockage, 60, repertoire=str(tmp_path / "sessions"), chemin_sqlite=str(tmp_path / "sessions.sqlite3")
+    )
+    donnees = {"conversation_history": [{"role": "Vous", "text": "Bonjour"}], "user_folder": "test"}
+    stockage.ecrire("abc_123", donnees)
+    assert stockage.lire("abc_123") == donnees
+    assert stockage.lire("inconnue") is None
+    assert stockage.nombre_sessions() == 1
+
+    stockage.supprimer("abc_123")
+    assert stockage.lire("abc_123") is None
+
+    stockage.ttl_seconds = -1
+    stockage.ecrire("abc_123", donnees)
+    assert stockage.lire("abc_123") is None
+    assert stockage.statistiques()["expirees"] == 1
+    stockage.fermer()
+
+
+def test_stockage_memoire_lru():
+    stockage = StockageSessionsMemoire(60, max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        stockage.ecrire(session_id, {"id": session_id})
+    assert stockage.lire("a") is None
+    assert stockage.lire("c") == {"id": "c"}
+
+
+def _application(stockage):
+    app = FastAPI()
+
+    @app.get("/ecrire")
+    async def ecrire(request: Request):
+        request.session.setdefault("conversation_history", []).append("x" * 2000)
+        return {"messages": len(request.session["conversation_history"])}
+
+    @app.get("/connexion")
+    async def connexion(request: Request):
+        request.session["user"] = {"email": "test@example.com"}
+        return {}
+
+    @app.get("/lire")
+    async def lire(request: Request):
+        return dict(request.session)
+
+    @app.get("/deconnexion")
+    async def deconnexion(request: Request):
+        request.session.clear()
+        return {}
+
+    app.add_middleware(ServerSessionMiddleware, secret_key=SECRET, stockage=stockage, session_cookie="session_test")
+    return app
+
+
+def test_cookie_ne_contient_que_l_identifiant():
+    stockage = StockageSessionsMemoire(60)
+    client = TestClient(_application(stockage))
+
+    for _ in range(5):
+        reponse = client.get("/ecrire")
+    assert reponse.json() == {"messages": 5}
+    cookie = client.cookies["session_test"]
+    assert len(cookie) < 100
+    ecritures = stockage.statistiques()["ecritures"]
+
+    # Session inchangée : pas de réécriture
+    client.get("/lire")
+    assert stockage.statistiques()["ecritures"] == ecritures
+
+    # Connexion : nouvel identifiant, session conservée
+    client.get("/connexion")
+    assert client.cookies["session_test"] != cookie
+    assert len(client.get("/lire").json()["conversation_history"]) == 5
+    assert stockage.nombre_sessions() == 1
+
+    # Cookie falsifié : nouvelle session vide
+    client.cookies.set("session_test", cookie + "x")
+    assert client.get("/lire").json() == {}
+
+    # Déconnexion : session supprimée côté serveur
+    client.cookies.clear()
+    client.get("/ecrire")
+    client.get("/deconnexion")
+    assert stockage.nombre_sessions() == 1
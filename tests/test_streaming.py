@@ -0,0 +1,112 @@
+"""
+Tests des outils de streaming SSE
+"""
+import json
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import core.journal_conversation as journal_conversation
+from app.dependencies.auth import get_current_user
+from app.dependencies.openai_client import get_azure_openai_client
+from app.middleware.session import ServerSessionMiddleware
+from app.routers import faq
+from core.journal_conversation import JournalConversationsFichiers
+from core.stockage_sessions import StockageSessionsFichiers
+from core.streaming import DecoupeurPhrases, formater_evenement_sse
+
+
+def test_formater_evenement_sse():
+    """Format event/data terminé par une ligne vide"""
+    bloc = formater_evenement_sse("token", {"delta": "Bonjour é"})
+    assert bloc.startswith("event: token\ndata: ")
+    assert bloc.endswith("\n\n")
+    assert json.loads(bloc.split("data: ", 1)[1]) == {"delta": "Bonjour é"}
+
+
+def test_decoupeur_phrases_incremental():
+    """Les phrases sont émises dès que leur ponctuation finale est suivie d'un espace"""
+    decoupeur = DecoupeurPhrases()
+    assert decoupeur.ajouter("Bonjour M. Dupont") == []
+    assert decoupeur.ajouter(", ça coûte 3.5 euros. Vraiment") == [
+        "Bonjour M. Dupont, ça coûte 3.5 euros."
+    ]
+    assert decoupeur.ajouter(" ? Ah d'accord") == ["Vraiment ?"]
+    assert decoupeur.terminer() == ["Ah d'accord"]
+    assert decoupeur.terminer() == []
+
+
+
+def _worker_faq(repertoire):
+    """Application FAQ d'un worker : sessions et journaux partagés dans le même répertoire"""
+    app = FastAPI()
+    app.include_router(faq.router)
+    app.dependency_overrides[get_current_user] = lambda: {"preferred_username": "test_user"}
+    app.dependency_overrides[get_azure_openai_client] = lambda: None
+    app.add_middleware(
+        ServerSessionMiddleware,
+        secret_key="test-secret-key-minimum-32-characters-long-for-security",
+        stockage=StockageSessionsFichiers(60, str(repertoire / "sessions")),
+    )
+    return TestClient(app), JournalConversationsFichiers(str(repertoire / "conversations"))
+
+
+def test_faq_stream_repris_par_un_autre_worker(monkeypatch, tmp_path):
+    """La réponse terminée en streaming sur un worker est dans l'historique lu par un autre"""
+    async def reponse_expert(question, client, historique, extraits):
+        for fragment in ("Six ", "blocs ", f"(après {len(historique)} échanges)."):
+            yield fragment
+
+    monkeypatch.setattr(faq, "stream_expert_response_async", reponse_expert)
+    monkeypatch.setattr(faq, "selectionner_extraits_faq", lambda *args, **kwargs: [])
+    monkeypatch.setattr(faq, "get_index_documentaire", lambda version=None: SimpleNamespace(version="v1"))
+    monkeypatch.setattr(faq, "get_cache_reponses_faq", lambda: SimpleNamespace(
+        obtenir=lambda *args: None, enregistrer=lambda *args: None
+    ))
+
+    client_a, journal_a = _worker_faq(tmp_path)
+    client_b, journal_b = _worker_faq(tmp_path)
+
+    monkeypatch.setattr(journal_conversation, "_journal_conversations", journal_a)
+    flux = client_a.post("/faq_chat_stream", json={"question": "Combien de blocs de garanties ?"}).text
+    assert "event: done" in flux
+
+    # Requête suivante traitée par l'autre worker, avec le même cookie de session
+    client_b.cookies = client_a.cookies
+    monkeypatch.setattr(journal_conversation, "_journal_conversations", journal_b)
+    historique = client_b.get("/faq_history").json()["history"]
+    assert [(entree["question"], entree["response"]) for entree in historique] == [
+        ("Combien de blocs de garanties ?", "Six blocs (après 0 échanges).")
+    ]
+
+    flux = client_b.post("/faq_chat_stream", json={"question": "Et pour les cadres ?"}).text
+    assert "(après 1 échanges)" in flux
+
+    client_b.post("/faq_reset")
+    monkeypatch.setattr(journal_conversation, "_journal_conversations", journal_a)
+    assert client_a.get("/faq_history").json()["history"] == []
+
+
+def test_faq_chat_et_reinitialisation(monkeypatch, tmp_path):
+    """Le repli sans streaming et la réinitialisation répondent sans erreur"""
+    async def reponse_expert(question, client, historique, extraits):
+        return f"Réponse après {len(historique)} échanges"
+
+    monkeypatch.setattr(faq, "generate_expert_response_async", reponse_expert)
+    monkeypatch.setattr(faq, "selectionner_extraits_faq", lambda *args, **kwargs: [])
+    monkeypatch.setattr(faq, "get_index_documentaire", lambda version=None: SimpleNamespace(version="v1"))
+    monkeypatch.setattr(faq, "get_cache_reponses_faq", lambda: SimpleNamespace(
+        obtenir=lambda *args: None, enregistrer=lambda *args: None
+    ))
+    client, journal = _worker_faq(tmp_path)
+    monkeypatch.setattr(journal_conversation, "_journal_conversations", journal)
+
+    reponse = client.post("/faq_chat", json={"question": "Combien de blocs de garanties ?"})
+    assert reponse.status_code == 200
+    assert reponse.json()["response"] == "Réponse après 0 échanges"
+    assert len(reponse.json()["history"]) == 1
+
+    reponse = client.post("/faq_reset")
+    assert reponse.status_code == 200 and reponse.json()["success"] is True
+    assert client.get("/faq_history").json()["history"] == []
@@ -0,0 +1,101 @@
+"""
+Tests du moteur de jobs de synthèse
+"""
+import asyncio
+
+import core.synthese_jobs as synthese_jobs
+from core.synthese_jobs import (
+    ETAPES_SYNTHESE,
+    GestionnaireJobsSynthese,
+    STATUT_ECHEC,
+    STATUT_TERMINE,
+)
+
+
+def _stockage_memoire(monkeypatch, fileshare_memoire):
+    """Stockage en mémoire, documents de référence et rendu HTML factices"""
+    fichiers = fileshare_memoire(synthese_jobs)
+    monkeypatch.setattr(synthese_jobs, "charger_documents_reference", lambda version_corpus=None: {})
+    monkeypatch.setattr(synthese_jobs, "generer_rapport_html_synthese", lambda data: "<html></html>")
+    return fichiers
+
+
+def test_job_synthese_etapes_et_persistance(monkeypatch, fileshare_memoire):
+    """Le job passe par toutes les étapes et son résultat est persisté"""
+    fichiers = _stockage_memoire(monkeypatch, fileshare_memoire)
+
+    async def fake_synthese(history, client, references, profil_manager, session_data, suivi_etape=None):
+        suivi_etape("preparation_prompt", 0)
+        suivi_etape("appel_llm", 1)
+        suivi_etape("validation_json", 1)
+        return {"synthese": {"niveau_general": "Bien"}}
+
+    monkeypatch.setattr(synthese_jobs, "synthese_2_async", fake_synthese)
+
+    async def scenario():
+        gestionnaire = GestionnaireJobsSynthese(max_workers=1)
+        job = gestionnaire.soumettre([{"role": "Vous", "text": "Bonjour"}], None, None, "user_a")
+        etats = [etat async for etat in gestionnaire.suivre(job.job_id, "user_a")]
+
+        # Un autre utilisateur ne voit pas le job
+        assert await gestionnaire.obtenir(job.job_id, "user_b") is None
+
+        # Relecture depuis le stockage (autre worker, redémarrage)
+        autre_worker = GestionnaireJobsSynthese()
+        return etats, await autre_worker.obtenir(job.job_id, "user_a")
+
+    etats, etat_persiste = asyncio.run(scenario())
+
+    etapes = [etat["etape"] for etat in etats if etat["etape"]]
+    assert list(dict.fromkeys(etapes)) == list(ETAPES_SYNTHESE)
+    assert etats[-1]["statut"] == STATUT_TERMINE
+    assert etat_persiste["statut"] == STATUT_TERMINE
+    assert f"user_a/syntheses/{etat_persiste['fichier_rapport']}" in fichiers
+    assert f"user_a/syntheses/{etat_persiste['fichier_synthese']}" in fichiers
+
+
+def test_job_synthese_echec(monkeypatch, fileshare_memoire):
+    """Une synthèse en erreur termine le job en échec"""
+    _stockage_memoire(monkeypatch, fileshare_memoire)
+
+    async def fake_synthese(*args, **kwargs):
+        return {"erreur": "API indisponible", "statut": "echec_api"}
+
+    monkeypatch.setattr(synthese_jobs, "synthese_2_async", fake_synthese)
+
+    async def scenario():
+        gestionnaire = GestionnaireJobsSynthese()
+        job = gestionnaire.soumettre([], None, None, "user_a")
+        return [etat async for etat in gestionnaire.suivre(job.job_id, "user_a")][-1]
+
+    etat = asyncio.run(scenario())
+    assert etat["statut"] == STATUT_ECHEC
+    assert etat["erreur"] == "API indisponible"
+
+
+def test_progression_visible_depuis_un_autre_worker(monkeypatch, fileshare_memoire):
+    """Chaque changement d'étape est persisté : le suivi par relecture du stockage le voit"""
+    _stockage_memoire(monkeypatch, fileshare_memoire)
+    etapes_vues, jobs = [], []
+    autre_worker = GestionnaireJobsSynthese()
+
+    async def fake_synthese(history, client, references, profil_manager, session_data, suivi_etape=None):
+        suivi_etape("appel_llm", 1)
+        await asyncio.sleep(0.05)
+        etapes_vues.append((await autre_worker.obtenir(jobs[0], "user_a"))["etape"])
+        suivi_etape("appel_llm", 2)
+        await asyncio.sleep(0.05)
+        etat = await autre_worker.obtenir(jobs[0], "user_a")
+        etapes_vues.append((etat["etape"], etat["tentative"]))
+        return {"synthese": {"niveau_general": "Bien"}}
+
+    monkeypatch.setattr(synthese_jobs, "synthese_2_async", fake_synthese)
+
+    async def scenario():
+        gestionnaire = GestionnaireJobsSynthese()
+        job = gestionnaire.soumettre([], None, None, "user_a")
+        jobs.append(job.job_id)
+        return [etat async for etat in gestionnaire.suivre(job.job_id, "user_a")][-1]
+
+    assert asyncio.run(scenario())["statut"] == STATUT_TERMINE
+    assert etapes_vues == ["appel_llm", ("appel_llm", 2)]
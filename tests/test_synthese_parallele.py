@@ -0,0 +1,110 @@
+"""
+Tests du mode de synthèse parallèle (un appel par dimension)
+"""
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+from core.prompt_synthese import DIMENSIONS_SYNTHESE, DOCUMENTS_PAR_DIMENSION
+from core.synthetiser import CLES_DIMENSION, MODE_SYNTHESE_PARALLELE, synthese_parallele_async
+
+DOCUMENTS = {
+    "tmgf": "Tableau TMGF",
+    "charte_relation_client": "Charte relation client",
+    "traitement_objections": "Méthode ACTE",
+}
+
+HISTORIQUE = [
+    {"role": "Vous", "text": "Bonjour, je vous appelle pour votre complémentaire santé", "msg_num": 1,
+     "timestamp": "2025-10-01T10:00:00"},
+    {"role": "Assistant", "text": "Bonjour, je vous écoute", "msg_num": 2, "timestamp": "2025-10-01T10:00:05"},
+]
+
+PROFIL = {"Nom": "Martin", "Age": 48, "profil_passerelle": "Famille"}
+
+
+def _profil_manager():
+    return SimpleNamespace(profil=PROFIL, get_person_details=lambda: PROFIL, get_profil_type="Famille")
+
+
+class FakeCompletions:
+    """Répond selon la consigne de l'appel et mesure la simultanéité des appels"""
+
+    def __init__(self):
+        self.appels = []
+        self.en_cours = 0
+        self.max_simultanes = 0
+        self.reponses_incompletes = {"cross_selling_opportunites"}
+
+    async def create(self, **params):
+        self.appels.append(params)
+        self.en_cours += 1
+        self.max_simultanes = max(self.max_simultanes, self.en_cours)
+        try:
+            await asyncio.sleep(0.01)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=self._contenu(params)))],
+                usage=SimpleNamespace(prompt_tokens=100, completion_tokens=20, prompt_tokens_details=None),
+            )
+        finally:
+            self.en_cours -= 1
+
+    def _contenu(self, params):
+        consigne = params["messages"][1]["content"]
+        dimension = re.search(r"uniquement la dimension (\w+)", consigne)
+        if dimension is None:
+            return json.dumps({
+                "synthese": {"niveau_general": "Bien", "commentaire_global": "Bon appel"},
+                "recommandations": {
+                    "principales_forces": ["Écoute"],
+                    "axes_amelioration_prioritaires": ["Chiffres"],
+                    "actions_correctives_immediates": ["Relire le TMGF"],
+                },
+            })
+        dimension = dimension.group(1)
+        evaluation = {cle: "Bien" if cle == "niveau" else f"{cle} {dimension}" for cle in CLES_DIMENSION}
+        if dimension in self.reponses_incompletes:
+            # Première réponse incomplète : la dimension est redemandée
+            self.reponses_incompletes.discard(dimension)
+            del evaluation["reponse_suggeree"]
+        return json.dumps({dimension: evaluation})
+
+
+def test_dimensions_evaluees_en_parallele_puis_fusionnees():
+    """Les dimensions sont appelées simultanément, avec leurs seuls documents"""
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    etapes = []
+
+    resultat = asyncio.run(synthese_parallele_async(
+        HISTORIQUE, client, DOCUMENTS, _profil_manager(), suivi_etape=lambda etape, tentative: etapes.append(etape)
+    ))
+
+    assert "erreur" not in resultat
+    assert completions.max_simultanes == len(DIMENSIONS_SYNTHESE)
+    assert set(resultat["vision_detaillee"]) == set(DIMENSIONS_SYNTHESE)
+    assert resultat["vision_detaillee"]["cross_selling_opportunites"]["reponse_suggeree"]
+    assert resultat["synthese"]["niveau_general"] == "Bien"
+    assert resultat["synthese"]["timestamp"]
+    assert resultat["recommandations"]["principales_forces"] == ["Écoute"]
+    assert etapes == ["preparation_prompt", "appel_llm", "validation_json"]
+
+    metadata = resultat["_metadata_appel"]
+    assert metadata["mode"] == MODE_SYNTHESE_PARALLELE
+    assert metadata["schema_valide"] is True
+    assert metadata["appels"]["cross_selling_opportunites"]["tentatives"] == 2
+    # 5 dimensions (dont une redemandée) + synthèse globale
+    assert len(completions.appels) == len(DIMENSIONS_SYNTHESE) + 2
+    assert metadata["usage_tokens"]["prompt_tokens"] == 100 * len(completions.appels)
+
+    # Chaque dimension ne reçoit que ses documents
+    prompts = {
+        re.search(r"uniquement la dimension (\w+)", appel["messages"][1]["content"]).group(1): appel["messages"][0]["content"]
+        for appel in completions.appels if "uniquement la dimension" in appel["messages"][1]["content"]
+    }
+    assert "Tableau TMGF" in prompts["maitrise_produit_technique"]
+    assert "Tableau TMGF" not in prompts["posture_charte_relation_client"]
+    assert "charte_relation_client" in DOCUMENTS_PAR_DIMENSION["posture_charte_relation_client"]
+    assert "Charte relation client" in prompts["posture_charte_relation_client"]
+    assert all(appel["max_tokens"] < 4000 for appel in completions.appels)